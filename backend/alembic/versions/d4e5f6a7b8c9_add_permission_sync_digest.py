@@ -0,0 +1,38 @@
+"""add permission sync digest
+
+Revision ID: d4e5f6a7b8c9
+Revises: c1d2e3f4a5b6
+Create Date: 2025-12-22 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d4e5f6a7b8c9"
+down_revision = "c1d2e3f4a5b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document",
+        sa.Column("external_access_digest", sa.String(), nullable=True),
+    )
+    op.add_column(
+        "doc_permission_sync_attempt",
+        sa.Column("docs_unchanged", sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        "doc_permission_sync_attempt",
+        sa.Column("docs_with_permission_changes", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("doc_permission_sync_attempt", "docs_with_permission_changes")
+    op.drop_column("doc_permission_sync_attempt", "docs_unchanged")
+    op.drop_column("document", "external_access_digest")
@@ -0,0 +1,31 @@
+"""add chat session keyset index
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2025-12-29 10:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e5f6a7b8c9d0"
+down_revision = "d4e5f6a7b8c9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves the chat history listing, which pages by (time_created, id) per user
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_chat_session_user_time_created
+        ON chat_session (user_id, time_created DESC, id DESC)
+        WHERE deleted = false AND onyxbot_flow = false
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_chat_session_user_time_created;")
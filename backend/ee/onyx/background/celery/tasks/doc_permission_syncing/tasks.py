@@ -21,8 +21,11 @@ from tenacity import retry_if_exception
 from tenacity import stop_after_delay
 from tenacity import wait_random_exponential
 
+from ee.onyx.configs.app_configs import DOC_PERMISSION_SYNC_DB_BATCH_SIZE
 from ee.onyx.db.connector_credential_pair import get_all_auto_sync_cc_pairs
+from ee.onyx.db.document import ExternalPermsBatchUpsertResult
 from ee.onyx.db.document import upsert_document_external_perms
+from ee.onyx.db.document import upsert_document_external_perms_batch
 from ee.onyx.external_permissions.sync_params import get_source_perm_sync_config
 from onyx.access.models import DocExternalAccess
 from onyx.background.celery.apps.app_base import task_logger
@@ -570,33 +573,52 @@ def connector_permission_sync_generator_task(
             )
 
             tasks_generated = 0
+            docs_unchanged = 0
             docs_with_errors = 0
-            for doc_external_access in document_external_accesses:
+
+            def flush_permissions(batch: list[DocExternalAccess]) -> None:
+                nonlocal tasks_generated, docs_unchanged, docs_with_errors
+
                 result = redis_connector.permissions.update_db(
                     lock=lock,
-                    new_permissions=[doc_external_access],
+                    new_permissions=batch,
                     source_string=source_type,
                     connector_id=cc_pair.connector.id,
                     credential_id=cc_pair.credential.id,
                     task_logger=task_logger,
                 )
                 tasks_generated += result.num_updated
+                docs_unchanged += result.num_unchanged
                 docs_with_errors += result.num_errors
 
+            permissions_batch: list[DocExternalAccess] = []
+            for doc_external_access in document_external_accesses:
+                permissions_batch.append(doc_external_access)
+                if len(permissions_batch) >= DOC_PERMISSION_SYNC_DB_BATCH_SIZE:
+                    flush_permissions(permissions_batch)
+                    permissions_batch = []
+
+            if permissions_batch:
+                flush_permissions(permissions_batch)
+
             task_logger.info(
                 f"RedisConnector.permissions.generate_tasks finished. "
-                f"cc_pair={cc_pair_id} tasks_generated={tasks_generated} docs_with_errors={docs_with_errors}"
+                f"cc_pair={cc_pair_id} tasks_generated={tasks_generated} "
+                f"docs_unchanged={docs_unchanged} docs_with_errors={docs_with_errors}"
             )
 
             complete_doc_permission_sync_attempt(
                 db_session=db_session,
                 attempt_id=attempt_id,
-                total_docs_synced=tasks_generated,
+                total_docs_synced=tasks_generated + docs_unchanged,
                 docs_with_permission_errors=docs_with_errors,
+                docs_unchanged=docs_unchanged,
+                docs_with_permission_changes=tasks_generated,
             )
             task_logger.info(
                 f"Completed doc permission sync attempt {attempt_id}: "
-                f"{tasks_generated} docs, {docs_with_errors} errors"
+                f"{tasks_generated} changed, {docs_unchanged} unchanged, "
+                f"{docs_with_errors} errors"
             )
 
             redis_connector.permissions.generator_complete = tasks_generated
@@ -695,6 +717,67 @@ def document_update_permissions(
     return True
 
 
+@retry(
+    retry=retry_if_exception(is_retryable_sqlalchemy_error),
+    wait=wait_random_exponential(
+        multiplier=1, max=DOCUMENT_PERMISSIONS_UPDATE_MAX_WAIT
+    ),
+    stop=stop_after_delay(DOCUMENT_PERMISSIONS_UPDATE_STOP_AFTER),
+)
+def document_update_permissions_batch(
+    tenant_id: str,
+    permissions: list[DocExternalAccess],
+    source_type_str: str,
+    connector_id: int,
+    credential_id: int,
+) -> ExternalPermsBatchUpsertResult:
+    """Batched version of document_update_permissions. Documents whose permissions
+    haven't changed since the last sync are skipped entirely."""
+    start = time.monotonic()
+
+    with get_session_with_tenant(tenant_id=tenant_id) as db_session:
+        result = upsert_document_external_perms_batch(
+            db_session=db_session,
+            doc_external_accesses=permissions,
+            source_type=DocumentSource(source_type_str),
+        )
+
+        if result.changed_doc_ids:
+            # Add the users of changed documents to the DB if they don't exist
+            changed_doc_ids = set(result.changed_doc_ids)
+            emails = {
+                email
+                for doc_permissions in permissions
+                if doc_permissions.doc_id in changed_doc_ids
+                for email in doc_permissions.external_access.external_user_emails
+            }
+            batch_add_ext_perm_user_if_not_exists(
+                db_session=db_session,
+                emails=list(emails),
+                continue_on_error=True,
+            )
+
+        if result.created_doc_ids:
+            # If new documents were created, we associate them with the cc_pair
+            upsert_document_by_connector_credential_pair(
+                db_session=db_session,
+                connector_id=connector_id,
+                credential_id=credential_id,
+                document_ids=result.created_doc_ids,
+            )
+
+    elapsed = time.monotonic() - start
+    task_logger.info(
+        f"connector_id={connector_id} "
+        f"docs={len(permissions)} "
+        f"changed={len(result.changed_doc_ids)} "
+        f"unchanged={result.num_unchanged} "
+        f"action=update_permissions_batch "
+        f"elapsed={elapsed:.2f}"
+    )
+    return result
+
+
 def validate_permission_sync_fences(
     tenant_id: str,
     r: Redis,
@@ -966,12 +1049,11 @@ def monitor_ccpair_permissions_taskset(
     cc_pair_id = int(cc_pair_id_str)
 
     redis_connector = RedisConnector(tenant_id, cc_pair_id)
-    if not redis_connector.permissions.fenced:
+    progress = redis_connector.permissions.get_progress()
+    if progress is None:
         return
 
-    initial = redis_connector.permissions.generator_complete
-    if initial is None:
-        return
+    initial, remaining = progress
 
     try:
         payload = redis_connector.permissions.payload
@@ -985,7 +1067,6 @@ def monitor_ccpair_permissions_taskset(
     if not payload:
         return
 
-    remaining = redis_connector.permissions.get_remaining()
     task_logger.info(
         f"Permissions sync progress: "
         f"cc_pair={cc_pair_id} "
@@ -43,7 +43,7 @@ def monitor_usergroup_taskset(
 
     count = cast(int, r.scard(rug.taskset_key))
     task_logger.info(
-        f"User group sync progress: usergroup_id={usergroup_id} remaining={count} initial={initial_count}"
+        f"User group sync progress: usergroup_id={usergroup_id} remaining_tasks={count} docs={initial_count}"
     )
     if count > 0:
         update_sync_record_status(
@@ -12,6 +12,12 @@ DEFAULT_PERMISSION_DOC_SYNC_FREQUENCY = int(
     os.environ.get("DEFAULT_PERMISSION_DOC_SYNC_FREQUENCY") or 5 * 60
 )
 
+# Number of documents whose permissions are written to Postgres in one transaction
+# during doc permission sync. Documents with unchanged permissions are skipped.
+DOC_PERMISSION_SYNC_DB_BATCH_SIZE = int(
+    os.environ.get("DOC_PERMISSION_SYNC_DB_BATCH_SIZE") or 200
+)
+
 
 #####
 # Confluence
@@ -1,15 +1,43 @@
+import hashlib
+from collections.abc import Iterable
 from datetime import datetime
 from datetime import timezone
 
+from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from onyx.access.models import DocExternalAccess
 from onyx.access.models import ExternalAccess
 from onyx.access.utils import build_ext_group_name_for_onyx
 from onyx.configs.constants import DocumentSource
 from onyx.db.models import Document as DbDocument
 
 
+class ExternalPermsBatchUpsertResult(BaseModel):
+    # documents whose permissions changed (or were created), i.e. need a Vespa sync
+    changed_doc_ids: list[str]
+    # documents that did not exist yet and were created to hold the permissions
+    created_doc_ids: list[str]
+    num_unchanged: int
+
+
+def build_external_access_digest(
+    external_user_emails: Iterable[str],
+    prefixed_external_group_ids: Iterable[str],
+    is_public: bool,
+) -> str:
+    """Order independent digest of a document's stored external access."""
+    hasher = hashlib.sha256()
+    for values in (external_user_emails, prefixed_external_group_ids):
+        for value in sorted(set(values)):
+            hasher.update(value.encode("utf-8"))
+            hasher.update(b"\0")
+        hasher.update(b"\1")
+    hasher.update(b"1" if is_public else b"0")
+    return hasher.hexdigest()
+
+
 def upsert_document_external_perms__no_commit(
     db_session: Session,
     doc_id: str,
@@ -83,6 +111,11 @@ def upsert_document_external_perms(
             external_user_emails=external_access.external_user_emails,
             external_user_group_ids=prefixed_external_groups,
             is_public=external_access.is_public,
+            external_access_digest=build_external_access_digest(
+                external_access.external_user_emails,
+                prefixed_external_groups,
+                external_access.is_public,
+            ),
         )
         db_session.add(document)
         db_session.commit()
@@ -97,7 +130,116 @@ def upsert_document_external_perms(
         document.external_user_emails = list(external_access.external_user_emails)
         document.external_user_group_ids = list(prefixed_external_groups)
         document.is_public = external_access.is_public
+        document.external_access_digest = build_external_access_digest(
+            external_access.external_user_emails,
+            prefixed_external_groups,
+            external_access.is_public,
+        )
         document.last_modified = datetime.now(timezone.utc)
         db_session.commit()
 
     return False
+
+
+def upsert_document_external_perms_batch(
+    db_session: Session,
+    doc_external_accesses: list[DocExternalAccess],
+    source_type: DocumentSource,
+) -> ExternalPermsBatchUpsertResult:
+    """
+    Batched version of upsert_document_external_perms. Documents whose stored digest
+    matches the new permissions are skipped without loading them, the rest are written
+    in a single transaction. last_modified is only bumped for documents whose
+    permissions actually changed, so only those are picked up by the Vespa sync.
+    NOTE: this will replace any existing external access, it will not do a union
+    """
+    # the last permissions seen for a document win
+    new_perms: dict[str, tuple[ExternalAccess, set[str], str]] = {}
+    for doc_external_access in doc_external_accesses:
+        external_access = doc_external_access.external_access
+        prefixed_external_groups = {
+            build_ext_group_name_for_onyx(
+                ext_group_name=group_id,
+                source=source_type,
+            )
+            for group_id in external_access.external_user_group_ids
+        }
+        digest = build_external_access_digest(
+            external_access.external_user_emails,
+            prefixed_external_groups,
+            external_access.is_public,
+        )
+        new_perms[doc_external_access.doc_id] = (
+            external_access,
+            prefixed_external_groups,
+            digest,
+        )
+
+    if not new_perms:
+        return ExternalPermsBatchUpsertResult(
+            changed_doc_ids=[], created_doc_ids=[], num_unchanged=0
+        )
+
+    stored_digests: dict[str, str | None] = dict(
+        db_session.execute(
+            select(DbDocument.id, DbDocument.external_access_digest).where(
+                DbDocument.id.in_(new_perms)
+            )
+        )
+        .tuples()
+        .all()
+    )
+
+    created_doc_ids: list[str] = []
+    doc_ids_to_check: list[str] = []
+    for doc_id, (external_access, prefixed_groups, digest) in new_perms.items():
+        if doc_id not in stored_digests:
+            # If the document does not exist, still store the external access so that
+            # if the document is added later, the external access is already stored
+            db_session.add(
+                DbDocument(
+                    id=doc_id,
+                    semantic_id="",
+                    external_user_emails=list(external_access.external_user_emails),
+                    external_user_group_ids=list(prefixed_groups),
+                    is_public=external_access.is_public,
+                    external_access_digest=digest,
+                )
+            )
+            created_doc_ids.append(doc_id)
+        elif stored_digests[doc_id] != digest:
+            doc_ids_to_check.append(doc_id)
+
+    changed_doc_ids = list(created_doc_ids)
+    if doc_ids_to_check:
+        now = datetime.now(timezone.utc)
+        documents = db_session.scalars(
+            select(DbDocument).where(DbDocument.id.in_(doc_ids_to_check))
+        ).all()
+        for document in documents:
+            external_access, prefixed_external_groups, digest = new_perms[document.id]
+            # documents without a digest (e.g. written by indexing) may still hold
+            # the same permissions, don't trigger a Vespa sync for those
+            if (
+                external_access.external_user_emails
+                != set(document.external_user_emails or [])
+                or prefixed_external_groups
+                != set(document.external_user_group_ids or [])
+                or external_access.is_public != document.is_public
+            ):
+                document.external_user_emails = list(
+                    external_access.external_user_emails
+                )
+                document.external_user_group_ids = list(prefixed_external_groups)
+                document.is_public = external_access.is_public
+                document.last_modified = now
+                changed_doc_ids.append(document.id)
+            document.external_access_digest = digest
+
+    db_session.commit()
+
+    return ExternalPermsBatchUpsertResult(
+        changed_doc_ids=changed_doc_ids,
+        created_doc_ids=created_doc_ids,
+        num_unchanged=len(new_perms) - len(changed_doc_ids),
+    )
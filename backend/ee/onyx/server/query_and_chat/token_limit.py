@@ -4,7 +4,6 @@ from datetime import datetime
 from itertools import groupby
 from typing import Dict
 from typing import List
-from typing import Tuple
 from uuid import UUID
 
 from fastapi import HTTPException
@@ -12,6 +11,7 @@ from sqlalchemy import func
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED
 from onyx.db.api_key import is_api_key_email_address
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
 from onyx.db.models import ChatMessage
@@ -25,6 +25,12 @@ from onyx.db.token_limit import fetch_all_user_token_rate_limits
 from onyx.server.query_and_chat.token_limit import _get_cutoff_time
 from onyx.server.query_and_chat.token_limit import _is_rate_limited
 from onyx.server.query_and_chat.token_limit import _user_is_rate_limited_by_global
+from onyx.server.query_and_chat.token_usage_counters import fetch_token_usage
+from onyx.server.query_and_chat.token_usage_counters import GLOBAL_TOKEN_USAGE_SCOPE
+from onyx.server.query_and_chat.token_usage_counters import record_token_usage
+from onyx.server.query_and_chat.token_usage_counters import TokenUsage
+from onyx.server.query_and_chat.token_usage_counters import user_group_token_usage_scope
+from onyx.server.query_and_chat.token_usage_counters import user_token_usage_scope
 from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 
@@ -47,6 +53,24 @@ def _check_token_rate_limits(user: User | None) -> None:
         )
 
 
+def _record_token_usage(user_id: UUID | None, usage: TokenUsage) -> None:
+    scopes = [GLOBAL_TOKEN_USAGE_SCOPE]
+    if user_id is not None:
+        with get_session_with_current_tenant() as db_session:
+            user_group_ids = db_session.scalars(
+                select(User__UserGroup.user_group_id).where(
+                    User__UserGroup.user_id == user_id
+                )
+            ).all()
+        scopes.append(user_token_usage_scope(user_id))
+        scopes.extend(
+            user_group_token_usage_scope(user_group_id)
+            for user_group_id in user_group_ids
+        )
+
+    record_token_usage(scopes, usage)
+
+
 """
 User rate limits
 """
@@ -60,7 +84,18 @@ def _user_is_rate_limited(user_id: UUID) -> None:
 
         if user_rate_limits:
             user_cutoff_time = _get_cutoff_time(user_rate_limits)
-            user_usage = _fetch_user_usage(user_id, user_cutoff_time, db_session)
+            if TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED:
+                user_scope = user_token_usage_scope(user_id)
+                user_usage = fetch_token_usage(
+                    [user_scope],
+                    user_cutoff_time,
+                    lambda scopes, cutoff_time: {
+                        scope: _fetch_user_usage(user_id, cutoff_time, db_session)
+                        for scope in scopes
+                    },
+                )[user_scope]
+            else:
+                user_usage = _fetch_user_usage(user_id, user_cutoff_time, db_session)
 
             if _is_rate_limited(user_rate_limits, user_usage):
                 raise HTTPException(
@@ -106,9 +141,15 @@ def _user_is_rate_limited_by_group(user_id: UUID) -> None:
             )
 
             user_group_ids = list(group_rate_limits.keys())
-            group_usage = _fetch_user_group_usage(
-                user_group_ids, group_cutoff_time, db_session
-            )
+            group_usage: dict[int, TokenUsage]
+            if TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED:
+                group_usage = _fetch_user_group_usage_from_counters(
+                    user_group_ids, group_cutoff_time, db_session
+                )
+            else:
+                group_usage = _fetch_user_group_usage(
+                    user_group_ids, group_cutoff_time, db_session
+                )
 
             has_at_least_one_untriggered_limit = False
             for user_group_id, rate_limits in group_rate_limits.items():
@@ -159,7 +200,7 @@ def _fetch_all_user_group_rate_limits(
 
 def _fetch_user_group_usage(
     user_group_ids: list[int], cutoff_time: datetime, db_session: Session
-) -> dict[int, list[Tuple[datetime, int]]]:
+) -> dict[int, TokenUsage]:
     """
     Fetch user group usage within the cutoff time, grouped by minute
     """
@@ -174,6 +215,8 @@ def _fetch_user_group_usage(
         .join(UserGroup, UserGroup.id == User__UserGroup.user_group_id)
         .filter(UserGroup.id.in_(user_group_ids), ChatMessage.time_sent >= cutoff_time)
         .group_by(func.date_trunc("minute", ChatMessage.time_sent), UserGroup.id)
+        # groupby below only merges consecutive rows
+        .order_by(UserGroup.id)
     ).all()
 
     return {
@@ -182,3 +225,31 @@ def _fetch_user_group_usage(
             user_group_usage, key=lambda row: row[2]
         )
     }
+
+
+def _fetch_user_group_usage_from_counters(
+    user_group_ids: list[int], cutoff_time: datetime, db_session: Session
+) -> dict[int, TokenUsage]:
+    scope_to_user_group_id = {
+        user_group_token_usage_scope(user_group_id): user_group_id
+        for user_group_id in user_group_ids
+    }
+
+    def _fetch_usage_from_db(
+        scopes: list[str], cutoff_time: datetime
+    ) -> dict[str, TokenUsage]:
+        db_usage = _fetch_user_group_usage(
+            [scope_to_user_group_id[scope] for scope in scopes],
+            cutoff_time,
+            db_session,
+        )
+        return {
+            scope: db_usage.get(scope_to_user_group_id[scope], []) for scope in scopes
+        }
+
+    usage_by_scope = fetch_token_usage(
+        list(scope_to_user_group_id.keys()), cutoff_time, _fetch_usage_from_db
+    )
+    return {
+        scope_to_user_group_id[scope]: usage for scope, usage in usage_by_scope.items()
+    }
@@ -0,0 +1,331 @@
+"""
+In-process micro-batching for the bi-encoder endpoint.
+
+Indexing workers send the model server many tiny requests (a couple of chunks each) and
+query-time embedding calls arrive concurrently with them. Running each request as its own
+`encode` call wastes forward passes and races inside the tokenizer, so requests for the same
+model are queued here and coalesced into shared, length-sorted batches. Queries get their own
+lane which is always drained first, so a search never waits behind a large backlog of passages
+for more than a single forward pass.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import EMBEDDING_BATCHER_MAX_BATCH_SIZE
+from shared_configs.configs import EMBEDDING_BATCHER_MAX_WAIT_MS
+from shared_configs.configs import EMBEDDING_BATCHER_QUERY_MAX_WAIT_MS
+
+logger = setup_logger()
+
+QUERY_LANE = "query"
+PASSAGE_LANE = "passage"
+
+# A single embedding as returned by the encode function, e.g. a row of a numpy array.
+# Rows are passed through untouched so callers decide how (and whether) to convert them.
+Vector = Any
+EncodeFunction = Callable[[list[str]], Sequence[Vector]]
+TokenLengthFunction = Callable[[list[str]], list[int]]
+
+_QUEUE_DEPTH = Gauge(
+    "onyx_embedding_batcher_queue_depth",
+    "Number of texts waiting to be embedded",
+    ["model", "lane"],
+)
+_BATCH_SIZE = Histogram(
+    "onyx_embedding_batcher_batch_size",
+    "Number of texts per coalesced forward pass",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+_BATCH_FILL_RATIO = Histogram(
+    "onyx_embedding_batcher_batch_fill_ratio",
+    "Texts per forward pass divided by the max batch size",
+    ["model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+_REQUESTS_PER_BATCH = Histogram(
+    "onyx_embedding_batcher_requests_per_batch",
+    "Number of distinct requests that shared a forward pass",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+_REQUEST_LATENCY = Histogram(
+    "onyx_embedding_batcher_request_seconds",
+    "Time from enqueueing a request until all of its texts are embedded",
+    ["model", "lane"],
+)
+_BATCH_ERRORS = Counter(
+    "onyx_embedding_batcher_batch_errors_total",
+    "Number of coalesced forward passes that raised",
+    ["model"],
+)
+
+
+@dataclass(eq=False)
+class _PendingRequest:
+    texts: list[str]
+    lane: str
+    future: "asyncio.Future[list[Vector]]"
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # index of the first text that has not yet been handed to a batch
+    next_index: int = 0
+    results: list[Vector | None] = field(default_factory=list)
+    remaining: int = 0
+
+    def __post_init__(self) -> None:
+        self.results = [None] * len(self.texts)
+        self.remaining = len(self.texts)
+
+    @property
+    def unscheduled(self) -> int:
+        return len(self.texts) - self.next_index
+
+
+def _char_lengths(texts: list[str]) -> list[int]:
+    return [len(text) for text in texts]
+
+
+class EmbeddingBatcher:
+    """Coalesces texts from concurrent requests for a single model into shared batches.
+
+    All forward passes for a batcher are run on one dedicated thread, so the underlying
+    model/tokenizer is never used concurrently.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        encode_fn: EncodeFunction,
+        token_length_fn: TokenLengthFunction | None = None,
+        max_batch_size: int = EMBEDDING_BATCHER_MAX_BATCH_SIZE,
+        max_wait_seconds: float = EMBEDDING_BATCHER_MAX_WAIT_MS / 1000,
+        query_max_wait_seconds: float = EMBEDDING_BATCHER_QUERY_MAX_WAIT_MS / 1000,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.query_max_wait_seconds = query_max_wait_seconds
+
+        self._encode_fn = encode_fn
+        self._token_length_fn = token_length_fn or _char_lengths
+
+        self._lanes: dict[str, deque[_PendingRequest]] = {
+            QUERY_LANE: deque(),
+            PASSAGE_LANE: deque(),
+        }
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="embedding_batcher"
+        )
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def queue_depth(self, lane: str | None = None) -> int:
+        lanes = [lane] if lane else list(self._lanes)
+        return sum(
+            request.unscheduled for name in lanes for request in self._lanes[name]
+        )
+
+    async def embed(self, texts: list[str], lane: str = PASSAGE_LANE) -> list[Vector]:
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown embedding lane: {lane}")
+        if not texts:
+            return []
+
+        request = _PendingRequest(
+            texts=texts, lane=lane, future=self._loop.create_future()
+        )
+        self._lanes[lane].append(request)
+        self._update_queue_depth()
+
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        self._wakeup.set()
+
+        embeddings = await request.future
+        _REQUEST_LATENCY.labels(self.model_name, lane).observe(
+            time.monotonic() - request.enqueued_at
+        )
+        return embeddings
+
+    def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for lane in self._lanes.values():
+            while lane:
+                request = lane.popleft()
+                if not request.future.done():
+                    request.future.set_exception(
+                        RuntimeError("Embedding batcher was shut down")
+                    )
+        self._update_queue_depth()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _has_pending(self) -> bool:
+        return any(self._lanes.values())
+
+    def _update_queue_depth(self) -> None:
+        for lane in self._lanes:
+            _QUEUE_DEPTH.labels(self.model_name, lane).set(self.queue_depth(lane))
+
+    def _batch_deadline(self) -> float:
+        """The batch is dispatched once the oldest waiting text has waited out its window.
+        Any waiting query shortens the window for the whole batch."""
+        queries = self._lanes[QUERY_LANE]
+        if queries:
+            return queries[0].enqueued_at + self.query_max_wait_seconds
+        return self._lanes[PASSAGE_LANE][0].enqueued_at + self.max_wait_seconds
+
+    async def _wait_for_batch_window(self) -> None:
+        while self.queue_depth() < self.max_batch_size:
+            timeout = self._batch_deadline() - time.monotonic()
+            if timeout <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+
+    def _assemble_batch(self) -> list[tuple[_PendingRequest, int]]:
+        """Takes up to max_batch_size texts, queries first. Large requests are split across
+        several batches so that queries arriving later can still jump ahead of them."""
+        slots: list[tuple[_PendingRequest, int]] = []
+        for lane_name in (QUERY_LANE, PASSAGE_LANE):
+            lane = self._lanes[lane_name]
+            while lane and len(slots) < self.max_batch_size:
+                request = lane[0]
+                if request.future.done():
+                    # caller went away (e.g. cancelled), nothing left to do for it
+                    lane.popleft()
+                    continue
+
+                take = min(request.unscheduled, self.max_batch_size - len(slots))
+                slots.extend(
+                    (request, index)
+                    for index in range(request.next_index, request.next_index + take)
+                )
+                request.next_index += take
+                if request.unscheduled == 0:
+                    lane.popleft()
+        self._update_queue_depth()
+        return slots
+
+    def _encode_length_sorted(self, texts: list[str]) -> list[Vector]:
+        # Grouping similarly sized texts keeps padding inside each forward pass to a minimum
+        lengths = self._token_length_fn(texts)
+        if len(lengths) != len(texts):
+            lengths = _char_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        vectors = self._encode_fn([texts[i] for i in order])
+        if len(vectors) != len(texts):
+            raise RuntimeError(
+                f"Model returned {len(vectors)} embeddings for {len(texts)} texts"
+            )
+
+        embeddings: list[Vector] = [None] * len(texts)
+        for position, original_index in enumerate(order):
+            embeddings[original_index] = vectors[position]
+        return embeddings
+
+    async def _process_batch(self, slots: list[tuple[_PendingRequest, int]]) -> None:
+        texts = [request.texts[index] for request, index in slots]
+        requests = list({id(request): request for request, _ in slots}.values())
+
+        _BATCH_SIZE.labels(self.model_name).observe(len(texts))
+        _BATCH_FILL_RATIO.labels(self.model_name).observe(
+            len(texts) / self.max_batch_size
+        )
+        _REQUESTS_PER_BATCH.labels(self.model_name).observe(len(requests))
+
+        try:
+            embeddings = await self._loop.run_in_executor(
+                self._executor, self._encode_length_sorted, texts
+            )
+        except Exception as e:
+            _BATCH_ERRORS.labels(self.model_name).inc()
+            logger.exception(
+                f"Coalesced embedding batch failed: model={self.model_name} "
+                f"texts={len(texts)} requests={len(requests)}"
+            )
+            for request in requests:
+                # drop the rest of the request, it can no longer succeed
+                lane = self._lanes[request.lane]
+                if request in lane:
+                    lane.remove(request)
+                if not request.future.done():
+                    request.future.set_exception(e)
+            self._update_queue_depth()
+            return
+
+        for (request, index), embedding in zip(slots, embeddings):
+            request.results[index] = embedding
+            request.remaining -= 1
+            if request.remaining == 0 and not request.future.done():
+                request.future.set_result(
+                    [result for result in request.results if result is not None]
+                )
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._has_pending():
+                await self._wait_for_batch_window()
+                slots = self._assemble_batch()
+                if slots:
+                    await self._process_batch(slots)
+
+
+_BATCHERS: dict[tuple[str, int, bool], EmbeddingBatcher] = {}
+
+
+def get_embedding_batcher(
+    model_name: str,
+    max_context_length: int,
+    normalize_embeddings: bool,
+    encode_fn: EncodeFunction,
+    token_length_fn: TokenLengthFunction | None = None,
+) -> EmbeddingBatcher:
+    """Returns the batcher for this model configuration, creating it on first use.
+    Only requests that can share a forward pass (same model, context length and
+    normalization) are coalesced."""
+    key = (model_name, max_context_length, normalize_embeddings)
+    batcher = _BATCHERS.get(key)
+    if batcher is None or batcher.loop is not asyncio.get_running_loop():
+        if batcher is not None:
+            batcher.shutdown()
+        batcher = EmbeddingBatcher(
+            model_name=model_name,
+            encode_fn=encode_fn,
+            token_length_fn=token_length_fn,
+        )
+        _BATCHERS[key] = batcher
+    return batcher
+
+
+def shutdown_embedding_batchers() -> None:
+    for batcher in _BATCHERS.values():
+        batcher.shutdown()
+    _BATCHERS.clear()
@@ -4,13 +4,23 @@ from typing import Any
 from typing import Optional
 from typing import TYPE_CHECKING
 
+import numpy as np
 from fastapi import APIRouter
 from fastapi import HTTPException
 from fastapi import Request
+from fastapi import Response
 
+from model_server.embedding_batcher import get_embedding_batcher
+from model_server.embedding_batcher import PASSAGE_LANE
+from model_server.embedding_batcher import QUERY_LANE
 from model_server.utils import simple_log_function_time
 from onyx.utils.logger import setup_logger
+from shared_configs.configs import EMBEDDING_BATCHER_ENABLED
+from shared_configs.configs import EMBEDDING_BATCHER_MAX_BATCH_SIZE
 from shared_configs.configs import INDEXING_ONLY
+from shared_configs.embedding_transport import EMBEDDING_BINARY_CONTENT_TYPE
+from shared_configs.embedding_transport import encode_embeddings
+from shared_configs.embedding_transport import get_requested_binary_dtype
 from shared_configs.enums import EmbedTextType
 from shared_configs.model_server_models import Embedding
 from shared_configs.model_server_models import EmbedRequest
@@ -105,12 +115,19 @@ ENCODING_RETRY_DELAY = 0.1
 
 
 def _concurrent_embedding(
-    texts: list[str], model: "SentenceTransformer", normalize_embeddings: bool
+    texts: list[str],
+    model: "SentenceTransformer",
+    normalize_embeddings: bool,
+    batch_size: int | None = None,
 ) -> Any:
     """Synchronous wrapper for concurrent_embedding to use with run_in_executor."""
+    encode_kwargs: dict[str, Any] = {"normalize_embeddings": normalize_embeddings}
+    if batch_size is not None:
+        encode_kwargs["batch_size"] = batch_size
+
     for _ in range(ENCODING_RETRIES):
         try:
-            return model.encode(texts, normalize_embeddings=normalize_embeddings)
+            return model.encode(texts, **encode_kwargs)
         except RuntimeError as e:
             # There is a concurrency bug in the SentenceTransformer library that causes
             # the model to fail to encode texts. It's pretty rare and we want to allow
@@ -118,18 +135,62 @@ def _concurrent_embedding(
             # "RuntimeError: Already borrowed" and occurs in the transformers library)
             logger.warning(f"Error encoding texts, retrying: {e}")
             time.sleep(ENCODING_RETRY_DELAY)
-    return model.encode(texts, normalize_embeddings=normalize_embeddings)
+    return model.encode(texts, **encode_kwargs)
+
+
+def _token_lengths(model: "SentenceTransformer", texts: list[str]) -> list[int]:
+    """Token counts used by the batcher to group similarly sized texts. Falls back to
+    character counts if the model does not expose a usable tokenizer."""
+    try:
+        input_ids = model.tokenizer(
+            texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=model.max_seq_length,
+        )["input_ids"]
+        return [len(ids) for ids in input_ids]
+    except Exception:
+        return [len(text) for text in texts]
+
+
+async def _batched_embedding(
+    texts: list[str],
+    model_name: str,
+    local_model: "SentenceTransformer",
+    max_context_length: int,
+    normalize_embeddings: bool,
+    text_type: EmbedTextType | None,
+) -> list[Any]:
+    """Hands the texts to the micro-batcher for this model so they can share forward
+    passes with other in-flight requests."""
+    batcher = get_embedding_batcher(
+        model_name=model_name,
+        max_context_length=max_context_length,
+        normalize_embeddings=normalize_embeddings,
+        encode_fn=lambda batch: _concurrent_embedding(
+            batch,
+            local_model,
+            normalize_embeddings,
+            batch_size=EMBEDDING_BATCHER_MAX_BATCH_SIZE,
+        ),
+        token_length_fn=lambda batch: _token_lengths(local_model, batch),
+    )
+    lane = QUERY_LANE if text_type == EmbedTextType.QUERY else PASSAGE_LANE
+    return await batcher.embed(texts, lane=lane)
 
 
 @simple_log_function_time()
-async def embed_text(
+async def embed_text_vectors(
     texts: list[str],
     model_name: str | None,
     max_context_length: int,
     normalize_embeddings: bool,
     prefix: str | None,
     gpu_type: str = "UNKNOWN",
-) -> list[Embedding]:
+    text_type: EmbedTextType | None = None,
+) -> np.ndarray:
+    """Embeds the texts and returns them as a (len(texts), dim) array, without
+    converting the vectors to Python lists."""
     if not all(texts):
         logger.error("Empty strings provided for embedding")
         raise ValueError("Empty strings are not allowed for embedding.")
@@ -157,17 +218,24 @@ async def embed_text(
         local_model = get_embedding_model(
             model_name=model_name, max_context_length=max_context_length
         )
-        # Run CPU-bound embedding in a thread pool
-        embeddings_vectors = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: _concurrent_embedding(
-                prefixed_texts, local_model, normalize_embeddings
-            ),
-        )
-        embeddings = [
-            embedding if isinstance(embedding, list) else embedding.tolist()
-            for embedding in embeddings_vectors
-        ]
+        if EMBEDDING_BATCHER_ENABLED:
+            embeddings_vectors = await _batched_embedding(
+                texts=prefixed_texts,
+                model_name=model_name,
+                local_model=local_model,
+                max_context_length=max_context_length,
+                normalize_embeddings=normalize_embeddings,
+                text_type=text_type,
+            )
+        else:
+            # Run CPU-bound embedding in a thread pool
+            embeddings_vectors = await asyncio.get_event_loop().run_in_executor(
+                None,
+                lambda: _concurrent_embedding(
+                    prefixed_texts, local_model, normalize_embeddings
+                ),
+            )
+        embeddings = np.asarray(embeddings_vectors)
 
         elapsed = time.monotonic() - start
         logger.info(
@@ -189,6 +257,27 @@ async def embed_text(
     return embeddings
 
 
+async def embed_text(
+    texts: list[str],
+    model_name: str | None,
+    max_context_length: int,
+    normalize_embeddings: bool,
+    prefix: str | None,
+    gpu_type: str = "UNKNOWN",
+    text_type: EmbedTextType | None = None,
+) -> list[Embedding]:
+    embeddings = await embed_text_vectors(
+        texts=texts,
+        model_name=model_name,
+        max_context_length=max_context_length,
+        normalize_embeddings=normalize_embeddings,
+        prefix=prefix,
+        gpu_type=gpu_type,
+        text_type=text_type,
+    )
+    return embeddings.tolist()
+
+
 @simple_log_function_time()
 async def local_rerank(query: str, docs: list[str], model_name: str) -> list[float]:
     cross_encoder = get_local_reranking_model(model_name)
@@ -199,17 +288,34 @@ async def local_rerank(query: str, docs: list[str], model_name: str) -> list[flo
     )
 
 
-@router.post("/bi-encoder-embed")
+@router.post("/bi-encoder-embed", response_model=EmbedResponse)
 async def route_bi_encoder_embed(
     request: Request,
     embed_request: EmbedRequest,
-) -> EmbedResponse:
-    return await process_embed_request(embed_request, request.app.state.gpu_type)
+) -> EmbedResponse | Response:
+    binary_dtype = get_requested_binary_dtype(request.headers)
+    if binary_dtype is None:
+        return await process_embed_request(embed_request, request.app.state.gpu_type)
+
+    embeddings = await _process_embed_request_vectors(
+        embed_request, request.app.state.gpu_type
+    )
+    content, headers = encode_embeddings(embeddings, binary_dtype)
+    return Response(
+        content=content, media_type=EMBEDDING_BINARY_CONTENT_TYPE, headers=headers
+    )
 
 
 async def process_embed_request(
     embed_request: EmbedRequest, gpu_type: str = "UNKNOWN"
 ) -> EmbedResponse:
+    embeddings = await _process_embed_request_vectors(embed_request, gpu_type)
+    return EmbedResponse(embeddings=embeddings.tolist())
+
+
+async def _process_embed_request_vectors(
+    embed_request: EmbedRequest, gpu_type: str = "UNKNOWN"
+) -> np.ndarray:
     from litellm.exceptions import RateLimitError
 
     # Only local models should use this endpoint - API providers should make direct API calls
@@ -233,15 +339,15 @@ async def process_embed_request(
         else:
             prefix = None
 
-        embeddings = await embed_text(
+        return await embed_text_vectors(
             texts=embed_request.texts,
             model_name=embed_request.model_name,
             max_context_length=embed_request.max_context_length,
             normalize_embeddings=embed_request.normalize_embeddings,
             prefix=prefix,
             gpu_type=gpu_type,
+            text_type=embed_request.text_type,
         )
-        return EmbedResponse(embeddings=embeddings)
     except RateLimitError as e:
         raise HTTPException(
             status_code=429,
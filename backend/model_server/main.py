@@ -17,6 +17,7 @@ from transformers import logging as transformer_logging
 from model_server.custom_models import router as custom_models_router
 from model_server.custom_models import warm_up_information_content_model
 from model_server.custom_models import warm_up_intent_model
+from model_server.embedding_batcher import shutdown_embedding_batchers
 from model_server.encoders import router as encoders_router
 from model_server.management_endpoints import router as management_router
 from model_server.utils import get_gpu_type
@@ -28,6 +29,7 @@ from onyx.utils.middleware import add_onyx_tenant_id_middleware
 from shared_configs.configs import INDEXING_ONLY
 from shared_configs.configs import MIN_THREADS_ML_MODELS
 from shared_configs.configs import MODEL_SERVER_ALLOWED_HOST
+from shared_configs.configs import MODEL_SERVER_KEEP_ALIVE_TIMEOUT
 from shared_configs.configs import MODEL_SERVER_PORT
 from shared_configs.configs import SENTRY_DSN
 from shared_configs.configs import SKIP_WARM_UP
@@ -106,6 +108,8 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
 
     yield
 
+    shutdown_embedding_batchers()
+
 
 def get_model_app() -> FastAPI:
     application = FastAPI(
@@ -146,4 +150,9 @@ if __name__ == "__main__":
         f"Starting Onyx Model Server on http://{MODEL_SERVER_ALLOWED_HOST}:{str(MODEL_SERVER_PORT)}/"
     )
     logger.notice(f"Model Server Version: {__version__}")
-    uvicorn.run(app, host=MODEL_SERVER_ALLOWED_HOST, port=MODEL_SERVER_PORT)
+    uvicorn.run(
+        app,
+        host=MODEL_SERVER_ALLOWED_HOST,
+        port=MODEL_SERVER_PORT,
+        timeout_keep_alive=MODEL_SERVER_KEEP_ALIVE_TIMEOUT,
+    )
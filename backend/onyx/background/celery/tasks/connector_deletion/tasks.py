@@ -378,7 +378,7 @@ def monitor_connector_deletion_taskset(
 
     redis_connector = RedisConnector(tenant_id, cc_pair_id)
 
-    fence_data = redis_connector.delete.payload
+    fence_data, remaining = redis_connector.delete.get_progress()
     if not fence_data:
         task_logger.warning(
             f"Connector deletion - fence payload invalid: cc_pair={cc_pair_id}"
@@ -389,7 +389,6 @@ def monitor_connector_deletion_taskset(
         # the fence is setting up but isn't ready yet
         return
 
-    remaining = redis_connector.delete.get_remaining()
     task_logger.info(
         f"Connector deletion progress: cc_pair={cc_pair_id} remaining={remaining} initial={fence_data.num_tasks}"
     )
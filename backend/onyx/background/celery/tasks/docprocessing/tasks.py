@@ -6,6 +6,7 @@ from collections import defaultdict
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from itertools import chain
 from typing import Any
 
 from celery import Celery
@@ -40,6 +41,7 @@ from onyx.background.indexing.checkpointing_utils import (
 )
 from onyx.background.indexing.index_attempt_utils import cleanup_index_attempts
 from onyx.background.indexing.index_attempt_utils import get_old_index_attempts
+from onyx.configs.app_configs import INDEX_BATCH_SIZE
 from onyx.configs.app_configs import MANAGED_VESPA
 from onyx.configs.app_configs import VESPA_CLOUD_CERT_PATH
 from onyx.configs.app_configs import VESPA_CLOUD_KEY_PATH
@@ -53,7 +55,6 @@ from onyx.configs.constants import OnyxRedisConstants
 from onyx.configs.constants import OnyxRedisLocks
 from onyx.configs.constants import OnyxRedisSignals
 from onyx.connectors.models import ConnectorFailure
-from onyx.connectors.models import Document
 from onyx.connectors.models import IndexAttemptMetadata
 from onyx.db.connector import mark_ccpair_with_indexing_trigger
 from onyx.db.connector_credential_pair import (
@@ -94,6 +95,8 @@ from onyx.indexing.adapters.document_indexing_adapter import (
     DocumentIndexingBatchAdapter,
 )
 from onyx.indexing.embedder import DefaultIndexingEmbedder
+from onyx.indexing.embedding_cache import EmbeddingCacheStats
+from onyx.indexing.indexing_pipeline import IndexingPipelineResult
 from onyx.indexing.indexing_pipeline import run_indexing_pipeline
 from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.natural_language_processing.search_nlp_models import (
@@ -107,6 +110,7 @@ from onyx.redis.redis_pool import redis_lock_dump
 from onyx.redis.redis_pool import SCAN_ITER_COUNT_DEFAULT
 from onyx.redis.redis_utils import is_fence
 from onyx.server.runtime.onyx_runtime import OnyxRuntime
+from onyx.utils.batching import batch_generator
 from onyx.utils.logger import setup_logger
 from onyx.utils.middleware import make_randomized_onyx_request_id
 from onyx.utils.telemetry import mt_cloud_telemetry
@@ -126,6 +130,9 @@ DOCPROCESSING_HEARTBEAT_TIMEOUT_MULTIPLIER = 24
 # This should be much longer than INDEXING_WORKER_HEARTBEAT_INTERVAL (30s)
 HEARTBEAT_TIMEOUT_SECONDS = 30 * 60  # 30 minutes
 INDEX_ATTEMPT_BATCH_SIZE = 500
+# Per index attempt embedding cache hit/miss counters, summed over all batches
+_EMBEDDING_CACHE_STATS_PREFIX = "embedding_cache_stats"
+_EMBEDDING_CACHE_STATS_TTL = 60 * 60 * 24 * 7  # 1 week
 
 
 def _get_fence_validation_block_expiration() -> int:
@@ -1213,10 +1220,38 @@ def _check_failure_threshold(
         )
 
 
+def _record_embedding_cache_stats(
+    r: Redis,
+    index_attempt_id: int,
+    batch_num: int,
+    cache_stats: EmbeddingCacheStats,
+) -> None:
+    """Accumulates embedding cache hits/misses across all batches of the attempt
+    (batches may run on different workers) and logs the running hit rate."""
+    key = f"{_EMBEDDING_CACHE_STATS_PREFIX}_{index_attempt_id}"
+    pipe = r.pipeline()
+    pipe.hincrby(key, "hits", cache_stats.hits)
+    pipe.hincrby(key, "misses", cache_stats.misses)
+    pipe.expire(key, _EMBEDDING_CACHE_STATS_TTL)
+    total_hits, total_misses, _ = pipe.execute()
+
+    attempt_stats = EmbeddingCacheStats(hits=total_hits, misses=total_misses)
+    task_logger.info(
+        f"event=embedding_cache "
+        f"index_attempt_id={index_attempt_id} "
+        f"batch_num={batch_num} "
+        f"batch_hits={cache_stats.hits} "
+        f"batch_misses={cache_stats.misses} "
+        f"attempt_hits={attempt_stats.hits} "
+        f"attempt_misses={attempt_stats.misses} "
+        f"attempt_hit_rate={attempt_stats.hit_rate:.2f}"
+    )
+
+
 def _resolve_indexing_document_errors(
     cc_pair_id: int,
     failures: list[ConnectorFailure],
-    document_batch: list[Document],
+    document_ids: list[str],
 ) -> None:
     with get_session_with_current_tenant() as db_session_temp:
         # get previously unresolved errors
@@ -1239,9 +1274,9 @@ def _resolve_indexing_document_errors(
             if failure.failed_document
         ]
         successful_document_ids = [
-            document.id
-            for document in document_batch
-            if document.id not in failed_document_ids
+            document_id
+            for document_id in document_ids
+            if document_id not in failed_document_ids
         ]
         for document_id in successful_document_ids:
             if document_id not in doc_id_to_unresolved_errors:
@@ -1329,13 +1364,16 @@ def _docprocessing_task(
             },
         )
 
-        # Retrieve documents from storage
-        documents = storage.get_batch(batch_num)
+        # Documents are decoded from storage as the pipeline consumes them, so indexing
+        # starts on the first INDEX_BATCH_SIZE documents before the rest are parsed
+        document_iter = storage.iter_batch(batch_num)
+        document_batches = batch_generator(document_iter or [], INDEX_BATCH_SIZE)
+        documents = next(document_batches, None)
         if not documents:
             task_logger.error(f"No documents found for batch {batch_num}")
             return
 
-        # FIX: Monitor memory after loading documents
+        # FIX: Monitor memory after loading the first documents
         emit_process_memory(
             os.getpid(),
             "docprocessing",
@@ -1411,16 +1449,9 @@ def _docprocessing_task(
                 batch_num=batch_num,
             )
 
-            # Process documents through indexing pipeline
             connector_source = (
                 index_attempt.connector_credential_pair.connector.source.value
             )
-            task_logger.info(
-                f"Processing {len(documents)} documents through indexing pipeline: "
-                f"cc_pair_id={cc_pair_id}, source={connector_source}, "
-                f"batch_num={batch_num}"
-            )
-
             adapter = DocumentIndexingBatchAdapter(
                 db_session=db_session,
                 connector_id=index_attempt.connector_credential_pair.connector.id,
@@ -1429,18 +1460,53 @@ def _docprocessing_task(
                 index_attempt_metadata=index_attempt_metadata,
             )
 
-            # real work happens here!
-            index_pipeline_result = run_indexing_pipeline(
-                embedder=embedding_model,
-                information_content_classification_model=information_content_classification_model,
-                document_index=document_index,
-                ignore_time_skip=True,  # Documents are already filtered during extraction
-                db_session=db_session,
-                tenant_id=tenant_id,
-                document_batch=documents,
-                request_id=index_attempt_metadata.request_id,
-                adapter=adapter,
+            index_pipeline_result = IndexingPipelineResult(
+                new_docs=0, total_docs=0, total_chunks=0, failures=[]
             )
+            document_ids: list[str] = []
+            for documents in chain([documents], document_batches):
+                if document_ids and callback.should_stop():
+                    raise RuntimeError("Docprocessing cancelled by connector pausing")
+
+                # Process documents through indexing pipeline
+                task_logger.info(
+                    f"Processing {len(documents)} documents through indexing pipeline: "
+                    f"cc_pair_id={cc_pair_id}, source={connector_source}, "
+                    f"batch_num={batch_num}"
+                )
+
+                # real work happens here!
+                sub_batch_result = run_indexing_pipeline(
+                    embedder=embedding_model,
+                    information_content_classification_model=information_content_classification_model,
+                    document_index=document_index,
+                    ignore_time_skip=True,  # Documents are already filtered during extraction
+                    db_session=db_session,
+                    tenant_id=tenant_id,
+                    document_batch=documents,
+                    request_id=index_attempt_metadata.request_id,
+                    adapter=adapter,
+                )
+                index_pipeline_result = IndexingPipelineResult(
+                    new_docs=index_pipeline_result.new_docs + sub_batch_result.new_docs,
+                    total_docs=index_pipeline_result.total_docs
+                    + sub_batch_result.total_docs,
+                    total_chunks=index_pipeline_result.total_chunks
+                    + sub_batch_result.total_chunks,
+                    failures=index_pipeline_result.failures + sub_batch_result.failures,
+                )
+                document_ids.extend(document.id for document in documents)
+
+            if embedding_model.embedding_cache is not None:
+                try:
+                    _record_embedding_cache_stats(
+                        r,
+                        index_attempt_id,
+                        batch_num,
+                        embedding_model.cache_stats,
+                    )
+                except Exception:
+                    task_logger.exception("Failed to record embedding cache stats")
 
         # Update batch completion and document counts atomically using database coordination
 
@@ -1456,7 +1522,7 @@ def _docprocessing_task(
             _resolve_indexing_document_errors(
                 cc_pair_id,
                 index_pipeline_result.failures,
-                documents,
+                document_ids,
             )
 
         coordination_status = None
@@ -1510,7 +1576,7 @@ def _docprocessing_task(
         # This helps prevent memory accumulation across multiple batches
         # NOTE: Thread-local event loops in embedding threads are cleaned up automatically
         # via the _cleanup_thread_local decorator in search_nlp_models.py
-        del documents
+        del documents, document_batches
         gc.collect()
 
         # FIX: Log final memory usage to track problematic tenants/CC pairs
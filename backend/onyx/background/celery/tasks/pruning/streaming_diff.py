@@ -0,0 +1,104 @@
+"""
+Pruning diff for connectors with too many documents to keep all of their IDs in memory.
+
+IDs pulled from the source are buffered and written to disk as sorted runs. The runs are
+merged back into a single sorted stream, and documents to remove are found with a sorted
+merge against the indexed IDs, which Postgres streams in the same (code point) order.
+Memory use is bounded by the run size, no matter how many documents the connector has.
+"""
+
+import heapq
+import json
+import tempfile
+from collections.abc import Iterable
+from collections.abc import Iterator
+from types import TracebackType
+from typing import IO
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+def _iter_run(run: IO[str]) -> Iterator[str]:
+    run.seek(0)
+    for line in run:
+        yield json.loads(line)
+
+
+class SortedIdSpool:
+    """Collects IDs and hands them back sorted and deduplicated. At most run_size IDs
+    are held in memory, the rest are spilled to temporary files that are removed on
+    close."""
+
+    def __init__(self, run_size: int) -> None:
+        self.run_size = run_size
+        self._buffer: set[str] = set()
+        self._runs: list[IO[str]] = []
+
+    def __enter__(self) -> "SortedIdSpool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def num_runs(self) -> int:
+        return len(self._runs)
+
+    def add(self, ids: Iterable[str]) -> None:
+        self._buffer.update(ids)
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self) -> None:
+        if not self._buffer:
+            return
+
+        run = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        # json keeps IDs containing newlines on a single line
+        run.writelines(f"{json.dumps(doc_id)}\n" for doc_id in sorted(self._buffer))
+        self._runs.append(run)
+        self._buffer.clear()
+
+    def iter_sorted_unique(self) -> Iterator[str]:
+        """Streams every ID added so far exactly once, in ascending order."""
+        if not self._runs:
+            yield from sorted(self._buffer)
+            return
+
+        self._spill()
+        logger.info(f"Merging {len(self._runs)} sorted runs of document IDs")
+
+        previous: str | None = None
+        for doc_id in heapq.merge(*(_iter_run(run) for run in self._runs)):
+            if doc_id != previous:
+                yield doc_id
+                previous = doc_id
+
+    def close(self) -> None:
+        for run in self._runs:
+            run.close()
+        self._runs.clear()
+        self._buffer.clear()
+
+
+def iter_ids_missing_from(
+    sorted_ids: Iterable[str], sorted_ids_to_exclude: Iterable[str]
+) -> Iterator[str]:
+    """Yields the IDs of sorted_ids that are not in sorted_ids_to_exclude. Both must be
+    sorted in ascending order, neither is ever fully loaded into memory."""
+    exclude_iter = iter(sorted_ids_to_exclude)
+    current_exclude = next(exclude_iter, None)
+
+    for doc_id in sorted_ids:
+        while current_exclude is not None and current_exclude < doc_id:
+            current_exclude = next(exclude_iter, None)
+
+        if current_exclude != doc_id:
+            yield doc_id
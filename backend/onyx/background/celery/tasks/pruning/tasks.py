@@ -21,10 +21,15 @@ from onyx.background.celery.celery_redis import celery_get_queue_length
 from onyx.background.celery.celery_redis import celery_get_queued_task_ids
 from onyx.background.celery.celery_redis import celery_get_unacked_task_ids
 from onyx.background.celery.celery_utils import extract_ids_from_runnable_connector
+from onyx.background.celery.celery_utils import iterate_ids_from_runnable_connector
 from onyx.background.celery.tasks.beat_schedule import CLOUD_BEAT_MULTIPLIER_DEFAULT
 from onyx.background.celery.tasks.docprocessing.utils import IndexingCallbackBase
+from onyx.background.celery.tasks.pruning.streaming_diff import iter_ids_missing_from
+from onyx.background.celery.tasks.pruning.streaming_diff import SortedIdSpool
 from onyx.configs.app_configs import ALLOW_SIMULTANEOUS_PRUNING
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.app_configs import PRUNING_STREAMING_DIFF_ENABLED
+from onyx.configs.app_configs import PRUNING_STREAMING_DIFF_RUN_SIZE
 from onyx.configs.constants import CELERY_GENERIC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_PRUNING_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_TASK_WAIT_FOR_FENCE_TIMEOUT
@@ -36,12 +41,14 @@ from onyx.configs.constants import OnyxRedisConstants
 from onyx.configs.constants import OnyxRedisLocks
 from onyx.configs.constants import OnyxRedisSignals
 from onyx.connectors.factory import instantiate_connector
+from onyx.connectors.interfaces import BaseConnector
 from onyx.connectors.models import InputType
 from onyx.db.connector import mark_ccpair_as_pruned
 from onyx.db.connector_credential_pair import get_connector_credential_pair
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.connector_credential_pair import get_connector_credential_pairs
 from onyx.db.document import get_documents_for_connector_credential_pair
+from onyx.db.document import iterate_document_ids_for_connector_credential_pair
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
 from onyx.db.enums import ConnectorCredentialPairStatus
 from onyx.db.enums import SyncStatus
@@ -389,6 +396,51 @@ def try_creating_prune_generator_task(
     return payload_id
 
 
+def _generate_prune_tasks_streaming(
+    celery_app: Celery,
+    db_session: Session,
+    redis_connector: RedisConnector,
+    runnable_connector: BaseConnector,
+    callback: PruneCallback,
+    lock: RedisLock,
+    cc_pair: ConnectorCredentialPair,
+) -> int | None:
+    """Same as the in memory diff in connector_pruning_generator_task, but source IDs
+    are spilled to disk and the indexed IDs are streamed from Postgres, so neither set
+    is ever fully loaded. Cleanup tasks are sent while the diff is computed."""
+    with SortedIdSpool(PRUNING_STREAMING_DIFF_RUN_SIZE) as source_ids:
+        for doc_batch_ids in iterate_ids_from_runnable_connector(
+            runnable_connector, callback
+        ):
+            source_ids.add(doc_batch_ids)
+
+        task_logger.info(
+            "Pruning source IDs collected: "
+            f"cc_pair={cc_pair.id} "
+            f"connector_source={cc_pair.connector.source} "
+            f"sorted_runs={source_ids.num_runs}"
+        )
+
+        # a separate session so the server side cursor isn't disturbed by the
+        # queries made while generating tasks
+        with get_session_with_current_tenant() as stream_session:
+            indexed_ids = iterate_document_ids_for_connector_credential_pair(
+                db_session=stream_session,
+                connector_id=cc_pair.connector_id,
+                credential_id=cc_pair.credential_id,
+            )
+
+            task_logger.info(
+                f"RedisConnector.prune.generate_tasks starting. cc_pair={cc_pair.id}"
+            )
+            return redis_connector.prune.generate_tasks(
+                iter_ids_missing_from(indexed_ids, source_ids.iter_sorted_unique()),
+                celery_app,
+                db_session,
+                lock,
+            )
+
+
 @shared_task(
     name=OnyxCeleryTask.CONNECTOR_PRUNING_GENERATOR_TASK,
     acks_late=False,
@@ -525,37 +577,50 @@ def connector_pruning_generator_task(
                 r,
             )
 
-            # a list of docs in the source
-            all_connector_doc_ids: set[str] = extract_ids_from_runnable_connector(
-                runnable_connector, callback
-            )
-
-            # a list of docs in our local index
-            all_indexed_document_ids = {
-                doc.id
-                for doc in get_documents_for_connector_credential_pair(
-                    db_session=db_session,
-                    connector_id=connector_id,
-                    credential_id=credential_id,
+            if PRUNING_STREAMING_DIFF_ENABLED:
+                tasks_generated = _generate_prune_tasks_streaming(
+                    self.app,
+                    db_session,
+                    redis_connector,
+                    runnable_connector,
+                    callback,
+                    lock,
+                    cc_pair,
+                )
+            else:
+                # a list of docs in the source
+                all_connector_doc_ids: set[str] = extract_ids_from_runnable_connector(
+                    runnable_connector, callback
                 )
-            }
 
-            # generate list of docs to remove (no longer in the source)
-            doc_ids_to_remove = list(all_indexed_document_ids - all_connector_doc_ids)
+                # a list of docs in our local index
+                all_indexed_document_ids = {
+                    doc.id
+                    for doc in get_documents_for_connector_credential_pair(
+                        db_session=db_session,
+                        connector_id=connector_id,
+                        credential_id=credential_id,
+                    )
+                }
 
-            task_logger.info(
-                "Pruning set collected: "
-                f"cc_pair={cc_pair_id} "
-                f"connector_source={cc_pair.connector.source} "
-                f"docs_to_remove={len(doc_ids_to_remove)}"
-            )
+                # generate list of docs to remove (no longer in the source)
+                doc_ids_to_remove = list(
+                    all_indexed_document_ids - all_connector_doc_ids
+                )
 
-            task_logger.info(
-                f"RedisConnector.prune.generate_tasks starting. cc_pair={cc_pair_id}"
-            )
-            tasks_generated = redis_connector.prune.generate_tasks(
-                set(doc_ids_to_remove), self.app, db_session, None
-            )
+                task_logger.info(
+                    "Pruning set collected: "
+                    f"cc_pair={cc_pair_id} "
+                    f"connector_source={cc_pair.connector.source} "
+                    f"docs_to_remove={len(doc_ids_to_remove)}"
+                )
+
+                task_logger.info(
+                    f"RedisConnector.prune.generate_tasks starting. cc_pair={cc_pair_id}"
+                )
+                tasks_generated = redis_connector.prune.generate_tasks(
+                    set(doc_ids_to_remove), self.app, db_session, None
+                )
             if tasks_generated is None:
                 return None
 
@@ -600,14 +665,11 @@ def monitor_ccpair_pruning_taskset(
     cc_pair_id = int(cc_pair_id_str)
 
     redis_connector = RedisConnector(tenant_id, cc_pair_id)
-    if not redis_connector.prune.fenced:
-        return
-
-    initial = redis_connector.prune.generator_complete
-    if initial is None:
+    progress = redis_connector.prune.get_progress()
+    if progress is None:
         return
 
-    remaining = redis_connector.prune.get_remaining()
+    initial, remaining = progress
     task_logger.info(
         f"Connector pruning progress: cc_pair={cc_pair_id} remaining={remaining} initial={initial}"
     )
@@ -4,6 +4,7 @@ from tenacity import retry_if_exception_type
 from tenacity import stop_after_delay
 from tenacity import wait_random_exponential
 
+from onyx.context.search.semantic_cache import invalidate_documents_cache
 from onyx.document_index.interfaces import DocumentIndex
 from onyx.document_index.interfaces import VespaDocumentFields
 from onyx.document_index.interfaces import VespaDocumentUserFields
@@ -36,11 +37,13 @@ class RetryDocumentIndex:
         tenant_id: str,
         chunk_count: int | None,
     ) -> int:
-        return self.index.delete_single(
+        chunks_deleted = self.index.delete_single(
             doc_id,
             tenant_id=tenant_id,
             chunk_count=chunk_count,
         )
+        invalidate_documents_cache([doc_id], tenant_id)
+        return chunks_deleted
 
     @retry(
         retry=retry_if_exception_type(httpx.ReadTimeout),
@@ -63,3 +66,5 @@ class RetryDocumentIndex:
             fields=fields,
             user_fields=user_fields,
         )
+        # access, document sets, boost etc. all change which results a search returns
+        invalidate_documents_cache([doc_id], tenant_id)
@@ -8,6 +8,7 @@ from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
 from onyx.configs.app_configs import DB_YIELD_PER_DEFAULT
+from onyx.configs.app_configs import VESPA_METADATA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
@@ -66,6 +67,29 @@ def reset_document_sync(r: Redis) -> None:
     r.delete(DOCUMENT_SYNC_FENCE_KEY)
 
 
+def _send_document_sync_batch_task(
+    r: Redis,
+    celery_app: Celery,
+    document_ids: list[str],
+    tenant_id: str,
+) -> None:
+    # Create a unique task ID
+    custom_task_id = f"{DOCUMENT_SYNC_PREFIX}_{uuid4()}"
+
+    # Add to the tracking taskset in Redis BEFORE creating the celery task
+    r.sadd(DOCUMENT_SYNC_TASKSET_KEY, custom_task_id)
+
+    # Create the Celery task
+    celery_app.send_task(
+        OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+        kwargs=dict(document_ids=document_ids, tenant_id=tenant_id),
+        queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
+        task_id=custom_task_id,
+        priority=OnyxCeleryPriority.MEDIUM,
+        ignore_result=True,
+    )
+
+
 def generate_document_sync_tasks(
     r: Redis,
     max_tasks: int,
@@ -73,8 +97,10 @@ def generate_document_sync_tasks(
     db_session: Session,
     lock: RedisLock,
     tenant_id: str,
+    batch_size: int = VESPA_METADATA_SYNC_BATCH_SIZE,
 ) -> tuple[int, int]:
-    """Generate sync tasks for all documents that need syncing.
+    """Generate sync tasks for all documents that need syncing. Each task syncs a
+    batch of up to batch_size documents.
 
     Args:
         r: Redis client
@@ -83,6 +109,7 @@ def generate_document_sync_tasks(
         db_session: Database session
         lock: Redis lock for coordination
         tenant_id: Tenant identifier
+        batch_size: Maximum number of documents per task
 
     Returns:
         tuple[int, int]: (tasks_generated, total_docs_found)
@@ -90,6 +117,7 @@ def generate_document_sync_tasks(
     last_lock_time = time.monotonic()
     num_tasks_sent = 0
     num_docs = 0
+    document_ids: list[str] = []
 
     # Get all documents that need syncing
     stmt = construct_document_id_select_by_needs_sync()
@@ -104,28 +132,21 @@ def generate_document_sync_tasks(
             last_lock_time = current_time
 
         num_docs += 1
+        document_ids.append(doc_id)
+        if len(document_ids) < batch_size:
+            continue
 
-        # Create a unique task ID
-        custom_task_id = f"{DOCUMENT_SYNC_PREFIX}_{uuid4()}"
-
-        # Add to the tracking taskset in Redis BEFORE creating the celery task
-        r.sadd(DOCUMENT_SYNC_TASKSET_KEY, custom_task_id)
-
-        # Create the Celery task
-        celery_app.send_task(
-            OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
-            kwargs=dict(document_id=doc_id, tenant_id=tenant_id),
-            queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
-            task_id=custom_task_id,
-            priority=OnyxCeleryPriority.MEDIUM,
-            ignore_result=True,
-        )
-
+        _send_document_sync_batch_task(r, celery_app, document_ids, tenant_id)
+        document_ids = []
         num_tasks_sent += 1
 
         if num_tasks_sent >= max_tasks:
             break
 
+    if document_ids:
+        _send_document_sync_batch_task(r, celery_app, document_ids, tenant_id)
+        num_tasks_sent += 1
+
     return num_tasks_sent, num_docs
 
 
@@ -148,7 +169,8 @@ def try_generate_stale_document_sync_tasks(
         return None
 
     logger.info(
-        f"Stale documents found (at least {stale_doc_count}). Generating sync tasks in one batch."
+        f"Stale documents found (at least {stale_doc_count}). "
+        f"Generating sync tasks in batches of {VESPA_METADATA_SYNC_BATCH_SIZE}."
     )
 
     logger.info("generate_document_sync_tasks starting for all documents.")
@@ -8,6 +8,7 @@ import httpx
 from celery import Celery
 from celery import shared_task
 from celery import Task
+from celery.exceptions import Retry
 from celery.exceptions import SoftTimeLimitExceeded
 from redis import Redis
 from redis.lock import Lock as RedisLock
@@ -15,6 +16,7 @@ from sqlalchemy.orm import Session
 from tenacity import RetryError
 
 from onyx.access.access import get_access_for_document
+from onyx.access.access import get_access_for_documents
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
 from onyx.background.celery.tasks.shared.tasks import LIGHT_SOFT_TIME_LIMIT
@@ -28,16 +30,20 @@ from onyx.background.celery.tasks.vespa.document_sync import (
     try_generate_stale_document_sync_tasks,
 )
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.app_configs import VESPA_METADATA_SYNC_BATCH_NUM_THREADS
 from onyx.configs.app_configs import VESPA_SYNC_MAX_TASKS
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.configs.constants import OnyxRedisConstants
 from onyx.configs.constants import OnyxRedisLocks
 from onyx.db.document import get_document
+from onyx.db.document import get_documents_by_ids
 from onyx.db.document import mark_document_as_synced
+from onyx.db.document import mark_documents_as_synced
 from onyx.db.document_set import delete_document_set
 from onyx.db.document_set import fetch_document_sets
 from onyx.db.document_set import fetch_document_sets_for_document
+from onyx.db.document_set import fetch_document_sets_for_documents
 from onyx.db.document_set import get_document_set_by_id
 from onyx.db.document_set import mark_document_set_as_synced
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
@@ -58,6 +64,7 @@ from onyx.redis.redis_pool import get_redis_replica_client
 from onyx.redis.redis_pool import redis_lock_dump
 from onyx.redis.redis_usergroup import RedisUserGroup
 from onyx.utils.logger import setup_logger
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 from onyx.utils.variable_functionality import (
     fetch_versioned_implementation_with_fallback,
@@ -67,6 +74,10 @@ from onyx.utils.variable_functionality import noop_fallback
 
 logger = setup_logger()
 
+# a batch covers a few hundred documents, so it gets more time than a single document
+VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT = LIGHT_SOFT_TIME_LIMIT * 3
+VESPA_METADATA_SYNC_BATCH_TIME_LIMIT = VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT + 15
+
 
 # celery auto associates tasks created inside another task,
 # which bloats the result metadata considerably. trail=False prevents this.
@@ -256,7 +267,7 @@ def try_generate_document_set_sync_tasks(
     if result is None:
         return None
 
-    tasks_generated = result[0]
+    tasks_generated, num_docs = result
     # Currently we are allowing the sync to proceed with 0 tasks.
     # It's possible for sets/groups to be generated initially with no entries
     # and they still need to be marked as up to date.
@@ -265,7 +276,8 @@ def try_generate_document_set_sync_tasks(
 
     task_logger.info(
         f"RedisDocumentSet.generate_tasks finished. "
-        f"document_set={document_set.id} tasks_generated={tasks_generated}"
+        f"document_set={document_set.id} tasks_generated={tasks_generated} "
+        f"docs={num_docs}"
     )
 
     # create before setting fence to avoid race condition where the monitoring
@@ -280,7 +292,9 @@ def try_generate_document_set_sync_tasks(
         task_logger.exception("insert_sync_record exceptioned.")
 
     # set this only after all tasks have been added
-    rds.set_fence(tasks_generated)
+    # the fence holds the number of documents, it is reported as the number of
+    # documents synced once all tasks are done
+    rds.set_fence(num_docs)
     return tasks_generated
 
 
@@ -332,7 +346,7 @@ def try_generate_user_group_sync_tasks(
     if result is None:
         return None
 
-    tasks_generated = result[0]
+    tasks_generated, num_docs = result
     # Currently we are allowing the sync to proceed with 0 tasks.
     # It's possible for sets/groups to be generated initially with no entries
     # and they still need to be marked as up to date.
@@ -341,7 +355,8 @@ def try_generate_user_group_sync_tasks(
 
     task_logger.info(
         f"RedisUserGroup.generate_tasks finished. "
-        f"usergroup={usergroup.id} tasks_generated={tasks_generated}"
+        f"usergroup={usergroup.id} tasks_generated={tasks_generated} "
+        f"docs={num_docs}"
     )
 
     # create before setting fence to avoid race condition where the monitoring
@@ -356,7 +371,7 @@ def try_generate_user_group_sync_tasks(
         task_logger.exception("insert_sync_record exceptioned.")
 
     # set this only after all tasks have been added
-    rug.set_fence(tasks_generated)
+    rug.set_fence(num_docs)
 
     return tasks_generated
 
@@ -397,7 +412,7 @@ def monitor_document_set_taskset(
     count = cast(int, r.scard(rds.taskset_key))
     task_logger.info(
         f"Document set sync progress: document_set={document_set_id} "
-        f"remaining={count} initial={initial_count}"
+        f"remaining_tasks={count} docs={initial_count}"
     )
     if count > 0:
         update_sync_record_status(
@@ -571,3 +586,168 @@ def vespa_metadata_sync_task(self: Task, document_id: str, *, tenant_id: str) ->
         )
 
     return completion_status == OnyxCeleryTaskCompletionStatus.SUCCEEDED
+
+
+def _unwrap_sync_exception(ex: Exception) -> Exception:
+    """Returns the underlying exception if tenacity gave up retrying."""
+    if isinstance(ex, RetryError):
+        inner = ex.last_attempt.exception()
+        if isinstance(inner, Exception):
+            return inner
+    return ex
+
+
+@shared_task(
+    name=OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+    bind=True,
+    soft_time_limit=VESPA_METADATA_SYNC_BATCH_SOFT_TIME_LIMIT,
+    time_limit=VESPA_METADATA_SYNC_BATCH_TIME_LIMIT,
+    max_retries=3,
+)
+def vespa_metadata_sync_batch_task(
+    self: Task, document_ids: list[str], *, tenant_id: str
+) -> bool:
+    """Batched version of vespa_metadata_sync_task. Document sets and access are
+    fetched for all documents at once, the Vespa updates run concurrently and all
+    successfully updated documents are marked as synced in one statement.
+
+    Documents that failed with a retryable error are retried in a new attempt of this
+    task, without the documents that already succeeded."""
+    start = time.monotonic()
+
+    completion_status = OnyxCeleryTaskCompletionStatus.UNDEFINED
+    num_synced = 0
+    retryable_ids: list[str] = []
+
+    try:
+        with get_session_with_current_tenant() as db_session:
+            active_search_settings = get_active_search_settings(db_session)
+            doc_index = get_default_document_index(
+                search_settings=active_search_settings.primary,
+                secondary_search_settings=active_search_settings.secondary,
+                httpx_client=HttpxPool.get("vespa"),
+            )
+
+            retry_index = RetryDocumentIndex(doc_index)
+
+            docs = get_documents_by_ids(db_session, document_ids)
+            existing_ids = [doc.id for doc in docs]
+            doc_id_to_doc_sets = dict(
+                fetch_document_sets_for_documents(existing_ids, db_session)
+            )
+            doc_id_to_access = get_access_for_documents(existing_ids, db_session)
+
+            # resolve everything up front, the ORM objects must not be touched
+            # from the worker threads
+            updates = [
+                (
+                    doc.id,
+                    doc.chunk_count,
+                    VespaDocumentFields(
+                        document_sets=set(doc_id_to_doc_sets.get(doc.id, [])),
+                        access=doc_id_to_access[doc.id],
+                        boost=doc.boost,
+                        hidden=doc.hidden,
+                    ),
+                )
+                for doc in docs
+            ]
+
+            def _sync_document(
+                document_id: str, chunk_count: int | None, fields: VespaDocumentFields
+            ) -> Exception | None:
+                try:
+                    # update Vespa. OK if doc doesn't exist. Raises exception otherwise.
+                    retry_index.update_single(
+                        document_id,
+                        tenant_id=tenant_id,
+                        chunk_count=chunk_count,
+                        fields=fields,
+                        user_fields=None,
+                    )
+                except Exception as e:
+                    return e
+                return None
+
+            errors: list[Exception | None] = run_functions_tuples_in_parallel(
+                [(_sync_document, update) for update in updates],
+                max_workers=VESPA_METADATA_SYNC_BATCH_NUM_THREADS,
+            )
+
+            synced_ids: list[str] = []
+            for (document_id, _, _), error in zip(updates, errors):
+                if error is None:
+                    synced_ids.append(document_id)
+                    continue
+
+                e = _unwrap_sync_exception(error)
+                if isinstance(e, httpx.HTTPStatusError):
+                    task_logger.error(
+                        f"Non-retryable HTTPStatusError: "
+                        f"doc={document_id} "
+                        f"status={e.response.status_code}"
+                    )
+                    continue
+
+                task_logger.error(
+                    f"vespa_metadata_sync_batch_task failed to sync: "
+                    f"doc={document_id} exception={e!r}"
+                )
+                retryable_ids.append(document_id)
+
+            # update db last. Worst case = we crash right before this and
+            # the sync might repeat again later
+            mark_documents_as_synced(synced_ids, db_session)
+            num_synced = len(synced_ids)
+
+            elapsed = time.monotonic() - start
+            task_logger.info(
+                f"docs={len(document_ids)} "
+                f"missing={len(document_ids) - len(docs)} "
+                f"synced={num_synced} "
+                f"failed={len(docs) - num_synced} "
+                f"action=sync "
+                f"elapsed={elapsed:.2f}"
+            )
+
+        if not retryable_ids:
+            completion_status = (
+                OnyxCeleryTaskCompletionStatus.SUCCEEDED
+                if num_synced == len(docs)
+                else OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+            )
+        elif self.max_retries is not None and self.request.retries >= self.max_retries:
+            completion_status = OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+        else:
+            completion_status = OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION
+
+            # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+            countdown = 2 ** (self.request.retries + 4)
+            self.retry(
+                kwargs=dict(document_ids=retryable_ids, tenant_id=tenant_id),
+                countdown=countdown,
+            )  # this will raise a celery exception
+    except SoftTimeLimitExceeded:
+        task_logger.info(f"SoftTimeLimitExceeded exception. docs={len(document_ids)}")
+        completion_status = OnyxCeleryTaskCompletionStatus.SOFT_TIME_LIMIT
+    except Retry:
+        raise
+    except Exception as ex:
+        task_logger.exception(
+            f"vespa_metadata_sync_batch_task exceptioned: docs={len(document_ids)}"
+        )
+
+        completion_status = OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION
+        if self.max_retries is not None and self.request.retries >= self.max_retries:
+            completion_status = OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+
+        countdown = 2 ** (self.request.retries + 4)
+        self.retry(exc=_unwrap_sync_exception(ex), countdown=countdown)
+    finally:
+        task_logger.info(
+            f"vespa_metadata_sync_batch_task completed: "
+            f"status={completion_status.value} "
+            f"docs={len(document_ids)} synced={num_synced}"
+        )
+
+    return completion_status == OnyxCeleryTaskCompletionStatus.SUCCEEDED
@@ -24,6 +24,9 @@ from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.connectors.connector_runner import ConnectorRunner
+from onyx.connectors.cross_connector_utils.rate_limit_wrapper import (
+    rate_limit_scope,
+)
 from onyx.connectors.exceptions import ConnectorValidationError
 from onyx.connectors.exceptions import UnexpectedValidationError
 from onyx.connectors.factory import instantiate_connector
@@ -279,6 +282,7 @@ def run_docfetching_entrypoint(
             attempt.connector_credential_pair.connector.connector_specific_config
         )
         credential_id = attempt.connector_credential_pair.credential_id
+        source = attempt.connector_credential_pair.connector.source
 
     logger.info(
         f"Docfetching starting{tenant_str}: "
@@ -287,14 +291,16 @@ def run_docfetching_entrypoint(
         f"credentials='{credential_id}'"
     )
 
-    connector_document_extraction(
-        app,
-        index_attempt_id,
-        attempt.connector_credential_pair_id,
-        attempt.search_settings_id,
-        tenant_id,
-        callback,
-    )
+    # share rate limits with all other workers using the same credential
+    with rate_limit_scope(source, credential_id):
+        connector_document_extraction(
+            app,
+            index_attempt_id,
+            attempt.connector_credential_pair_id,
+            attempt.search_settings_id,
+            tenant_id,
+            callback,
+        )
 
     logger.info(
         f"Docfetching finished{tenant_str}: "
@@ -0,0 +1,211 @@
+"""
+Cache for the converted history of chat sessions.
+
+Every turn used to load the whole mainline of the session (with the files and tool
+calls of every message) and convert all of it into ChatMessageSimples again, which is
+quadratic over a long session. The converted messages are kept per session in a bounded
+in-process LRU, and the next turn only loads and converts the messages that follow the
+last cached one.
+
+Messages are never edited in place, edits and regenerations create new branches. The
+cached prefix is therefore valid as long as its last message is an ancestor of the new
+user message, which is what following the latest children from it checks. The token
+counts of the converted messages come from the stored messages, files and tool calls,
+so they don't depend on the LLM of the turn.
+
+The contents of images are not kept, they are read from the file store again when the
+prefix is used. Files attached as text are part of the message texts, so the cache is
+bounded by the number of characters of the messages as well as by the number of
+sessions.
+"""
+
+import threading
+from collections import OrderedDict
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from onyx.chat.models import ChatMessageSimple
+from onyx.configs.chat_configs import CHAT_HISTORY_CACHE_MAX_CHARS
+from onyx.configs.chat_configs import CHAT_HISTORY_CACHE_SIZE
+from onyx.file_store.file_store import get_default_file_store
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from shared_configs.contextvars import get_current_tenant_id
+
+# tenant id, chat session id
+ChatHistoryCacheKey = tuple[str, UUID]
+
+
+class CachedChatHistory(BaseModel):
+    """The converted messages of a prefix of the mainline, one list of
+    ChatMessageSimples per ChatMessage. The contents of the image files are empty,
+    see load_simple_messages"""
+
+    message_ids: list[int]
+    converted_messages: list[list[ChatMessageSimple]]
+
+    @property
+    def last_message_id(self) -> int:
+        return self.message_ids[-1]
+
+    @property
+    def simple_messages(self) -> list[ChatMessageSimple]:
+        return [
+            simple_message
+            for message_simple_messages in self.converted_messages
+            for simple_message in message_simple_messages
+        ]
+
+    @property
+    def num_chars(self) -> int:
+        return sum(
+            len(simple_message.message) for simple_message in self.simple_messages
+        )
+
+    def load_simple_messages(self) -> list[ChatMessageSimple]:
+        """The cached messages with the contents of their images read back from the
+        file store"""
+        simple_messages = self.simple_messages
+        file_ids = {
+            image_file.file_id
+            for simple_message in simple_messages
+            for image_file in simple_message.image_files or []
+        }
+        if not file_ids:
+            return simple_messages
+
+        file_ids_list = list(file_ids)
+        file_id_to_content = dict(
+            zip(
+                file_ids_list,
+                run_functions_tuples_in_parallel(
+                    [(_read_file_content, (file_id,)) for file_id in file_ids_list]
+                ),
+            )
+        )
+        return [
+            _with_image_contents(simple_message, file_id_to_content)
+            for simple_message in simple_messages
+        ]
+
+    def extend(
+        self,
+        message_ids: list[int],
+        converted_messages: list[list[ChatMessageSimple]],
+    ) -> "CachedChatHistory":
+        """Returns a new prefix with the given messages appended, without the contents
+        of their images"""
+        return CachedChatHistory(
+            message_ids=self.message_ids + message_ids,
+            converted_messages=self.converted_messages
+            + [
+                [
+                    _with_image_contents(simple_message, {})
+                    for simple_message in messages
+                ]
+                for messages in converted_messages
+            ],
+        )
+
+
+def _with_image_contents(
+    simple_message: ChatMessageSimple, file_id_to_content: dict[str, bytes]
+) -> ChatMessageSimple:
+    """Replaces the contents of the images of the message, the ones that are not in
+    file_id_to_content are emptied"""
+    if not simple_message.image_files:
+        return simple_message
+    return simple_message.model_copy(
+        update={
+            "image_files": [
+                image_file.model_copy(
+                    update={"content": file_id_to_content.get(image_file.file_id, b"")}
+                )
+                for image_file in simple_message.image_files
+            ]
+        }
+    )
+
+
+def _read_file_content(file_id: str) -> bytes:
+    return get_default_file_store().read_file(file_id, mode="b").read()
+
+
+class ChatHistoryCache:
+    def __init__(self, max_size: int, max_chars: int) -> None:
+        self.max_size = max_size
+        self.max_chars = max_chars
+
+        self._entries: OrderedDict[ChatHistoryCacheKey, CachedChatHistory] = (
+            OrderedDict()
+        )
+        self._entry_chars: dict[ChatHistoryCacheKey, int] = {}
+        self._num_chars = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_key(chat_session_id: UUID) -> ChatHistoryCacheKey:
+        return (get_current_tenant_id(), chat_session_id)
+
+    def get(self, chat_session_id: UUID) -> CachedChatHistory | None:
+        key = self.build_key(chat_session_id)
+        with self._lock:
+            cached_history = self._entries.get(key)
+            if cached_history is None:
+                return None
+            self._entries.move_to_end(key)
+            return cached_history
+
+    def put(self, chat_session_id: UUID, cached_history: CachedChatHistory) -> None:
+        if not cached_history.message_ids:
+            return
+
+        num_chars = cached_history.num_chars
+        key = self.build_key(chat_session_id)
+        with self._lock:
+            self._pop(key)
+            if num_chars > self.max_chars:
+                return
+
+            self._entries[key] = cached_history
+            self._entry_chars[key] = num_chars
+            self._num_chars += num_chars
+            while (
+                len(self._entries) > self.max_size or self._num_chars > self.max_chars
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, chat_session_id: UUID) -> None:
+        with self._lock:
+            self._pop(self.build_key(chat_session_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._entry_chars.clear()
+            self._num_chars = 0
+
+    def _pop(self, key: ChatHistoryCacheKey) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._num_chars -= self._entry_chars.pop(key)
+
+
+_chat_history_cache: ChatHistoryCache | None = None
+_chat_history_cache_lock = threading.Lock()
+
+
+def get_chat_history_cache() -> ChatHistoryCache | None:
+    """Returns the process-wide cache, or None if it is disabled."""
+    global _chat_history_cache
+
+    if CHAT_HISTORY_CACHE_SIZE <= 0:
+        return None
+
+    if _chat_history_cache is None:
+        with _chat_history_cache_lock:
+            if _chat_history_cache is None:
+                _chat_history_cache = ChatHistoryCache(
+                    max_size=CHAT_HISTORY_CACHE_SIZE,
+                    max_chars=CHAT_HISTORY_CACHE_MAX_CHARS,
+                )
+    return _chat_history_cache
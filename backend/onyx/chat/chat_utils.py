@@ -25,7 +25,7 @@ from onyx.configs.constants import TMP_DRALPHA_PERSONA_NAME
 from onyx.context.search.models import RerankingDetails
 from onyx.context.search.models import RetrievalDetails
 from onyx.db.chat import create_chat_session
-from onyx.db.chat import get_chat_messages_by_session
+from onyx.db.chat import get_mainline_chat_messages
 from onyx.db.kg_config import get_kg_config_settings
 from onyx.db.kg_config import is_kg_config_settings_enabled_valid
 from onyx.db.llm import fetch_existing_doc_sets
@@ -151,43 +151,34 @@ def create_chat_history_chain(
     prefetch_top_two_level_tool_calls: bool = True,
     # Optional id at which we finish processing
     stop_at_message_id: int | None = None,
+    # Optional id after which we start processing, the chain is then only the part
+    # of the mainline that follows this message
+    start_after_message_id: int | None = None,
 ) -> list[ChatMessage]:
     """Build the linear chain of messages without including the root message"""
     mainline_messages: list[ChatMessage] = []
 
-    all_chat_messages = get_chat_messages_by_session(
+    chain = get_mainline_chat_messages(
         chat_session_id=chat_session_id,
-        user_id=None,
         db_session=db_session,
-        skip_permission_check=True,
+        start_message_id=start_after_message_id,
+        stop_at_message_id=stop_at_message_id,
         prefetch_top_two_level_tool_calls=prefetch_top_two_level_tool_calls,
     )
 
-    if not all_chat_messages:
+    if not chain:
         raise RuntimeError("No messages in Chat Session")
 
-    root_message = all_chat_messages[0]
-    if root_message.parent_message is not None:
+    start_message = chain[0]
+    if start_after_message_id is None and start_message.parent_message_id is not None:
         raise RuntimeError(
             "Invalid root message, unable to fetch valid chat message sequence"
         )
 
-    current_message: ChatMessage | None = root_message
-    previous_message: ChatMessage | None = None
-    while current_message is not None:
-        child_msg = current_message.latest_child_message
-
-        # Break if at the end of the chain
-        # or have reached the `final_id` of the submitted message
-        if not child_msg or (
-            stop_at_message_id and current_message.id == stop_at_message_id
-        ):
-            break
-        current_message = child_msg
-
+    previous_message: ChatMessage = start_message
+    for current_message in chain[1:]:
         if (
             current_message.message_type == MessageType.ASSISTANT
-            and previous_message is not None
             and previous_message.message_type == MessageType.ASSISTANT
             and mainline_messages
         ):
@@ -555,7 +546,32 @@ def convert_chat_history(
     For user messages: includes attached files (images attached to message, text files as separate messages)
     For assistant messages: includes tool calls followed by the assistant response
     """
-    simple_messages: list[ChatMessageSimple] = []
+    return [
+        simple_message
+        for message_simple_messages in convert_chat_history_by_message(
+            chat_history=chat_history,
+            files=files,
+            project_image_files=project_image_files,
+            additional_context=additional_context,
+            token_counter=token_counter,
+            tool_id_to_name_map=tool_id_to_name_map,
+        )
+        for simple_message in message_simple_messages
+    ]
+
+
+def convert_chat_history_by_message(
+    chat_history: list[ChatMessage],
+    files: list[ChatLoadedFile],
+    project_image_files: list[ChatLoadedFile],
+    additional_context: str | None,
+    token_counter: Callable[[str], int],
+    tool_id_to_name_map: dict[int, str],
+) -> list[list[ChatMessageSimple]]:
+    """Same as `convert_chat_history`, but keeps the ChatMessageSimples of each
+    ChatMessage separate. Only the last user message depends on the project image
+    files and the additional context, the others can be reused on later turns."""
+    converted_messages: list[list[ChatMessageSimple]] = []
 
     # Create a mapping of file IDs to loaded files for quick lookup
     file_map = {str(f.file_id): f for f in files}
@@ -568,6 +584,8 @@ def convert_chat_history(
             break
 
     for idx, chat_message in enumerate(chat_history):
+        simple_messages: list[ChatMessageSimple] = []
+
         if chat_message.message_type == MessageType.USER:
             # Process files attached to this message
             text_files: list[ChatLoadedFile] = []
@@ -697,7 +715,9 @@ def convert_chat_history(
                 f"Invalid message type when constructing simple history: {chat_message.message_type}"
             )
 
-    return simple_messages
+        converted_messages.append(simple_messages)
+
+    return converted_messages
 
 
 def get_custom_agent_prompt(persona: Persona, chat_session: ChatSession) -> str | None:
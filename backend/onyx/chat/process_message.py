@@ -6,9 +6,11 @@ from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+from onyx.chat.chat_history_cache import CachedChatHistory
+from onyx.chat.chat_history_cache import get_chat_history_cache
 from onyx.chat.chat_state import ChatStateContainer
 from onyx.chat.chat_state import run_chat_loop_with_state_containers
-from onyx.chat.chat_utils import convert_chat_history
+from onyx.chat.chat_utils import convert_chat_history_by_message
 from onyx.chat.chat_utils import create_chat_history_chain
 from onyx.chat.chat_utils import get_custom_agent_prompt
 from onyx.chat.chat_utils import is_last_assistant_message_clarification
@@ -18,6 +20,7 @@ from onyx.chat.llm_loop import run_llm_loop
 from onyx.chat.models import AnswerStream
 from onyx.chat.models import ChatBasicResponse
 from onyx.chat.models import ChatLoadedFile
+from onyx.chat.models import ChatMessageSimple
 from onyx.chat.models import ExtractedProjectFiles
 from onyx.chat.models import MessageResponseIDInfo
 from onyx.chat.models import ProjectFileMetadata
@@ -62,6 +65,7 @@ from onyx.server.query_and_chat.streaming_models import AgentResponseDelta
 from onyx.server.query_and_chat.streaming_models import AgentResponseStart
 from onyx.server.query_and_chat.streaming_models import CitationInfo
 from onyx.server.query_and_chat.streaming_models import Packet
+from onyx.server.query_and_chat.token_limit import record_chat_token_usage
 from onyx.server.utils import get_json_line
 from onyx.tools.constants import SEARCH_TOOL_ID
 from onyx.tools.interface import Tool
@@ -306,6 +310,64 @@ def _initialize_chat_session(
     return user_message
 
 
+def _load_chat_history(
+    chat_session_id: UUID,
+    user_message_id: int,
+    db_session: Session,
+) -> tuple[CachedChatHistory | None, list[ChatMessage]]:
+    """Returns the cached converted prefix of the mainline (if any) and the messages
+    that follow it, which should end with the new user message"""
+    chat_history_cache = get_chat_history_cache()
+    if chat_history_cache is None:
+        return None, create_chat_history_chain(
+            chat_session_id=chat_session_id, db_session=db_session
+        )
+
+    cached_history = chat_history_cache.get(chat_session_id)
+    if cached_history is not None:
+        try:
+            chat_history = create_chat_history_chain(
+                chat_session_id=chat_session_id,
+                db_session=db_session,
+                start_after_message_id=cached_history.last_message_id,
+            )
+            if chat_history[-1].id == user_message_id:
+                return cached_history, chat_history
+        except RuntimeError:
+            pass
+
+        # The message was edited / regenerated from before the end of the prefix
+        chat_history_cache.invalidate(chat_session_id)
+
+    return None, create_chat_history_chain(
+        chat_session_id=chat_session_id, db_session=db_session
+    )
+
+
+def _cache_chat_history(
+    chat_session_id: UUID,
+    cached_history: CachedChatHistory | None,
+    chat_history: list[ChatMessage],
+    converted_messages: list[list[ChatMessageSimple]],
+) -> None:
+    chat_history_cache = get_chat_history_cache()
+    if chat_history_cache is None:
+        return
+
+    # The last (user) message also carries the project files and additional context
+    # of this turn, so it is converted again on the next one
+    message_ids = [chat_message.id for chat_message in chat_history[:-1]]
+    if not message_ids:
+        return
+
+    if cached_history is None:
+        cached_history = CachedChatHistory(message_ids=[], converted_messages=[])
+    chat_history_cache.put(
+        chat_session_id,
+        cached_history.extend(message_ids, converted_messages[:-1]),
+    )
+
+
 def stream_chat_message_objects(
     new_msg_req: CreateChatMessageRequest,
     user: User | None,
@@ -408,9 +470,12 @@ def stream_chat_message_objects(
             use_existing_user_message=use_existing_user_message,
         )
 
-        # re-create linear history of messages
-        chat_history = create_chat_history_chain(
-            chat_session_id=chat_session_id, db_session=db_session
+        # re-create linear history of messages, only the part after the converted
+        # messages cached by the previous turns has to be loaded
+        cached_history, chat_history = _load_chat_history(
+            chat_session_id=chat_session_id,
+            user_message_id=user_message.id,
+            db_session=db_session,
         )
 
         last_chat_message = chat_history[-1]
@@ -424,6 +489,7 @@ def stream_chat_message_objects(
 
         # At this point we can save the user message as it's validated and final
         db_session.commit()
+        record_chat_token_usage(user_id, [user_message])
 
         memories = get_memories(user, db_session)
 
@@ -517,7 +583,7 @@ def stream_chat_message_objects(
 
         # Convert the chat history into a simple format that is free of any DB objects
         # and is easy to parse for the agent loop
-        simple_chat_history = convert_chat_history(
+        converted_messages = convert_chat_history_by_message(
             chat_history=chat_history,
             files=files,
             project_image_files=extracted_project_files.project_image_files,
@@ -525,6 +591,21 @@ def stream_chat_message_objects(
             token_counter=token_counter,
             tool_id_to_name_map=tool_id_to_name_map,
         )
+        simple_chat_history = [
+            simple_message
+            for message_simple_messages in converted_messages
+            for simple_message in message_simple_messages
+        ]
+        if cached_history:
+            simple_chat_history = (
+                cached_history.load_simple_messages() + simple_chat_history
+            )
+        _cache_chat_history(
+            chat_session_id=chat_session_id,
+            cached_history=cached_history,
+            chat_history=chat_history,
+            converted_messages=converted_messages,
+        )
 
         redis_client = get_redis_client()
 
@@ -635,6 +716,7 @@ def stream_chat_message_objects(
             assistant_message=assistant_response,
             is_clarification=state_container.is_clarification,
         )
+        record_chat_token_usage(user_id, [assistant_response])
 
     except ValueError as e:
         logger.exception("Failed to process chat message.")
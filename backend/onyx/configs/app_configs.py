@@ -192,6 +192,15 @@ DOCUMENT_INDEX_NAME = "danswer_index"
 DOCUMENT_INDEX_TYPE = os.environ.get(
     "DOCUMENT_INDEX_TYPE", DocumentIndexType.COMBINED.value
 )
+# Only used with the embedded document index (DOCUMENT_INDEX_TYPE=embedded), which runs
+# inside of every process and persists to this directory, so it has to be on a volume
+# shared by the api server and the background workers
+EMBEDDED_DOCUMENT_INDEX_DIR = (
+    os.environ.get("EMBEDDED_DOCUMENT_INDEX_DIR") or "/app/embedded_document_index"
+)
+# Number of IVF lists scanned per vector search once the embedded index is large enough
+# to use them, higher is more accurate and slower
+EMBEDDED_INDEX_IVF_NPROBE = int(os.environ.get("EMBEDDED_INDEX_IVF_NPROBE") or 16)
 VESPA_HOST = os.environ.get("VESPA_HOST") or "localhost"
 # NOTE: this is used if and only if the vespa config server is accessible via a
 # different host than the main vespa application
@@ -311,6 +320,17 @@ REDIS_POOL_MAX_CONNECTIONS = int(os.environ.get("REDIS_POOL_MAX_CONNECTIONS", 12
 REDIS_SSL_CERT_REQS = os.getenv("REDIS_SSL_CERT_REQS", "none")
 REDIS_SSL_CA_CERTS = os.getenv("REDIS_SSL_CA_CERTS", None)
 
+# Process local cache in front of the Redis layer of the key value store. Writes are
+# broadcast over Redis pub/sub so that every process drops its stale entries
+KV_STORE_L1_CACHE_ENABLED = (
+    os.environ.get("KV_STORE_L1_CACHE_ENABLED", "").lower() == "true"
+)
+KV_STORE_L1_CACHE_MAX_SIZE = int(os.environ.get("KV_STORE_L1_CACHE_MAX_SIZE") or 1000)
+# upper bound on how stale an entry can get if an invalidation is missed
+KV_STORE_L1_CACHE_TTL_SECONDS = float(
+    os.environ.get("KV_STORE_L1_CACHE_TTL_SECONDS") or 60
+)
+
 CELERY_RESULT_EXPIRES = int(os.environ.get("CELERY_RESULT_EXPIRES", 86400))  # seconds
 
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#broker-pool-limit
@@ -409,6 +429,15 @@ CELERY_WORKER_USER_FILE_PROCESSING_CONCURRENCY = int(
 # The maximum number of tasks that can be queued up to sync to Vespa in a single pass
 VESPA_SYNC_MAX_TASKS = 8192
 
+# Number of stale documents synced to Vespa by a single batched metadata sync task
+VESPA_METADATA_SYNC_BATCH_SIZE = int(
+    os.environ.get("VESPA_METADATA_SYNC_BATCH_SIZE") or 200
+)
+# Number of documents of a batch whose Vespa chunks are updated concurrently
+VESPA_METADATA_SYNC_BATCH_NUM_THREADS = int(
+    os.environ.get("VESPA_METADATA_SYNC_BATCH_NUM_THREADS") or 16
+)
+
 DB_YIELD_PER_DEFAULT = 64
 
 #####
@@ -445,6 +474,20 @@ WEB_CONNECTOR_OAUTH_CLIENT_ID = os.environ.get("WEB_CONNECTOR_OAUTH_CLIENT_ID")
 WEB_CONNECTOR_OAUTH_CLIENT_SECRET = os.environ.get("WEB_CONNECTOR_OAUTH_CLIENT_SECRET")
 WEB_CONNECTOR_OAUTH_TOKEN_URL = os.environ.get("WEB_CONNECTOR_OAUTH_TOKEN_URL")
 WEB_CONNECTOR_VALIDATE_URLS = os.environ.get("WEB_CONNECTOR_VALIDATE_URLS")
+# Number of pages the web connector scrapes concurrently
+WEB_CONNECTOR_NUM_WORKERS = int(os.environ.get("WEB_CONNECTOR_NUM_WORKERS") or 4)
+# Politeness limits, applied per host
+WEB_CONNECTOR_MAX_CONCURRENT_REQUESTS_PER_HOST = int(
+    os.environ.get("WEB_CONNECTOR_MAX_CONCURRENT_REQUESTS_PER_HOST") or 2
+)
+WEB_CONNECTOR_MIN_REQUEST_INTERVAL_PER_HOST = float(
+    os.environ.get("WEB_CONNECTOR_MIN_REQUEST_INTERVAL_PER_HOST") or 0.5
+)
+# Fetch pages with a plain HTTP request first and only render them in a browser if
+# they seem to need JavaScript
+WEB_CONNECTOR_HTTP_FIRST = (
+    os.environ.get("WEB_CONNECTOR_HTTP_FIRST", "true").lower() == "true"
+)
 
 HTML_BASED_CONNECTOR_TRANSFORM_LINKS_STRATEGY = os.environ.get(
     "HTML_BASED_CONNECTOR_TRANSFORM_LINKS_STRATEGY",
@@ -484,6 +527,12 @@ CONFLUENCE_CONNECTOR_ATTACHMENT_CHAR_COUNT_THRESHOLD = int(
     os.environ.get("CONFLUENCE_CONNECTOR_ATTACHMENT_CHAR_COUNT_THRESHOLD", 200_000)
 )
 
+# Number of pages whose comments and attachments are fetched (and whose attachments are
+# converted to text) at the same time while indexing
+CONFLUENCE_CONNECTOR_HYDRATION_THREADS = int(
+    os.environ.get("CONFLUENCE_CONNECTOR_HYDRATION_THREADS", 4)
+)
+
 # A JSON-formatted array. Each item in the array should have the following structure:
 # {
 #     "user_id": "1234567890",
@@ -628,6 +677,17 @@ MAX_PRUNING_DOCUMENT_RETRIEVAL_PER_MINUTE = int(
     os.environ.get("MAX_PRUNING_DOCUMENT_RETRIEVAL_PER_MINUTE", 0)
 )
 
+# Compute the pruning diff without holding all document IDs in memory: IDs from the
+# source are spilled to sorted run files on disk and merged against the indexed IDs,
+# which are streamed from Postgres in the same order. Meant for very large connectors.
+PRUNING_STREAMING_DIFF_ENABLED = (
+    os.environ.get("PRUNING_STREAMING_DIFF_ENABLED", "").lower() == "true"
+)
+# Number of source document IDs kept in memory before a sorted run is written to disk
+PRUNING_STREAMING_DIFF_RUN_SIZE = int(
+    os.environ.get("PRUNING_STREAMING_DIFF_RUN_SIZE") or 1_000_000
+)
+
 # comma delimited list of zendesk article labels to skip indexing for
 ZENDESK_CONNECTOR_SKIP_ARTICLE_LABELS = os.environ.get(
     "ZENDESK_CONNECTOR_SKIP_ARTICLE_LABELS", ""
@@ -657,6 +717,28 @@ ENABLE_CONTEXTUAL_RAG = os.environ.get("ENABLE_CONTEXTUAL_RAG", "").lower() == "
 
 DEFAULT_CONTEXTUAL_RAG_LLM_NAME = "gpt-4o-mini"
 DEFAULT_CONTEXTUAL_RAG_LLM_PROVIDER = "DevEnvPresetOpenAI"
+# Max number of contextual RAG LLM calls in flight at the same time per process
+CONTEXTUAL_RAG_MAX_CONCURRENCY = int(
+    os.environ.get("CONTEXTUAL_RAG_MAX_CONCURRENCY") or 8
+)
+# Max number of tokens (prompt + completion) per minute spent on contextual RAG per
+# process, 0 means no limit
+CONTEXTUAL_RAG_MAX_TOKENS_PER_MINUTE = int(
+    os.environ.get("CONTEXTUAL_RAG_MAX_TOKENS_PER_MINUTE") or 0
+)
+# Keep document summaries and chunk contexts keyed by the prompt and the model, so that
+# unchanged documents are not summarized again when they are re-indexed
+CONTEXTUAL_RAG_CACHE_ENABLED = (
+    os.environ.get("CONTEXTUAL_RAG_CACHE_ENABLED", "").lower() == "true"
+)
+# Local directory holding the cache, shared by all indexing workers on the host
+CONTEXTUAL_RAG_CACHE_DIR = (
+    os.environ.get("CONTEXTUAL_RAG_CACHE_DIR") or "/tmp/onyx_contextual_rag_cache"
+)
+# Least recently used entries are evicted beyond this many cached summaries
+CONTEXTUAL_RAG_CACHE_MAX_ENTRIES = int(
+    os.environ.get("CONTEXTUAL_RAG_CACHE_MAX_ENTRIES") or 1_000_000
+)
 # Finer grained chunking for more detail retention
 # Slightly larger since the sentence aware split is a max cutoff so most minichunks will be under MINI_CHUNK_SIZE
 # tokens. But we need it to be at least as big as 1/4th chunk size to avoid having a tiny mini-chunk at the end
@@ -692,6 +774,52 @@ INDEXING_EMBEDDING_MODEL_NUM_THREADS = int(
 # exception without aborting the attempt.
 INDEXING_EXCEPTION_LIMIT = int(os.environ.get("INDEXING_EXCEPTION_LIMIT") or 0)
 
+# Reuse embeddings of chunk texts that were already embedded by a previous run, so that
+# re-indexing an edited document only embeds the chunks that actually changed
+EMBEDDING_CACHE_ENABLED = (
+    os.environ.get("EMBEDDING_CACHE_ENABLED", "").lower() == "true"
+)
+# Local directory holding the cache, shared by all indexing workers on the host
+EMBEDDING_CACHE_DIR = (
+    os.environ.get("EMBEDDING_CACHE_DIR") or "/tmp/onyx_embedding_cache"
+)
+# Least recently used entries are evicted beyond this many cached vectors
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES") or 1_000_000
+)
+
+# Stream each indexing batch through chunking, embedding and vector db writes in small
+# groups of documents, so that the stages work on different groups at the same time
+INDEXING_PIPELINE_STREAMING_ENABLED = (
+    os.environ.get("INDEXING_PIPELINE_STREAMING_ENABLED", "").lower() == "true"
+)
+# Number of documents that move through the stages together
+INDEXING_PIPELINE_STREAMING_GROUP_SIZE = int(
+    os.environ.get("INDEXING_PIPELINE_STREAMING_GROUP_SIZE") or 4
+)
+# Number of finished groups a stage may get ahead of the next one before it blocks
+INDEXING_PIPELINE_STREAMING_QUEUE_SIZE = int(
+    os.environ.get("INDEXING_PIPELINE_STREAMING_QUEUE_SIZE") or 2
+)
+
+# Instead of waiting until every document of an indexing batch can be locked, lock the
+# ones that are free (SELECT ... FOR UPDATE SKIP LOCKED), write them right away and
+# retry the documents held by other workers after a short, jittered backoff
+DOCUMENT_LOCK_SKIP_LOCKED_ENABLED = (
+    os.environ.get("DOCUMENT_LOCK_SKIP_LOCKED_ENABLED", "").lower() == "true"
+)
+# Number of times the contended documents are retried before the batch fails
+DOCUMENT_LOCK_SKIP_LOCKED_MAX_ATTEMPTS = int(
+    os.environ.get("DOCUMENT_LOCK_SKIP_LOCKED_MAX_ATTEMPTS") or 20
+)
+# Backoff before the first retry, doubled for every further retry up to the max
+DOCUMENT_LOCK_SKIP_LOCKED_RETRY_DELAY = float(
+    os.environ.get("DOCUMENT_LOCK_SKIP_LOCKED_RETRY_DELAY") or 0.2
+)
+DOCUMENT_LOCK_SKIP_LOCKED_MAX_RETRY_DELAY = float(
+    os.environ.get("DOCUMENT_LOCK_SKIP_LOCKED_MAX_RETRY_DELAY") or 5
+)
+
 # Maximum number of user file connector credential pairs to index in a single batch
 # Setting this number too high may overload the indexing process
 USER_FILE_INDEXING_LIMIT = int(os.environ.get("USER_FILE_INDEXING_LIMIT") or 100)
@@ -792,6 +920,17 @@ TOKEN_BUDGET_GLOBALLY_ENABLED = (
     os.environ.get("TOKEN_BUDGET_GLOBALLY_ENABLED", "").lower() == "true"
 )
 
+# Check token rate limits against per minute usage counters in Redis instead of
+# aggregating the chat messages in Postgres on every request
+TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED = (
+    os.environ.get("TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED", "true").lower() == "true"
+)
+# The counters are rebuilt from Postgres after this long, which bounds any drift
+# from messages that were saved but not counted (e.g. a crash in between)
+TOKEN_RATE_LIMIT_COUNTERS_TTL_SECONDS = int(
+    os.environ.get("TOKEN_RATE_LIMIT_COUNTERS_TTL_SECONDS") or 60 * 60
+)
+
 # Defined custom query/answer conditions to validate the query and the LLM answer.
 # Format: list of strings
 CUSTOM_ANSWER_VALIDITY_CONDITIONS = json.loads(
@@ -800,6 +939,13 @@ CUSTOM_ANSWER_VALIDITY_CONDITIONS = json.loads(
 
 VESPA_REQUEST_TIMEOUT = int(os.environ.get("VESPA_REQUEST_TIMEOUT") or "15")
 
+# Feed chunks to Vespa from one event loop over HTTP/2 instead of a thread per request
+VESPA_ASYNC_FEED_ENABLED = (
+    os.environ.get("VESPA_ASYNC_FEED_ENABLED", "").lower() == "true"
+)
+# Maximum number of feed requests in flight at the same time
+VESPA_FEED_MAX_IN_FLIGHT = int(os.environ.get("VESPA_FEED_MAX_IN_FLIGHT") or "64")
+
 SYSTEM_RECURSION_LIMIT = int(os.environ.get("SYSTEM_RECURSION_LIMIT") or "1000")
 
 PARSE_WITH_TRAFILATURA = os.environ.get("PARSE_WITH_TRAFILATURA", "").lower() == "true"
@@ -955,6 +1101,36 @@ IMAGE_SUMMARIZATION_USER_PROMPT = os.environ.get(
     DEFAULT_IMAGE_SUMMARIZATION_USER_PROMPT,
 )
 
+# Max number of images summarized at the same time per process and LLM provider.
+# Providers can be given their own limit, e.g. {"ollama": 1}
+IMAGE_SUMMARIZATION_MAX_CONCURRENCY = int(
+    os.environ.get("IMAGE_SUMMARIZATION_MAX_CONCURRENCY") or 4
+)
+_IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER = os.environ.get(
+    "IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER", '{"ollama": 1}'
+)
+IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER: dict[str, int] = {}
+try:
+    IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER = cast(
+        dict[str, int], json.loads(_IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER)
+    )
+except json.JSONDecodeError:
+    pass
+
+# Keep image summaries keyed by the image content, model and prompts, so that
+# re-indexed and duplicate images are not summarized again
+IMAGE_SUMMARY_CACHE_ENABLED = (
+    os.environ.get("IMAGE_SUMMARY_CACHE_ENABLED", "").lower() == "true"
+)
+# Local directory holding the cache, shared by all indexing workers on the host
+IMAGE_SUMMARY_CACHE_DIR = (
+    os.environ.get("IMAGE_SUMMARY_CACHE_DIR") or "/tmp/onyx_image_summary_cache"
+)
+# Least recently used entries are evicted beyond this many cached summaries
+IMAGE_SUMMARY_CACHE_MAX_ENTRIES = int(
+    os.environ.get("IMAGE_SUMMARY_CACHE_MAX_ENTRIES") or 100_000
+)
+
 IMAGE_ANALYSIS_SYSTEM_PROMPT = os.environ.get(
     "IMAGE_ANALYSIS_SYSTEM_PROMPT",
     DEFAULT_IMAGE_ANALYSIS_SYSTEM_PROMPT,
@@ -988,6 +1164,17 @@ S3_GENERATE_LOCAL_CHECKSUM = (
     os.environ.get("S3_GENERATE_LOCAL_CHECKSUM", "").lower() == "true"
 )
 
+# Write the document batches handed from docfetching to docprocessing in the compact
+# binary format. Both formats can always be read, only enable this once no
+# docprocessing workers from before the binary format are running anymore.
+DOCUMENT_BATCH_BINARY_FORMAT_ENABLED = (
+    os.environ.get("DOCUMENT_BATCH_BINARY_FORMAT_ENABLED", "").lower() == "true"
+)
+# zstd compression level for binary document batches
+DOCUMENT_BATCH_COMPRESSION_LEVEL = int(
+    os.environ.get("DOCUMENT_BATCH_COMPRESSION_LEVEL") or 3
+)
+
 # Forcing Vespa Language
 # English: en, German:de, etc. See: https://docs.vespa.ai/en/linguistics.html
 VESPA_LANGUAGE_OVERRIDE = os.environ.get("VESPA_LANGUAGE_OVERRIDE")
@@ -38,6 +38,44 @@ QUOTE_ALLOWED_ERROR_PERCENT = 0.05
 QA_TIMEOUT = int(os.environ.get("QA_TIMEOUT") or "60")  # 60 seconds
 # Weighting factor between Vector and Keyword Search, 1 for completely vector search
 HYBRID_ALPHA = max(0, min(1, float(os.environ.get("HYBRID_ALPHA") or 0.5)))
+
+# Cache retrieval results (per tenant, ACL and filters) in search_pipeline
+SEARCH_RESULT_CACHE_ENABLED = (
+    os.environ.get("SEARCH_RESULT_CACHE_ENABLED", "").lower() == "true"
+)
+SEARCH_RESULT_CACHE_TTL_SECONDS = float(
+    os.environ.get("SEARCH_RESULT_CACHE_TTL_SECONDS") or 300
+)
+SEARCH_RESULT_CACHE_MAX_SIZE = int(
+    os.environ.get("SEARCH_RESULT_CACHE_MAX_SIZE") or 10000
+)
+# If set, a query may be served by a cached query whose embedding has at least this
+# cosine similarity (e.g. 0.97). Unset disables near-duplicate lookups.
+SEARCH_RESULT_CACHE_SIMILARITY_THRESHOLD = (
+    float(os.environ["SEARCH_RESULT_CACHE_SIMILARITY_THRESHOLD"])
+    if os.environ.get("SEARCH_RESULT_CACHE_SIMILARITY_THRESHOLD")
+    else None
+)
+# Share cached results between API server replicas through Redis
+SEARCH_RESULT_CACHE_REDIS_ENABLED = (
+    os.environ.get("SEARCH_RESULT_CACHE_REDIS_ENABLED", "true").lower() == "true"
+)
+
+# Number of query embeddings kept in memory per process, 0 disables the cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE") or 2048)
+# If set, query embeddings are also shared between processes through Redis for this
+# many seconds (e.g. 86400). Unset or 0 keeps the cache local to each process
+QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS") or 0
+)
+# Number of chat sessions whose converted history is kept in memory per process, so a
+# new turn only loads and converts the messages since the previous one. 0 disables
+CHAT_HISTORY_CACHE_SIZE = int(os.environ.get("CHAT_HISTORY_CACHE_SIZE") or 256)
+# Total number of characters of the cached messages (which include the text of the
+# attached files) per process, the least recently used sessions are evicted beyond it
+CHAT_HISTORY_CACHE_MAX_CHARS = int(
+    os.environ.get("CHAT_HISTORY_CACHE_MAX_CHARS") or 50_000_000
+)
 HYBRID_ALPHA_KEYWORD = max(
     0, min(1, float(os.environ.get("HYBRID_ALPHA_KEYWORD") or 0.4))
 )
@@ -249,6 +249,7 @@ class BlobType(str, Enum):
 class DocumentIndexType(str, Enum):
     COMBINED = "combined"  # Vespa
     SPLIT = "split"  # Typesense + Qdrant
+    EMBEDDED = "embedded"  # In process, see onyx/document_index/embedded
 
 
 class AuthType(str, Enum):
@@ -533,6 +534,7 @@ class OnyxCeleryTask:
     CONNECTOR_PRUNING_GENERATOR_TASK = "connector_pruning_generator_task"
     DOCUMENT_BY_CC_PAIR_CLEANUP_TASK = "document_by_cc_pair_cleanup_task"
     VESPA_METADATA_SYNC_TASK = "vespa_metadata_sync_task"
+    VESPA_METADATA_SYNC_BATCH_TASK = "vespa_metadata_sync_batch_task"
     USER_FILE_DOCID_MIGRATION = "user_file_docid_migration"
 
     # chat retention
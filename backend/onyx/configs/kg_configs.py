@@ -135,6 +135,11 @@ KG_CLUSTERING_THRESHOLD: float = float(
     os.environ.get("KG_CLUSTERING_THRESHOLD", "0.96")
 )
 
+# number of staging entities merged / transferred per transaction during clustering
+KG_CLUSTERING_WRITE_BATCH_SIZE: int = int(
+    os.environ.get("KG_CLUSTERING_WRITE_BATCH_SIZE", "500")
+)
+
 KG_MAX_SEARCH_DOCUMENTS: int = int(os.environ.get("KG_MAX_SEARCH_DOCUMENTS", "15"))
 
 KG_MAX_DECOMPOSITION_SEGMENTS: int = int(
@@ -1,4 +1,5 @@
 import copy
+from collections.abc import Iterator
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
@@ -10,6 +11,7 @@ from requests.exceptions import HTTPError
 from typing_extensions import override
 
 from onyx.access.models import ExternalAccess
+from onyx.configs.app_configs import CONFLUENCE_CONNECTOR_HYDRATION_THREADS
 from onyx.configs.app_configs import CONFLUENCE_CONNECTOR_LABELS_TO_SKIP
 from onyx.configs.app_configs import CONFLUENCE_TIMEZONE_OFFSET
 from onyx.configs.app_configs import CONTINUE_ON_CONNECTOR_FAILURE
@@ -51,22 +53,27 @@ from onyx.connectors.models import SlimDocument
 from onyx.connectors.models import TextSection
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.utils.logger import setup_logger
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 logger = setup_logger()
 # Potential Improvements
 # 1. Segment into Sections for more accurate linking, can split by headers but make sure no text/ordering is lost
 _COMMENT_EXPANSION_FIELDS = ["body.storage.value"]
-_PAGE_EXPANSION_FIELDS = [
-    "body.storage.value",
+_ATTACHMENT_EXPANSION_FIELDS = [
     "version",
     "space",
     "metadata.labels",
-    "history.lastUpdated",
 ]
-_ATTACHMENT_EXPANSION_FIELDS = [
+# Attachments come along with the page listing so that most pages don't need a
+# separate attachment query, see _get_page_attachments. Comments are still queried
+# per page because the comment children of a page only include top level comments.
+_PAGE_EXPANSION_FIELDS = [
+    "body.storage.value",
     "version",
     "space",
     "metadata.labels",
+    "history.lastUpdated",
+    *(f"children.attachment.{field}" for field in _ATTACHMENT_EXPANSION_FIELDS),
 ]
 _RESTRICTIONS_EXPANSION_FIELDS = [
     "space",
@@ -117,6 +124,7 @@ class ConfluenceConnector(
         labels_to_skip: list[str] = CONFLUENCE_CONNECTOR_LABELS_TO_SKIP,
         timezone_offset: float = CONFLUENCE_TIMEZONE_OFFSET,
         scoped_token: bool = False,
+        hydration_threads: int = CONFLUENCE_CONNECTOR_HYDRATION_THREADS,
     ) -> None:
         self.wiki_base = wiki_base
         self.is_cloud = is_cloud
@@ -128,6 +136,7 @@ class ConfluenceConnector(
         self.labels_to_skip = labels_to_skip
         self.timezone_offset = timezone_offset
         self.scoped_token = scoped_token
+        self.hydration_threads = hydration_threads
         self._confluence_client: OnyxConfluence | None = None
         self._low_timeout_confluence_client: OnyxConfluence | None = None
         self._fetched_titles: set[str] = set()
@@ -377,6 +386,44 @@ class ConfluenceConnector(
                 exception=e,
             )
 
+    def _get_page_attachments(
+        self,
+        page: dict[str, Any],
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        The attachments of the page that were modified between start and end. Uses
+        the attachments expanded in the page listing unless Confluence truncated
+        them, in which case they are queried separately.
+        """
+        expanded_attachments = page.get("children", {}).get("attachment")
+        if expanded_attachments is None or expanded_attachments.get("_links", {}).get(
+            "next"
+        ):
+            yield from self.confluence_client.paginated_cql_retrieval(
+                cql=self._construct_attachment_query(_get_page_id(page), start, end),
+                expand=",".join(_ATTACHMENT_EXPANSION_FIELDS),
+            )
+            return
+
+        # same filters as _construct_attachment_query, which compares modification
+        # times by the minute
+        min_modified = start - start % 60 if start else None
+        for attachment in expanded_attachments.get("results", []):
+            labels = attachment.get("metadata", {}).get("labels", {}).get("results", [])
+            if any(label.get("name") in self.labels_to_skip for label in labels):
+                continue
+
+            if (min_modified or end) and attachment.get("version", {}).get("when"):
+                modified = datetime_from_string(attachment["version"]["when"])
+                if min_modified and modified.timestamp() < min_modified:
+                    continue
+                if end and modified.timestamp() > end:
+                    continue
+
+            yield attachment
+
     def _fetch_page_attachments(
         self,
         page: dict[str, Any],
@@ -388,18 +435,12 @@ class ConfluenceConnector(
         this function. The returned documents/connectorfailures are for non-inline attachments
         and those at the end of the page.
         """
-        attachment_query = self._construct_attachment_query(
-            _get_page_id(page), start, end
-        )
         attachment_failures: list[ConnectorFailure] = []
         attachment_docs: list[Document] = []
         page_url = ""
 
         try:
-            for attachment in self.confluence_client.paginated_cql_retrieval(
-                cql=attachment_query,
-                expand=",".join(_ATTACHMENT_EXPANSION_FIELDS),
-            ):
+            for attachment in self._get_page_attachments(page, start, end):
                 media_type: str = attachment.get("metadata", {}).get("mediaType", "")
 
                 # TODO(rkuo): this check is partially redundant with validate_attachment_filetype
@@ -561,6 +602,25 @@ class ConfluenceConnector(
 
         return attachment_docs, attachment_failures
 
+    def _hydrate_page(
+        self,
+        page: dict[str, Any],
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+    ) -> list[Document | ConnectorFailure]:
+        """
+        The document (or failure) for the page followed by those of its attachments.
+        Runs in a worker thread, see _fetch_document_batches.
+        """
+        doc_or_failure = self._convert_page_to_document(page)
+        if isinstance(doc_or_failure, ConnectorFailure):
+            return [doc_or_failure]
+
+        attachment_docs, attachment_failures = self._fetch_page_attachments(
+            page, start, end
+        )
+        return [doc_or_failure, *attachment_docs, *attachment_failures]
+
     def _fetch_document_batches(
         self,
         checkpoint: ConfluenceCheckpoint,
@@ -587,32 +647,28 @@ class ConfluenceConnector(
         def store_next_page_url(next_page_url: str) -> None:
             checkpoint.next_page_url = next_page_url
 
+        pages: list[dict[str, Any]] = []
         for page in self.confluence_client.paginated_page_retrieval(
             cql_url=page_query_url,
             limit=self.batch_size,
             next_page_callback=store_next_page_url,
         ):
-            # Build doc from page
-            doc_or_failure = self._convert_page_to_document(page)
-
-            if isinstance(doc_or_failure, ConnectorFailure):
-                yield doc_or_failure
-                continue
-
-            # yield completed document (or failure)
-            yield doc_or_failure
+            pages.append(page)
+            # stop once a full page of results is returned
+            if checkpoint.next_page_url and checkpoint.next_page_url != page_query_url:
+                break
 
-            # Now get attachments for that page:
-            attachment_docs, attachment_failures = self._fetch_page_attachments(
-                page, start, end
-            )
-            # yield attached docs and failures
-            yield from attachment_docs
-            yield from attachment_failures
+        # The pages are hydrated concurrently but their documents are yielded in
+        # order, so the checkpoint never moves past a page that wasn't yielded.
+        for page_docs in run_functions_tuples_in_parallel(
+            [(self._hydrate_page, (page, start, end)) for page in pages],
+            max_workers=self.hydration_threads,
+        ):
+            yield from page_docs
 
-            # Create checkpoint once a full page of results is returned
-            if checkpoint.next_page_url and checkpoint.next_page_url != page_query_url:
-                return checkpoint
+        # Create checkpoint once a full page of results is returned
+        if checkpoint.next_page_url and checkpoint.next_page_url != page_query_url:
+            return checkpoint
 
         checkpoint.has_more = False
         return checkpoint
@@ -13,6 +13,7 @@ We haven't explored all of the cloud APIs' pagination strategies. @raunakab take
 """
 
 import json
+import threading
 import time
 from collections.abc import Callable
 from collections.abc import Generator
@@ -121,6 +122,10 @@ class OnyxConfluence:
 
         self._kwargs: Any = None
 
+        # shared by every thread using this client, see _wait_for_rate_limit
+        self._rate_limit_lock = threading.Lock()
+        self._rate_limited_until = 0.0
+
         self.shared_base_kwargs: dict[str, str | int | bool] = {
             "api_version": "cloud" if is_cloud else "latest",
             "backoff_and_retry": True,
@@ -430,33 +435,30 @@ class OnyxConfluence:
                         f"Confluence call attempts took longer than {TIMEOUT} seconds."
                     )
 
+                # another call may have run into the rate limit in the meantime
+                self._wait_for_rate_limit()
+
                 # we're relying more on the client to rate limit itself
                 # and applying our own retries in a more specific set of circumstances
                 try:
                     if credential_provider:
+                        # the lock only guards the renewal, so that calls made from
+                        # several threads are not serialized behind it
                         with credential_provider:
                             credentials, renewed = self._renew_credentials()
                             if renewed:
                                 self._confluence = self._initialize_connection_helper(
                                     credentials, **self._kwargs
                                 )
-                            attr = getattr(self._confluence, name, None)
-                            if attr is None:
-                                # The underlying Confluence client doesn't have this attribute
-                                raise AttributeError(
-                                    f"'{type(self).__name__}' object has no attribute '{name}'"
-                                )
 
-                            return attr(*args, **kwargs)
-                    else:
-                        attr = getattr(self._confluence, name, None)
-                        if attr is None:
-                            # The underlying Confluence client doesn't have this attribute
-                            raise AttributeError(
-                                f"'{type(self).__name__}' object has no attribute '{name}'"
-                            )
+                    attr = getattr(self._confluence, name, None)
+                    if attr is None:
+                        # The underlying Confluence client doesn't have this attribute
+                        raise AttributeError(
+                            f"'{type(self).__name__}' object has no attribute '{name}'"
+                        )
 
-                        return attr(*args, **kwargs)
+                    return attr(*args, **kwargs)
 
                 except HTTPError as e:
                     delay_until = _handle_http_error(e, attempt)
@@ -464,9 +466,11 @@ class OnyxConfluence:
                         f"HTTPError in confluence call. "
                         f"Retrying in {delay_until} seconds..."
                     )
-                    while time.monotonic() < delay_until:
-                        # in the future, check a signal here to exit
-                        time.sleep(1)
+                    # every other call made through this client backs off as well
+                    with self._rate_limit_lock:
+                        self._rate_limited_until = max(
+                            self._rate_limited_until, delay_until
+                        )
                 except AttributeError as e:
                     # Some error within the Confluence library, unclear why it fails.
                     # Users reported it to be intermittent, so just retry
@@ -480,6 +484,12 @@ class OnyxConfluence:
 
         return wrapped_call
 
+    def _wait_for_rate_limit(self) -> None:
+        """Blocks until the backoff requested by the last rate limited call is over"""
+        while time.monotonic() < self._rate_limited_until:
+            # in the future, check a signal here to exit
+            time.sleep(1)
+
     def __getattr__(self, name: str) -> Any:
         """Dynamically intercept attribute/method access."""
         attr = getattr(self._confluence, name, None)
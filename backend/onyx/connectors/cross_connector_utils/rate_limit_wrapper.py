@@ -1,40 +1,123 @@
+import threading
 import time
+import uuid
+from collections import deque
 from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from typing import Any
 from typing import cast
 from typing import TypeVar
+from urllib.parse import urlparse
 
 import requests
 
+from onyx.configs.constants import DocumentSource
+from onyx.redis.redis_pool import get_raw_redis_client
 from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
 
 logger = setup_logger()
 
 
 F = TypeVar("F", bound=Callable[..., Any])
 
+_REDIS_KEY_PREFIX = "connector_rate_limit"
+
+# Set while a connector runs on behalf of a specific source + credential. Within such a
+# scope, rate limits are tracked in Redis and shared by every thread and process that
+# talks to the external service with the same credential.
+_RATE_LIMIT_SCOPE_CONTEXTVAR: ContextVar[str | None] = ContextVar(
+    "connector_rate_limit_scope", default=None
+)
+
+
+@contextmanager
+def rate_limit_scope(
+    source: DocumentSource, credential_id: int
+) -> Generator[None, None, None]:
+    token = _RATE_LIMIT_SCOPE_CONTEXTVAR.set(f"{source.value}:{credential_id}")
+    try:
+        yield
+    finally:
+        _RATE_LIMIT_SCOPE_CONTEXTVAR.reset(token)
+
+
+def _get_redis_key(scope: str, name: str) -> str:
+    return f"{get_current_tenant_id()}:{_REDIS_KEY_PREFIX}:{scope}:{name}"
+
 
 class RateLimitTriedTooManyTimesError(Exception):
     pass
 
 
+# Takes a token if one is available and returns 0. Otherwise returns how many
+# microseconds to wait until the next token is handed back. Each token is handed
+# back `period` after it was taken, so there are never more than `max_calls` calls
+# in any window of `period`. Uses the Redis clock so that all callers agree on time.
+_ACQUIRE_TOKEN_SCRIPT = """
+local key = KEYS[1]
+local max_calls = tonumber(ARGV[1])
+local period_us = tonumber(ARGV[2])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - period_us)
+if redis.call('ZCARD', key) < max_calls then
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, math.ceil(period_us / 1000))
+    return 0
+end
+
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return math.max(tonumber(oldest[2]) + period_us - now, 1)
+"""
+
+
+class _LocalTokens:
+    """In-process equivalent of _ACQUIRE_TOKEN_SCRIPT, shared by the threads of this
+    process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._taken_at: deque[float] = deque()
+
+    def try_acquire(self, max_calls: int, period: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            while self._taken_at and self._taken_at[0] <= now - period:
+                self._taken_at.popleft()
+            if len(self._taken_at) < max_calls:
+                self._taken_at.append(now)
+                return 0.0
+            return self._taken_at[0] + period - now
+
+
 class _RateLimitDecorator:
     """Builds a generic wrapper/decorator for calls to external APIs that
-    prevents making more than `max_calls` requests per `period`
+    prevents making more than `max_calls` requests per `period`.
 
-    Implementation inspired by the `ratelimit` library:
-    https://github.com/tomasbasham/ratelimit.
-
-    NOTE: is not thread safe.
+    Every call takes a token which is handed back `period` seconds later, callers
+    without a token sleep until the next one is handed back. Within a
+    `rate_limit_scope` the tokens are kept in Redis and shared across threads and
+    processes using the same source + credential, otherwise they are shared by
+    the threads of this process.
     """
 
     def __init__(
         self,
         max_calls: int,
         period: float,  # in seconds
-        sleep_time: float = 2,  # in seconds
-        sleep_backoff: float = 2,  # applies exponential backoff
+        # unused, the time until the next token is handed back is known exactly.
+        # Kept for backwards compatibility.
+        sleep_time: float = 2,
+        sleep_backoff: float = 2,
         max_num_sleep: int = 0,
     ):
         self.max_calls = max_calls
@@ -43,72 +126,170 @@ class _RateLimitDecorator:
         self.sleep_backoff = sleep_backoff
         self.max_num_sleep = max_num_sleep
 
-        self.call_history: list[float] = []
-        self.curr_calls = 0
+    def _try_acquire(self, name: str, local_tokens: _LocalTokens) -> float:
+        """Returns 0 if a token was taken, otherwise the seconds to wait."""
+        scope = _RATE_LIMIT_SCOPE_CONTEXTVAR.get()
+        if scope is not None:
+            try:
+                wait_us = get_raw_redis_client().eval(
+                    _ACQUIRE_TOKEN_SCRIPT,
+                    1,
+                    _get_redis_key(scope, name),
+                    str(self.max_calls),
+                    str(int(self.period * 1_000_000)),
+                    uuid.uuid4().hex,
+                )
+                return int(cast(int, wait_us)) / 1_000_000
+            except Exception:
+                logger.exception(
+                    "Failed to acquire a rate limit token from Redis, "
+                    "falling back to the local rate limit"
+                )
+        return local_tokens.try_acquire(self.max_calls, self.period)
+
+    def _acquire(self, name: str, local_tokens: _LocalTokens, func_name: str) -> None:
+        """Blocks until a token is available."""
+        sleep_cnt = 0
+        while (wait_time := self._try_acquire(name, local_tokens)) > 0:
+            if self.max_num_sleep != 0 and sleep_cnt >= self.max_num_sleep:
+                raise RateLimitTriedTooManyTimesError(
+                    f"Exceeded '{self.max_num_sleep}' retries for function '{func_name}'"
+                )
+            logger.notice(
+                f"Rate limit exceeded for function {func_name}. "
+                f"Waiting {wait_time:.2f} seconds before retrying."
+            )
+            time.sleep(wait_time)
+            sleep_cnt += 1
 
     def __call__(self, func: F) -> F:
+        # the same function may be wrapped with several limits, e.g. per second and
+        # per minute. They must not share tokens, and neither must the functions
+        # wrapped by the same decorator.
+        name = (
+            f"{func.__module__}.{func.__qualname__}:"
+            f"calls:{self.max_calls}:{self.period}"
+        )
+        local_tokens = _LocalTokens()
+
         @wraps(func)
         def wrapped_func(*args: list, **kwargs: dict[str, Any]) -> Any:
-            # cleanup calls which are no longer relevant
-            self._cleanup()
-
-            # check if we've exceeded the rate limit
-            sleep_cnt = 0
-            while len(self.call_history) == self.max_calls:
-                sleep_time = self.sleep_time * (self.sleep_backoff**sleep_cnt)
-                logger.notice(
-                    f"Rate limit exceeded for function {func.__name__}. "
-                    f"Waiting {sleep_time} seconds before retrying."
-                )
-                time.sleep(sleep_time)
-                sleep_cnt += 1
-                if self.max_num_sleep != 0 and sleep_cnt >= self.max_num_sleep:
-                    raise RateLimitTriedTooManyTimesError(
-                        f"Exceeded '{self.max_num_sleep}' retries for function '{func.__name__}'"
-                    )
-
-                self._cleanup()
-
-            # add the current call to the call history
-            self.call_history.append(time.monotonic())
+            self._acquire(name, local_tokens, func.__name__)
             return func(*args, **kwargs)
 
         return cast(F, wrapped_func)
 
-    def _cleanup(self) -> None:
-        curr_time = time.monotonic()
-        time_to_expire_before = curr_time - self.period
-        self.call_history = [
-            call_time
-            for call_time in self.call_history
-            if call_time > time_to_expire_before
-        ]
-
 
 rate_limit_builder = _RateLimitDecorator
 
 
+def get_retry_after_seconds(
+    headers: Mapping[str, str], default_wait_time_sec: float
+) -> float:
+    """Parses a `Retry-After` header, given either in seconds or as an HTTP date."""
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return default_wait_time_sec
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return default_wait_time_sec
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
 """If you want to allow the external service to tell you when you've hit the rate limit,
 use the following instead"""
 
 R = TypeVar("R", bound=Callable[..., requests.Response])
 
 
+class _RetryAfterBlock:
+    """Makes the requests to one host wait out a `Retry-After` received by any of
+    them. Within a `rate_limit_scope` the block is kept in Redis and shared across
+    processes, otherwise it is shared by the threads of this process."""
+
+    def __init__(self, host: str) -> None:
+        self.name = f"host:{host}"
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+
+    def _get_wait_time(self) -> float:
+        with self._lock:
+            wait_time = self._blocked_until - time.monotonic()
+
+        scope = _RATE_LIMIT_SCOPE_CONTEXTVAR.get()
+        if scope is not None:
+            try:
+                # negative if the key doesn't exist
+                blocked_ms = get_raw_redis_client().pttl(
+                    f"{_get_redis_key(scope, self.name)}:blocked"
+                )
+                wait_time = max(wait_time, int(cast(int, blocked_ms)) / 1000)
+            except Exception:
+                logger.exception("Failed to read the rate limit block from Redis")
+        return wait_time
+
+    def wait(self, func_name: str) -> None:
+        while (wait_time := self._get_wait_time()) > 0:
+            logger.notice(
+                f"Rate limit exceeded for function {func_name}. "
+                f"Waiting {wait_time:.2f} seconds before retrying."
+            )
+            time.sleep(wait_time)
+
+    def block_for(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+        scope = _RATE_LIMIT_SCOPE_CONTEXTVAR.get()
+        if scope is None or seconds <= 0:
+            return
+        try:
+            get_raw_redis_client().set(
+                f"{_get_redis_key(scope, self.name)}:blocked",
+                1,
+                px=int(seconds * 1000),
+            )
+        except Exception:
+            logger.exception("Failed to store the rate limit block in Redis")
+
+
+_host_blocks: dict[str, _RetryAfterBlock] = {}
+_host_blocks_lock = threading.Lock()
+
+
+def _get_host_block(url: str) -> _RetryAfterBlock:
+    host = urlparse(url).netloc
+    with _host_blocks_lock:
+        if host not in _host_blocks:
+            _host_blocks[host] = _RetryAfterBlock(host)
+        return _host_blocks[host]
+
+
 def wrap_request_to_handle_ratelimiting(
     request_fn: R, default_wait_time_sec: int = 30, max_waits: int = 30
 ) -> R:
     def wrapped_request(*args: list, **kwargs: dict[str, Any]) -> requests.Response:
+        url = str(args[0] if args else kwargs.get("url") or "")
+        host_block = _get_host_block(url)
+
         for _ in range(max_waits):
+            host_block.wait(request_fn.__name__)
             response = request_fn(*args, **kwargs)
             if response.status_code == 429:
-                try:
-                    wait_time = int(
-                        response.headers.get("Retry-After", default_wait_time_sec)
-                    )
-                except ValueError:
-                    wait_time = default_wait_time_sec
-
-                time.sleep(wait_time)
+                wait_time = get_retry_after_seconds(
+                    response.headers, default_wait_time_sec
+                )
+                # other threads / processes hitting the same host wait as well
+                host_block.block_for(wait_time)
                 continue
 
             return response
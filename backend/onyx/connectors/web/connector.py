@@ -2,6 +2,7 @@ import io
 import ipaddress
 import random
 import socket
+import threading
 import time
 from datetime import datetime
 from datetime import timezone
@@ -23,6 +24,11 @@ from requests_oauthlib import OAuth2Session  # type:ignore
 from urllib3.exceptions import MaxRetryError
 
 from onyx.configs.app_configs import INDEX_BATCH_SIZE
+from onyx.configs.app_configs import POLL_CONNECTOR_OFFSET
+from onyx.configs.app_configs import WEB_CONNECTOR_HTTP_FIRST
+from onyx.configs.app_configs import WEB_CONNECTOR_MAX_CONCURRENT_REQUESTS_PER_HOST
+from onyx.configs.app_configs import WEB_CONNECTOR_MIN_REQUEST_INTERVAL_PER_HOST
+from onyx.configs.app_configs import WEB_CONNECTOR_NUM_WORKERS
 from onyx.configs.app_configs import WEB_CONNECTOR_OAUTH_CLIENT_ID
 from onyx.configs.app_configs import WEB_CONNECTOR_OAUTH_CLIENT_SECRET
 from onyx.configs.app_configs import WEB_CONNECTOR_OAUTH_TOKEN_URL
@@ -34,40 +40,109 @@ from onyx.connectors.exceptions import InsufficientPermissionsError
 from onyx.connectors.exceptions import UnexpectedValidationError
 from onyx.connectors.interfaces import GenerateDocumentsOutput
 from onyx.connectors.interfaces import LoadConnector
+from onyx.connectors.interfaces import PollConnector
+from onyx.connectors.interfaces import SecondsSinceUnixEpoch
 from onyx.connectors.models import Document
 from onyx.connectors.models import TextSection
+from onyx.connectors.web.crawler import CrawlStateStore
+from onyx.connectors.web.crawler import CrawlWorkerPool
+from onyx.connectors.web.crawler import get_content_hash
+from onyx.connectors.web.crawler import HostPoliteness
+from onyx.connectors.web.crawler import PageValidators
 from onyx.file_processing.extract_file_text import read_pdf_file
 from onyx.file_processing.html_utils import web_html_cleanup
 from onyx.utils.logger import setup_logger
 from onyx.utils.sitemap import list_pages_for_site
 from shared_configs.configs import MULTI_TENANT
+from shared_configs.contextvars import INDEX_ATTEMPT_INFO_CONTEXTVAR
 
 logger = setup_logger()
 
 
 class ScrapeSessionContext:
-    """Session level context for scraping"""
+    """Session level context for scraping, only used by the thread driving the crawl"""
 
     def __init__(self, base_url: str, to_visit: list[str]):
         self.base_url = base_url
         self.to_visit = to_visit
         self.visited_links: set[str] = set()
-        self.content_hashes: set[int] = set()
+        self.content_hashes: set[str] = set()
+        # submitted to a worker, but not done yet
+        self.in_flight: set[str] = set()
 
         self.doc_batch: list[Document] = []
 
         self.at_least_one_doc: bool = False
+        self.num_unchanged: int = 0
         self.last_error: str | None = None
-        self.needs_retry: bool = False
+
+        # not persisted yet, see CrawlStateStore
+        self.newly_visited: list[str] = []
+        self.new_content_hashes: list[str] = []
+        self.pending_validators: dict[str, PageValidators] = {}
+
+
+class ScrapeResult:
+    def __init__(self, url: str) -> None:
+        # differs from the requested url after a redirect
+        self.url = url
+        self.doc: Document | None = None
+        self.retry: bool = False
+        self.error: str | None = None
+        # the page hasn't changed since it was last indexed
+        self.unchanged: bool = False
+        self.links: set[str] = set()
+        self.content_hash: str | None = None
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        self.validators: PageValidators | None = None
+
+
+class CrawlSettings:
+    """Crawl level settings shared by all workers"""
+
+    def __init__(
+        self,
+        base_url: str,
+        state_store: CrawlStateStore | None,
+        politeness: HostPoliteness,
+        extra_headers: dict[str, str],
+        start: float | None = None,
+    ) -> None:
+        self.base_url = base_url
+        self.state_store = state_store
+        self.politeness = politeness
+        self.extra_headers = extra_headers
+        # start of the poll window, pages indexed before it can be fetched conditionally
+        self.start = start
+
+
+class _WorkerSession:
+    """Browser and HTTP session of a single crawl worker thread. Playwright's sync API
+    is bound to the thread that started it, so these can't be shared."""
+
+    def __init__(self, max_pages_per_browser: int) -> None:
+        self.max_pages_per_browser = max_pages_per_browser
+        self.http_session = requests.Session()
 
         self.playwright: Playwright | None = None
         self.playwright_context: BrowserContext | None = None
+        self.num_pages = 0
+
+    def get_playwright_context(self) -> BrowserContext:
+        # restart the browser every now and then to keep its memory in check
+        if (
+            self.playwright_context is None
+            or self.num_pages >= self.max_pages_per_browser
+        ):
+            self.stop_browser()
+            self.playwright, self.playwright_context = start_playwright()
+            self.num_pages = 0
 
-    def initialize(self) -> None:
-        self.stop()
-        self.playwright, self.playwright_context = start_playwright()
+        self.num_pages += 1
+        return self.playwright_context
 
-    def stop(self) -> None:
+    def stop_browser(self) -> None:
         if self.playwright_context:
             self.playwright_context.close()
             self.playwright_context = None
@@ -76,10 +151,9 @@ class ScrapeSessionContext:
             self.playwright.stop()
             self.playwright = None
 
-
-class ScrapeResult:
-    doc: Document | None = None
-    retry: bool = False
+    def close(self) -> None:
+        self.stop_browser()
+        self.http_session.close()
 
 
 WEB_CONNECTOR_MAX_SCROLL_ATTEMPTS = 20
@@ -89,6 +163,10 @@ IFRAME_TEXT_LENGTH_THRESHOLD = 700
 JAVASCRIPT_DISABLED_MESSAGE = "You have JavaScript disabled in your browser"
 # Grace period after page navigation to allow bot-detection challenges to complete
 BOT_DETECTION_GRACE_PERIOD_MS = 5000
+# Pages fetched with plain HTTP with less text than this that contain scripts are
+# assumed to be rendered client side, and are rendered in a browser instead
+MIN_STATIC_PAGE_TEXT_LENGTH = 200
+HTTP_REQUEST_TIMEOUT_SECONDS = 30
 
 # Define common headers that mimic a real browser
 DEFAULT_USER_AGENT = (
@@ -334,23 +412,29 @@ def start_playwright() -> Tuple[Playwright, BrowserContext]:
     """
     )
 
-    if (
+    oauth_headers = get_oauth_headers()
+    if oauth_headers:
+        context.set_extra_http_headers(oauth_headers)
+
+    return playwright, context
+
+
+def get_oauth_headers() -> dict[str, str]:
+    if not (
         WEB_CONNECTOR_OAUTH_CLIENT_ID
         and WEB_CONNECTOR_OAUTH_CLIENT_SECRET
         and WEB_CONNECTOR_OAUTH_TOKEN_URL
     ):
-        client = BackendApplicationClient(client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID)
-        oauth = OAuth2Session(client=client)
-        token = oauth.fetch_token(
-            token_url=WEB_CONNECTOR_OAUTH_TOKEN_URL,
-            client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID,
-            client_secret=WEB_CONNECTOR_OAUTH_CLIENT_SECRET,
-        )
-        context.set_extra_http_headers(
-            {"Authorization": "Bearer {}".format(token["access_token"])}
-        )
-
-    return playwright, context
+        return {}
+
+    client = BackendApplicationClient(client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID)
+    oauth = OAuth2Session(client=client)
+    token = oauth.fetch_token(
+        token_url=WEB_CONNECTOR_OAUTH_TOKEN_URL,
+        client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID,
+        client_secret=WEB_CONNECTOR_OAUTH_CLIENT_SECRET,
+    )
+    return {"Authorization": "Bearer {}".format(token["access_token"])}
 
 
 def extract_urls_from_sitemap(sitemap_url: str) -> list[str]:
@@ -455,7 +539,7 @@ def _handle_cookies(context: BrowserContext, url: str) -> None:
         )
 
 
-class WebConnector(LoadConnector):
+class WebConnector(LoadConnector, PollConnector):
     MAX_RETRIES = 3
 
     def __init__(
@@ -472,6 +556,9 @@ class WebConnector(LoadConnector):
         self.recursive = False
         self.scroll_before_scraping = scroll_before_scraping
         self.web_connector_type = web_connector_type
+        self.base_url = base_url
+        self.num_workers = WEB_CONNECTOR_NUM_WORKERS
+        self._worker_sessions = threading.local()
         if web_connector_type == WEB_CONNECTOR_VALID_SETTINGS.RECURSIVE.value:
             self.recursive = True
             self.to_visit_list = [_ensure_valid_url(base_url)]
@@ -506,56 +593,133 @@ class WebConnector(LoadConnector):
             logger.warning("Unexpected credentials provided for Web Connector")
         return None
 
-    def _do_scrape(
+    def _get_worker_session(self) -> _WorkerSession:
+        session = getattr(self._worker_sessions, "session", None)
+        if session is None:
+            session = _WorkerSession(max_pages_per_browser=self.batch_size)
+            self._worker_sessions.session = session
+        return session
+
+    def _close_worker_session(self) -> None:
+        session = getattr(self._worker_sessions, "session", None)
+        if session is not None:
+            session.close()
+            self._worker_sessions.session = None
+
+    def _build_pdf_result(self, url: str, response: requests.Response) -> ScrapeResult:
+        result = ScrapeResult(url)
+
+        # PDF files are not checked for links
+        page_text, metadata, images = read_pdf_file(file=io.BytesIO(response.content))
+        last_modified = response.headers.get("Last-Modified")
+
+        result.doc = Document(
+            id=url,
+            sections=[TextSection(link=url, text=page_text)],
+            source=DocumentSource.WEB,
+            semantic_identifier=url.rstrip("/").split("/")[-1] or url,
+            metadata=metadata,
+            doc_updated_at=(
+                _get_datetime_from_last_modified_header(last_modified)
+                if last_modified
+                else None
+            ),
+        )
+        result.etag = response.headers.get("ETag")
+        result.last_modified = last_modified
+        return result
+
+    def _scrape_with_http(
         self,
-        index: int,
         initial_url: str,
-        session_ctx: ScrapeSessionContext,
-    ) -> ScrapeResult:
-        """Returns a ScrapeResult object with a doc and retry flag."""
+        crawl: CrawlSettings,
+        validators: PageValidators | None,
+    ) -> ScrapeResult | None:
+        """Scrapes the page with a plain HTTP request. Returns None if the page has to
+        be rendered in a browser instead."""
+        headers = {**DEFAULT_HEADERS, **crawl.extra_headers}
+        if validators:
+            if validators.etag:
+                headers["If-None-Match"] = validators.etag
+            if validators.last_modified:
+                headers["If-Modified-Since"] = validators.last_modified
 
-        if session_ctx.playwright is None:
-            raise RuntimeError("scrape_context.playwright is None")
+        try:
+            response = self._get_worker_session().http_session.get(
+                initial_url,
+                headers=headers,
+                timeout=HTTP_REQUEST_TIMEOUT_SECONDS,
+                allow_redirects=True,
+            )
+        except requests.RequestException as e:
+            logger.info(f"HTTP request for {initial_url} failed, using a browser: {e}")
+            return None
 
-        if session_ctx.playwright_context is None:
-            raise RuntimeError("scrape_context.playwright_context is None")
+        final_url = response.url
+        if final_url != initial_url:
+            protected_url_check(final_url)
 
-        result = ScrapeResult()
+        if response.status_code == 304 and validators:
+            result = ScrapeResult(final_url)
+            result.unchanged = True
+            result.links = set(validators.links)
+            result.validators = validators
+            return result
 
-        # Handle cookies for the URL
-        _handle_cookies(session_ctx.playwright_context, initial_url)
+        # errors and bot protection are handled by the browser
+        if not response.ok:
+            return None
 
-        # First do a HEAD request to check content type without downloading the entire content
-        head_response = requests.head(
-            initial_url, headers=DEFAULT_HEADERS, allow_redirects=True
-        )
-        is_pdf = is_pdf_content(head_response)
+        if is_pdf_content(response) or final_url.lower().endswith(".pdf"):
+            return self._build_pdf_result(final_url, response)
 
-        if is_pdf or initial_url.lower().endswith(".pdf"):
-            # PDF files are not checked for links
-            response = requests.get(initial_url, headers=DEFAULT_HEADERS)
-            page_text, metadata, images = read_pdf_file(
-                file=io.BytesIO(response.content)
-            )
-            last_modified = response.headers.get("Last-Modified")
+        if "html" not in response.headers.get("content-type", "").lower():
+            return None
 
-            result.doc = Document(
-                id=initial_url,
-                sections=[TextSection(link=initial_url, text=page_text)],
-                source=DocumentSource.WEB,
-                semantic_identifier=initial_url.rstrip("/").split("/")[-1]
-                or initial_url,
-                metadata=metadata,
-                doc_updated_at=(
-                    _get_datetime_from_last_modified_header(last_modified)
-                    if last_modified
-                    else None
-                ),
-            )
+        soup = BeautifulSoup(response.text, "html.parser")
+        has_scripts = soup.find("script") is not None
 
-            return result
+        result = ScrapeResult(final_url)
+        if self.recursive:
+            result.links = get_internal_links(crawl.base_url, final_url, soup)
+
+        parsed_html = web_html_cleanup(soup, self.mintlify_cleanup)
+        if JAVASCRIPT_DISABLED_MESSAGE in parsed_html.cleaned_text or (
+            has_scripts
+            and len(parsed_html.cleaned_text.strip()) < MIN_STATIC_PAGE_TEXT_LENGTH
+        ):
+            logger.debug(f"{initial_url} seems to need JavaScript, using a browser")
+            return None
+
+        last_modified = response.headers.get("Last-Modified")
+        result.content_hash = get_content_hash(
+            parsed_html.title, parsed_html.cleaned_text
+        )
+        result.etag = response.headers.get("ETag")
+        result.last_modified = last_modified
+        result.doc = Document(
+            id=final_url,
+            sections=[TextSection(link=final_url, text=parsed_html.cleaned_text)],
+            source=DocumentSource.WEB,
+            semantic_identifier=parsed_html.title or final_url,
+            metadata={},
+            doc_updated_at=(
+                _get_datetime_from_last_modified_header(last_modified)
+                if last_modified
+                else None
+            ),
+        )
+        return result
 
-        page = session_ctx.playwright_context.new_page()
+    def _scrape_with_playwright(
+        self, initial_url: str, crawl: CrawlSettings
+    ) -> ScrapeResult:
+        playwright_context = self._get_worker_session().get_playwright_context()
+
+        # Handle cookies for the URL
+        _handle_cookies(playwright_context, initial_url)
+
+        page = playwright_context.new_page()
         try:
             # Use "commit" instead of "domcontentloaded" to avoid hanging on bot-detection pages
             # that may never fire domcontentloaded. "commit" waits only for navigation to be
@@ -575,16 +739,7 @@ class WebConnector(LoadConnector):
             final_url = page.url
             if final_url != initial_url:
                 protected_url_check(final_url)
-                initial_url = final_url
-                if initial_url in session_ctx.visited_links:
-                    logger.info(
-                        f"{index}: {initial_url} redirected to {final_url} - already indexed"
-                    )
-                    page.close()
-                    return result
-
-                logger.info(f"{index}: {initial_url} redirected to {final_url}")
-                session_ctx.visited_links.add(initial_url)
+            result = ScrapeResult(final_url)
 
             # If we got here, the request was successful
             if self.scroll_before_scraping:
@@ -613,16 +768,11 @@ class WebConnector(LoadConnector):
             soup = BeautifulSoup(content, "html.parser")
 
             if self.recursive:
-                internal_links = get_internal_links(
-                    session_ctx.base_url, initial_url, soup
-                )
-                for link in internal_links:
-                    if link not in session_ctx.visited_links:
-                        session_ctx.to_visit.append(link)
+                result.links = get_internal_links(crawl.base_url, final_url, soup)
 
             if page_response and str(page_response.status)[0] in ("4", "5"):
-                session_ctx.last_error = f"Skipped indexing {initial_url} due to HTTP {page_response.status} response"
-                logger.info(session_ctx.last_error)
+                result.error = f"Skipped indexing {final_url} due to HTTP {page_response.status} response"
+                logger.info(result.error)
                 result.retry = True
                 return result
 
@@ -633,7 +783,7 @@ class WebConnector(LoadConnector):
             the code below can extract text from within these iframes.
             """
             logger.debug(
-                f"{index}: Length of cleaned text {len(parsed_html.cleaned_text)}"
+                f"{final_url}: Length of cleaned text {len(parsed_html.cleaned_text)}"
             )
             if JAVASCRIPT_DISABLED_MESSAGE in parsed_html.cleaned_text:
                 iframe_count = page.frame_locator("iframe").locator("html").count()
@@ -649,22 +799,18 @@ class WebConnector(LoadConnector):
                     else:
                         parsed_html.cleaned_text += "\n" + document_text
 
-            # Sometimes pages with #! will serve duplicate content
-            # There are also just other ways this can happen
-            hashed_text = hash((parsed_html.title, parsed_html.cleaned_text))
-            if hashed_text in session_ctx.content_hashes:
-                logger.info(
-                    f"{index}: Skipping duplicate title + content for {initial_url}"
-                )
-                return result
-
-            session_ctx.content_hashes.add(hashed_text)
-
+            # Sometimes pages with #! will serve duplicate content, the crawl skips
+            # pages with a content hash it has already seen
+            result.content_hash = get_content_hash(
+                parsed_html.title, parsed_html.cleaned_text
+            )
+            result.etag = page_response.header_value("ETag") if page_response else None
+            result.last_modified = last_modified
             result.doc = Document(
-                id=initial_url,
-                sections=[TextSection(link=initial_url, text=parsed_html.cleaned_text)],
+                id=final_url,
+                sections=[TextSection(link=final_url, text=parsed_html.cleaned_text)],
                 source=DocumentSource.WEB,
-                semantic_identifier=parsed_html.title or initial_url,
+                semantic_identifier=parsed_html.title or final_url,
                 metadata={},
                 doc_updated_at=(
                     _get_datetime_from_last_modified_header(last_modified)
@@ -677,81 +823,257 @@ class WebConnector(LoadConnector):
 
         return result
 
-    def load_from_state(self) -> GenerateDocumentsOutput:
-        """Traverses through all pages found on the website
-        and converts them into documents"""
+    def _do_scrape(
+        self,
+        initial_url: str,
+        crawl: CrawlSettings,
+        validators: PageValidators | None,
+    ) -> ScrapeResult:
+        """Returns a ScrapeResult object with a doc and retry flag."""
 
-        if not self.to_visit_list:
-            raise ValueError("No URLs to visit")
+        # scrolling needs a browser
+        if WEB_CONNECTOR_HTTP_FIRST and not self.scroll_before_scraping:
+            http_result = self._scrape_with_http(initial_url, crawl, validators)
+            if http_result is not None:
+                return http_result
+        else:
+            # First do a HEAD request to check content type without downloading the entire content
+            head_response = requests.head(
+                initial_url, headers=DEFAULT_HEADERS, allow_redirects=True
+            )
+            if is_pdf_content(head_response) or initial_url.lower().endswith(".pdf"):
+                response = requests.get(initial_url, headers=DEFAULT_HEADERS)
+                return self._build_pdf_result(initial_url, response)
 
-        base_url = self.to_visit_list[0]  # For the recursive case
-        check_internet_connection(base_url)  # make sure we can connect to the base url
+        return self._scrape_with_playwright(initial_url, crawl)
 
-        session_ctx = ScrapeSessionContext(base_url, self.to_visit_list)
-        session_ctx.initialize()
+    def _scrape_with_retries(
+        self, initial_url: str, crawl: CrawlSettings
+    ) -> ScrapeResult:
+        """Runs on a crawl worker thread, never raises."""
+        result = ScrapeResult(initial_url)
+        try:
+            protected_url_check(initial_url)
+        except Exception as e:
+            result.error = f"Invalid URL {initial_url} due to {e}"
+            logger.warning(result.error)
+            return result
 
-        while session_ctx.to_visit:
-            initial_url = session_ctx.to_visit.pop()
-            if initial_url in session_ctx.visited_links:
-                continue
-            session_ctx.visited_links.add(initial_url)
+        # only pages indexed by a crawl that completed successfully are fetched
+        # conditionally, everything else may not have made it into the index
+        validators = None
+        if crawl.state_store and crawl.start:
+            validators = crawl.state_store.get_validators(initial_url)
+            if validators and (
+                validators.window_end > crawl.start + POLL_CONNECTOR_OFFSET * 60
+            ):
+                validators = None
+
+        # Add retry mechanism with exponential backoff
+        retry_count = 0
+
+        while retry_count < self.MAX_RETRIES:
+            if retry_count > 0:
+                # Add a random delay between retries (exponential backoff)
+                delay = min(2**retry_count + random.uniform(0, 1), 10)
+                logger.info(
+                    f"Retry {retry_count}/{self.MAX_RETRIES} for {initial_url} after {delay:.2f}s delay"
+                )
+                time.sleep(delay)
 
             try:
-                protected_url_check(initial_url)
+                with crawl.politeness.slot(initial_url):
+                    result = self._do_scrape(initial_url, crawl, validators)
+                if result.retry:
+                    continue
             except Exception as e:
-                session_ctx.last_error = f"Invalid URL {initial_url} due to {e}"
-                logger.warning(session_ctx.last_error)
+                result = ScrapeResult(initial_url)
+                result.error = f"Failed to fetch '{initial_url}': {e}"
+                logger.exception(result.error)
+                self._get_worker_session().stop_browser()
                 continue
+            finally:
+                retry_count += 1
 
-            index = len(session_ctx.visited_links)
-            logger.info(f"{index}: Visiting {initial_url}")
+            break  # success / don't retry
 
-            # Add retry mechanism with exponential backoff
-            retry_count = 0
+        return result
 
-            while retry_count < self.MAX_RETRIES:
-                if retry_count > 0:
-                    # Add a random delay between retries (exponential backoff)
-                    delay = min(2**retry_count + random.uniform(0, 1), 10)
-                    logger.info(
-                        f"Retry {retry_count}/{self.MAX_RETRIES} for {initial_url} after {delay:.2f}s delay"
-                    )
-                    time.sleep(delay)
+    def _handle_scrape_result(
+        self,
+        session_ctx: ScrapeSessionContext,
+        initial_url: str,
+        result: ScrapeResult,
+        window_end: float | None,
+    ) -> None:
+        session_ctx.in_flight.discard(initial_url)
+        session_ctx.newly_visited.append(initial_url)
+        if result.error:
+            session_ctx.last_error = result.error
 
-                try:
-                    result = self._do_scrape(index, initial_url, session_ctx)
-                    if result.retry:
+        if result.url != initial_url:
+            if result.url in session_ctx.visited_links:
+                logger.info(
+                    f"{initial_url} redirected to {result.url} - already indexed"
+                )
+                return
+
+            logger.info(f"{initial_url} redirected to {result.url}")
+            session_ctx.visited_links.add(result.url)
+            session_ctx.newly_visited.append(result.url)
+
+        for link in result.links:
+            if link not in session_ctx.visited_links:
+                session_ctx.to_visit.append(link)
+
+        if result.unchanged:
+            session_ctx.num_unchanged += 1
+            if window_end is not None and result.validators:
+                # still in the index, the next crawl can skip it again
+                session_ctx.pending_validators[initial_url] = (
+                    result.validators.model_copy(update={"window_end": window_end})
+                )
+            return
+
+        if result.doc is None:
+            return
+
+        if result.content_hash:
+            if result.content_hash in session_ctx.content_hashes:
+                logger.info(f"Skipping duplicate title + content for {result.url}")
+                return
+            session_ctx.content_hashes.add(result.content_hash)
+            session_ctx.new_content_hashes.append(result.content_hash)
+
+        session_ctx.doc_batch.append(result.doc)
+        if window_end is not None and (result.etag or result.last_modified):
+            session_ctx.pending_validators[initial_url] = PageValidators(
+                etag=result.etag,
+                last_modified=result.last_modified,
+                window_end=window_end,
+                links=sorted(result.links),
+            )
+
+    def _save_crawl_state(
+        self, session_ctx: ScrapeSessionContext, state_store: CrawlStateStore
+    ) -> None:
+        """Called once the current batch has been handed off. Pages still being
+        scraped are kept in the frontier so they are scraped again after a restart."""
+        state_store.set_validators(session_ctx.pending_validators)
+        state_store.save(
+            to_visit=[*session_ctx.to_visit, *session_ctx.in_flight],
+            newly_visited=session_ctx.newly_visited,
+            new_content_hashes=session_ctx.new_content_hashes,
+        )
+        session_ctx.pending_validators = {}
+        session_ctx.newly_visited = []
+        session_ctx.new_content_hashes = []
+
+    def _crawl(
+        self,
+        start: SecondsSinceUnixEpoch | None = None,
+        end: SecondsSinceUnixEpoch | None = None,
+    ) -> GenerateDocumentsOutput:
+        if not self.to_visit_list:
+            raise ValueError("No URLs to visit")
+
+        base_url = self.to_visit_list[0]  # For the recursive case
+        check_internet_connection(base_url)  # make sure we can connect to the base url
+
+        session_ctx = ScrapeSessionContext(base_url, list(self.to_visit_list))
+
+        # the crawl state belongs to a single cc pair, it is only kept when running
+        # as part of an index attempt
+        index_attempt_info = INDEX_ATTEMPT_INFO_CONTEXTVAR.get()
+        state_store: CrawlStateStore | None = None
+        if end is not None and index_attempt_info is not None:
+            cc_pair_id, _ = index_attempt_info
+            state_store = CrawlStateStore(
+                crawl_id=f"{cc_pair_id}:{self.web_connector_type}:{self.base_url}",
+                window_end=end,
+            )
+            crawl_state = state_store.load()
+            if crawl_state:
+                logger.info(
+                    f"Resuming crawl of {base_url}: "
+                    f"visited={len(crawl_state.visited)} "
+                    f"to_visit={len(crawl_state.to_visit)}"
+                )
+                session_ctx.to_visit = crawl_state.to_visit
+                session_ctx.visited_links = crawl_state.visited
+                session_ctx.content_hashes = crawl_state.content_hashes
+
+        crawl = CrawlSettings(
+            base_url=base_url,
+            state_store=state_store,
+            politeness=HostPoliteness(
+                max_concurrent_requests=WEB_CONNECTOR_MAX_CONCURRENT_REQUESTS_PER_HOST,
+                min_interval=WEB_CONNECTOR_MIN_REQUEST_INTERVAL_PER_HOST,
+            ),
+            extra_headers=get_oauth_headers(),
+            start=start,
+        )
+
+        self._worker_sessions = threading.local()
+        pool: CrawlWorkerPool[ScrapeResult] = CrawlWorkerPool(
+            num_workers=self.num_workers,
+            work_fn=lambda url: self._scrape_with_retries(url, crawl),
+            thread_cleanup_fn=self._close_worker_session,
+        )
+        try:
+            while session_ctx.to_visit or pool.num_pending:
+                while session_ctx.to_visit and pool.has_capacity:
+                    initial_url = session_ctx.to_visit.pop()
+                    if initial_url in session_ctx.visited_links:
                         continue
+                    session_ctx.visited_links.add(initial_url)
+                    session_ctx.in_flight.add(initial_url)
 
-                    if result.doc:
-                        session_ctx.doc_batch.append(result.doc)
-                except Exception as e:
-                    session_ctx.last_error = f"Failed to fetch '{initial_url}': {e}"
-                    logger.exception(session_ctx.last_error)
-                    session_ctx.initialize()
-                    continue
-                finally:
-                    retry_count += 1
+                    index = len(session_ctx.visited_links)
+                    logger.info(f"{index}: Visiting {initial_url}")
+                    pool.submit(initial_url)
+
+                if not pool.num_pending:
+                    break
 
-                break  # success / don't retry
+                initial_url, result = pool.next_result()
+                self._handle_scrape_result(session_ctx, initial_url, result, end)
 
-            if len(session_ctx.doc_batch) >= self.batch_size:
-                session_ctx.initialize()
-                session_ctx.at_least_one_doc = True
-                yield session_ctx.doc_batch
-                session_ctx.doc_batch = []
+                if len(session_ctx.doc_batch) >= self.batch_size:
+                    session_ctx.at_least_one_doc = True
+                    yield session_ctx.doc_batch
+                    session_ctx.doc_batch = []
+
+                    if state_store:
+                        self._save_crawl_state(session_ctx, state_store)
+        finally:
+            pool.shutdown()
 
         if session_ctx.doc_batch:
-            session_ctx.stop()
             session_ctx.at_least_one_doc = True
             yield session_ctx.doc_batch
 
-        if not session_ctx.at_least_one_doc:
+        if state_store:
+            state_store.set_validators(session_ctx.pending_validators)
+            state_store.clear()
+
+        if not session_ctx.at_least_one_doc and not session_ctx.num_unchanged:
             if session_ctx.last_error:
                 raise RuntimeError(session_ctx.last_error)
             raise RuntimeError("No valid pages found.")
 
-        session_ctx.stop()
+    def load_from_state(self) -> GenerateDocumentsOutput:
+        """Traverses through all pages found on the website
+        and converts them into documents"""
+        yield from self._crawl()
+
+    def poll_source(
+        self, start: SecondsSinceUnixEpoch, end: SecondsSinceUnixEpoch
+    ) -> GenerateDocumentsOutput:
+        """Same as load_from_state, but pages that haven't changed since a previous
+        successful crawl indexed them are skipped, using conditional requests. A crawl
+        of the same window that was interrupted is resumed."""
+        yield from self._crawl(start=start, end=end)
 
     def validate_connector_settings(self) -> None:
         # Make sure we have at least one valid URL to check
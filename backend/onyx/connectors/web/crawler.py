@@ -0,0 +1,276 @@
+"""
+Building blocks for crawling with several concurrent page workers.
+
+- CrawlWorkerPool runs the page scraping on worker threads. Every thread keeps its own
+  resources (e.g. a Playwright browser, which can't be shared across threads) and
+  releases them itself when the pool shuts down.
+- HostPoliteness caps the number of concurrent requests and the request rate per host.
+- CrawlStateStore persists the crawl frontier in Redis, so that a crawl interrupted by
+  a worker restart resumes where it left off. It also remembers the HTTP validators
+  (ETag / Last-Modified) of every indexed page, which are used for conditional
+  requests when recrawling.
+"""
+
+import hashlib
+import queue
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from contextlib import contextmanager
+from typing import cast
+from typing import Generic
+from typing import TypeVar
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+from pydantic import ValidationError
+
+from onyx.redis.redis_pool import get_raw_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+
+logger = setup_logger()
+
+R = TypeVar("R")
+
+_REDIS_KEY_PREFIX = "web_connector_crawl"
+# an interrupted crawl is only resumed within this time
+CRAWL_FRONTIER_TTL_SECONDS = 24 * 60 * 60
+# every crawl refreshes the validators of the pages it indexed
+PAGE_VALIDATORS_TTL_SECONDS = 30 * 24 * 60 * 60
+_REDIS_WRITE_CHUNK_SIZE = 1000
+
+
+class CrawlWorkerPool(Generic[R]):
+    """Calls work_fn(url) for every submitted url on one of num_workers threads.
+    thread_cleanup_fn is called on every worker thread right before it exits."""
+
+    def __init__(
+        self,
+        num_workers: int,
+        work_fn: Callable[[str], R],
+        thread_cleanup_fn: Callable[[], None] | None = None,
+    ) -> None:
+        self.num_workers = num_workers
+        self._work_fn = work_fn
+        self._thread_cleanup_fn = thread_cleanup_fn
+
+        self._tasks: queue.Queue[str | None] = queue.Queue()
+        self._results: queue.Queue[tuple[str, R]] = queue.Queue()
+        self._num_pending = 0
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f"web-crawl-worker-{i}", daemon=True
+            )
+            for i in range(num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self) -> None:
+        try:
+            while (url := self._tasks.get()) is not None:
+                # work_fn is expected to handle its own errors
+                self._results.put((url, self._work_fn(url)))
+        finally:
+            if self._thread_cleanup_fn:
+                try:
+                    self._thread_cleanup_fn()
+                except Exception:
+                    logger.exception("Failed to clean up web crawl worker")
+
+    @property
+    def num_pending(self) -> int:
+        return self._num_pending
+
+    @property
+    def has_capacity(self) -> bool:
+        return self._num_pending < self.num_workers
+
+    def submit(self, url: str) -> None:
+        self._num_pending += 1
+        self._tasks.put(url)
+
+    def next_result(self) -> tuple[str, R]:
+        """Blocks until any submitted url is done."""
+        if self._num_pending == 0:
+            raise RuntimeError("No urls pending")
+        result = self._results.get()
+        self._num_pending -= 1
+        return result
+
+    def shutdown(self) -> None:
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class HostPoliteness:
+    """Limits how many requests run concurrently against a single host and how soon
+    after each other they may start."""
+
+    def __init__(self, max_concurrent_requests: int, min_interval: float) -> None:
+        self.max_concurrent_requests = max_concurrent_requests
+        self.min_interval = min_interval
+
+        self._lock = threading.Lock()
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._next_request_time: dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, url: str) -> Generator[None, None, None]:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.max_concurrent_requests)
+            )
+
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                request_time = max(now, self._next_request_time.get(host, now))
+                self._next_request_time[host] = request_time + self.min_interval
+            if request_time > now:
+                time.sleep(request_time - now)
+            yield
+
+
+class PageValidators(BaseModel):
+    etag: str | None = None
+    last_modified: str | None = None
+    # end of the poll window of the crawl that indexed the page
+    window_end: float
+    # links found on the page, needed to continue the crawl when it is unchanged
+    links: list[str] = []
+
+
+class CrawlState(BaseModel):
+    to_visit: list[str]
+    visited: set[str]
+    content_hashes: set[str]
+
+
+def get_content_hash(title: str | None, text: str) -> str:
+    """Stable across processes (unlike hash()), so it can be persisted."""
+    content = f"{title}\0{text}".encode("utf-8")
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class CrawlStateStore:
+    """Redis backed state of a crawl. Failures to talk to Redis are logged and
+    otherwise ignored, the crawl then simply can't be resumed / recrawled cheaply."""
+
+    def __init__(self, crawl_id: str, window_end: float) -> None:
+        self.window_end = window_end
+
+        crawl_hash = hashlib.sha256(crawl_id.encode("utf-8")).hexdigest()[:32]
+        prefix = f"{get_current_tenant_id()}:{_REDIS_KEY_PREFIX}:{crawl_hash}"
+        self._window_end_key = f"{prefix}:window_end"
+        self._to_visit_key = f"{prefix}:to_visit"
+        self._visited_key = f"{prefix}:visited"
+        self._content_hashes_key = f"{prefix}:content_hashes"
+        self._validators_key = f"{prefix}:validators"
+        self._redis = get_raw_redis_client()
+
+    @property
+    def _frontier_keys(self) -> list[str]:
+        return [
+            self._window_end_key,
+            self._to_visit_key,
+            self._visited_key,
+            self._content_hashes_key,
+        ]
+
+    def load(self) -> CrawlState | None:
+        """Returns the state of an interrupted crawl of the same poll window."""
+        try:
+            stored_window_end = cast(
+                bytes | None, self._redis.get(self._window_end_key)
+            )
+            if stored_window_end is None or float(stored_window_end) != self.window_end:
+                return None
+
+            return CrawlState(
+                to_visit=[
+                    url.decode("utf-8")
+                    for url in cast(
+                        list[bytes], self._redis.lrange(self._to_visit_key, 0, -1)
+                    )
+                ],
+                visited={
+                    url.decode("utf-8")
+                    for url in cast(set[bytes], self._redis.smembers(self._visited_key))
+                },
+                content_hashes={
+                    content_hash.decode("utf-8")
+                    for content_hash in cast(
+                        set[bytes], self._redis.smembers(self._content_hashes_key)
+                    )
+                },
+            )
+        except Exception:
+            logger.exception("Failed to load the web crawl state")
+            return None
+
+    def save(
+        self,
+        to_visit: Iterable[str],
+        newly_visited: Iterable[str],
+        new_content_hashes: Iterable[str],
+    ) -> None:
+        try:
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.set(self._window_end_key, repr(self.window_end))
+            pipe.delete(self._to_visit_key)
+            for key, values, add in (
+                (self._to_visit_key, list(to_visit), pipe.rpush),
+                (self._visited_key, list(newly_visited), pipe.sadd),
+                (self._content_hashes_key, list(new_content_hashes), pipe.sadd),
+            ):
+                for i in range(0, len(values), _REDIS_WRITE_CHUNK_SIZE):
+                    add(key, *values[i : i + _REDIS_WRITE_CHUNK_SIZE])
+            for key in self._frontier_keys:
+                pipe.expire(key, CRAWL_FRONTIER_TTL_SECONDS)
+            pipe.execute()
+        except Exception:
+            logger.exception("Failed to save the web crawl state")
+
+    def clear(self) -> None:
+        try:
+            self._redis.delete(*self._frontier_keys)
+        except Exception:
+            logger.exception("Failed to clear the web crawl state")
+
+    def get_validators(self, url: str) -> PageValidators | None:
+        try:
+            raw_validators = cast(
+                bytes | None, self._redis.hget(self._validators_key, url)
+            )
+            if raw_validators is None:
+                return None
+            return PageValidators.model_validate_json(raw_validators)
+        except ValidationError:
+            return None
+        except Exception:
+            logger.exception("Failed to load page validators")
+            return None
+
+    def set_validators(self, validators: dict[str, PageValidators]) -> None:
+        if not validators:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(
+                self._validators_key,
+                mapping={
+                    url: page_validators.model_dump_json()
+                    for url, page_validators in validators.items()
+                },
+            )
+            pipe.expire(self._validators_key, PAGE_VALIDATORS_TTL_SECONDS)
+            pipe.execute()
+        except Exception:
+            logger.exception("Failed to save page validators")
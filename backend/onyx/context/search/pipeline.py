@@ -1,9 +1,11 @@
+import json
 from collections import defaultdict
 from datetime import datetime
 from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_ENABLED
 from onyx.context.search.models import BaseFilters
 from onyx.context.search.models import ChunkIndexRequest
 from onyx.context.search.models import ChunkSearchRequest
@@ -14,7 +16,10 @@ from onyx.context.search.preprocessing.access_filters import (
     build_access_filters_for_user,
 )
 from onyx.context.search.retrieval.search_runner import search_chunks
+from onyx.context.search.semantic_cache import get_retrieval_cache
+from onyx.context.search.utils import get_query_embedding
 from onyx.context.search.utils import inference_section_from_chunks
+from onyx.db.federated import list_federated_connector_oauth_tokens
 from onyx.db.models import Persona
 from onyx.db.models import User
 from onyx.document_index.interfaces import DocumentIndex
@@ -29,9 +34,14 @@ from onyx.utils.timing import log_function_time
 from onyx.utils.variable_functionality import fetch_ee_implementation_or_noop
 from shared_configs.configs import MULTI_TENANT
 from shared_configs.contextvars import get_current_tenant_id
+from shared_configs.model_server_models import Embedding
 
 logger = setup_logger()
 
+# ACL "entry" for searches that bypass ACL filtering, so they never share cache
+# entries with regular user searches
+_NO_ACL_FILTER_CACHE_ENTRY = "__no_acl_filter__"
+
 
 @log_function_time(print_only=True)
 def _build_index_filters(
@@ -235,6 +245,93 @@ def merge_individual_chunks(
     return result
 
 
+def _retrieval_cache_context(
+    query_request: ChunkIndexRequest,
+    federated_token_ids: list[int],
+    index_name: str,
+) -> str:
+    """Everything besides the query text, tenant and ACL that affects retrieval.
+    Federated sources are searched with the user's own OAuth tokens, so those are
+    included as well. Users without any still share entries through their ACL."""
+    request_fields = query_request.model_dump(
+        mode="json", exclude={"query": True, "filters": {"access_control_list"}}
+    )
+    return json.dumps(
+        {
+            "request": request_fields,
+            "federated_token_ids": sorted(federated_token_ids),
+            "index_name": index_name,
+        },
+        sort_keys=True,
+    )
+
+
+def _cached_search_chunks(
+    query_request: ChunkIndexRequest,
+    user_id: UUID | None,
+    document_index: DocumentIndex,
+    db_session: Session,
+) -> list[InferenceChunk]:
+    """search_chunks with the retrieval cache in front of it."""
+    retrieval_cache = get_retrieval_cache()
+    tenant_id = get_current_tenant_id()
+    acl = (
+        query_request.filters.access_control_list
+        if query_request.filters.access_control_list is not None
+        else [_NO_ACL_FILTER_CACHE_ENTRY]
+    )
+    federated_token_ids = (
+        [
+            oauth_token.id
+            for oauth_token in list_federated_connector_oauth_tokens(
+                db_session, user_id
+            )
+        ]
+        if user_id
+        else []
+    )
+    context = _retrieval_cache_context(
+        query_request, federated_token_ids, document_index.index_name
+    )
+
+    # Needed for near-duplicate lookups, reused for the actual search on a miss
+    query_embedding: Embedding | None = (
+        get_query_embedding(query_request.query, db_session)
+        if retrieval_cache.similarity_enabled
+        else None
+    )
+
+    cached_chunks = retrieval_cache.get(
+        query=query_request.query,
+        tenant_id=tenant_id,
+        acl=acl,
+        context=context,
+        query_embedding=query_embedding,
+    )
+    if cached_chunks is not None:
+        # copies, so callers can't modify the cached results
+        return [chunk.model_copy() for chunk in cached_chunks]
+
+    retrieved_chunks = search_chunks(
+        query_request=query_request,
+        user_id=user_id,
+        document_index=document_index,
+        db_session=db_session,
+        query_embedding=query_embedding,
+    )
+
+    retrieval_cache.set(
+        query=query_request.query,
+        tenant_id=tenant_id,
+        acl=acl,
+        value=[chunk.model_copy() for chunk in retrieved_chunks],
+        context=context,
+        document_ids=list({chunk.document_id for chunk in retrieved_chunks}),
+        query_embedding=query_embedding,
+    )
+    return retrieved_chunks
+
+
 @log_function_time(print_only=True, debug_only=True)
 def search_pipeline(
     # Query and settings
@@ -289,14 +386,23 @@ def search_pipeline(
         filters=filters,
     )
 
-    retrieved_chunks = search_chunks(
-        query_request=query_request,
-        # Needed for federated Slack search
-        user_id=user.id if user else None,
-        document_index=document_index,
-        db_session=db_session,
-        slack_context=slack_context,
-    )
+    # Slack bot searches depend on the Slack context, those are not cached
+    if SEARCH_RESULT_CACHE_ENABLED and slack_context is None:
+        retrieved_chunks = _cached_search_chunks(
+            query_request=query_request,
+            user_id=user.id if user else None,
+            document_index=document_index,
+            db_session=db_session,
+        )
+    else:
+        retrieved_chunks = search_chunks(
+            query_request=query_request,
+            # Needed for federated Slack search
+            user_id=user.id if user else None,
+            document_index=document_index,
+            db_session=db_session,
+            slack_context=slack_context,
+        )
 
     # For some specific connectors like Salesforce, a user that has access to an object doesn't mean
     # that they have access to all of the fields of the object.
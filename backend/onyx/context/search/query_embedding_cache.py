@@ -0,0 +1,180 @@
+"""
+Cache for query embeddings.
+
+The same queries (and the same rephrased sub-queries) are embedded over and over again, each
+time costing a model server / embedding provider round trip. Embeddings are kept in a bounded
+in-process LRU and, optionally, in Redis with a TTL so all API server replicas share them.
+
+Keys include the search settings id and everything about the model that changes the vector,
+so switching to new search settings never serves embeddings from the old model. The local
+entries of a tenant are also dropped as soon as its active search settings change.
+"""
+
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+from onyx.configs.chat_configs import QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS
+from onyx.configs.chat_configs import QUERY_EMBEDDING_CACHE_SIZE
+from onyx.db.models import SearchSettings
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+_REDIS_KEY_PREFIX = "query_embedding"
+
+# tenant id, search settings id, hash of the model settings and query text
+QueryEmbeddingKey = tuple[str, int, str]
+
+
+def _hash_query(search_settings: SearchSettings, query: str) -> str:
+    hasher = hashlib.sha256()
+    for part in (
+        search_settings.provider_type.value if search_settings.provider_type else "",
+        search_settings.model_name,
+        search_settings.query_prefix or "",
+        str(search_settings.normalize),
+        str(search_settings.reduced_dimension or ""),
+    ):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    hasher.update(query.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int, redis_ttl_seconds: int = 0) -> None:
+        self.max_size = max_size
+        self.redis_ttl_seconds = redis_ttl_seconds
+
+        self._entries: OrderedDict[QueryEmbeddingKey, Embedding] = OrderedDict()
+        self._active_search_settings: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def build_key(
+        self, search_settings: SearchSettings, query: str
+    ) -> QueryEmbeddingKey:
+        return (
+            get_current_tenant_id(),
+            search_settings.id,
+            _hash_query(search_settings, query),
+        )
+
+    def observe_search_settings(self, search_settings: SearchSettings) -> None:
+        """Drops the tenant's local entries if its active search settings changed."""
+        tenant_id = get_current_tenant_id()
+        with self._lock:
+            previous_id = self._active_search_settings.get(tenant_id)
+            self._active_search_settings[tenant_id] = search_settings.id
+            if previous_id is None or previous_id == search_settings.id:
+                return
+
+            stale_keys = [key for key in self._entries if key[0] == tenant_id]
+            for key in stale_keys:
+                del self._entries[key]
+
+        logger.info(
+            f"Search settings changed from {previous_id} to {search_settings.id}, "
+            f"dropped {len(stale_keys)} cached query embeddings"
+        )
+
+    def get_many(
+        self, keys: list[QueryEmbeddingKey]
+    ) -> dict[QueryEmbeddingKey, Embedding]:
+        found: dict[QueryEmbeddingKey, Embedding] = {}
+        with self._lock:
+            for key in keys:
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = embedding
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.redis_ttl_seconds > 0:
+            from_redis = self._redis_get_many(missing)
+            if from_redis:
+                self._put_local(from_redis)
+                found.update(from_redis)
+        return found
+
+    def put_many(self, entries: dict[QueryEmbeddingKey, Embedding]) -> None:
+        if not entries:
+            return
+        self._put_local(entries)
+        if self.redis_ttl_seconds > 0:
+            self._redis_put_many(entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._active_search_settings.clear()
+
+    def _put_local(self, entries: dict[QueryEmbeddingKey, Embedding]) -> None:
+        with self._lock:
+            for key, embedding in entries.items():
+                self._entries[key] = embedding
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis_key(key: QueryEmbeddingKey) -> str:
+        # the tenant is already part of the prefix added by the tenant redis client
+        _, search_settings_id, query_hash = key
+        return f"{_REDIS_KEY_PREFIX}:{search_settings_id}:{query_hash}"
+
+    def _redis_get_many(
+        self, keys: list[QueryEmbeddingKey]
+    ) -> dict[QueryEmbeddingKey, Embedding]:
+        try:
+            values = get_redis_client().mget([self._redis_key(key) for key in keys])
+        except Exception:
+            logger.exception("Failed to read query embeddings from Redis")
+            return {}
+
+        found: dict[QueryEmbeddingKey, Embedding] = {}
+        for key, value in zip(keys, values):  # type: ignore[arg-type]
+            if value is None:
+                continue
+            vector = array("f")
+            vector.frombytes(value)
+            found[key] = vector.tolist()
+        return found
+
+    def _redis_put_many(self, entries: dict[QueryEmbeddingKey, Embedding]) -> None:
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for key, embedding in entries.items():
+                pipe.set(
+                    self._redis_key(key),
+                    array("f", embedding).tobytes(),
+                    ex=self.redis_ttl_seconds,
+                )
+            pipe.execute()
+        except Exception:
+            logger.exception("Failed to write query embeddings to Redis")
+
+
+_query_embedding_cache: QueryEmbeddingCache | None = None
+_query_embedding_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache | None:
+    """Returns the process-wide cache, or None if it is disabled."""
+    global _query_embedding_cache
+
+    if QUERY_EMBEDDING_CACHE_SIZE <= 0:
+        return None
+
+    if _query_embedding_cache is None:
+        with _query_embedding_cache_lock:
+            if _query_embedding_cache is None:
+                _query_embedding_cache = QueryEmbeddingCache(
+                    max_size=QUERY_EMBEDDING_CACHE_SIZE,
+                    redis_ttl_seconds=QUERY_EMBEDDING_CACHE_REDIS_TTL_SECONDS,
+                )
+    return _query_embedding_cache
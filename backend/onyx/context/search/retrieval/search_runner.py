@@ -431,8 +431,11 @@ def _embed_and_search(
     query_request: ChunkIndexRequest,
     document_index: DocumentIndex,
     db_session: Session,
+    query_embedding: Embedding | None = None,
 ) -> list[InferenceChunk]:
-    query_embedding = get_query_embedding(query_request.query, db_session)
+    query_embedding = query_embedding or get_query_embedding(
+        query_request.query, db_session
+    )
 
     hybrid_alpha = query_request.hybrid_alpha or HYBRID_ALPHA
 
@@ -461,6 +464,8 @@ def search_chunks(
     document_index: DocumentIndex,
     db_session: Session,
     slack_context: SlackContext | None = None,
+    # If already computed by the caller, avoids embedding the query again
+    query_embedding: Embedding | None = None,
 ) -> list[InferenceChunk]:
     run_queries: list[tuple[Callable, tuple]] = []
 
@@ -497,7 +502,10 @@ def search_chunks(
 
     if normal_search_enabled:
         run_queries.append(
-            (_embed_and_search, (query_request, document_index, db_session))
+            (
+                _embed_and_search,
+                (query_request, document_index, db_session, query_embedding),
+            )
         )
 
     parallel_search_results = run_functions_tuples_in_parallel(run_queries)
@@ -3,21 +3,35 @@ Semantic Cache for RAG Retrieval - Enterprise-grade caching with tenant isolatio
 
 Provides:
 - Query result caching with tenant+ACL keys
+- Optional near-duplicate lookups on the query embedding (cosine similarity)
+- Optional Redis-backed second level shared by all API server replicas
 - Configurable TTL and size limits
 - Cache invalidation on document updates
 - Metrics for cache hit/miss rates
 """
 
 import hashlib
-import json
+import math
 import threading
 import time
+from collections.abc import Callable
+from collections.abc import Iterable
 from dataclasses import dataclass
-from dataclasses import field
 from typing import Any
+from typing import cast
 from typing import Generic
 from typing import TypeVar
 
+from pydantic import TypeAdapter
+from redis import Redis
+
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_ENABLED
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_MAX_SIZE
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_REDIS_ENABLED
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_SIMILARITY_THRESHOLD
+from onyx.configs.chat_configs import SEARCH_RESULT_CACHE_TTL_SECONDS
+from onyx.context.search.models import InferenceChunk
+from onyx.redis.redis_pool import get_shared_redis_client
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -28,6 +42,7 @@ T = TypeVar("T")
 @dataclass
 class CacheEntry(Generic[T]):
     """A cached entry with metadata."""
+
     value: T
     created_at: float
     ttl_seconds: float
@@ -35,7 +50,11 @@ class CacheEntry(Generic[T]):
     acl_hash: str
     query_hash: str
     hit_count: int = 0
-    
+    cache_key: str = ""
+    scope_key: str = ""
+    # Unit-length query embedding, only set when near-duplicate lookups are enabled
+    embedding: list[float] | None = None
+
     def is_expired(self) -> bool:
         """Check if entry has expired."""
         return time.time() - self.created_at > self.ttl_seconds
@@ -44,17 +63,21 @@ class CacheEntry(Generic[T]):
 @dataclass
 class CacheStats:
     """Statistics for cache performance monitoring."""
+
     hits: int = 0
     misses: int = 0
     evictions: int = 0
     size: int = 0
-    
+    # Subsets of hits: served from the shared Redis tier / by a similar (not identical) query
+    l2_hits: int = 0
+    similarity_hits: int = 0
+
     @property
     def hit_rate(self) -> float:
         """Calculate cache hit rate."""
         total = self.hits + self.misses
         return self.hits / total if total > 0 else 0.0
-    
+
     def to_dict(self) -> dict[str, Any]:
         """Convert to dictionary for metrics export."""
         return {
@@ -62,32 +85,144 @@ class CacheStats:
             "misses": self.misses,
             "evictions": self.evictions,
             "size": self.size,
+            "l2_hits": self.l2_hits,
+            "similarity_hits": self.similarity_hits,
             "hit_rate": self.hit_rate,
         }
 
 
+def _normalize_embedding(embedding: list[float]) -> list[float] | None:
+    norm = math.sqrt(sum(value * value for value in embedding))
+    if norm == 0:
+        return None
+    return [value / norm for value in embedding]
+
+
+class RedisCacheTier:
+    """
+    Shared second-level cache so all API server replicas see each other's entries.
+
+    Entries are stored as serialized bytes with a TTL. For every cached entry, the
+    documents it contains are tracked in per-document sets so that document updates
+    (which usually happen in background workers, not in the serving process) can
+    delete exactly the affected entries. Processes treat a local entry whose Redis
+    copy is gone as invalidated.
+
+    Entry keys include a per-tenant generation counter, so invalidating a tenant is a
+    single INCR: the entries of older generations are never read again and expire
+    with their TTL.
+    """
+
+    def __init__(self, redis_client: Redis, key_prefix: str = "semantic_cache"):
+        self._redis = redis_client
+        self._prefix = key_prefix
+
+    def _generation_key(self, tenant_id: str) -> str:
+        return f"{self._prefix}:generation:{tenant_id}"
+
+    def _entry_key(self, cache_key: str, generation: int) -> str:
+        return f"{self._prefix}:entry:{generation}:{cache_key}"
+
+    def _doc_key(self, tenant_id: str, document_id: str) -> str:
+        return f"{self._prefix}:doc:{tenant_id}:{document_id}"
+
+    def _current_entry_key(self, cache_key: str, tenant_id: str) -> str:
+        generation = cast(
+            bytes | None, self._redis.get(self._generation_key(tenant_id))
+        )
+        return self._entry_key(cache_key, int(generation or 0))
+
+    def get(self, cache_key: str, tenant_id: str) -> bytes | None:
+        return cast(
+            bytes | None, self._redis.get(self._current_entry_key(cache_key, tenant_id))
+        )
+
+    def contains(self, cache_key: str, tenant_id: str) -> bool:
+        return bool(self._redis.exists(self._current_entry_key(cache_key, tenant_id)))
+
+    def set(
+        self,
+        cache_key: str,
+        value: bytes,
+        ttl_seconds: float,
+        tenant_id: str,
+        document_ids: Iterable[str],
+    ) -> None:
+        # an entry written under a generation that was just invalidated is never read
+        entry_key = self._current_entry_key(cache_key, tenant_id)
+        ttl = max(1, math.ceil(ttl_seconds))
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(entry_key, value, ex=ttl)
+        for document_id in document_ids:
+            doc_key = self._doc_key(tenant_id, document_id)
+            pipe.sadd(doc_key, entry_key)
+            pipe.expire(doc_key, ttl)
+        pipe.execute()
+
+    def invalidate_documents(self, document_ids: Iterable[str], tenant_id: str) -> int:
+        """Deletes all entries containing any of the documents. Returns the number of
+        entries deleted."""
+        doc_keys = [self._doc_key(tenant_id, doc_id) for doc_id in document_ids]
+        if not doc_keys:
+            return 0
+
+        pipe = self._redis.pipeline(transaction=False)
+        for doc_key in doc_keys:
+            pipe.smembers(doc_key)
+        members = pipe.execute()
+
+        entry_keys = {
+            member.decode() if isinstance(member, bytes) else member
+            for doc_members in members
+            for member in doc_members
+        }
+        deleted = cast(int, self._redis.delete(*entry_keys)) if entry_keys else 0
+        self._redis.delete(*doc_keys)
+        return deleted
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        self._redis.incr(self._generation_key(tenant_id))
+
+
 class SemanticCache(Generic[T]):
     """
     Thread-safe semantic cache with tenant and ACL isolation.
-    
+
     Cache keys are derived from:
     - Query text (hashed)
     - Tenant ID
     - User ACL (hashed)
     - Optional additional context
-    
+
     This ensures that:
     1. Different tenants never share cache entries
     2. Users with different ACLs get different results
     3. Queries are efficiently deduplicated
+
+    If a similarity threshold is set, a query that misses exactly can still be served
+    by a cached query in the same tenant/ACL/context scope whose embedding has a
+    cosine similarity of at least the threshold.
+
+    If a Redis tier is given, entries are written through to it (serialized with
+    `serializer`), local misses fall back to it, and local hits are only served while
+    the Redis copy still exists, so invalidations from other processes are honored.
     """
-    
+
     def __init__(
         self,
         max_size: int = 10000,
         default_ttl_seconds: float = 300.0,  # 5 minutes
         cleanup_interval_seconds: float = 60.0,
+        similarity_threshold: float | None = None,
+        l2: RedisCacheTier | None = None,
+        serializer: Callable[[T], bytes] | None = None,
+        deserializer: Callable[[bytes], T] | None = None,
     ):
+        if l2 is not None and (serializer is None or deserializer is None):
+            raise ValueError(
+                "A serializer and deserializer are required for the L2 tier"
+            )
+
         self._cache: dict[str, CacheEntry[T]] = {}
         self._lock = threading.RLock()
         self._max_size = max_size
@@ -95,21 +230,44 @@ class SemanticCache(Generic[T]):
         self._cleanup_interval = cleanup_interval_seconds
         self._last_cleanup = time.time()
         self._stats = CacheStats()
-        
+        self._similarity_threshold = similarity_threshold
+        self._l2 = l2
+        self._serializer = serializer
+        self._deserializer = deserializer
+
+        # Maps scope key (tenant + ACL + context) -> cache keys, for similarity lookups
+        self._scope_to_keys: dict[str, set[str]] = {}
+
         # Document invalidation tracking
         # Maps document_id -> set of cache keys that depend on it
         self._doc_to_keys: dict[str, set[str]] = {}
-    
+
     def _hash_query(self, query: str) -> str:
         """Create a hash of the query for cache key."""
         return hashlib.sha256(query.lower().strip().encode()).hexdigest()[:32]
-    
+
     def _hash_acl(self, acl: list[str]) -> str:
         """Create a hash of the ACL for cache key."""
         sorted_acl = sorted(set(acl))
         acl_str = "|".join(sorted_acl)
         return hashlib.sha256(acl_str.encode()).hexdigest()[:16]
-    
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self._similarity_threshold is not None
+
+    def _make_scope_key(
+        self,
+        tenant_id: str,
+        acl: list[str],
+        context: str | None = None,
+    ) -> str:
+        """Entries in the same scope may be served for each other's (similar) queries."""
+        key_parts = [tenant_id, self._hash_acl(acl)]
+        if context:
+            key_parts.append(hashlib.sha256(context.encode()).hexdigest()[:8])
+        return ":".join(key_parts)
+
     def _make_cache_key(
         self,
         query: str,
@@ -119,113 +277,246 @@ class SemanticCache(Generic[T]):
     ) -> str:
         """
         Create a cache key from query, tenant, and ACL.
-        
+
         The key structure ensures tenant and ACL isolation.
         """
         query_hash = self._hash_query(query)
         acl_hash = self._hash_acl(acl)
-        
+
         key_parts = [tenant_id, query_hash, acl_hash]
         if context:
             key_parts.append(hashlib.sha256(context.encode()).hexdigest()[:8])
-        
+
         return ":".join(key_parts)
-    
+
     def _maybe_cleanup(self) -> None:
         """Run cleanup if enough time has passed."""
         now = time.time()
         if now - self._last_cleanup < self._cleanup_interval:
             return
-        
+
         self._last_cleanup = now
         self._cleanup_expired()
-    
+
     def _cleanup_expired(self) -> None:
         """Remove expired entries from cache."""
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if entry.is_expired()
-        ]
-        
+        expired_keys = [key for key, entry in self._cache.items() if entry.is_expired()]
+
         for key in expired_keys:
             self._remove_entry(key)
             self._stats.evictions += 1
-        
+
         if expired_keys:
-            logger.debug(f"Semantic cache cleanup: removed {len(expired_keys)} expired entries")
-    
+            logger.debug(
+                f"Semantic cache cleanup: removed {len(expired_keys)} expired entries"
+            )
+
     def _remove_entry(self, key: str) -> None:
         """Remove an entry and clean up document tracking."""
         if key in self._cache:
-            del self._cache[key]
+            entry = self._cache.pop(key)
             self._stats.size = len(self._cache)
-            
+
+            scope_keys = self._scope_to_keys.get(entry.scope_key)
+            if scope_keys is not None:
+                scope_keys.discard(key)
+                if not scope_keys:
+                    del self._scope_to_keys[entry.scope_key]
+
             # Clean up document tracking
             for doc_keys in self._doc_to_keys.values():
                 doc_keys.discard(key)
-    
+
     def _evict_lru(self) -> None:
         """Evict least recently used entries if cache is full."""
         if len(self._cache) < self._max_size:
             return
-        
+
         # Sort by hit count and creation time (LRU-ish)
         sorted_entries = sorted(
             self._cache.items(),
             key=lambda x: (x[1].hit_count, x[1].created_at),
         )
-        
+
         # Remove bottom 10%
         num_to_remove = max(1, len(sorted_entries) // 10)
         for key, _ in sorted_entries[:num_to_remove]:
             self._remove_entry(key)
             self._stats.evictions += 1
-    
+
+    def _find_similar_entry(
+        self, scope_key: str, embedding: list[float]
+    ) -> CacheEntry[T] | None:
+        """Best non-expired entry in the scope above the similarity threshold."""
+        if self._similarity_threshold is None:
+            return None
+
+        best_entry: CacheEntry[T] | None = None
+        best_score = self._similarity_threshold
+        for key in self._scope_to_keys.get(scope_key, set()):
+            entry = self._cache.get(key)
+            if entry is None or entry.embedding is None or entry.is_expired():
+                continue
+            if len(entry.embedding) != len(embedding):
+                continue
+
+            score = sum(a * b for a, b in zip(entry.embedding, embedding))
+            if score >= best_score:
+                best_entry = entry
+                best_score = score
+        return best_entry
+
+    def _l2_contains(self, key: str, tenant_id: str) -> bool:
+        assert self._l2 is not None
+        try:
+            return self._l2.contains(key, tenant_id)
+        except Exception:
+            logger.exception("Semantic cache L2 lookup failed")
+            # without the shared tier we can't tell if the entry was invalidated
+            return False
+
+    def _l2_get(self, key: str, tenant_id: str) -> T | None:
+        assert self._l2 is not None and self._deserializer is not None
+        try:
+            data = self._l2.get(key, tenant_id)
+            return self._deserializer(data) if data is not None else None
+        except Exception:
+            logger.exception("Semantic cache L2 lookup failed")
+            return None
+
+    def _store_local(
+        self,
+        key: str,
+        scope_key: str,
+        value: T,
+        ttl: float,
+        tenant_id: str,
+        acl_hash: str,
+        query_hash: str,
+        embedding: list[float] | None,
+        document_ids: list[str] | None,
+    ) -> None:
+        """Must be called with the lock held."""
+        self._evict_lru()
+
+        if key in self._cache:
+            self._remove_entry(key)
+
+        entry = CacheEntry(
+            value=value,
+            created_at=time.time(),
+            ttl_seconds=ttl,
+            tenant_id=tenant_id,
+            acl_hash=acl_hash,
+            query_hash=query_hash,
+            cache_key=key,
+            scope_key=scope_key,
+            embedding=embedding,
+        )
+
+        self._cache[key] = entry
+        self._scope_to_keys.setdefault(scope_key, set()).add(key)
+        self._stats.size = len(self._cache)
+
+        # Track document dependencies for invalidation
+        if document_ids:
+            for doc_id in document_ids:
+                if doc_id not in self._doc_to_keys:
+                    self._doc_to_keys[doc_id] = set()
+                self._doc_to_keys[doc_id].add(key)
+
     def get(
         self,
         query: str,
         tenant_id: str,
         acl: list[str],
         context: str | None = None,
+        query_embedding: list[float] | None = None,
     ) -> T | None:
         """
         Get a cached result if available.
-        
+
         Args:
             query: The search query
             tenant_id: The tenant ID (required for isolation)
             acl: User's ACL entries (required for isolation)
             context: Optional additional context for key
-            
+            query_embedding: Optional query embedding for near-duplicate lookups
+
         Returns:
             Cached value if hit, None if miss
         """
         key = self._make_cache_key(query, tenant_id, acl, context)
-        
+
         with self._lock:
             self._maybe_cleanup()
-            
+
             entry = self._cache.get(key)
-            if entry is None:
-                self._stats.misses += 1
-                return None
-            
-            if entry.is_expired():
+            if entry is not None and entry.is_expired():
                 self._remove_entry(key)
-                self._stats.misses += 1
-                return None
-            
-            # Cache hit
-            entry.hit_count += 1
-            self._stats.hits += 1
-            
+                entry = None
+
+            is_similarity_hit = False
+            if entry is None and query_embedding is not None:
+                normalized = _normalize_embedding(query_embedding)
+                if normalized is not None:
+                    entry = self._find_similar_entry(
+                        self._make_scope_key(tenant_id, acl, context), normalized
+                    )
+                    is_similarity_hit = entry is not None
+
+        # Entries may have been invalidated by another process through the shared tier
+        if (
+            entry is not None
+            and self._l2 is not None
+            and not self._l2_contains(entry.cache_key, entry.tenant_id)
+        ):
+            with self._lock:
+                self._remove_entry(entry.cache_key)
+            entry = None
+            is_similarity_hit = False
+
+        if entry is not None:
+            with self._lock:
+                # Cache hit
+                entry.hit_count += 1
+                self._stats.hits += 1
+                if is_similarity_hit:
+                    self._stats.similarity_hits += 1
+
             logger.debug(
                 f"Semantic cache hit: tenant={tenant_id} "
-                f"query_hash={entry.query_hash[:8]} hits={entry.hit_count}"
+                f"query_hash={entry.query_hash[:8]} hits={entry.hit_count} "
+                f"similar={is_similarity_hit}"
             )
-            
+
             return entry.value
-    
+
+        if self._l2 is not None:
+            value = self._l2_get(key, tenant_id)
+            if value is not None:
+                with self._lock:
+                    self._stats.hits += 1
+                    self._stats.l2_hits += 1
+                    # Local copy without embedding/doc tracking: the shared tier
+                    # remains the source of truth for invalidation
+                    self._store_local(
+                        key=key,
+                        scope_key=self._make_scope_key(tenant_id, acl, context),
+                        value=value,
+                        ttl=self._default_ttl,
+                        tenant_id=tenant_id,
+                        acl_hash=self._hash_acl(acl),
+                        query_hash=self._hash_query(query),
+                        embedding=None,
+                        document_ids=None,
+                    )
+                return value
+
+        with self._lock:
+            self._stats.misses += 1
+        return None
+
     def set(
         self,
         query: str,
@@ -235,10 +526,11 @@ class SemanticCache(Generic[T]):
         ttl_seconds: float | None = None,
         context: str | None = None,
         document_ids: list[str] | None = None,
+        query_embedding: list[float] | None = None,
     ) -> None:
         """
         Cache a result.
-        
+
         Args:
             query: The search query
             tenant_id: The tenant ID
@@ -247,48 +539,58 @@ class SemanticCache(Generic[T]):
             ttl_seconds: Optional custom TTL
             context: Optional additional context
             document_ids: Document IDs in the result (for invalidation)
+            query_embedding: Query embedding, enables near-duplicate lookups for this entry
         """
         key = self._make_cache_key(query, tenant_id, acl, context)
         ttl = ttl_seconds if ttl_seconds is not None else self._default_ttl
-        
+        embedding = (
+            _normalize_embedding(query_embedding)
+            if query_embedding is not None and self.similarity_enabled
+            else None
+        )
+
         with self._lock:
-            self._evict_lru()
-            
-            entry = CacheEntry(
+            self._store_local(
+                key=key,
+                scope_key=self._make_scope_key(tenant_id, acl, context),
                 value=value,
-                created_at=time.time(),
-                ttl_seconds=ttl,
+                ttl=ttl,
                 tenant_id=tenant_id,
                 acl_hash=self._hash_acl(acl),
                 query_hash=self._hash_query(query),
+                embedding=embedding,
+                document_ids=document_ids,
             )
-            
-            self._cache[key] = entry
-            self._stats.size = len(self._cache)
-            
-            # Track document dependencies for invalidation
-            if document_ids:
-                for doc_id in document_ids:
-                    if doc_id not in self._doc_to_keys:
-                        self._doc_to_keys[doc_id] = set()
-                    self._doc_to_keys[doc_id].add(key)
-    
+
+        if self._l2 is not None:
+            assert self._serializer is not None
+            try:
+                self._l2.set(
+                    key,
+                    self._serializer(value),
+                    ttl_seconds=ttl,
+                    tenant_id=tenant_id,
+                    document_ids=document_ids or [],
+                )
+            except Exception:
+                logger.exception("Semantic cache L2 write failed")
+
     def invalidate_document(self, document_id: str, tenant_id: str) -> int:
         """
         Invalidate all cache entries that include a specific document.
-        
+
         Should be called when a document is updated or deleted.
-        
+
         Args:
             document_id: The document that was changed
             tenant_id: The tenant ID (for logging/verification)
-            
+
         Returns:
             Number of entries invalidated
         """
         with self._lock:
             keys_to_remove = self._doc_to_keys.get(document_id, set()).copy()
-            
+
             count = 0
             for key in keys_to_remove:
                 if key in self._cache:
@@ -296,49 +598,100 @@ class SemanticCache(Generic[T]):
                     if self._cache[key].tenant_id == tenant_id:
                         self._remove_entry(key)
                         count += 1
-            
+
             # Clean up document tracking
             if document_id in self._doc_to_keys:
                 del self._doc_to_keys[document_id]
-            
-            if count > 0:
-                logger.info(
-                    f"Invalidated {count} cache entries for document "
-                    f"{document_id} in tenant {tenant_id}"
-                )
-            
-            return count
-    
+
+        if self._l2 is not None:
+            try:
+                count += self._l2.invalidate_documents([document_id], tenant_id)
+            except Exception:
+                logger.exception("Semantic cache L2 invalidation failed")
+
+        if count > 0:
+            logger.info(
+                f"Invalidated {count} cache entries for document "
+                f"{document_id} in tenant {tenant_id}"
+            )
+
+        return count
+
+    def invalidate_documents(self, document_ids: list[str], tenant_id: str) -> int:
+        """
+        Invalidate all cache entries that include any of the documents.
+
+        Batched variant of `invalidate_document` for the indexing/sync paths.
+
+        Returns:
+            Number of entries invalidated
+        """
+        if not document_ids:
+            return 0
+
+        count = 0
+        with self._lock:
+            for document_id in document_ids:
+                for key in self._doc_to_keys.pop(document_id, set()):
+                    entry = self._cache.get(key)
+                    if entry is not None and entry.tenant_id == tenant_id:
+                        self._remove_entry(key)
+                        count += 1
+
+        if self._l2 is not None:
+            try:
+                count += self._l2.invalidate_documents(document_ids, tenant_id)
+            except Exception:
+                logger.exception("Semantic cache L2 invalidation failed")
+
+        if count > 0:
+            logger.info(
+                f"Invalidated {count} cache entries for {len(document_ids)} "
+                f"documents in tenant {tenant_id}"
+            )
+
+        return count
+
     def invalidate_tenant(self, tenant_id: str) -> int:
         """
         Invalidate all cache entries for a tenant.
-        
+
         Useful for bulk operations or tenant-wide reindex.
-        
+
         Returns:
             Number of entries invalidated
         """
         with self._lock:
             keys_to_remove = [
-                key for key, entry in self._cache.items()
+                key
+                for key, entry in self._cache.items()
                 if entry.tenant_id == tenant_id
             ]
-            
+
             for key in keys_to_remove:
                 self._remove_entry(key)
-            
-            logger.info(f"Invalidated {len(keys_to_remove)} cache entries for tenant {tenant_id}")
-            
-            return len(keys_to_remove)
-    
+
+        count = len(keys_to_remove)
+        if self._l2 is not None:
+            try:
+                # entries only cached in Redis are not counted
+                self._l2.invalidate_tenant(tenant_id)
+            except Exception:
+                logger.exception("Semantic cache L2 invalidation failed")
+
+        logger.info(f"Invalidated {count} cache entries for tenant {tenant_id}")
+
+        return count
+
     def clear(self) -> None:
         """Clear all cache entries."""
         with self._lock:
             self._cache.clear()
             self._doc_to_keys.clear()
+            self._scope_to_keys.clear()
             self._stats = CacheStats()
             logger.info("Semantic cache cleared")
-    
+
     def get_stats(self) -> CacheStats:
         """Get cache statistics."""
         with self._lock:
@@ -347,21 +700,36 @@ class SemanticCache(Generic[T]):
                 misses=self._stats.misses,
                 evictions=self._stats.evictions,
                 size=len(self._cache),
+                l2_hits=self._stats.l2_hits,
+                similarity_hits=self._stats.similarity_hits,
             )
 
 
 # Global cache instance for retrieval results
-_retrieval_cache: SemanticCache | None = None
+_retrieval_cache: SemanticCache[list[InferenceChunk]] | None = None
+_retrieval_cache_lock = threading.Lock()
+_inference_chunks_adapter = TypeAdapter(list[InferenceChunk])
 
 
-def get_retrieval_cache() -> SemanticCache:
+def get_retrieval_cache() -> SemanticCache[list[InferenceChunk]]:
     """Get the global retrieval cache instance."""
     global _retrieval_cache
     if _retrieval_cache is None:
-        _retrieval_cache = SemanticCache(
-            max_size=10000,
-            default_ttl_seconds=300.0,
-        )
+        with _retrieval_cache_lock:
+            if _retrieval_cache is None:
+                l2 = (
+                    RedisCacheTier(get_shared_redis_client())
+                    if SEARCH_RESULT_CACHE_ENABLED and SEARCH_RESULT_CACHE_REDIS_ENABLED
+                    else None
+                )
+                _retrieval_cache = SemanticCache(
+                    max_size=SEARCH_RESULT_CACHE_MAX_SIZE,
+                    default_ttl_seconds=SEARCH_RESULT_CACHE_TTL_SECONDS,
+                    similarity_threshold=SEARCH_RESULT_CACHE_SIMILARITY_THRESHOLD,
+                    l2=l2,
+                    serializer=_inference_chunks_adapter.dump_json,
+                    deserializer=_inference_chunks_adapter.validate_json,
+                )
     return _retrieval_cache
 
 
@@ -369,3 +737,28 @@ def invalidate_document_cache(document_id: str, tenant_id: str) -> None:
     """Invalidate cache entries for a document (call on document update/delete)."""
     cache = get_retrieval_cache()
     cache.invalidate_document(document_id, tenant_id)
+
+
+def invalidate_documents_cache(document_ids: list[str], tenant_id: str) -> None:
+    """Batched `invalidate_document_cache`. Never raises, a failed invalidation must not
+    fail the indexing/sync operation that triggered it."""
+    if not SEARCH_RESULT_CACHE_ENABLED or not document_ids:
+        return
+
+    try:
+        get_retrieval_cache().invalidate_documents(document_ids, tenant_id)
+    except Exception:
+        logger.exception("Failed to invalidate the retrieval cache")
+
+
+def invalidate_tenant_cache(tenant_id: str) -> None:
+    """Invalidates every cached result of the tenant, e.g. once new documents are
+    indexed, since they may belong in any of them. Never raises, like
+    `invalidate_documents_cache`."""
+    if not SEARCH_RESULT_CACHE_ENABLED:
+        return
+
+    try:
+        get_retrieval_cache().invalidate_tenant(tenant_id)
+    except Exception:
+        logger.exception("Failed to invalidate the retrieval cache")
@@ -10,7 +10,9 @@ from onyx.context.search.models import InferenceSection
 from onyx.context.search.models import SavedSearchDoc
 from onyx.context.search.models import SavedSearchDocWithContent
 from onyx.context.search.models import SearchDoc
+from onyx.context.search.query_embedding_cache import get_query_embedding_cache
 from onyx.db.models import SearchDoc as DBSearchDoc
+from onyx.db.models import SearchSettings
 from onyx.db.search_settings import get_current_search_settings
 from onyx.natural_language_processing.search_nlp_models import EmbeddingModel
 from onyx.utils.logger import setup_logger
@@ -148,9 +150,9 @@ def remove_stop_words_and_punctuation(keywords: list[str]) -> list[str]:
         return keywords
 
 
-def get_query_embeddings(queries: list[str], db_session: Session) -> list[Embedding]:
-    search_settings = get_current_search_settings(db_session)
-
+def _encode_queries(
+    queries: list[str], search_settings: SearchSettings
+) -> list[Embedding]:
     model = EmbeddingModel.from_db_model(
         search_settings=search_settings,
         # The below are globally set, this flow always uses the indexing one
@@ -158,8 +160,35 @@ def get_query_embeddings(queries: list[str], db_session: Session) -> list[Embedd
         server_port=MODEL_SERVER_PORT,
     )
 
-    query_embedding = model.encode(queries, text_type=EmbedTextType.QUERY)
-    return query_embedding
+    return list(model.encode(queries, text_type=EmbedTextType.QUERY))
+
+
+def get_query_embeddings(queries: list[str], db_session: Session) -> list[Embedding]:
+    search_settings = get_current_search_settings(db_session)
+
+    cache = get_query_embedding_cache()
+    if cache is None:
+        return _encode_queries(queries, search_settings)
+
+    cache.observe_search_settings(search_settings)
+    keys = [cache.build_key(search_settings, query) for query in queries]
+    embeddings = cache.get_many(keys)
+
+    query_by_key = dict(zip(keys, queries))
+    missing_keys = [key for key in query_by_key if key not in embeddings]
+    if missing_keys:
+        new_embeddings = dict(
+            zip(
+                missing_keys,
+                _encode_queries(
+                    [query_by_key[key] for key in missing_keys], search_settings
+                ),
+            )
+        )
+        cache.put_many(new_embeddings)
+        embeddings.update(new_embeddings)
+
+    return [embeddings[key] for key in keys]
 
 
 @log_function_time(print_only=True, debug_only=True)
@@ -8,12 +8,16 @@ from fastapi import HTTPException
 from sqlalchemy import delete
 from sqlalchemy import desc
 from sqlalchemy import func
+from sqlalchemy import Integer
+from sqlalchemy import literal
 from sqlalchemy import nullsfirst
 from sqlalchemy import or_
 from sqlalchemy import Row
+from sqlalchemy import Select
 from sqlalchemy import select
 from sqlalchemy import update
 from sqlalchemy.exc import MultipleResultsFound
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm import Session
 
@@ -581,6 +585,53 @@ def get_chat_messages_by_session(
     return list(result)
 
 
+def get_mainline_chat_messages(
+    chat_session_id: UUID,
+    db_session: Session,
+    start_message_id: int | None = None,
+    stop_at_message_id: int | None = None,
+    prefetch_top_two_level_tool_calls: bool = True,
+) -> list[ChatMessage]:
+    """Follows the latest children from the root message (or from `start_message_id`)
+    in a recursive CTE, so abandoned branches and their tool calls are never loaded.
+    The first message returned is the root / start message."""
+    anchor: Select[tuple[int, int | None, int]] = select(
+        ChatMessage.id,
+        ChatMessage.latest_child_message_id,
+        literal(0, Integer).label("depth"),
+    ).where(ChatMessage.chat_session_id == chat_session_id)
+    if start_message_id is None:
+        anchor = anchor.where(ChatMessage.parent_message_id.is_(None))
+    else:
+        anchor = anchor.where(ChatMessage.id == start_message_id)
+    mainline = anchor.cte("mainline", recursive=True)
+
+    child = aliased(ChatMessage)
+    children = select(
+        child.id,
+        child.latest_child_message_id,
+        mainline.c.depth + 1,
+    ).join(mainline, child.id == mainline.c.latest_child_message_id)
+    if stop_at_message_id is not None:
+        children = children.where(mainline.c.id != stop_at_message_id)
+    mainline = mainline.union_all(children)
+
+    stmt = (
+        select(ChatMessage)
+        .join(mainline, ChatMessage.id == mainline.c.id)
+        .order_by(mainline.c.depth)
+    )
+    if prefetch_top_two_level_tool_calls:
+        stmt = stmt.options(
+            selectinload(ChatMessage.tool_calls).selectinload(
+                ToolCall.tool_call_children
+            )
+        )
+        return list(db_session.scalars(stmt).unique().all())
+
+    return list(db_session.scalars(stmt).all())
+
+
 def get_or_create_root_message(
     chat_session_id: UUID,
     db_session: Session,
@@ -1,20 +1,56 @@
+import base64
+import binascii
+from datetime import datetime
 from typing import List
 from typing import Optional
 from typing import Tuple
 from uuid import UUID
 
+from pydantic import BaseModel
+from pydantic import ValidationError
+from sqlalchemy import cast
 from sqlalchemy import column
 from sqlalchemy import desc
 from sqlalchemy import func
+from sqlalchemy import literal
 from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy import union_all
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import ColumnClause
+from sqlalchemy.sql.expression import ColumnElement
 
 from onyx.db.models import ChatMessage
 from onyx.db.models import ChatSession
 
 
+class ChatSearchCursor(BaseModel):
+    """Position after the last session of a page. Sessions are ordered by
+    (time_created, id) descending, search results by relevance first."""
+
+    time_created: datetime
+    id: UUID
+    rank: float | None = None
+
+
+def encode_chat_search_cursor(cursor: ChatSearchCursor) -> str:
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode("utf-8")).decode(
+        "ascii"
+    )
+
+
+def decode_chat_search_cursor(raw_cursor: str) -> ChatSearchCursor:
+    """Raises ValueError if the cursor is malformed"""
+    try:
+        return ChatSearchCursor.model_validate_json(
+            base64.urlsafe_b64decode(raw_cursor.encode("ascii"))
+        )
+    except (binascii.Error, UnicodeError, ValidationError) as e:
+        raise ValueError(f"Invalid chat search cursor: {raw_cursor}") from e
+
+
 def search_chat_sessions(
     user_id: UUID | None,
     db_session: Session,
@@ -23,89 +59,143 @@ def search_chat_sessions(
     page_size: int = 10,
     include_deleted: bool = False,
     include_onyxbot_flows: bool = False,
-) -> Tuple[List[ChatSession], bool]:
+    cursor: str | None = None,
+) -> Tuple[List[ChatSession], bool, str | None]:
     """
     Fast full-text search on ChatSession + ChatMessage using tsvectors.
 
     If no query is provided, returns the most recent chat sessions.
-    Otherwise, searches both chat messages and session descriptions.
+    Otherwise, searches both chat messages and session descriptions and returns the
+    best matches first.
 
-    Returns a tuple of (sessions, has_more) where has_more indicates if
+    Pages are fetched with keyset pagination: pass the returned cursor to get the next
+    page. Without a cursor, the (slower for deep pages) page number is used instead.
+
+    Returns a tuple of (sessions, has_more, next_cursor) where has_more indicates if
     there are additional results beyond the requested page.
     """
-    offset_val = (page - 1) * page_size
+    decoded_cursor = decode_chat_search_cursor(cursor) if cursor else None
+    # deep pages are slow with an offset, it is only used by clients without a cursor
+    offset_val = 0 if decoded_cursor else (page - 1) * page_size
+
+    base_conditions = []
+    if user_id is not None:
+        base_conditions.append(ChatSession.user_id == user_id)
+    if not include_onyxbot_flows:
+        base_conditions.append(ChatSession.onyxbot_flow.is_(False))
+    if not include_deleted:
+        base_conditions.append(ChatSession.deleted.is_(False))
 
     # If no query, just return the most recent sessions
     if not query or not query.strip():
         stmt = (
             select(ChatSession)
-            .order_by(desc(ChatSession.time_created))
-            .offset(offset_val)
+            .where(*base_conditions)
+            .order_by(desc(ChatSession.time_created), desc(ChatSession.id))
             .limit(page_size + 1)
         )
-        if user_id is not None:
-            stmt = stmt.where(ChatSession.user_id == user_id)
-        if not include_onyxbot_flows:
-            stmt = stmt.where(ChatSession.onyxbot_flow.is_(False))
-        if not include_deleted:
-            stmt = stmt.where(ChatSession.deleted.is_(False))
+        if offset_val:
+            stmt = stmt.offset(offset_val)
+        if decoded_cursor:
+            stmt = stmt.where(
+                tuple_(ChatSession.time_created, ChatSession.id)
+                < tuple_(
+                    literal(decoded_cursor.time_created), literal(decoded_cursor.id)
+                )
+            )
 
         result = db_session.execute(stmt.options(joinedload(ChatSession.persona)))
-        sessions = result.scalars().all()
+        sessions = list(result.scalars().all())
 
         has_more = len(sessions) > page_size
-        if has_more:
-            sessions = sessions[:page_size]
+        if not has_more:
+            return sessions, False, None
 
-        return list(sessions), has_more
+        sessions = sessions[:page_size]
+        next_cursor = ChatSearchCursor(
+            time_created=sessions[-1].time_created, id=sessions[-1].id
+        )
+        return sessions, True, encode_chat_search_cursor(next_cursor)
 
     # Otherwise, proceed with full-text search
     query = query.strip()
 
-    base_conditions = []
-    if user_id is not None:
-        base_conditions.append(ChatSession.user_id == user_id)
-    if not include_onyxbot_flows:
-        base_conditions.append(ChatSession.onyxbot_flow.is_(False))
-    if not include_deleted:
-        base_conditions.append(ChatSession.deleted.is_(False))
-
     message_tsv: ColumnClause = column("message_tsv")
     description_tsv: ColumnClause = column("description_tsv")
 
     ts_query = func.plainto_tsquery("english", query)
 
-    description_session_ids = (
-        select(ChatSession.id)
+    # ts_rank returns a real, which doesn't survive the round trip through the
+    # cursor (a python float) exactly. As a double the cursor compares equal to the
+    # rank of the last session, so sessions sharing its rank aren't skipped.
+    def _rank(tsv: ColumnClause) -> ColumnElement[float]:
+        return cast(func.ts_rank(tsv, ts_query), DOUBLE_PRECISION)
+
+    description_matches = (
+        select(
+            ChatSession.id.label("id"),
+            _rank(description_tsv).label("rank"),
+        )
         .where(*base_conditions)
         .where(description_tsv.op("@@")(ts_query))
     )
 
-    message_session_ids = (
-        select(ChatMessage.chat_session_id)
+    message_matches = (
+        select(
+            ChatMessage.chat_session_id.label("id"),
+            _rank(message_tsv).label("rank"),
+        )
         .join(ChatSession, ChatMessage.chat_session_id == ChatSession.id)
         .where(*base_conditions)
         .where(message_tsv.op("@@")(ts_query))
     )
 
-    combined_ids = description_session_ids.union(message_session_ids).alias(
-        "combined_ids"
+    all_matches = union_all(description_matches, message_matches).subquery(
+        "all_matches"
+    )
+    # a session is as relevant as its best matching message / description
+    ranked_ids = (
+        select(
+            all_matches.c.id,
+            func.max(all_matches.c.rank).label("rank"),
+        )
+        .group_by(all_matches.c.id)
+        .subquery("ranked_ids")
     )
 
     final_stmt = (
-        select(ChatSession)
-        .join(combined_ids, ChatSession.id == combined_ids.c.id)
-        .order_by(desc(ChatSession.time_created))
-        .distinct()
-        .offset(offset_val)
+        select(ChatSession, ranked_ids.c.rank)
+        .join(ranked_ids, ChatSession.id == ranked_ids.c.id)
+        .order_by(
+            desc(ranked_ids.c.rank),
+            desc(ChatSession.time_created),
+            desc(ChatSession.id),
+        )
         .limit(page_size + 1)
         .options(joinedload(ChatSession.persona))
     )
+    if offset_val:
+        final_stmt = final_stmt.offset(offset_val)
+    if decoded_cursor:
+        final_stmt = final_stmt.where(
+            tuple_(ranked_ids.c.rank, ChatSession.time_created, ChatSession.id)
+            < tuple_(
+                literal(decoded_cursor.rank or 0.0, DOUBLE_PRECISION),
+                literal(decoded_cursor.time_created),
+                literal(decoded_cursor.id),
+            )
+        )
 
-    session_objs = db_session.execute(final_stmt).scalars().all()
+    rows = db_session.execute(final_stmt).all()
 
-    has_more = len(session_objs) > page_size
-    if has_more:
-        session_objs = session_objs[:page_size]
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    session_objs = [row[0] for row in rows]
+    if not has_more:
+        return session_objs, False, None
 
-    return list(session_objs), has_more
+    last_session, last_rank = rows[-1]
+    next_cursor = ChatSearchCursor(
+        time_created=last_session.time_created, id=last_session.id, rank=last_rank
+    )
+    return session_objs, True, encode_chat_search_cursor(next_cursor)
@@ -216,6 +216,26 @@ def get_documents_for_connector_credential_pair(
     return db_session.scalars(stmt).all()
 
 
+def iterate_document_ids_for_connector_credential_pair(
+    db_session: Session,
+    connector_id: int,
+    credential_id: int,
+    batch_size: int = 10_000,
+) -> Generator[str, None, None]:
+    """Streams the ids of all documents of the cc pair with a server side cursor,
+    sorted by their code points (which is also how python sorts strings)."""
+    stmt = (
+        select(DocumentByConnectorCredentialPair.id)
+        .where(
+            DocumentByConnectorCredentialPair.connector_id == connector_id,
+            DocumentByConnectorCredentialPair.credential_id == credential_id,
+        )
+        .order_by(DocumentByConnectorCredentialPair.id.collate("C"))
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db_session.scalars(stmt)
+
+
 def get_documents_by_ids(
     db_session: Session,
     document_ids: list[str],
@@ -460,6 +480,8 @@ def upsert_documents(
             "external_user_emails": insert_stmt.excluded.external_user_emails,
             "external_user_group_ids": insert_stmt.excluded.external_user_group_ids,
             "is_public": insert_stmt.excluded.is_public,
+            # the permissions above may have changed outside of permission sync
+            "external_access_digest": None,
             "doc_metadata": insert_stmt.excluded.doc_metadata,
         },
     )
@@ -579,6 +601,19 @@ def mark_document_as_synced(document_id: str, db_session: Session) -> None:
     db_session.commit()
 
 
+def mark_documents_as_synced(document_ids: list[str], db_session: Session) -> None:
+    """Bulk version of mark_document_as_synced. Unknown ids are ignored."""
+    if not document_ids:
+        return
+
+    db_session.execute(
+        update(DbDocument)
+        .where(DbDocument.id.in_(document_ids))
+        .values(last_synced=datetime.now(timezone.utc))
+    )
+    db_session.commit()
+
+
 def delete_document_by_connector_credential_pair__no_commit(
     db_session: Session,
     document_id: str,
@@ -803,6 +838,54 @@ def prepare_to_modify_documents(
         )
 
 
+def acquire_available_document_locks(
+    db_session: Session, document_ids: list[str]
+) -> tuple[set[str], set[str]]:
+    """Lock the specified documents that are not currently locked by another
+    transaction. Never waits for, or fails because of, the documents that are locked
+    elsewhere (SELECT ... FOR UPDATE SKIP LOCKED).
+
+    Returns the IDs of the locked documents and the IDs of the documents that don't
+    exist, since SKIP LOCKED leaves out both the same way.
+    """
+    existing_ids = set(
+        db_session.scalars(
+            select(DbDocument.id).where(DbDocument.id.in_(document_ids))
+        ).all()
+    )
+    stmt = (
+        select(DbDocument.id)
+        .where(DbDocument.id.in_(existing_ids))
+        .with_for_update(skip_locked=True)
+    )
+    locked_ids = set(db_session.scalars(stmt).all())
+    return locked_ids, set(document_ids) - existing_ids
+
+
+@contextlib.contextmanager
+def prepare_to_modify_available_documents(
+    db_session: Session, document_ids: list[str]
+) -> Generator[tuple[TransactionalContext, set[str], set[str]], None, None]:
+    """Like prepare_to_modify_documents, but only locks the documents that are free
+    right now instead of waiting for all of them. Yields the transaction, the IDs
+    of the locked documents, which may be a subset (or none) of document_ids, and the
+    IDs of the documents that don't exist.
+    Only the locked documents may be modified, the caller is responsible for
+    retrying the rest (except the missing ones).
+
+    NOTE: only one commit is allowed within the returned context manager.
+    NOTE: this function will commit any existing transaction.
+    """
+
+    db_session.commit()  # ensure that we're not in a transaction
+
+    with db_session.begin() as transaction:
+        locked_ids, missing_ids = acquire_available_document_locks(
+            db_session=db_session, document_ids=document_ids
+        )
+        yield transaction, locked_ids, missing_ids
+
+
 def get_ingestion_documents(
     db_session: Session,
 ) -> list[DbDocument]:
@@ -689,6 +689,9 @@ class Document(Base):
         postgresql.ARRAY(String), nullable=True
     )
     is_public: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Digest of the three columns above as last written by permission sync, used to
+    # skip documents whose permissions haven't changed. Cleared by any other writer.
+    external_access_digest: Mapped[str | None] = mapped_column(String, nullable=True)
 
     # tables for the knowledge graph data
     kg_stage: Mapped[KGStage] = mapped_column(
@@ -2084,6 +2087,19 @@ class ChatSession(Base):
         DateTime(timezone=True), server_default=func.now()
     )
     user: Mapped[User] = relationship("User", back_populates="chat_sessions")
+
+    # keyset pagination of a user's chat history, see search_chat_sessions
+    __table_args__ = (
+        Index(
+            "ix_chat_session_user_time_created",
+            user_id,
+            time_created.desc(),
+            id.desc(),
+            postgresql_where=(
+                (deleted == False) & (onyxbot_flow == False)  # noqa: E712
+            ),
+        ),
+    )
     messages: Mapped[list["ChatMessage"]] = relationship(
         "ChatMessage", back_populates="chat_session", cascade="all, delete-orphan"
     )
@@ -3806,6 +3822,9 @@ class DocPermissionSyncAttempt(Base):
     # Counts for tracking progress
     total_docs_synced: Mapped[int | None] = mapped_column(Integer, default=0)
     docs_with_permission_errors: Mapped[int | None] = mapped_column(Integer, default=0)
+    # docs whose permissions were unchanged since the last sync and thus skipped
+    docs_unchanged: Mapped[int | None] = mapped_column(Integer, default=0)
+    docs_with_permission_changes: Mapped[int | None] = mapped_column(Integer, default=0)
 
     # Error message if sync fails
     error_message: Mapped[str | None] = mapped_column(Text, default=None)
@@ -182,6 +182,8 @@ def complete_doc_permission_sync_attempt(
     attempt_id: int,
     total_docs_synced: int,
     docs_with_permission_errors: int,
+    docs_unchanged: int = 0,
+    docs_with_permission_changes: int = 0,
 ) -> DocPermissionSyncAttempt:
     """Complete a doc permission sync attempt by updating progress and setting final status.
 
@@ -194,6 +196,9 @@ def complete_doc_permission_sync_attempt(
         attempt_id: The ID of the attempt
         total_docs_synced: Total number of documents synced
         docs_with_permission_errors: Number of documents that had permission errors
+        docs_unchanged: Number of documents skipped since their permissions had not
+            changed since the last sync
+        docs_with_permission_changes: Number of documents whose permissions changed
 
     Returns:
         The completed attempt
@@ -210,6 +215,10 @@ def complete_doc_permission_sync_attempt(
         attempt.docs_with_permission_errors = (
             attempt.docs_with_permission_errors or 0
         ) + docs_with_permission_errors
+        attempt.docs_unchanged = (attempt.docs_unchanged or 0) + docs_unchanged
+        attempt.docs_with_permission_changes = (
+            attempt.docs_with_permission_changes or 0
+        ) + docs_with_permission_changes
 
         # Set final status based on whether there were errors
         if docs_with_permission_errors > 0:
@@ -0,0 +1,69 @@
+import numpy as np
+
+_WORD_BITS = 64
+
+
+def words_to_mask(words: np.ndarray, size: int) -> np.ndarray:
+    """Expands a bitmap of 64 bit words (bit i set <=> slot i is in the set) to a
+    boolean array of length `size`, the words must cover all of the slots."""
+    packed = words.astype("<u8", copy=False).view(np.uint8)
+    return np.unpackbits(packed, bitorder="little")[:size].astype(bool)
+
+
+class BitmapIndex:
+    """Maps every value of a (multi valued) attribute to the bitmap of the slots that
+    have it. Every bitmap is a numpy array of 64 bit words, which is grown by doubling
+    when a slot past its end is added, so adding or removing a slot doesn't copy the
+    bitmap and set operations over all of the slots are vectorized."""
+
+    def __init__(self) -> None:
+        self._bitmaps: dict[str, np.ndarray] = {}
+        # number of slots in every bitmap, empty bitmaps are dropped
+        self._sizes: dict[str, int] = {}
+
+    def add(self, slot: int, values: set[str]) -> None:
+        word, bit = divmod(slot, _WORD_BITS)
+        bit_mask = np.uint64(1 << bit)
+        for value in values:
+            bitmap = self._bitmaps.get(value)
+            if bitmap is None or word >= len(bitmap):
+                bitmap = self._grow(value, word + 1)
+            if not bitmap[word] & bit_mask:
+                bitmap[word] |= bit_mask
+                self._sizes[value] = self._sizes.get(value, 0) + 1
+
+    def remove(self, slot: int, values: set[str]) -> None:
+        word, bit = divmod(slot, _WORD_BITS)
+        bit_mask = np.uint64(1 << bit)
+        for value in values:
+            bitmap = self._bitmaps.get(value)
+            if bitmap is None or word >= len(bitmap) or not bitmap[word] & bit_mask:
+                continue
+            bitmap[word] &= ~bit_mask
+            self._sizes[value] -= 1
+            if not self._sizes[value]:
+                del self._bitmaps[value]
+                del self._sizes[value]
+
+    def _grow(self, value: str, num_words: int) -> np.ndarray:
+        bitmap = self._bitmaps.get(value)
+        old_num_words = 0 if bitmap is None else len(bitmap)
+        grown = np.zeros(max(num_words, 2 * old_num_words), dtype=np.uint64)
+        if bitmap is not None:
+            grown[:old_num_words] = bitmap
+        self._bitmaps[value] = grown
+        return grown
+
+    def get(self, value: str, size: int) -> np.ndarray:
+        """Boolean mask of length `size` over the slots having the value"""
+        return self.any_of([value], size)
+
+    def any_of(self, values: list[str], size: int) -> np.ndarray:
+        """Boolean mask of length `size` over the slots having any of the values"""
+        words = np.zeros((size + _WORD_BITS - 1) // _WORD_BITS, dtype=np.uint64)
+        for value in values:
+            bitmap = self._bitmaps.get(value)
+            if bitmap is not None:
+                num_words = min(len(bitmap), len(words))
+                words[:num_words] |= bitmap[:num_words]
+        return words_to_mask(words, size)
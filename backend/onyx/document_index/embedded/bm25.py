@@ -0,0 +1,95 @@
+import math
+import re
+from collections import Counter
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# same defaults as the Vespa bm25 rank feature
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def highlight_terms(text: str, terms: set[str], max_length: int) -> str | None:
+    """Up to `max_length` characters of `text` starting shortly before the first
+    occurrence of any of the (tokenized) terms, with every occurrence wrapped in
+    Vespa style <hi> tags. None if none of the terms occur."""
+    first_match = next(
+        (
+            match
+            for match in _TOKEN_PATTERN.finditer(text)
+            if match.group().lower() in terms
+        ),
+        None,
+    )
+    if first_match is None:
+        return None
+
+    start = text.rfind(" ", 0, max(first_match.start() - max_length // 4, 0)) + 1
+    return _TOKEN_PATTERN.sub(
+        lambda match: (
+            f"<hi>{match.group()}</hi>"
+            if match.group().lower() in terms
+            else match.group()
+        ),
+        text[start : start + max_length],
+    )
+
+
+class BM25Index:
+    """Inverted index over a single text field, scored with Okapi BM25"""
+
+    def __init__(self) -> None:
+        # term -> slot -> term frequency
+        self._postings: dict[str, dict[int, int]] = {}
+        self._slot_terms: dict[int, Counter[str]] = {}
+        self._slot_lengths: dict[int, int] = {}
+        self._total_length = 0
+
+    def add(self, slot: int, text: str) -> None:
+        self.remove(slot)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[slot] = frequency
+        self._slot_terms[slot] = terms
+        length = sum(terms.values())
+        self._slot_lengths[slot] = length
+        self._total_length += length
+
+    def remove(self, slot: int) -> None:
+        terms = self._slot_terms.pop(slot, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._slot_lengths.pop(slot)
+
+    def score(self, query_terms: list[str]) -> dict[int, float]:
+        """BM25 score of every slot matching at least one of the query terms"""
+        num_slots = len(self._slot_lengths)
+        if not num_slots:
+            return {}
+        average_length = max(self._total_length / num_slots, 1.0)
+
+        scores: dict[int, float] = {}
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (num_slots - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for slot, frequency in postings.items():
+                length_norm = (
+                    1 - BM25_B + BM25_B * (self._slot_lengths[slot] / average_length)
+                )
+                scores[slot] = scores.get(slot, 0.0) + idf * (
+                    frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                )
+        return scores
@@ -0,0 +1,331 @@
+import os
+import threading
+
+from onyx.configs.app_configs import EMBEDDED_DOCUMENT_INDEX_DIR
+from onyx.configs.app_configs import EMBEDDED_INDEX_IVF_NPROBE
+from onyx.configs.app_configs import RERANK_COUNT
+from onyx.configs.chat_configs import DOC_TIME_DECAY
+from onyx.configs.chat_configs import NUM_RETURNED_HITS
+from onyx.configs.chat_configs import TITLE_CONTENT_RATIO
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
+    get_experts_stores_representations,
+)
+from onyx.context.search.models import IndexFilters
+from onyx.context.search.models import InferenceChunk
+from onyx.context.search.models import QueryExpansionType
+from onyx.db.enums import EmbeddingPrecision
+from onyx.document_index.embedded.bm25 import highlight_terms
+from onyx.document_index.embedded.bm25 import tokenize
+from onyx.document_index.embedded.store import ChunkHit
+from onyx.document_index.embedded.store import EmbeddedChunk
+from onyx.document_index.embedded.store import EmbeddedChunkUpdate
+from onyx.document_index.embedded.store import EmbeddedIndexStore
+from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentInsertionRecord
+from onyx.document_index.interfaces import IndexBatchParams
+from onyx.document_index.interfaces import UpdateRequest
+from onyx.document_index.interfaces import VespaChunkRequest
+from onyx.document_index.interfaces import VespaDocumentFields
+from onyx.document_index.interfaces import VespaDocumentUserFields
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.utils.logger import setup_logger
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+# same length as the Vespa dynamic summaries are cut to
+_MAX_HIGHLIGHT_LENGTH = 400
+
+_stores: dict[tuple[int, str], EmbeddedIndexStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedded_index_store(index_name: str) -> EmbeddedIndexStore:
+    """Every index is loaded once per process and shared by all of the EmbeddedIndex
+    instances, which are created per request like the VespaIndex ones. Keyed by pid
+    as well since SQLite connections must not be used across a fork."""
+    directory = os.path.join(EMBEDDED_DOCUMENT_INDEX_DIR, index_name)
+    with _stores_lock:
+        store = _stores.get((os.getpid(), directory))
+        if store is None:
+            store = EmbeddedIndexStore(directory, ivf_nprobe=EMBEDDED_INDEX_IVF_NPROBE)
+            _stores[(os.getpid(), directory)] = store
+        return store
+
+
+def _to_embedded_chunk(chunk: DocMetadataAwareIndexChunk) -> EmbeddedChunk:
+    document = chunk.source_document
+    title = document.get_title_for_document_index()
+    return EmbeddedChunk(
+        tenant_id=chunk.tenant_id,
+        document_id=document.id,
+        chunk_id=chunk.chunk_id,
+        large_chunk_reference_ids=chunk.large_chunk_reference_ids,
+        blurb=chunk.blurb,
+        content=chunk.content,
+        # same text as the Vespa `content` field, which BM25 runs over
+        keyword_content=(
+            f"{chunk.title_prefix}{chunk.doc_summary}{chunk.content}"
+            f"{chunk.chunk_context}{chunk.metadata_suffix_keyword}"
+        ),
+        title=title,
+        has_title_embedding=bool(title) and chunk.title_embedding is not None,
+        semantic_identifier=document.semantic_identifier,
+        source_type=document.source.value,
+        source_links=chunk.source_links,
+        section_continuation=chunk.section_continuation,
+        image_file_id=chunk.image_file_id,
+        metadata=document.metadata,
+        metadata_list=document.get_metadata_str_attributes() or [],
+        doc_summary=chunk.doc_summary,
+        chunk_context=chunk.chunk_context,
+        doc_updated_at=document.doc_updated_at,
+        primary_owners=get_experts_stores_representations(document.primary_owners),
+        secondary_owners=get_experts_stores_representations(document.secondary_owners),
+        access_control_list=sorted(chunk.access.to_acl()),
+        document_sets=sorted(chunk.document_sets),
+        user_projects=chunk.user_project or [],
+        boost=chunk.boost,
+        hidden=False,
+        aggregated_chunk_boost_factor=chunk.aggregated_chunk_boost_factor,
+    )
+
+
+def _to_inference_chunk(hit: ChunkHit, query_terms: set[str]) -> InferenceChunk:
+    chunk = hit.chunk
+    highlight = highlight_terms(chunk.content, query_terms, _MAX_HIGHLIGHT_LENGTH)
+    return InferenceChunk(
+        chunk_id=chunk.chunk_id,
+        blurb=chunk.blurb,
+        content=chunk.content,
+        source_links=chunk.source_links or {0: ""},
+        image_file_id=chunk.image_file_id,
+        section_continuation=chunk.section_continuation,
+        document_id=chunk.document_id,
+        source_type=DocumentSource(chunk.source_type),
+        semantic_identifier=chunk.semantic_identifier,
+        title=chunk.title,
+        boost=chunk.boost,
+        recency_bias=hit.recency_bias,
+        score=hit.score,
+        hidden=chunk.hidden,
+        metadata=chunk.metadata,
+        match_highlights=[highlight] if highlight else [],
+        doc_summary=chunk.doc_summary,
+        chunk_context=chunk.chunk_context,
+        updated_at=chunk.doc_updated_at,
+        primary_owners=chunk.primary_owners,
+        secondary_owners=chunk.secondary_owners,
+        large_chunk_reference_ids=chunk.large_chunk_reference_ids,
+    )
+
+
+class EmbeddedIndex(DocumentIndex):
+    """Document index that runs inside of the process, for single node deployments,
+    evaluations and tests which should not need a Vespa container.
+
+    Chunks live in SQLite and their vectors in memory mapped float32 matrices, under
+    EMBEDDED_DOCUMENT_INDEX_DIR/<index name>. Retrieval goes through a BM25 inverted
+    index, bitmap indexes for the filters and an IVF index (exact search for small
+    indices) which are rebuilt in memory when a process first touches the index.
+    Ranking follows the Vespa rank profiles. Multipass mini chunk vectors are not
+    stored, only the full chunk vector is searched.
+    """
+
+    def __init__(
+        self,
+        index_name: str,
+        secondary_index_name: str | None,
+        large_chunks_enabled: bool,
+        secondary_large_chunks_enabled: bool | None,
+        multitenant: bool = False,
+    ) -> None:
+        self.index_name = index_name
+        self.secondary_index_name = secondary_index_name
+        self.large_chunks_enabled = large_chunks_enabled
+        self.secondary_large_chunks_enabled = secondary_large_chunks_enabled
+        self.multitenant = multitenant
+
+    @property
+    def _store(self) -> EmbeddedIndexStore:
+        return get_embedded_index_store(self.index_name)
+
+    def ensure_indices_exist(
+        self,
+        primary_embedding_dim: int,
+        primary_embedding_precision: EmbeddingPrecision,
+        secondary_index_embedding_dim: int | None,
+        secondary_index_embedding_precision: EmbeddingPrecision | None,
+    ) -> None:
+        # vectors are always stored as float32, whatever the precision
+        self._store.ensure_dim(primary_embedding_dim)
+        if self.secondary_index_name and secondary_index_embedding_dim is not None:
+            get_embedded_index_store(self.secondary_index_name).ensure_dim(
+                secondary_index_embedding_dim
+            )
+
+    @staticmethod
+    def register_multitenant_indices(
+        indices: list[str],
+        embedding_dims: list[int],
+        embedding_precisions: list[EmbeddingPrecision],
+    ) -> None:
+        # all tenants share the index, chunks are filtered by their tenant id
+        for index_name, embedding_dim in zip(indices, embedding_dims):
+            get_embedded_index_store(index_name).ensure_dim(embedding_dim)
+
+    def index(
+        self,
+        chunks: list[DocMetadataAwareIndexChunk],
+        index_batch_params: IndexBatchParams,
+    ) -> set[DocumentInsertionRecord]:
+        if not chunks:
+            return set()
+
+        store = self._store
+        store.ensure_dim(len(chunks[0].embeddings.full_embedding))
+        already_existed = store.replace_documents(
+            [
+                (
+                    _to_embedded_chunk(chunk),
+                    chunk.embeddings.full_embedding,
+                    chunk.title_embedding,
+                )
+                for chunk in chunks
+            ]
+        )
+        return {
+            DocumentInsertionRecord(document_id=document_id, already_existed=existed)
+            for document_id, existed in already_existed.items()
+        }
+
+    def update_single(
+        self,
+        doc_id: str,
+        *,
+        tenant_id: str,
+        chunk_count: int | None,
+        fields: VespaDocumentFields | None,
+        user_fields: VespaDocumentUserFields | None,
+    ) -> None:
+        """Note: if the document id does not exist, the update will be a no-op and the
+        function will complete with no errors or exceptions."""
+        if fields is None and user_fields is None:
+            raise ValueError(
+                f"Bug: Tried to update document {doc_id} with no updated fields or user fields."
+            )
+
+        update = EmbeddedChunkUpdate()
+        if fields is not None:
+            update.document_id = fields.document_id
+            if fields.access is not None:
+                update.access_control_list = sorted(fields.access.to_acl())
+            if fields.document_sets is not None:
+                update.document_sets = sorted(fields.document_sets)
+            if fields.boost is not None:
+                update.boost = int(fields.boost)
+            update.hidden = fields.hidden
+            update.aggregated_chunk_boost_factor = fields.aggregated_chunk_boost_factor
+        if user_fields is not None:
+            update.user_projects = user_fields.user_projects
+
+        num_updated = self._store.update_document(doc_id, tenant_id, update)
+        logger.debug(f"Updated {num_updated} chunks for document {doc_id}.")
+
+    def update(self, update_requests: list[UpdateRequest], *, tenant_id: str) -> None:
+        for update_request in update_requests:
+            for doc_info in update_request.minimal_document_indexing_info:
+                self.update_single(
+                    doc_info.doc_id,
+                    tenant_id=tenant_id,
+                    chunk_count=None,
+                    fields=VespaDocumentFields(
+                        access=update_request.access,
+                        document_sets=update_request.document_sets,
+                        boost=update_request.boost,
+                        hidden=update_request.hidden,
+                    ),
+                    user_fields=None,
+                )
+
+    def delete_single(
+        self,
+        doc_id: str,
+        *,
+        tenant_id: str,
+        chunk_count: int | None,
+    ) -> int:
+        return self._store.delete_document(doc_id, tenant_id)
+
+    def id_based_retrieval(
+        self,
+        chunk_requests: list[VespaChunkRequest],
+        filters: IndexFilters,
+        batch_retrieval: bool = False,
+        get_large_chunks: bool = False,
+    ) -> list[InferenceChunk]:
+        hits = self._store.get_chunks(
+            chunk_requests, filters, get_large_chunks=get_large_chunks
+        )
+        return [_to_inference_chunk(hit, set()) for hit in hits]
+
+    def hybrid_retrieval(
+        self,
+        query: str,
+        query_embedding: Embedding,
+        final_keywords: list[str] | None,
+        filters: IndexFilters,
+        hybrid_alpha: float,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        ranking_profile_type: QueryExpansionType = QueryExpansionType.SEMANTIC,
+        offset: int = 0,
+        title_content_ratio: float | None = TITLE_CONTENT_RATIO,
+    ) -> list[InferenceChunk]:
+        if not (
+            ranking_profile_type == QueryExpansionType.KEYWORD
+            or ranking_profile_type == QueryExpansionType.SEMANTIC
+        ):
+            raise ValueError(
+                f"Bug: Received invalid ranking profile type: {ranking_profile_type}"
+            )
+
+        final_query = " ".join(final_keywords) if final_keywords else query
+        hits = self._store.hybrid_search(
+            query=final_query,
+            query_vector=query_embedding,
+            filters=filters,
+            hybrid_alpha=hybrid_alpha,
+            title_content_ratio=(
+                title_content_ratio
+                if title_content_ratio is not None
+                else TITLE_CONTENT_RATIO
+            ),
+            decay_factor=DOC_TIME_DECAY * time_decay_multiplier,
+            num_to_retrieve=num_to_retrieve,
+            offset=offset,
+            # same number of candidates as Vespa reranks
+            target_hits=max(10 * num_to_retrieve, RERANK_COUNT),
+        )
+        query_terms = set(tokenize(final_query))
+        return [_to_inference_chunk(hit, query_terms) for hit in hits]
+
+    def admin_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        offset: int = 0,
+    ) -> list[InferenceChunk]:
+        hits = self._store.admin_search(query, filters, num_to_retrieve, offset)
+        query_terms = set(tokenize(query))
+        return [_to_inference_chunk(hit, query_terms) for hit in hits]
+
+    def random_retrieval(
+        self,
+        filters: IndexFilters,
+        num_to_retrieve: int = 10,
+    ) -> list[InferenceChunk]:
+        hits = self._store.random_chunks(filters, num_to_retrieve)
+        return [_to_inference_chunk(hit, set()) for hit in hits]
@@ -0,0 +1,716 @@
+"""Storage, filtering and ranking for the embedded document index.
+
+Layout of an index directory:
+- chunks.sqlite: one row per chunk with all of its stored fields, the index metadata
+  (embedding dim, number of slots) and a changelog of the modified slots
+- content_vectors.f32 / title_vectors.f32: memory mapped float32 matrices, row i holds
+  the vector of the chunk in slot i
+
+SQLite serializes the writers across processes. The BM25, bitmap and IVF indexes are
+derived from the rows and kept in memory by every process, which catches up with the
+writes of the other processes through the changelog before each operation.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import numpy as np
+from pydantic import BaseModel
+
+from onyx.configs.constants import INDEX_SEPARATOR
+from onyx.context.search.models import IndexFilters
+from onyx.document_index.embedded.bitmap import BitmapIndex
+from onyx.document_index.embedded.bm25 import BM25Index
+from onyx.document_index.embedded.bm25 import tokenize
+from onyx.document_index.embedded.vector_index import angular_closeness
+from onyx.document_index.embedded.vector_index import normalize
+from onyx.document_index.embedded.vector_index import VectorField
+from onyx.document_index.interfaces import VespaChunkRequest
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import MULTI_TENANT
+
+logger = setup_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (
+    slot INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    slot INTEGER NOT NULL
+);
+"""
+
+_INITIAL_CAPACITY = 1024
+# processes lagging further behind than this reload everything instead
+_CHANGELOG_RETENTION = 100_000
+_SQLITE_BATCH_SIZE = 500
+
+# same constants as the Vespa ranking and filters
+_SECONDS_PER_YEAR = 31_536_000
+_UNTIMED_DOC_AGE_SECONDS = 7_890_000
+_UNTIMED_DOC_CUTOFF = timedelta(days=92)
+_MIN_RECENCY_BIAS = 0.75
+_ADMIN_TITLE_WEIGHT = 5
+
+
+class EmbeddedChunk(BaseModel):
+    """Everything stored for a chunk, besides its vectors"""
+
+    tenant_id: str
+    document_id: str
+    chunk_id: int
+    large_chunk_reference_ids: list[int]
+    blurb: str
+    content: str
+    # the content plus the title prefix, contextual RAG texts and metadata suffix
+    keyword_content: str
+    title: str | None
+    has_title_embedding: bool
+    semantic_identifier: str
+    source_type: str
+    source_links: dict[int, str] | None
+    section_continuation: bool
+    image_file_id: str | None
+    metadata: dict[str, str | list[str]]
+    metadata_list: list[str]
+    doc_summary: str
+    chunk_context: str
+    doc_updated_at: datetime | None
+    primary_owners: list[str] | None
+    secondary_owners: list[str] | None
+    access_control_list: list[str]
+    document_sets: list[str]
+    user_projects: list[int]
+    boost: int
+    hidden: bool
+    aggregated_chunk_boost_factor: float | None
+
+
+class EmbeddedChunkUpdate(BaseModel):
+    """Fields to overwrite on every chunk of a document, None means unchanged"""
+
+    document_id: str | None = None
+    access_control_list: list[str] | None = None
+    document_sets: list[str] | None = None
+    boost: int | None = None
+    hidden: bool | None = None
+    aggregated_chunk_boost_factor: float | None = None
+    user_projects: list[int] | None = None
+
+
+class ChunkHit(BaseModel):
+    chunk: EmbeddedChunk
+    score: float | None = None
+    recency_bias: float = 1.0
+
+
+def _normalize_linear(values: np.ndarray) -> np.ndarray:
+    """Same as Vespa's normalize_linear: rescales to [0, 1] over the candidates"""
+    low = values.min()
+    value_range = values.max() - low
+    if value_range == 0:
+        return np.ones_like(values) if low > 0 else np.zeros_like(values)
+    return (values - low) / value_range
+
+
+def _document_boost(boosts: np.ndarray) -> np.ndarray:
+    # 0.5 to 2x score: piecewise sigmoid function stretched out by factor of 3
+    sigmoid = 1 / (1 + np.exp(-boosts / 3))
+    return np.where(boosts < 0, 0.5 + sigmoid, 2 * sigmoid)
+
+
+class EmbeddedIndexStore:
+    def __init__(self, directory: str, ivf_nprobe: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._ivf_nprobe = ivf_nprobe
+
+        # one connection per process, guarded by the lock like the in memory state
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "chunks.sqlite"),
+            timeout=60,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._dim: int | None = None
+        self._capacity = 0
+        self._last_seq = 0
+        self._content_vectors: VectorField | None = None
+        self._title_vectors: VectorField | None = None
+        self._reset_memory()
+
+    def _reset_memory(self) -> None:
+        self._chunks: dict[int, EmbeddedChunk] = {}
+        self._document_slots: dict[str, set[int]] = {}
+
+        self._live = np.zeros(self._capacity, dtype=bool)
+        self._hidden = np.zeros(self._capacity, dtype=bool)
+        self._tenants = BitmapIndex()
+        self._access_control_list = BitmapIndex()
+        self._document_sets = BitmapIndex()
+        self._source_types = BitmapIndex()
+        self._tags = BitmapIndex()
+        self._user_projects = BitmapIndex()
+
+        self._boosts = np.zeros(self._capacity, dtype=np.float64)
+        self._updated_at = np.full(self._capacity, np.nan)
+        self._aggregated_boosts = np.full(self._capacity, np.nan)
+        self._has_title = np.zeros(self._capacity, dtype=bool)
+
+        self._content_bm25 = BM25Index()
+        self._title_bm25 = BM25Index()
+
+        for vector_field in (self._content_vectors, self._title_vectors):
+            if vector_field is not None:
+                vector_field.reset()
+
+    def _bitmap_values(
+        self, chunk: EmbeddedChunk
+    ) -> list[tuple[BitmapIndex, set[str]]]:
+        return [
+            (self._tenants, {chunk.tenant_id}),
+            (self._access_control_list, set(chunk.access_control_list)),
+            (self._document_sets, set(chunk.document_sets)),
+            (self._source_types, {chunk.source_type}),
+            (self._tags, set(chunk.metadata_list)),
+            (self._user_projects, {str(project) for project in chunk.user_projects}),
+        ]
+
+    def _add_to_memory(self, slot: int, chunk: EmbeddedChunk) -> None:
+        self._chunks[slot] = chunk
+        self._document_slots.setdefault(chunk.document_id, set()).add(slot)
+
+        self._live[slot] = True
+        self._hidden[slot] = chunk.hidden
+        for bitmap_index, values in self._bitmap_values(chunk):
+            bitmap_index.add(slot, values)
+
+        self._boosts[slot] = chunk.boost
+        self._updated_at[slot] = (
+            chunk.doc_updated_at.timestamp() if chunk.doc_updated_at else np.nan
+        )
+        self._aggregated_boosts[slot] = (
+            chunk.aggregated_chunk_boost_factor
+            if chunk.aggregated_chunk_boost_factor is not None
+            else np.nan
+        )
+        self._has_title[slot] = chunk.has_title_embedding
+
+        self._content_bm25.add(slot, chunk.keyword_content)
+        self._title_bm25.add(slot, chunk.title or "")
+        if self._content_vectors is not None and self._title_vectors is not None:
+            self._content_vectors.add(slot)
+            if chunk.has_title_embedding:
+                self._title_vectors.add(slot)
+
+    def _remove_from_memory(self, slot: int) -> None:
+        chunk = self._chunks.pop(slot)
+        document_slots = self._document_slots[chunk.document_id]
+        document_slots.discard(slot)
+        if not document_slots:
+            del self._document_slots[chunk.document_id]
+
+        self._live[slot] = False
+        self._hidden[slot] = False
+        for bitmap_index, values in self._bitmap_values(chunk):
+            bitmap_index.remove(slot, values)
+
+        self._content_bm25.remove(slot)
+        self._title_bm25.remove(slot)
+        if self._content_vectors is not None and self._title_vectors is not None:
+            self._content_vectors.remove(slot)
+            self._title_vectors.remove(slot)
+
+    def _grow_memory(self, capacity: int) -> None:
+        if capacity <= self._capacity:
+            return
+        padding = capacity - self._capacity
+        self._live = np.pad(self._live, (0, padding))
+        self._hidden = np.pad(self._hidden, (0, padding))
+        self._boosts = np.pad(self._boosts, (0, padding))
+        self._updated_at = np.pad(
+            self._updated_at, (0, padding), constant_values=np.nan
+        )
+        self._aggregated_boosts = np.pad(
+            self._aggregated_boosts, (0, padding), constant_values=np.nan
+        )
+        self._has_title = np.pad(self._has_title, (0, padding))
+        for vector_field in (self._content_vectors, self._title_vectors):
+            if vector_field is not None:
+                vector_field.open(capacity)
+        self._capacity = capacity
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        value = row.fetchone()
+        return value[0] if value else None
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def _sync(self) -> None:
+        """Applies every change committed since the last sync, by any process, to the
+        in memory indexes. Must run inside a transaction, to see a consistent
+        snapshot."""
+        dim = self._get_meta("dim")
+        if dim is None:
+            return
+
+        needs_reload = self._last_seq < int(self._get_meta("pruned_through") or 0)
+        if self._dim != int(dim):
+            self._dim = int(dim)
+            self._capacity = 0
+            self._content_vectors = VectorField(
+                os.path.join(self._directory, "content_vectors.f32"),
+                self._dim,
+                self._ivf_nprobe,
+            )
+            self._title_vectors = VectorField(
+                os.path.join(self._directory, "title_vectors.f32"),
+                self._dim,
+                self._ivf_nprobe,
+            )
+            needs_reload = True
+        self._grow_memory(int(self._get_meta("capacity") or 0))
+
+        if needs_reload:
+            self._reset_memory()
+            self._last_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM changes"
+            ).fetchone()[0]
+            for slot, payload in self._conn.execute("SELECT slot, payload FROM chunks"):
+                self._add_to_memory(slot, EmbeddedChunk.model_validate_json(payload))
+            logger.info(f"Loaded {len(self._chunks)} chunks from {self._directory}")
+            return
+
+        changes = self._conn.execute(
+            "SELECT seq, slot FROM changes WHERE seq > ? ORDER BY seq",
+            (self._last_seq,),
+        ).fetchall()
+        if not changes:
+            return
+
+        changed_slots = sorted({slot for _, slot in changes})
+        rows: dict[int, EmbeddedChunk] = {}
+        for start in range(0, len(changed_slots), _SQLITE_BATCH_SIZE):
+            batch = changed_slots[start : start + _SQLITE_BATCH_SIZE]
+            for slot, payload in self._conn.execute(
+                "SELECT slot, payload FROM chunks "
+                f"WHERE slot IN ({','.join('?' * len(batch))})",
+                batch,
+            ):
+                rows[slot] = EmbeddedChunk.model_validate_json(payload)
+
+        for slot in changed_slots:
+            if slot in self._chunks:
+                self._remove_from_memory(slot)
+            if slot in rows:
+                self._add_to_memory(slot, rows[slot])
+        self._last_seq = changes[-1][0]
+
+    def _sync_snapshot(self) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            self._sync()
+        finally:
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _synced(self) -> Generator[None, None, None]:
+        """Holds the lock over an up to date in memory state"""
+        with self._lock:
+            self._sync_snapshot()
+            yield
+
+    @contextmanager
+    def _write_transaction(self) -> Generator[None, None, None]:
+        with self._lock:
+            # IMMEDIATE takes the database write lock, blocking the other writers
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                yield
+                for vector_field in (self._content_vectors, self._title_vectors):
+                    if vector_field is not None:
+                        vector_field.flush()
+                self._prune_changelog()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._sync_snapshot()
+
+    def _prune_changelog(self) -> None:
+        last_seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM changes"
+        ).fetchone()[0]
+        pruned_through = int(self._get_meta("pruned_through") or 0)
+        if last_seq - pruned_through <= 2 * _CHANGELOG_RETENTION:
+            return
+        pruned_through = last_seq - _CHANGELOG_RETENTION
+        self._conn.execute("DELETE FROM changes WHERE seq <= ?", (pruned_through,))
+        self._set_meta("pruned_through", pruned_through)
+
+    def _log_changes(self, slots: list[int]) -> None:
+        self._conn.executemany(
+            "INSERT INTO changes (slot) VALUES (?)", [(slot,) for slot in slots]
+        )
+
+    def _delete_slots(self, slots: list[int]) -> None:
+        for start in range(0, len(slots), _SQLITE_BATCH_SIZE):
+            batch = slots[start : start + _SQLITE_BATCH_SIZE]
+            self._conn.execute(
+                f"DELETE FROM chunks WHERE slot IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+        self._log_changes(slots)
+
+    def _allocate_slots(self, num_slots: int) -> list[int]:
+        """Slots that were free when the transaction started. The vectors of the new
+        chunks are written to the shared files before the commit, so slots freed by
+        the same transaction are only reused once it has committed: a rollback or a
+        reader of the last commit never sees vectors of other chunks in them."""
+        # the in memory state is the last commit, synced when the transaction began
+        used_slots = set(self._chunks)
+        capacity = self._capacity
+        while capacity - len(used_slots) < num_slots:
+            capacity = max(2 * capacity, _INITIAL_CAPACITY)
+        # compared against the stored capacity, memory may have outgrown it if a
+        # transaction that grew it was rolled back
+        if capacity > int(self._get_meta("capacity") or 0):
+            self._set_meta("capacity", capacity)
+        self._grow_memory(capacity)
+
+        free_slots: list[int] = []
+        for slot in range(capacity):
+            if len(free_slots) == num_slots:
+                break
+            if slot not in used_slots:
+                free_slots.append(slot)
+        return free_slots
+
+    def _slots_of(self, document_id: str, tenant_id: str) -> list[int]:
+        # like in Vespa, documents are only told apart by tenant in multi tenant mode
+        return [
+            slot
+            for slot in self._document_slots.get(document_id, ())
+            if not MULTI_TENANT or self._chunks[slot].tenant_id == tenant_id
+        ]
+
+    def ensure_dim(self, dim: int) -> None:
+        if self._dim == dim:
+            return
+        with self._write_transaction():
+            current_dim = self._get_meta("dim")
+            if current_dim is None:
+                self._set_meta("dim", dim)
+                self._set_meta("capacity", 0)
+            elif int(current_dim) != dim:
+                raise ValueError(
+                    f"Embedded index at {self._directory} holds {current_dim} "
+                    f"dimensional vectors, got {dim}"
+                )
+
+    def replace_documents(
+        self,
+        chunks: list[tuple[EmbeddedChunk, list[float], list[float] | None]],
+    ) -> dict[str, bool]:
+        """Replaces all of the chunks of the documents with the given (chunk, content
+        vector, title vector) triples. Returns whether each document already had
+        chunks."""
+        already_existed: dict[str, bool] = {}
+        with self._write_transaction():
+            freed_slots: set[int] = set()
+            for chunk, _, _ in chunks:
+                if chunk.document_id in already_existed:
+                    continue
+                document_slots = self._slots_of(chunk.document_id, chunk.tenant_id)
+                already_existed[chunk.document_id] = bool(document_slots)
+                freed_slots.update(document_slots)
+            self._delete_slots(sorted(freed_slots))
+
+            assert self._content_vectors and self._title_vectors
+            slots = self._allocate_slots(len(chunks))
+            for slot, (chunk, content_vector, title_vector) in zip(slots, chunks):
+                self._content_vectors.write(slot, content_vector)
+                if title_vector is not None:
+                    self._title_vectors.write(slot, title_vector)
+            self._conn.executemany(
+                "INSERT INTO chunks (slot, document_id, payload) VALUES (?, ?, ?)",
+                [
+                    (slot, chunk.document_id, chunk.model_dump_json())
+                    for slot, (chunk, _, _) in zip(slots, chunks)
+                ],
+            )
+            self._log_changes(slots)
+        return already_existed
+
+    def update_document(
+        self, document_id: str, tenant_id: str, update: EmbeddedChunkUpdate
+    ) -> int:
+        with self._write_transaction():
+            slots = self._slots_of(document_id, tenant_id)
+            changed_fields = update.model_dump(exclude_none=True)
+            self._conn.executemany(
+                "UPDATE chunks SET document_id = ?, payload = ? WHERE slot = ?",
+                [
+                    (
+                        updated_chunk.document_id,
+                        updated_chunk.model_dump_json(),
+                        slot,
+                    )
+                    for slot in slots
+                    for updated_chunk in [
+                        self._chunks[slot].model_copy(update=changed_fields)
+                    ]
+                ],
+            )
+            self._log_changes(slots)
+        return len(slots)
+
+    def delete_document(self, document_id: str, tenant_id: str) -> int:
+        with self._write_transaction():
+            slots = self._slots_of(document_id, tenant_id)
+            self._delete_slots(slots)
+        return len(slots)
+
+    def _filter_mask(self, filters: IndexFilters, include_hidden: bool) -> np.ndarray:
+        """Boolean mask over the slots of the chunks passing the filters, with the same
+        semantics as the Vespa filters"""
+        size = self._capacity
+        mask = self._live.copy()
+        if not include_hidden:
+            mask &= ~self._hidden
+        if filters.tenant_id and MULTI_TENANT:
+            mask &= self._tenants.get(filters.tenant_id, size)
+        if filters.access_control_list:
+            mask &= self._access_control_list.any_of(filters.access_control_list, size)
+        if filters.source_type:
+            mask &= self._source_types.any_of(
+                [source.value for source in filters.source_type], size
+            )
+        if filters.tags:
+            mask &= self._tags.any_of(
+                [
+                    f"{tag.tag_key}{INDEX_SEPARATOR}{tag.tag_value}"
+                    for tag in filters.tags
+                ],
+                size,
+            )
+        if filters.document_set:
+            mask &= self._document_sets.any_of(filters.document_set, size)
+        if filters.user_file_ids:
+            # only a few documents, their slots are already known
+            document_mask = np.zeros(size, dtype=bool)
+            document_mask[
+                [
+                    slot
+                    for user_file_id in filters.user_file_ids
+                    for slot in self._document_slots.get(str(user_file_id), ())
+                ]
+            ] = True
+            mask &= document_mask
+        if filters.project_id is not None:
+            mask &= self._user_projects.get(str(filters.project_id), size)
+
+        if filters.time_cutoff:
+            with np.errstate(invalid="ignore"):
+                timed = self._updated_at >= filters.time_cutoff.timestamp()
+            if datetime.now(timezone.utc) - _UNTIMED_DOC_CUTOFF > filters.time_cutoff:
+                timed |= np.isnan(self._updated_at)
+            mask &= timed
+        return mask
+
+    def _recency_bias(self, slots: np.ndarray, decay_factor: float) -> np.ndarray:
+        now = datetime.now(timezone.utc).timestamp()
+        updated_at = self._updated_at[slots]
+        age_years = np.maximum(
+            np.where(np.isnan(updated_at), _UNTIMED_DOC_AGE_SECONDS, now - updated_at)
+            / _SECONDS_PER_YEAR,
+            0,
+        )
+        return np.maximum(1 / (1 + decay_factor * age_years), _MIN_RECENCY_BIAS)
+
+    def hybrid_search(
+        self,
+        query: str,
+        query_vector: list[float],
+        filters: IndexFilters,
+        hybrid_alpha: float,
+        title_content_ratio: float,
+        decay_factor: float,
+        num_to_retrieve: int,
+        offset: int,
+        target_hits: int,
+    ) -> list[ChunkHit]:
+        """Ranks like the Vespa hybrid profiles: the nearest neighbors by content and
+        by title vector plus the best BM25 matches are the candidates, all of their
+        scores are normalized over the candidates and blended by `hybrid_alpha`."""
+        with self._synced():
+            if self._content_vectors is None or self._title_vectors is None:
+                return []
+            allowed = self._filter_mask(filters, include_hidden=False)
+            query_embedding = normalize(np.asarray(query_vector, dtype=np.float32))
+
+            candidates = set(
+                self._content_vectors.nearest(
+                    query_embedding, allowed, target_hits
+                ).tolist()
+            )
+            candidates.update(
+                self._title_vectors.nearest(
+                    query_embedding, allowed, target_hits
+                ).tolist()
+            )
+
+            query_terms = tokenize(query)
+            content_bm25 = self._content_bm25.score(query_terms)
+            title_bm25 = self._title_bm25.score(query_terms)
+            keyword_scores = {
+                slot: (1 - title_content_ratio) * content_bm25.get(slot, 0.0)
+                + title_content_ratio * title_bm25.get(slot, 0.0)
+                for slot in content_bm25.keys() | title_bm25.keys()
+                if allowed[slot]
+            }
+            candidates.update(
+                heapq.nlargest(
+                    target_hits, keyword_scores, key=keyword_scores.__getitem__
+                )
+            )
+            if not candidates:
+                return []
+
+            slots = np.array(sorted(candidates), dtype=np.int64)
+            content_closeness = angular_closeness(
+                self._content_vectors.cosine_similarities(slots, query_embedding)
+            )
+            title_closeness = np.where(
+                self._has_title[slots],
+                angular_closeness(
+                    self._title_vectors.cosine_similarities(slots, query_embedding)
+                ),
+                0,
+            )
+            # no matching title falls back to the content, so that an irrelevant
+            # title does not get normalized to a full score
+            title_vector_score = np.maximum(content_closeness, title_closeness)
+            vector_score = title_content_ratio * _normalize_linear(
+                title_vector_score
+            ) + (1 - title_content_ratio) * _normalize_linear(content_closeness)
+
+            content_keyword = np.array([content_bm25.get(slot, 0.0) for slot in slots])
+            title_keyword = np.array([title_bm25.get(slot, 0.0) for slot in slots])
+            keyword_score = title_content_ratio * _normalize_linear(title_keyword) + (
+                1 - title_content_ratio
+            ) * _normalize_linear(content_keyword)
+
+            recency_bias = self._recency_bias(slots, decay_factor)
+            aggregated_boosts = self._aggregated_boosts[slots]
+            scores = (
+                (hybrid_alpha * vector_score + (1 - hybrid_alpha) * keyword_score)
+                * _document_boost(self._boosts[slots])
+                * recency_bias
+                * np.where(np.isnan(aggregated_boosts), 1.0, aggregated_boosts)
+            )
+
+            ranked = np.argsort(-scores, kind="stable")[
+                offset : offset + num_to_retrieve
+            ]
+            return [
+                ChunkHit(
+                    chunk=self._chunks[int(slots[i])],
+                    score=float(scores[i]),
+                    recency_bias=float(recency_bias[i]),
+                )
+                for i in ranked
+            ]
+
+    def admin_search(
+        self,
+        query: str,
+        filters: IndexFilters,
+        num_to_retrieve: int,
+        offset: int,
+    ) -> list[ChunkHit]:
+        """BM25 over the content plus 5x the BM25 over the title, hidden chunks
+        included, like the Vespa admin_search profile"""
+        with self._synced():
+            allowed = self._filter_mask(filters, include_hidden=True)
+            query_terms = tokenize(query)
+            content_bm25 = self._content_bm25.score(query_terms)
+            title_bm25 = self._title_bm25.score(query_terms)
+            scores = {
+                slot: content_bm25.get(slot, 0.0)
+                + _ADMIN_TITLE_WEIGHT * title_bm25.get(slot, 0.0)
+                for slot in content_bm25.keys() | title_bm25.keys()
+                if allowed[slot]
+            }
+            ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+            return [
+                ChunkHit(chunk=self._chunks[slot], score=scores[slot])
+                for slot in ranked[offset : offset + num_to_retrieve]
+            ]
+
+    def get_chunks(
+        self,
+        chunk_requests: list[VespaChunkRequest],
+        filters: IndexFilters,
+        get_large_chunks: bool = False,
+    ) -> list[ChunkHit]:
+        with self._synced():
+            allowed = self._filter_mask(filters, include_hidden=True)
+            hits: list[ChunkHit] = []
+            for chunk_request in chunk_requests:
+                chunks = [
+                    self._chunks[slot]
+                    for slot in self._document_slots.get(chunk_request.document_id, ())
+                    if allowed[slot]
+                ]
+                if chunk_request.is_capped:
+                    chunks = [
+                        chunk
+                        for chunk in chunks
+                        if (chunk_request.min_chunk_ind or 0)
+                        <= chunk.chunk_id
+                        <= (chunk_request.max_chunk_ind or 0)
+                    ]
+                if not get_large_chunks:
+                    chunks = [
+                        chunk for chunk in chunks if not chunk.large_chunk_reference_ids
+                    ]
+                chunks.sort(key=lambda chunk: chunk.chunk_id)
+                hits.extend(ChunkHit(chunk=chunk) for chunk in chunks)
+            return hits
+
+    def random_chunks(
+        self, filters: IndexFilters, num_to_retrieve: int
+    ) -> list[ChunkHit]:
+        with self._synced():
+            allowed_slots = np.flatnonzero(
+                self._filter_mask(filters, include_hidden=False)
+            )
+            if not len(allowed_slots):
+                return []
+            slots = np.random.default_rng().choice(
+                allowed_slots,
+                size=min(num_to_retrieve, len(allowed_slots)),
+                replace=False,
+            )
+            return [ChunkHit(chunk=self._chunks[int(slot)]) for slot in slots]
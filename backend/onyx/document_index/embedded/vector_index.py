@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+# below this many vectors a brute force scan is about as fast as probing and exact
+IVF_MIN_VECTORS = 20_000
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_LIST = 64
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def angular_closeness(cosine_similarities: np.ndarray) -> np.ndarray:
+    """Same as Vespa's closeness for the angular distance metric"""
+    return 1 / (1 + np.arccos(np.clip(cosine_similarities, -1, 1)))
+
+
+class VectorField:
+    """A memory mapped float32 matrix with one (normalized) vector per slot, plus an
+    in memory IVF index over it.
+
+    The matrix file is the source of truth and is shared with every other process
+    using the index. The IVF lists are derived from it and are (re)built by every
+    process on its own: once the field holds `IVF_MIN_VECTORS` vectors and again every
+    time it has doubled in size since the last training."""
+
+    def __init__(self, path: str, dim: int, nprobe: int) -> None:
+        self.path = path
+        self.dim = dim
+        self.nprobe = nprobe
+        self.capacity = 0
+        self._matrix: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+        self._present = np.zeros(0, dtype=bool)
+
+        self._centroids: np.ndarray | None = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+
+    def open(self, capacity: int) -> None:
+        """Maps the first `capacity` rows of the file, growing the file if needed"""
+        num_bytes = capacity * self.dim * np.dtype(np.float32).itemsize
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < num_bytes:
+            with open(self.path, "ab") as f:
+                f.truncate(num_bytes)
+
+        if capacity:
+            self._matrix = np.memmap(
+                self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+        self._present = np.pad(self._present, (0, capacity - self.capacity))
+        self._assignments = np.pad(
+            self._assignments, (0, capacity - self.capacity), constant_values=-1
+        )
+        self.capacity = capacity
+
+    def write(self, slot: int, vector: list[float]) -> None:
+        self._matrix[slot] = normalize(np.asarray(vector, dtype=np.float32))
+
+    def flush(self) -> None:
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+
+    def add(self, slot: int) -> None:
+        """Makes the vector already written to `slot` searchable"""
+        self._present[slot] = True
+        if self._centroids is not None:
+            self._assignments[slot] = np.argmax(self._centroids @ self._matrix[slot])
+
+    def remove(self, slot: int) -> None:
+        self._present[slot] = False
+        self._assignments[slot] = -1
+
+    def reset(self) -> None:
+        self._present[:] = False
+        self._assignments[:] = -1
+        self._centroids = None
+        self._trained_size = 0
+
+    def cosine_similarities(self, slots: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return self._matrix[slots] @ query
+
+    def nearest(
+        self, query: np.ndarray, allowed: np.ndarray, num_hits: int
+    ) -> np.ndarray:
+        """Slots of the (approximately) `num_hits` nearest vectors among the `allowed`
+        (boolean mask) slots. Falls back to an exact scan whenever the probed lists do
+        not hold enough allowed vectors, e.g. for very selective filters."""
+        allowed = allowed & self._present
+        self._maybe_train()
+
+        candidates = np.flatnonzero(allowed)
+        if self._centroids is not None and len(candidates) > num_hits:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probed_lists = np.argpartition(self._centroids @ query, -nprobe)[-nprobe:]
+            probed = np.flatnonzero(allowed & np.isin(self._assignments, probed_lists))
+            if len(probed) >= num_hits:
+                candidates = probed
+
+        if len(candidates) <= num_hits:
+            return candidates
+        similarities = self.cosine_similarities(candidates, query)
+        return candidates[np.argpartition(similarities, -num_hits)[-num_hits:]]
+
+    def _maybe_train(self) -> None:
+        num_vectors = int(self._present.sum())
+        if num_vectors < IVF_MIN_VECTORS or num_vectors < 2 * self._trained_size:
+            return
+
+        slots = np.flatnonzero(self._present)
+        num_lists = int(np.sqrt(num_vectors))
+        rng = np.random.default_rng(0)
+        sample = np.asarray(
+            self._matrix[
+                np.sort(
+                    rng.choice(
+                        slots,
+                        size=min(len(slots), num_lists * _KMEANS_SAMPLES_PER_LIST),
+                        replace=False,
+                    )
+                )
+            ]
+        )
+
+        # spherical k-means, the vectors are normalized
+        centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            # empty lists keep their previous centroid
+            non_empty = np.bincount(labels, minlength=num_lists) > 0
+            centroids[non_empty] = normalize(sums[non_empty])
+
+        self._assignments[:] = -1
+        for start in range(0, len(slots), 10_000):
+            batch = slots[start : start + 10_000]
+            self._assignments[batch] = np.argmax(
+                np.asarray(self._matrix[batch]) @ centroids.T, axis=1
+            )
+        self._centroids = centroids
+        self._trained_size = num_vectors
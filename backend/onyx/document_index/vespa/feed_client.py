@@ -0,0 +1,206 @@
+"""
+Asynchronous feeding of documents to Vespa.
+
+Vespa's document API takes a single document per request, so feed throughput depends on
+keeping many requests in flight. Rather than blocking a thread on every request, all
+requests are multiplexed over HTTP/2 from a single event loop, with a bounded window of
+requests in flight at any time (similar to pyvespa's feed).
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Iterable
+from http import HTTPStatus
+from typing import Any
+
+import httpx
+from pydantic import BaseModel
+
+from onyx.configs.app_configs import VESPA_FEED_MAX_IN_FLIGHT
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_async_http_client
+from onyx.utils.logger import setup_logger
+from onyx.utils.threadpool_concurrency import run_async_sync_no_cancel
+
+logger = setup_logger()
+
+# Retry configuration constants
+INDEXING_MAX_RETRIES = 5
+INDEXING_BASE_DELAY = 1.0
+INDEXING_MAX_DELAY = 60.0
+
+NON_RETRYABLE_STATUS_CODES = (
+    HTTPStatus.BAD_REQUEST,
+    HTTPStatus.UNAUTHORIZED,
+    HTTPStatus.FORBIDDEN,
+    HTTPStatus.NOT_FOUND,
+)
+
+
+class VespaFeedOperation(BaseModel):
+    # only used for logging
+    document_id: str
+    url: str
+    fields: dict[str, Any]
+
+
+class VespaFeedStats(BaseModel):
+    num_operations: int
+    num_retries: int
+    elapsed_seconds: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_p99_ms: float
+
+    @property
+    def operations_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.num_operations / self.elapsed_seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{self.num_operations} operations in {self.elapsed_seconds:.2f}s "
+            f"({self.operations_per_second:.1f}/s), "
+            f"latency p50={self.latency_p50_ms:.1f}ms "
+            f"p95={self.latency_p95_ms:.1f}ms "
+            f"p99={self.latency_p99_ms:.1f}ms, "
+            f"retries={self.num_retries}"
+        )
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percentile / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def get_retry_delay(attempt: int, status_code: int | None) -> float | None:
+    """Returns how long to wait before retrying a failed feed request, or None if the
+    request must not be retried."""
+    if attempt >= INDEXING_MAX_RETRIES - 1:
+        return None
+
+    if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        # exponential backoff with jitter
+        return min(INDEXING_BASE_DELAY * (2**attempt), INDEXING_MAX_DELAY) * (
+            random.uniform(0.5, 1.0)
+        )
+
+    if (
+        status_code == HTTPStatus.INSUFFICIENT_STORAGE
+        or status_code in NON_RETRYABLE_STATUS_CODES
+    ):
+        return None
+
+    return INDEXING_BASE_DELAY * (1.5**attempt)
+
+
+class _FeedSession:
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self.client = client
+        self.latencies: list[float] = []
+        self.num_retries = 0
+
+    async def feed_operation(self, operation: VespaFeedOperation) -> None:
+        for attempt in range(INDEXING_MAX_RETRIES):
+            start = time.monotonic()
+            try:
+                response = await self.client.post(
+                    operation.url, json={"fields": operation.fields}
+                )
+                response.raise_for_status()
+                self.latencies.append(time.monotonic() - start)
+                return
+            except httpx.HTTPStatusError as e:
+                status_code = e.response.status_code
+                delay = get_retry_delay(attempt, status_code)
+                if delay is None:
+                    if status_code == HTTPStatus.INSUFFICIENT_STORAGE:
+                        logger.error(
+                            "NOTE: HTTP Status 507 Insufficient Storage usually means "
+                            "you need to allocate more memory or disk space to the "
+                            "Vespa/index container."
+                        )
+                    logger.error(
+                        f"Failed to index document: '{operation.document_id}'. "
+                        f"Got HTTP {status_code} response: '{e.response.text}'"
+                    )
+                    raise
+                logger.warning(
+                    f"HTTP error {status_code} while indexing document "
+                    f"'{operation.document_id}' "
+                    f"(attempt {attempt + 1}/{INDEXING_MAX_RETRIES}). "
+                    f"Retrying in {delay:.2f} seconds."
+                )
+            except Exception as e:
+                delay = get_retry_delay(attempt, None)
+                if delay is None:
+                    logger.exception(
+                        f"Failed to index document: '{operation.document_id}'"
+                    )
+                    raise
+                logger.warning(
+                    f"Error while indexing document '{operation.document_id}' "
+                    f"(attempt {attempt + 1}/{INDEXING_MAX_RETRIES}): {str(e)}. "
+                    f"Retrying in {delay:.2f} seconds."
+                )
+
+            self.num_retries += 1
+            await asyncio.sleep(delay)
+
+
+async def _feed_async(
+    operations: Iterable[VespaFeedOperation], max_in_flight: int
+) -> VespaFeedStats:
+    start = time.monotonic()
+    semaphore = asyncio.Semaphore(max(max_in_flight, 1))
+    tasks: set[asyncio.Task[None]] = set()
+
+    async with get_vespa_async_http_client() as client:
+        session = _FeedSession(client)
+
+        async def _run(operation: VespaFeedOperation) -> None:
+            try:
+                await session.feed_operation(operation)
+            finally:
+                semaphore.release()
+
+        try:
+            # operations are only pulled from the iterable once there is room in the
+            # window, so they can be built lazily
+            for operation in operations:
+                await semaphore.acquire()
+                # stop feeding as soon as any operation failed for good
+                for task in [task for task in tasks if task.done()]:
+                    tasks.discard(task)
+                    task.result()
+                tasks.add(asyncio.create_task(_run(operation)))
+
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies_ms = sorted(latency * 1000 for latency in session.latencies)
+    return VespaFeedStats(
+        num_operations=len(latencies_ms),
+        num_retries=session.num_retries,
+        elapsed_seconds=time.monotonic() - start,
+        latency_p50_ms=_percentile(latencies_ms, 50),
+        latency_p95_ms=_percentile(latencies_ms, 95),
+        latency_p99_ms=_percentile(latencies_ms, 99),
+    )
+
+
+def feed_vespa_documents(
+    operations: Iterable[VespaFeedOperation],
+    max_in_flight: int = VESPA_FEED_MAX_IN_FLIGHT,
+) -> VespaFeedStats:
+    """Feeds all operations, with at most max_in_flight requests outstanding at any
+    time. Raises the first error that could not be resolved by retrying, in which case
+    the remaining operations are not fed."""
+    return run_async_sync_no_cancel(_feed_async(operations, max_in_flight))
@@ -9,16 +9,24 @@ from collections.abc import Callable
 from datetime import datetime
 from datetime import timezone
 from http import HTTPStatus
+from typing import Any
 
 import httpx
 from retry import retry
 
+from onyx.configs.app_configs import VESPA_ASYNC_FEED_ENABLED
 from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
 from onyx.document_index.document_index_utils import get_uuid_from_chunk
 from onyx.document_index.document_index_utils import get_uuid_from_chunk_info_old
 from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
+from onyx.document_index.vespa.feed_client import feed_vespa_documents
+from onyx.document_index.vespa.feed_client import INDEXING_BASE_DELAY
+from onyx.document_index.vespa.feed_client import INDEXING_MAX_DELAY
+from onyx.document_index.vespa.feed_client import INDEXING_MAX_RETRIES
+from onyx.document_index.vespa.feed_client import VespaFeedOperation
+from onyx.document_index.vespa.feed_client import VespaFeedStats
 from onyx.document_index.vespa.shared_utils.utils import remove_invalid_unicode_chars
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
@@ -55,15 +63,14 @@ from onyx.document_index.vespa_constants import TITLE
 from onyx.document_index.vespa_constants import TITLE_EMBEDDING
 from onyx.document_index.vespa_constants import USER_PROJECT
 from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.utils.batching import batch_generator
 from onyx.utils.logger import setup_logger
 
 
 logger = setup_logger()
 
-# Retry configuration constants
-INDEXING_MAX_RETRIES = 5
-INDEXING_BASE_DELAY = 1.0
-INDEXING_MAX_DELAY = 60.0
+# Maximum number of documents per visit selection when looking up existing chunks
+_VISIT_MAX_DOCUMENT_IDS = 100
 
 
 @retry(tries=3, delay=1, backoff=2)
@@ -96,6 +103,56 @@ def _vespa_get_updated_at_attribute(t: datetime | None) -> int | None:
     return int(t.timestamp())
 
 
+@retry(tries=3, delay=1, backoff=2)
+def get_document_chunk_counts_via_visit(
+    document_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+    tenant_id: str | None = None,
+) -> dict[str, int]:
+    """Returns, for each document that currently has chunks in the index, the index of
+    its last (regular) chunk + 1. Uses a single visit per group of documents instead of
+    probing chunk ids one request at a time.
+
+    NOTE: document_ids must already be sanitized (replace_invalid_doc_id_characters)."""
+    url = DOCUMENT_ID_ENDPOINT.format(index_name=index_name)
+    doc_id_to_chunk_count: dict[str, int] = {}
+
+    for document_id_batch in batch_generator(document_ids, _VISIT_MAX_DOCUMENT_IDS):
+        doc_id_selection = " or ".join(
+            f"{index_name}.{DOCUMENT_ID}=='{document_id}'"
+            for document_id in document_id_batch
+        )
+        selection = (
+            f"({doc_id_selection}) and {index_name}.{LARGE_CHUNK_REFERENCE_IDS} == null"
+        )
+        if tenant_id:
+            selection += f" and {index_name}.{TENANT_ID}=='{tenant_id}'"
+
+        params: dict[str, str | int] = {
+            "selection": selection,
+            "fieldSet": f"{index_name}:{DOCUMENT_ID},{CHUNK_ID}",
+            "wantedDocumentCount": 1_000,
+        }
+        while True:
+            response = http_client.get(url, params=params)
+            response.raise_for_status()
+            response_data = response.json()
+
+            for document in response_data.get("documents", []):
+                fields = document["fields"]
+                document_id = fields[DOCUMENT_ID]
+                doc_id_to_chunk_count[document_id] = max(
+                    doc_id_to_chunk_count.get(document_id, 0), fields[CHUNK_ID] + 1
+                )
+
+            if not response_data.get("continuation"):
+                break
+            params["continuation"] = response_data["continuation"]
+
+    return doc_id_to_chunk_count
+
+
 def get_existing_documents_from_chunks(
     chunks: list[DocMetadataAwareIndexChunk],
     index_name: str,
@@ -132,21 +189,13 @@ def get_existing_documents_from_chunks(
     return document_ids
 
 
-def _index_vespa_chunk(
-    chunk: DocMetadataAwareIndexChunk,
-    index_name: str,
-    http_client: httpx.Client,
-    multitenant: bool,
-) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+def _build_vespa_chunk_fields(
+    chunk: DocMetadataAwareIndexChunk, multitenant: bool
+) -> dict[str, Any]:
     document = chunk.source_document
 
     # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
 
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
-
     embeddings = chunk.embeddings
 
     embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
@@ -221,7 +270,36 @@ def _index_vespa_chunk(
     if multitenant:
         if chunk.tenant_id:
             vespa_document_fields[TENANT_ID] = chunk.tenant_id
-    vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
+    return vespa_document_fields
+
+
+def _get_vespa_chunk_url(chunk: DocMetadataAwareIndexChunk, index_name: str) -> str:
+    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+    return f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
+
+
+def _build_vespa_feed_operation(
+    chunk: DocMetadataAwareIndexChunk, index_name: str, multitenant: bool
+) -> VespaFeedOperation:
+    return VespaFeedOperation(
+        document_id=chunk.source_document.id,
+        url=_get_vespa_chunk_url(chunk, index_name),
+        fields=_build_vespa_chunk_fields(chunk, multitenant),
+    )
+
+
+def _index_vespa_chunk(
+    chunk: DocMetadataAwareIndexChunk,
+    index_name: str,
+    http_client: httpx.Client,
+    multitenant: bool,
+) -> None:
+    json_header = {
+        "Content-Type": "application/json",
+    }
+    document = chunk.source_document
+    vespa_document_fields = _build_vespa_chunk_fields(chunk, multitenant)
+    vespa_url = _get_vespa_chunk_url(chunk, index_name)
     logger.debug(f'Indexing to URL "{vespa_url}"')
 
     # Retry logic with exponential backoff for rate limiting
@@ -312,16 +390,30 @@ def batch_index_vespa_chunks(
     http_client: httpx.Client,
     multitenant: bool,
     executor: concurrent.futures.ThreadPoolExecutor | None = None,
-) -> None:
+) -> VespaFeedStats | None:
     """Indexes a list of chunks in a Vespa index in parallel.
 
+    With the async feed enabled, the chunks are fed from an event loop with a bounded
+    number of requests in flight and the feed stats are returned. Otherwise every chunk
+    is posted from the executor's threads.
+
     Args:
         chunks: List of chunks to index.
         index_name: Name of the index to index into.
-        http_client: HTTP client to use for the request.
+        http_client: HTTP client to use for the request (thread based feed only).
         multitenant: Whether the index is multitenant.
-        executor: Executor to use for the request.
+        executor: Executor to use for the request (thread based feed only).
     """
+    if VESPA_ASYNC_FEED_ENABLED:
+        if not chunks:
+            return None
+        stats = feed_vespa_documents(
+            _build_vespa_feed_operation(chunk, index_name, multitenant)
+            for chunk in chunks
+        )
+        logger.info(f"Fed {len(chunks)} chunks to Vespa index {index_name}: {stats}")
+        return stats
+
     external_executor = True
 
     if not executor:
@@ -343,6 +435,8 @@ def batch_index_vespa_chunks(
         if not external_executor:
             executor.shutdown(wait=True)
 
+    return None
+
 
 def clean_chunk_id_copy(
     chunk: DocMetadataAwareIndexChunk,
@@ -79,6 +79,21 @@ def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx
     )
 
 
+def get_vespa_async_http_client(http2: bool = True) -> httpx.AsyncClient:
+    """Async counterpart of get_vespa_http_client, must be created (and closed) in the
+    event loop that uses it."""
+    return httpx.AsyncClient(
+        cert=(
+            cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
+            if MANAGED_VESPA
+            else None
+        ),
+        verify=False if not MANAGED_VESPA else True,
+        timeout=VESPA_REQUEST_TIMEOUT,
+        http2=http2,
+    )
+
+
 def wait_for_vespa_with_timeout(wait_interval: int = 5, wait_limit: int = 60) -> bool:
     """Waits for Vespa to become ready subject to a timeout.
     Returns True if Vespa is ready, False otherwise."""
@@ -10,6 +10,7 @@ from retry import retry
 from onyx.configs.app_configs import BLURB_SIZE
 from onyx.configs.app_configs import RECENCY_BIAS_MULTIPLIER
 from onyx.configs.app_configs import RERANK_COUNT
+from onyx.configs.app_configs import VESPA_ASYNC_FEED_ENABLED
 from onyx.configs.chat_configs import DOC_TIME_DECAY
 from onyx.configs.chat_configs import TITLE_CONTENT_RATIO
 from onyx.configs.constants import RETURN_SEPARATOR
@@ -38,6 +39,9 @@ from onyx.document_index.vespa.indexing_utils import BaseHTTPXClientContext
 from onyx.document_index.vespa.indexing_utils import batch_index_vespa_chunks
 from onyx.document_index.vespa.indexing_utils import check_for_final_chunk_existence
 from onyx.document_index.vespa.indexing_utils import clean_chunk_id_copy
+from onyx.document_index.vespa.indexing_utils import (
+    get_document_chunk_counts_via_visit,
+)
 from onyx.document_index.vespa.indexing_utils import GlobalHTTPXClientContext
 from onyx.document_index.vespa.indexing_utils import TemporaryHTTPXClientContext
 from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
@@ -87,6 +91,7 @@ def _enrich_basic_chunk_info(
     document_id: str,
     previous_chunk_count: int | None,
     new_chunk_count: int,
+    legacy_chunk_count: int | None = None,
 ) -> EnrichedDocumentIndexingInfo:
     """Determines which chunks need to be deleted during document reindexing.
 
@@ -107,6 +112,10 @@ def _enrich_basic_chunk_info(
         new_chunk_count: The total number of chunks the document has after
             reindexing. This becomes the starting index for deletion since
             chunks are 0-indexed.
+        legacy_chunk_count: For documents using the legacy chunk ID system, the
+            number of chunks found in the index up front (see
+            get_document_chunk_counts_via_visit). If None, the chunks are
+            probed one by one.
 
     Returns:
         EnrichedDocumentIndexingInfo with chunk_start_index set to
@@ -120,15 +129,18 @@ def _enrich_basic_chunk_info(
     is_old_version = False
     if last_indexed_chunk is None:
         is_old_version = True
-        minimal_doc_info = MinimalDocumentIndexingInfo(
-            doc_id=document_id, chunk_start_index=new_chunk_count
-        )
-        last_indexed_chunk = check_for_final_chunk_existence(
-            minimal_doc_info=minimal_doc_info,
-            start_index=new_chunk_count,
-            index_name=index_name,
-            http_client=http_client,
-        )
+        if legacy_chunk_count is not None:
+            last_indexed_chunk = max(legacy_chunk_count, new_chunk_count)
+        else:
+            minimal_doc_info = MinimalDocumentIndexingInfo(
+                doc_id=document_id, chunk_start_index=new_chunk_count
+            )
+            last_indexed_chunk = check_for_final_chunk_existence(
+                minimal_doc_info=minimal_doc_info,
+                start_index=new_chunk_count,
+                index_name=index_name,
+                http_client=http_client,
+            )
 
     assert (
         last_indexed_chunk is not None and last_indexed_chunk >= 0
@@ -454,7 +466,25 @@ class VespaDocumentIndex(DocumentIndex):
             # We require the start and end index for each document in order to
             # know precisely which chunks to delete. This information exists for
             # documents that have `chunk_count` in the database, but not for
-            # `old_version` documents.
+            # `old_version` documents. Those are all looked up with one visit.
+            legacy_doc_ids = [
+                doc_id
+                for doc_id, previous_chunk_cnt in doc_id_to_previous_chunk_cnt.items()
+                if previous_chunk_cnt is None
+            ]
+            legacy_doc_id_to_chunk_cnt = (
+                get_document_chunk_counts_via_visit(
+                    document_ids=[
+                        replace_invalid_doc_id_characters(doc_id)
+                        for doc_id in legacy_doc_ids
+                    ],
+                    index_name=self._index_name,
+                    http_client=http_client,
+                    tenant_id=self._tenant_id if self._multitenant else None,
+                )
+                if legacy_doc_ids
+                else {}
+            )
             enriched_doc_infos: list[EnrichedDocumentIndexingInfo] = [
                 _enrich_basic_chunk_info(
                     index_name=self._index_name,
@@ -462,6 +492,9 @@ class VespaDocumentIndex(DocumentIndex):
                     document_id=doc_id,
                     previous_chunk_count=doc_id_to_previous_chunk_cnt[doc_id],
                     new_chunk_count=doc_id_to_new_chunk_cnt[doc_id],
+                    legacy_chunk_count=legacy_doc_id_to_chunk_cnt.get(
+                        replace_invalid_doc_id_characters(doc_id), 0
+                    ),
                 )
                 for doc_id in doc_id_to_chunk_cnt_diff.keys()
                 # TODO(andrei), WARNING: Don't we need to sanitize these doc IDs?
@@ -499,8 +532,12 @@ class VespaDocumentIndex(DocumentIndex):
                     executor=executor,
                 )
 
-            # Insert new Vespa documents.
-            for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
+            # Insert new Vespa documents. The async feed keeps its own bounded
+            # window of requests in flight, so it takes all chunks at once.
+            feed_batch_size = (
+                max(len(cleaned_chunks), 1) if VESPA_ASYNC_FEED_ENABLED else BATCH_SIZE
+            )
+            for chunk_batch in batch_generator(cleaned_chunks, feed_batch_size):
                 batch_index_vespa_chunks(
                     chunks=chunk_batch,
                     index_name=self._index_name,
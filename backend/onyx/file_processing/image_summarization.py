@@ -1,8 +1,11 @@
 import base64
+import threading
 from io import BytesIO
 
 from PIL import Image
 
+from onyx.configs.app_configs import IMAGE_SUMMARIZATION_MAX_CONCURRENCY
+from onyx.configs.app_configs import IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER
 from onyx.configs.app_configs import IMAGE_SUMMARIZATION_SYSTEM_PROMPT
 from onyx.configs.app_configs import IMAGE_SUMMARIZATION_USER_PROMPT
 from onyx.llm.interfaces import LLM
@@ -20,10 +23,36 @@ from onyx.utils.logger import setup_logger
 logger = setup_logger()
 
 
+_provider_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_provider_semaphores_lock = threading.Lock()
+
+
 class UnsupportedImageFormatError(ValueError):
     """Raised when an image uses a MIME type unsupported by the summarization flow."""
 
 
+def get_image_summarization_concurrency(model_provider: str) -> int:
+    return max(
+        IMAGE_SUMMARIZATION_MAX_CONCURRENCY_BY_PROVIDER.get(
+            model_provider, IMAGE_SUMMARIZATION_MAX_CONCURRENCY
+        ),
+        1,
+    )
+
+
+def get_image_summarization_semaphore(
+    model_provider: str,
+) -> threading.BoundedSemaphore:
+    """Shared by everything summarizing images in this process, so concurrent indexing
+    batches don't multiply the load on the provider."""
+    with _provider_semaphores_lock:
+        if model_provider not in _provider_semaphores:
+            _provider_semaphores[model_provider] = threading.BoundedSemaphore(
+                get_image_summarization_concurrency(model_provider)
+            )
+        return _provider_semaphores[model_provider]
+
+
 def prepare_image_bytes(image_data: bytes) -> str:
     """Prepare image bytes for summarization.
     Resizes image if it's larger than 20MB. Encodes image as a base64 string."""
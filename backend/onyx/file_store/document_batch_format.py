@@ -0,0 +1,107 @@
+"""
+Binary format for the document batches handed from docfetching to docprocessing.
+
+Layout:
+    header:  4 byte magic + 1 byte format version
+    body:    a single zstd frame containing one record per document, where each record
+             is a 4 byte big-endian length followed by the orjson encoded document
+
+Every document is its own record, so a batch can be decoded one document at a time
+straight from the (compressed) file instead of parsing the whole blob up front.
+"""
+
+import struct
+from collections.abc import Iterator
+from io import BytesIO
+from typing import IO
+
+import orjson
+import zstandard
+from pydantic import BaseModel
+
+from onyx.connectors.models import Document
+
+DOCUMENT_BATCH_MAGIC = b"OXDB"
+DOCUMENT_BATCH_FORMAT_VERSION = 1
+DOCUMENT_BATCH_FILE_EXTENSION = "batch"
+DOCUMENT_BATCH_FILE_TYPE = "application/vnd.onyx.document-batch+zstd"
+
+_HEADER = struct.Struct(">4sB")
+_RECORD_LENGTH = struct.Struct(">I")
+
+
+class DocumentBatchFormatError(ValueError):
+    pass
+
+
+class SerializedDocumentBatch(BaseModel):
+    data: bytes
+    uncompressed_size: int
+
+    @property
+    def compressed_size(self) -> int:
+        return len(self.data)
+
+
+def serialize_document_batch(
+    documents: list[Document], compression_level: int = 3
+) -> SerializedDocumentBatch:
+    output = BytesIO()
+    output.write(_HEADER.pack(DOCUMENT_BATCH_MAGIC, DOCUMENT_BATCH_FORMAT_VERSION))
+
+    compressor = zstandard.ZstdCompressor(level=compression_level).compressobj()
+    uncompressed_size = 0
+    for document in documents:
+        # mode="json" so that datetimes etc. round trip the same way as the JSON format
+        payload = orjson.dumps(document.model_dump(mode="json"))
+        record = _RECORD_LENGTH.pack(len(payload)) + payload
+        uncompressed_size += len(record)
+        output.write(compressor.compress(record))
+    output.write(compressor.flush())
+
+    return SerializedDocumentBatch(
+        data=output.getvalue(), uncompressed_size=uncompressed_size
+    )
+
+
+def _read_exactly(reader: IO[bytes], size: int) -> bytes:
+    """Reads size bytes, or returns fewer bytes only if the end of the stream is hit."""
+    parts: list[bytes] = []
+    remaining = size
+    while remaining > 0:
+        part = reader.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+def iter_document_batch(stream: IO[bytes]) -> Iterator[Document]:
+    """Yields the documents of a binary batch one at a time while decompressing it."""
+    header = _read_exactly(stream, _HEADER.size)
+    if len(header) != _HEADER.size:
+        raise DocumentBatchFormatError("Document batch is missing its header")
+
+    magic, version = _HEADER.unpack(header)
+    if magic != DOCUMENT_BATCH_MAGIC:
+        raise DocumentBatchFormatError("Not a binary document batch")
+    if version != DOCUMENT_BATCH_FORMAT_VERSION:
+        raise DocumentBatchFormatError(
+            f"Unsupported document batch format version: {version}"
+        )
+
+    with zstandard.ZstdDecompressor().stream_reader(stream) as reader:
+        while True:
+            length_bytes = _read_exactly(reader, _RECORD_LENGTH.size)
+            if not length_bytes:
+                return
+            if len(length_bytes) != _RECORD_LENGTH.size:
+                raise DocumentBatchFormatError("Truncated document batch")
+
+            (length,) = _RECORD_LENGTH.unpack(length_bytes)
+            payload = _read_exactly(reader, length)
+            if len(payload) != length:
+                raise DocumentBatchFormatError("Truncated document batch")
+
+            yield Document.model_validate(orjson.loads(payload))
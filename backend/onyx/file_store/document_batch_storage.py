@@ -1,24 +1,38 @@
 import json
 from abc import ABC
 from abc import abstractmethod
+from collections.abc import Generator
+from collections.abc import Iterator
 from enum import Enum
+from io import BytesIO
 from io import StringIO
+from typing import IO
 from typing import List
 from typing import Optional
 from typing import TypeAlias
 
 from pydantic import BaseModel
 
+from onyx.configs.app_configs import DOCUMENT_BATCH_BINARY_FORMAT_ENABLED
+from onyx.configs.app_configs import DOCUMENT_BATCH_COMPRESSION_LEVEL
 from onyx.configs.constants import FileOrigin
 from onyx.connectors.models import DocExtractionContext
 from onyx.connectors.models import DocIndexingContext
 from onyx.connectors.models import Document
+from onyx.file_store.document_batch_format import DOCUMENT_BATCH_FILE_EXTENSION
+from onyx.file_store.document_batch_format import DOCUMENT_BATCH_FILE_TYPE
+from onyx.file_store.document_batch_format import iter_document_batch
+from onyx.file_store.document_batch_format import serialize_document_batch
 from onyx.file_store.file_store import FileStore
 from onyx.file_store.file_store import get_default_file_store
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# batches written before the binary format was introduced
+LEGACY_DOCUMENT_BATCH_FILE_EXTENSION = "json"
+LEGACY_DOCUMENT_BATCH_FILE_TYPE = "application/json"
+
 
 class DocumentBatchStorageStateType(str, Enum):
     EXTRACTION = "extraction"
@@ -55,6 +69,10 @@ class DocumentBatchStorage(ABC):
     def get_batch(self, batch_num: int) -> Optional[List[Document]]:
         """Retrieve a batch of documents."""
 
+    @abstractmethod
+    def iter_batch(self, batch_num: int) -> Iterator[Document] | None:
+        """Retrieve a batch of documents one at a time, None if there is no batch."""
+
     @abstractmethod
     def delete_batch_by_name(self, batch_file_name: str) -> None:
         """Delete a specific batch."""
@@ -84,12 +102,12 @@ class DocumentBatchStorage(ABC):
         """Extract path info from a path."""
 
     def _serialize_documents(self, documents: list[Document]) -> str:
-        """Serialize documents to JSON string."""
+        """Serialize documents to JSON string (legacy format)."""
         # Use mode='json' to properly serialize datetime and other complex types
         return json.dumps([doc.model_dump(mode="json") for doc in documents], indent=2)
 
     def _deserialize_documents(self, data: str) -> list[Document]:
-        """Deserialize documents from JSON string."""
+        """Deserialize documents from JSON string (legacy format)."""
         doc_dicts = json.loads(data)
         return [Document.model_validate(doc_dict) for doc_dict in doc_dicts]
 
@@ -105,31 +123,67 @@ class FileStoreDocumentBatchStorage(DocumentBatchStorage):
         super().__init__(cc_pair_id, index_attempt_id)
         self.file_store = file_store
 
-    def _get_batch_file_name(self, batch_num: int) -> str:
+    def _get_batch_file_name(self, batch_num: int, legacy: bool = False) -> str:
         """Generate file name for a document batch."""
-        return f"{self.base_path}/{batch_num}.json"
+        extension = (
+            LEGACY_DOCUMENT_BATCH_FILE_EXTENSION
+            if legacy
+            else DOCUMENT_BATCH_FILE_EXTENSION
+        )
+        return f"{self.base_path}/{batch_num}.{extension}"
+
+    def _find_batch_file(self, batch_num: int) -> tuple[str, bool] | None:
+        """Returns the file name of the batch and whether it is in the legacy format."""
+        for legacy, file_type in (
+            (False, DOCUMENT_BATCH_FILE_TYPE),
+            (True, LEGACY_DOCUMENT_BATCH_FILE_TYPE),
+        ):
+            file_name = self._get_batch_file_name(batch_num, legacy=legacy)
+            if self.file_store.has_file(
+                file_id=file_name,
+                file_origin=FileOrigin.OTHER,
+                file_type=file_type,
+            ):
+                return file_name, legacy
+        return None
 
     def store_batch(self, batch_num: int, documents: list[Document]) -> None:
         """Store a batch of documents using FileStore."""
-        file_name = self._get_batch_file_name(batch_num)
+        legacy = not DOCUMENT_BATCH_BINARY_FORMAT_ENABLED
+        file_name = self._get_batch_file_name(batch_num, legacy=legacy)
         try:
-            data = self._serialize_documents(documents)
-            content = StringIO(data)
+            content: IO
+            if legacy:
+                data = self._serialize_documents(documents)
+                content = StringIO(data)
+                file_type = LEGACY_DOCUMENT_BATCH_FILE_TYPE
+                uncompressed_size = compressed_size = len(data)
+            else:
+                batch = serialize_document_batch(
+                    documents, compression_level=DOCUMENT_BATCH_COMPRESSION_LEVEL
+                )
+                content = BytesIO(batch.data)
+                file_type = DOCUMENT_BATCH_FILE_TYPE
+                uncompressed_size = batch.uncompressed_size
+                compressed_size = batch.compressed_size
 
             self.file_store.save_file(
                 file_id=file_name,
                 content=content,
                 display_name=f"Document Batch {batch_num}",
                 file_origin=FileOrigin.OTHER,
-                file_type="application/json",
+                file_type=file_type,
                 file_metadata={
                     "batch_num": batch_num,
                     "document_count": str(len(documents)),
+                    "uncompressed_size": str(uncompressed_size),
+                    "compressed_size": str(compressed_size),
                 },
             )
 
             logger.debug(
-                f"Stored batch {batch_num} with {len(documents)} documents to FileStore as {file_name}"
+                f"Stored batch {batch_num} with {len(documents)} documents to FileStore as {file_name} "
+                f"(uncompressed={uncompressed_size} bytes, compressed={compressed_size} bytes)"
             )
         except Exception as e:
             logger.error(f"Failed to store batch {batch_num}: {e}")
@@ -137,27 +191,46 @@ class FileStoreDocumentBatchStorage(DocumentBatchStorage):
 
     def get_batch(self, batch_num: int) -> list[Document] | None:
         """Retrieve a batch of documents from FileStore."""
-        file_name = self._get_batch_file_name(batch_num)
-        try:
-            # Check if file exists
-            if not self.file_store.has_file(
-                file_id=file_name,
-                file_origin=FileOrigin.OTHER,
-                file_type="application/json",
-            ):
-                logger.warning(
-                    f"Batch {batch_num} not found in FileStore with name {file_name}"
-                )
-                return None
-
-            content_io = self.file_store.read_file(file_name)
-            data = content_io.read().decode("utf-8")
+        document_iter = self.iter_batch(batch_num)
+        if document_iter is None:
+            return None
 
-            documents = self._deserialize_documents(data)
-            logger.debug(
-                f"Retrieved batch {batch_num} with {len(documents)} documents from FileStore"
+        documents = list(document_iter)
+        logger.debug(
+            f"Retrieved batch {batch_num} with {len(documents)} documents from FileStore"
+        )
+        return documents
+
+    def iter_batch(self, batch_num: int) -> Iterator[Document] | None:
+        """Retrieve a batch of documents from FileStore one at a time. Binary batches
+        are decoded while the file is read, so the first documents can be processed
+        before the rest of the batch is parsed. The file stays open until the
+        iterator is exhausted or closed."""
+        batch_file = self._find_batch_file(batch_num)
+        if batch_file is None:
+            logger.warning(
+                f"Batch {batch_num} not found in FileStore with name "
+                f"{self._get_batch_file_name(batch_num)}"
             )
-            return documents
+            return None
+
+        file_name, legacy = batch_file
+        return self._iter_batch_file(batch_num, file_name, legacy)
+
+    def _iter_batch_file(
+        self, batch_num: int, file_name: str, legacy: bool
+    ) -> Generator[Document, None, None]:
+        try:
+            if legacy:
+                content_io = self.file_store.read_file(file_name)
+                data = content_io.read().decode("utf-8")
+                yield from self._deserialize_documents(data)
+            else:
+                # spooled to a temp file, so the compressed blob is never held in memory
+                with self.file_store.read_file(
+                    file_name, use_tempfile=True
+                ) as content_io:
+                    yield from iter_document_batch(content_io)
         except Exception as e:
             logger.error(f"Failed to retrieve batch {batch_num}: {e}")
             raise
@@ -169,7 +242,11 @@ class FileStoreDocumentBatchStorage(DocumentBatchStorage):
 
     def delete_batch_by_num(self, batch_num: int) -> None:
         """Delete a specific batch from FileStore."""
-        batch_file_name = self._get_batch_file_name(batch_num)
+        batch_file = self._find_batch_file(batch_num)
+        if batch_file is None:
+            # same behavior as deleting a missing file by name
+            batch_file = (self._get_batch_file_name(batch_num), False)
+        batch_file_name, _ = batch_file
         self.delete_batch_by_name(batch_file_name)
         logger.debug(f"Deleted batch num {batch_num} {batch_file_name} from FileStore")
 
@@ -200,7 +277,12 @@ class FileStoreDocumentBatchStorage(DocumentBatchStorage):
                     f"Could not extract path info from batch file: {batch_file_name}"
                 )
                 continue
-            new_batch_file_name = self._get_batch_file_name(path_info.batch_num)
+            new_batch_file_name = self._get_batch_file_name(
+                path_info.batch_num,
+                legacy=batch_file_name.endswith(
+                    f".{LEGACY_DOCUMENT_BATCH_FILE_EXTENSION}"
+                ),
+            )
             self.file_store.change_file_id(batch_file_name, new_batch_file_name)
 
     def extract_path_info(self, path: str) -> BatchStoragePathInfo | None:
@@ -214,7 +296,7 @@ class FileStoreDocumentBatchStorage(DocumentBatchStorage):
             return BatchStoragePathInfo(
                 cc_pair_id=int(cc_pair_id),
                 index_attempt_id=int(index_attempt_id),
-                batch_num=int(batch_num.split(".")[0]),  # remove .json
+                batch_num=int(batch_num.split(".")[0]),  # remove the extension
             )
         except Exception as e:
             logger.error(f"Failed to extract path info from {path}: {e}")
@@ -12,6 +12,7 @@ from onyx.connectors.models import IndexAttemptMetadata
 from onyx.db.chunk import update_chunk_boost_components__no_commit
 from onyx.db.document import fetch_chunk_counts_for_documents
 from onyx.db.document import mark_document_as_indexed_for_cc_pair__no_commit
+from onyx.db.document import prepare_to_modify_available_documents
 from onyx.db.document import prepare_to_modify_documents
 from onyx.db.document import update_docs_chunk_count__no_commit
 from onyx.db.document import update_docs_last_modified__no_commit
@@ -83,6 +84,16 @@ class DocumentIndexingBatchAdapter:
         ) as transaction:
             yield transaction
 
+    @contextlib.contextmanager
+    def lock_available_context(
+        self, documents: list[Document]
+    ) -> Generator[tuple[TransactionalContext, set[str], set[str]], None, None]:
+        """Lock whichever docs are not locked by another worker right now."""
+        with prepare_to_modify_available_documents(
+            db_session=self.db_session, document_ids=[doc.id for doc in documents]
+        ) as (transaction, locked_ids, missing_ids):
+            yield transaction, locked_ids, missing_ids
+
     def build_metadata_aware_chunks(
         self,
         chunks_with_embeddings: list[IndexChunk],
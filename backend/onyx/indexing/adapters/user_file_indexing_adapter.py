@@ -53,6 +53,31 @@ def _acquire_user_file_locks(db_session: Session, user_file_ids: list[str]) -> b
     return True
 
 
+def _acquire_available_user_file_locks(
+    db_session: Session, user_file_ids: list[str]
+) -> tuple[set[str], set[str]]:
+    """Lock the specified user files that are not locked by another transaction.
+    Returns the IDs of the locked user files and of the ones that don't exist."""
+    user_file_uuid_list = [UUID(user_file_id) for user_file_id in user_file_ids]
+    existing_ids = set(
+        db_session.scalars(
+            select(UserFile.id).where(UserFile.id.in_(user_file_uuid_list))
+        ).all()
+    )
+    stmt = (
+        select(UserFile.id)
+        .where(UserFile.id.in_(existing_ids))
+        .with_for_update(skip_locked=True)
+    )
+    locked_ids = {str(user_file_id) for user_file_id in db_session.scalars(stmt).all()}
+    missing_ids = {
+        user_file_id
+        for user_file_id, user_file_uuid in zip(user_file_ids, user_file_uuid_list)
+        if user_file_uuid not in existing_ids
+    }
+    return locked_ids, missing_ids
+
+
 class UserFileIndexingAdapter:
     def __init__(self, tenant_id: str, db_session: Session):
         self.tenant_id = tenant_id
@@ -94,6 +119,18 @@ class UserFileIndexingAdapter:
                 f"for user files: {[doc.id for doc in documents]}"
             )
 
+    @contextlib.contextmanager
+    def lock_available_context(
+        self, documents: list[Document]
+    ) -> Generator[tuple[TransactionalContext, set[str], set[str]], None, None]:
+        self.db_session.commit()  # ensure that we're not in a transaction
+        with self.db_session.begin() as transaction:
+            locked_ids, missing_ids = _acquire_available_user_file_locks(
+                db_session=self.db_session,
+                user_file_ids=[doc.id for doc in documents],
+            )
+            yield transaction, locked_ids, missing_ids
+
     def build_metadata_aware_chunks(
         self,
         chunks_with_embeddings: list[IndexChunk],
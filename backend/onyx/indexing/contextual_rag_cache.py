@@ -0,0 +1,76 @@
+"""
+Content-addressed cache for contextual RAG document summaries and chunk contexts.
+
+Without it, every chunk of a document is situated within its document again each time
+the document is re-indexed, even if nothing changed. The outputs are stored keyed by a
+hash of the full prompt (which contains the template and the document / chunk content)
+and the model, so only new or edited content goes to the LLM.
+"""
+
+import hashlib
+import os
+import threading
+
+from onyx.configs.app_configs import CONTEXTUAL_RAG_CACHE_DIR
+from onyx.configs.app_configs import CONTEXTUAL_RAG_CACHE_ENABLED
+from onyx.configs.app_configs import CONTEXTUAL_RAG_CACHE_MAX_ENTRIES
+from onyx.indexing.text_cache import TextCache
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_DB_FILE_NAME = "contextual_rag_cache.sqlite3"
+# Bump when the way the outputs are generated changes beyond the prompts themselves
+_PROMPT_VERSION = "1"
+
+
+def build_contextual_rag_cache_key(
+    prompt: str,
+    model_provider: str,
+    model_name: str,
+    max_tokens: int,
+    tenant_id: str | None = None,
+) -> str:
+    """Everything that influences the output must be part of the key. The tenant
+    is included so that cache hits can never reveal content across tenants."""
+    hasher = hashlib.sha256()
+    for part in (
+        _PROMPT_VERSION,
+        tenant_id or "",
+        model_provider,
+        model_name,
+        str(max_tokens),
+    ):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    hasher.update(prompt.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+_contextual_rag_cache: TextCache | None = None
+_contextual_rag_cache_lock = threading.Lock()
+
+
+def get_contextual_rag_cache() -> TextCache | None:
+    """Returns the process-wide cache, or None if caching is disabled or the store
+    could not be opened (indexing must never fail because of the cache)."""
+    global _contextual_rag_cache
+
+    if not CONTEXTUAL_RAG_CACHE_ENABLED:
+        return None
+
+    if _contextual_rag_cache is None:
+        with _contextual_rag_cache_lock:
+            if _contextual_rag_cache is None:
+                try:
+                    _contextual_rag_cache = TextCache(
+                        db_path=os.path.join(CONTEXTUAL_RAG_CACHE_DIR, _DB_FILE_NAME),
+                        max_entries=CONTEXTUAL_RAG_CACHE_MAX_ENTRIES,
+                        name="contextual_rag",
+                    )
+                except Exception:
+                    logger.exception(
+                        "Failed to open the contextual RAG cache, disabling it"
+                    )
+                    return None
+    return _contextual_rag_cache
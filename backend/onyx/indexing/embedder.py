@@ -2,11 +2,17 @@ import time
 from abc import ABC
 from abc import abstractmethod
 from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Sequence
 
 from onyx.connectors.models import ConnectorFailure
 from onyx.connectors.models import ConnectorStopSignal
 from onyx.connectors.models import DocumentFailure
 from onyx.db.models import SearchSettings
+from onyx.indexing.embedding_cache import build_embedding_cache_key
+from onyx.indexing.embedding_cache import EmbeddingCache
+from onyx.indexing.embedding_cache import EmbeddingCacheStats
+from onyx.indexing.embedding_cache import get_embedding_cache
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.indexing.models import ChunkEmbedding
 from onyx.indexing.models import DocAwareChunk
@@ -51,6 +57,7 @@ class IndexingEmbedder(ABC):
         self.api_url = api_url
         self.api_version = api_version
         self.deployment_name = deployment_name
+        self.reduced_dimension = reduced_dimension
 
         self.embedding_model = EmbeddingModel(
             model_name=model_name,
@@ -94,6 +101,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         deployment_name: str | None = None,
         reduced_dimension: int | None = None,
         callback: IndexingHeartbeatInterface | None = None,
+        embedding_cache: EmbeddingCache | None = None,
     ):
         super().__init__(
             model_name,
@@ -108,6 +116,59 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             reduced_dimension,
             callback,
         )
+        self.embedding_cache = embedding_cache
+        # accumulated over every embed_chunks call made with this embedder
+        self.cache_stats = EmbeddingCacheStats()
+
+    def _encode_with_cache(
+        self,
+        texts: list[str],
+        encode: Callable[[list[str]], Sequence[Embedding]],
+        large_chunks_present: bool = False,
+        tenant_id: str | None = None,
+    ) -> Sequence[Embedding]:
+        """Only passes the texts not found in the embedding cache to `encode`.
+        Cache failures fall back to embedding everything."""
+        if self.embedding_cache is None:
+            return encode(texts)
+
+        keys = [
+            build_embedding_cache_key(
+                text=text,
+                model_name=self.model_name,
+                normalize=self.normalize,
+                prefix=self.passage_prefix,
+                provider_type=self.provider_type.value if self.provider_type else None,
+                reduced_dimension=self.reduced_dimension,
+                large_chunks_present=large_chunks_present,
+                tenant_id=tenant_id,
+            )
+            for text in texts
+        ]
+
+        cached: dict[str, Embedding] = {}
+        try:
+            cached = self.embedding_cache.get_many(keys)
+        except Exception:
+            logger.exception("Failed to read from the embedding cache")
+
+        # identical texts within the batch only need to be embedded once
+        miss_keys = list(dict.fromkeys(key for key in keys if key not in cached))
+        self.cache_stats.hits += len(keys) - len(miss_keys)
+        self.cache_stats.misses += len(miss_keys)
+
+        if miss_keys:
+            text_by_key = dict(zip(keys, texts))
+            new_entries = dict(
+                zip(miss_keys, encode([text_by_key[key] for key in miss_keys]))
+            )
+            cached.update(new_entries)
+            try:
+                self.embedding_cache.put_many(new_entries)
+            except Exception:
+                logger.exception("Failed to write to the embedding cache")
+
+        return [cached[key] for key in keys]
 
     @log_function_time()
     def embed_chunks(
@@ -144,12 +205,17 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
                     raise RuntimeError("Large chunk contains mini chunks")
                 flat_chunk_texts.extend(chunk.mini_chunk_texts)
 
-        embeddings = self.embedding_model.encode(
-            texts=flat_chunk_texts,
-            text_type=EmbedTextType.PASSAGE,
+        embeddings = self._encode_with_cache(
+            flat_chunk_texts,
+            encode=lambda texts: self.embedding_model.encode(
+                texts=texts,
+                text_type=EmbedTextType.PASSAGE,
+                large_chunks_present=large_chunks_present,
+                tenant_id=tenant_id,
+                request_id=request_id,
+            ),
             large_chunks_present=large_chunks_present,
             tenant_id=tenant_id,
-            request_id=request_id,
         )
 
         chunk_titles = {
@@ -164,11 +230,15 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         # Cache the Title embeddings to only have to do it once
         title_embed_dict: dict[str, Embedding] = {}
         if chunk_titles_list:
-            title_embeddings = self.embedding_model.encode(
+            title_embeddings = self._encode_with_cache(
                 chunk_titles_list,
-                text_type=EmbedTextType.PASSAGE,
+                encode=lambda texts: self.embedding_model.encode(
+                    texts,
+                    text_type=EmbedTextType.PASSAGE,
+                    tenant_id=tenant_id,
+                    request_id=request_id,
+                ),
                 tenant_id=tenant_id,
-                request_id=request_id,
             )
             title_embed_dict.update(
                 {
@@ -211,7 +281,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
                 **chunk.model_dump(),
                 embeddings=ChunkEmbedding(
                     full_embedding=chunk_embeddings[0],
-                    mini_chunk_embeddings=chunk_embeddings[1:],
+                    mini_chunk_embeddings=list(chunk_embeddings[1:]),
                 ),
                 title_embedding=title_embedding,
             )
@@ -238,6 +308,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             deployment_name=search_settings.deployment_name,
             reduced_dimension=search_settings.reduced_dimension,
             callback=callback,
+            embedding_cache=get_embedding_cache(),
         )
 
 
@@ -0,0 +1,187 @@
+"""
+Content-addressed cache for passage embeddings.
+
+When a document is updated (or an attempt is re-run from scratch), most of its chunk texts
+are byte-identical to what was embedded last time. Vectors are stored keyed by a hash of
+everything that determines them, so only chunks whose text actually changed go to the model
+server / embedding provider.
+
+The store is a local SQLite file so that all indexing worker processes on a host share it.
+It is bounded by entry count; the least recently used entries are evicted first.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+
+from pydantic import BaseModel
+
+from onyx.configs.app_configs import EMBEDDING_CACHE_DIR
+from onyx.configs.app_configs import EMBEDDING_CACHE_ENABLED
+from onyx.configs.app_configs import EMBEDDING_CACHE_MAX_ENTRIES
+from onyx.utils.logger import setup_logger
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+_DB_FILE_NAME = "embedding_cache.sqlite3"
+# Once over capacity, evict down to this fraction so eviction doesn't run on every write
+_EVICTION_TARGET_RATIO = 0.9
+# SQLite limits the number of bound parameters in a single statement
+_MAX_PARAMS_PER_QUERY = 500
+
+
+class EmbeddingCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def build_embedding_cache_key(
+    text: str,
+    model_name: str,
+    normalize: bool,
+    prefix: str | None,
+    provider_type: str | None = None,
+    reduced_dimension: int | None = None,
+    large_chunks_present: bool = False,
+    tenant_id: str | None = None,
+) -> str:
+    """Everything that influences the resulting vector must be part of the key. The tenant
+    is included so that cache hits can never reveal content across tenants."""
+    hasher = hashlib.sha256()
+    for part in (
+        tenant_id or "",
+        provider_type or "",
+        model_name,
+        str(normalize),
+        prefix or "",
+        str(reduced_dimension or ""),
+        str(large_chunks_present),
+    ):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def _serialize(embedding: Embedding) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+def _deserialize(blob: bytes) -> Embedding:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str, max_entries: int) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, "
+                "embedding BLOB NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # multiple indexing processes write to the same file, wait for their locks
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, Embedding]:
+        found: dict[str, Embedding] = {}
+        if not keys:
+            return found
+
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), _MAX_PARAMS_PER_QUERY):
+                key_batch = list(keys[start : start + _MAX_PARAMS_PER_QUERY])
+                placeholders = ",".join("?" * len(key_batch))
+                rows = conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                    key_batch,
+                ).fetchall()
+                found.update({key: _deserialize(blob) for key, blob in rows})
+
+                hit_keys = [key for key, _ in rows]
+                if hit_keys:
+                    conn.execute(
+                        "UPDATE embeddings SET last_used = ? WHERE key IN "
+                        f"({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+        return found
+
+    def put_many(self, entries: dict[str, Embedding]) -> None:
+        if not entries:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) "
+                "VALUES (?, ?, ?)",
+                [(key, _serialize(vector), now) for key, vector in entries.items()],
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_entries:
+            return
+
+        to_delete = count - int(self.max_entries * _EVICTION_TARGET_RATIO)
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (to_delete,),
+        )
+        logger.debug(f"Evicted {to_delete} entries from the embedding cache")
+
+
+_embedding_cache: EmbeddingCache | None = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Returns the process-wide cache, or None if caching is disabled or the store
+    could not be opened (indexing must never fail because of the cache)."""
+    global _embedding_cache
+
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                try:
+                    _embedding_cache = EmbeddingCache(
+                        db_path=os.path.join(EMBEDDING_CACHE_DIR, _DB_FILE_NAME),
+                        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                    )
+                except Exception:
+                    logger.exception("Failed to open the embedding cache, disabling it")
+                    return None
+    return _embedding_cache
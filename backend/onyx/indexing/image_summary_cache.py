@@ -0,0 +1,80 @@
+"""
+Content-addressed cache for image summaries.
+
+Summarizing an image with a vision LLM is by far the most expensive part of indexing
+image heavy documents, and the same images (logos, repeated diagram exports, unchanged
+slides of a re-indexed deck) come up again and again. Summaries are stored keyed by a
+hash of the image bytes, the model and the prompts, so only new images go to the LLM.
+
+Summaries are kept in a TextCache, shared by the indexing workers of a host.
+"""
+
+import hashlib
+import os
+import threading
+
+from onyx.configs.app_configs import IMAGE_SUMMARY_CACHE_DIR
+from onyx.configs.app_configs import IMAGE_SUMMARY_CACHE_ENABLED
+from onyx.configs.app_configs import IMAGE_SUMMARY_CACHE_MAX_ENTRIES
+from onyx.indexing.text_cache import TextCache
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_DB_FILE_NAME = "image_summary_cache.sqlite3"
+# Bump when the way summaries are generated changes beyond the prompts themselves
+_SUMMARY_VERSION = "1"
+
+
+def build_image_summary_cache_key(
+    image_data: bytes,
+    model_provider: str,
+    model_name: str,
+    system_prompt: str,
+    user_prompt: str,
+    tenant_id: str | None = None,
+) -> str:
+    """Everything that influences the summary must be part of the key. The tenant
+    is included so that cache hits can never reveal content across tenants."""
+    hasher = hashlib.sha256()
+    for part in (
+        _SUMMARY_VERSION,
+        tenant_id or "",
+        model_provider,
+        model_name,
+        system_prompt,
+        user_prompt,
+    ):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    hasher.update(image_data)
+    return hasher.hexdigest()
+
+
+_image_summary_cache: TextCache | None = None
+_image_summary_cache_lock = threading.Lock()
+
+
+def get_image_summary_cache() -> TextCache | None:
+    """Returns the process-wide cache, or None if caching is disabled or the store
+    could not be opened (indexing must never fail because of the cache)."""
+    global _image_summary_cache
+
+    if not IMAGE_SUMMARY_CACHE_ENABLED:
+        return None
+
+    if _image_summary_cache is None:
+        with _image_summary_cache_lock:
+            if _image_summary_cache is None:
+                try:
+                    _image_summary_cache = TextCache(
+                        db_path=os.path.join(IMAGE_SUMMARY_CACHE_DIR, _DB_FILE_NAME),
+                        max_entries=IMAGE_SUMMARY_CACHE_MAX_ENTRIES,
+                        name="image_summaries",
+                    )
+                except Exception:
+                    logger.exception(
+                        "Failed to open the image summary cache, disabling it"
+                    )
+                    return None
+    return _image_summary_cache
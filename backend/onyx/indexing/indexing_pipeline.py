@@ -1,14 +1,31 @@
+import itertools
+import random
+import threading
+import time
 from collections import defaultdict
 from collections.abc import Callable
+from collections.abc import Iterator
 from typing import Protocol
 
+from prometheus_client import Counter
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from sqlalchemy.orm import Session
 
+from onyx.configs.app_configs import CONTEXTUAL_RAG_MAX_CONCURRENCY
+from onyx.configs.app_configs import CONTEXTUAL_RAG_MAX_TOKENS_PER_MINUTE
 from onyx.configs.app_configs import DEFAULT_CONTEXTUAL_RAG_LLM_NAME
 from onyx.configs.app_configs import DEFAULT_CONTEXTUAL_RAG_LLM_PROVIDER
+from onyx.configs.app_configs import DOCUMENT_LOCK_SKIP_LOCKED_ENABLED
+from onyx.configs.app_configs import DOCUMENT_LOCK_SKIP_LOCKED_MAX_ATTEMPTS
+from onyx.configs.app_configs import DOCUMENT_LOCK_SKIP_LOCKED_MAX_RETRY_DELAY
+from onyx.configs.app_configs import DOCUMENT_LOCK_SKIP_LOCKED_RETRY_DELAY
 from onyx.configs.app_configs import ENABLE_CONTEXTUAL_RAG
+from onyx.configs.app_configs import IMAGE_SUMMARIZATION_SYSTEM_PROMPT
+from onyx.configs.app_configs import IMAGE_SUMMARIZATION_USER_PROMPT
+from onyx.configs.app_configs import INDEXING_PIPELINE_STREAMING_ENABLED
+from onyx.configs.app_configs import INDEXING_PIPELINE_STREAMING_GROUP_SIZE
+from onyx.configs.app_configs import INDEXING_PIPELINE_STREAMING_QUEUE_SIZE
 from onyx.configs.app_configs import MAX_DOCUMENT_CHARS
 from onyx.configs.app_configs import MAX_TOKENS_FOR_FULL_INCLUSION
 from onyx.configs.app_configs import USE_CHUNK_SUMMARY
@@ -27,6 +44,8 @@ from onyx.connectors.models import IndexAttemptMetadata
 from onyx.connectors.models import IndexingDocument
 from onyx.connectors.models import Section
 from onyx.connectors.models import TextSection
+from onyx.context.search.semantic_cache import invalidate_documents_cache
+from onyx.context.search.semantic_cache import invalidate_tenant_cache
 from onyx.db.document import get_documents_by_ids
 from onyx.db.document import upsert_document_by_connector_credential_pair
 from onyx.db.document import upsert_documents
@@ -38,21 +57,33 @@ from onyx.document_index.document_index_utils import (
     get_multipass_config,
 )
 from onyx.document_index.interfaces import DocumentIndex
+from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import DocumentMetadata
 from onyx.document_index.interfaces import IndexBatchParams
+from onyx.file_processing.image_summarization import (
+    get_image_summarization_concurrency,
+)
+from onyx.file_processing.image_summarization import get_image_summarization_semaphore
 from onyx.file_processing.image_summarization import summarize_image_with_error_handling
 from onyx.file_store.file_store import get_default_file_store
 from onyx.indexing.chunker import Chunker
+from onyx.indexing.contextual_rag_cache import build_contextual_rag_cache_key
+from onyx.indexing.contextual_rag_cache import get_contextual_rag_cache
 from onyx.indexing.embedder import embed_chunks_with_failure_handling
 from onyx.indexing.embedder import IndexingEmbedder
+from onyx.indexing.image_summary_cache import build_image_summary_cache_key
+from onyx.indexing.image_summary_cache import get_image_summary_cache
+from onyx.indexing.models import BuildMetadataAwareChunksResult
 from onyx.indexing.models import DocAwareChunk
 from onyx.indexing.models import IndexChunk
 from onyx.indexing.models import IndexingBatchAdapter
 from onyx.indexing.models import UpdatableChunkData
+from onyx.indexing.text_cache import TextCache
 from onyx.indexing.vector_db_insertion import write_chunks_to_vector_db_with_backoff
 from onyx.llm.factory import get_default_llm_with_vision
 from onyx.llm.factory import get_llm_for_contextual_rag
 from onyx.llm.interfaces import LLM
+from onyx.llm.llm_budget import LLMBudget
 from onyx.llm.multi_llm import LLMRateLimitError
 from onyx.llm.utils import llm_response_to_string
 from onyx.llm.utils import MAX_CONTEXT_TOKENS
@@ -64,17 +95,43 @@ from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.natural_language_processing.utils import tokenizer_trim_middle
 from onyx.prompts.contextual_retrieval import CONTEXTUAL_RAG_PROMPT1
 from onyx.prompts.contextual_retrieval import CONTEXTUAL_RAG_PROMPT2
+from onyx.prompts.contextual_retrieval import CONTEXTUAL_RAG_TOKEN_ESTIMATE
 from onyx.prompts.contextual_retrieval import DOCUMENT_SUMMARY_PROMPT
+from onyx.prompts.contextual_retrieval import DOCUMENT_SUMMARY_TOKEN_ESTIMATE
 from onyx.utils.logger import setup_logger
 from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from onyx.utils.threadpool_concurrency import run_pipeline_stage
 from onyx.utils.timing import log_function_time
 from shared_configs.configs import (
     INDEXING_INFORMATION_CONTENT_CLASSIFICATION_CUTOFF_LENGTH,
 )
+from shared_configs.contextvars import get_current_tenant_id
 
 
 logger = setup_logger()
 
+# images are read from the file store this many at a time
+_IMAGE_READ_CONCURRENCY = 8
+
+# shared by all contextual RAG LLM calls of this process
+_contextual_rag_budget = LLMBudget(
+    max_concurrency=CONTEXTUAL_RAG_MAX_CONCURRENCY,
+    tokens_per_minute=CONTEXTUAL_RAG_MAX_TOKENS_PER_MINUTE,
+)
+
+# connector_id / credential_id label of the documents of user files
+_USER_FILE_METRIC_LABEL = "user_file"
+document_lock_contention = Counter(
+    "onyx_indexing_document_lock_contention_total",
+    "Documents that could not be locked for indexing since another worker held them",
+    ["connector_id", "credential_id"],
+)
+document_lock_retries = Counter(
+    "onyx_indexing_document_lock_retries_total",
+    "Retries of indexing batches for documents that were locked by another worker",
+    ["connector_id", "credential_id"],
+)
+
 
 class DocumentBatchPrepareContext(BaseModel):
     updatable_docs: list[Document]
@@ -474,54 +531,21 @@ def process_image_sections(documents: list[Document]) -> list[IndexingDocument]:
             for document in documents
         ]
 
+    image_texts = _summarize_image_sections(documents, llm)
+
     indexed_documents: list[IndexingDocument] = []
 
     for document in documents:
         processed_sections: list[Section] = []
 
         for section in document.sections:
-            # For ImageSection, process and create base Section with both text and image_file_id
+            # For ImageSection, create base Section with both text and image_file_id
             if isinstance(section, ImageSection):
-                # Default section with image path preserved - ensure text is always a string
                 processed_section = Section(
                     link=section.link,
                     image_file_id=section.image_file_id,
-                    text="",  # Initialize with empty string
+                    text=image_texts[section.image_file_id],
                 )
-
-                # Try to get image summary
-                try:
-                    file_store = get_default_file_store()
-
-                    file_record = file_store.read_file_record(
-                        file_id=section.image_file_id
-                    )
-                    if not file_record:
-                        logger.warning(
-                            f"Image file {section.image_file_id} not found in FileStore"
-                        )
-
-                        processed_section.text = "[Image could not be processed]"
-                    else:
-                        # Get the image data
-                        image_data_io = file_store.read_file(
-                            file_id=section.image_file_id
-                        )
-                        image_data = image_data_io.read()
-                        summary = summarize_image_with_error_handling(
-                            llm=llm,
-                            image_data=image_data,
-                            context_name=file_record.display_name or "Image",
-                        )
-
-                        if summary:
-                            processed_section.text = summary
-                        else:
-                            processed_section.text = "[Image could not be summarized]"
-                except Exception as e:
-                    logger.error(f"Error processing image section: {e}")
-                    processed_section.text = "[Error processing image]"
-
                 processed_sections.append(processed_section)
 
             # For TextSection, create a base Section with text and link
@@ -542,11 +566,171 @@ def process_image_sections(documents: list[Document]) -> list[IndexingDocument]:
     return indexed_documents
 
 
+class _ImageSummaryTask:
+    def __init__(self, image_file_id: str) -> None:
+        self.image_file_id = image_file_id
+        self.context_name = "Image"
+        self.cache_key: str | None = None
+        # text of the processed section, set once known
+        self.text: str | None = None
+
+
+def _hash_image(task: _ImageSummaryTask, llm: LLM) -> None:
+    """Sets the cache key of the image. The image itself is not kept, only images
+    that miss the cache are read again to be summarized."""
+    try:
+        file_store = get_default_file_store()
+
+        file_record = file_store.read_file_record(file_id=task.image_file_id)
+        if not file_record:
+            logger.warning(f"Image file {task.image_file_id} not found in FileStore")
+            task.text = "[Image could not be processed]"
+            return
+
+        task.context_name = file_record.display_name or "Image"
+        # the file name is only a hint in the prompt, leaving it out of the key lets
+        # copies of an image under different names share a summary
+        task.cache_key = build_image_summary_cache_key(
+            image_data=file_store.read_file(file_id=task.image_file_id).read(),
+            model_provider=llm.config.model_provider,
+            model_name=llm.config.model_name,
+            system_prompt=IMAGE_SUMMARIZATION_SYSTEM_PROMPT,
+            user_prompt=IMAGE_SUMMARIZATION_USER_PROMPT,
+            tenant_id=get_current_tenant_id(),
+        )
+    except Exception as e:
+        logger.error(f"Error processing image section: {e}")
+        task.text = "[Error processing image]"
+
+
+def _summarize_image(task: _ImageSummaryTask, llm: LLM) -> str | None:
+    try:
+        with get_image_summarization_semaphore(llm.config.model_provider):
+            # read within the semaphore, so only the images being summarized are
+            # held in memory
+            image_data = (
+                get_default_file_store().read_file(file_id=task.image_file_id).read()
+            )
+            summary = summarize_image_with_error_handling(
+                llm=llm,
+                image_data=image_data,
+                context_name=task.context_name,
+            )
+        task.text = summary or "[Image could not be summarized]"
+        return summary
+    except Exception as e:
+        logger.error(f"Error processing image section: {e}")
+        task.text = "[Error processing image]"
+        return None
+
+
+def _summarize_image_sections(documents: list[Document], llm: LLM) -> dict[str, str]:
+    """Returns the section text for every image file referenced by the documents.
+
+    Every distinct image is summarized once, concurrently up to the limit of the LLM
+    provider. Summaries are looked up in the image summary cache first, so images
+    that were summarized before (by a previous indexing run or under another file
+    id in this batch) don't go to the LLM again."""
+    tasks: dict[str, _ImageSummaryTask] = {}
+    for document in documents:
+        for section in document.sections:
+            if isinstance(section, ImageSection):
+                tasks.setdefault(
+                    section.image_file_id, _ImageSummaryTask(section.image_file_id)
+                )
+    if not tasks:
+        return {}
+
+    run_functions_tuples_in_parallel(
+        [(_hash_image, (task, llm)) for task in tasks.values()],
+        max_workers=_IMAGE_READ_CONCURRENCY,
+    )
+
+    tasks_by_key: dict[str, list[_ImageSummaryTask]] = defaultdict(list)
+    for task in tasks.values():
+        if task.text is None and task.cache_key is not None:
+            tasks_by_key[task.cache_key].append(task)
+
+    cache = get_image_summary_cache()
+    cached_summaries: dict[str, str] = {}
+    if cache and tasks_by_key:
+        try:
+            cached_summaries = cache.get_many(list(tasks_by_key))
+        except Exception:
+            logger.exception("Failed to read from the image summary cache")
+
+    keys_to_summarize = [key for key in tasks_by_key if key not in cached_summaries]
+    logger.debug(
+        f"Image summaries: images={len(tasks)} distinct={len(tasks_by_key)} "
+        f"cached={len(cached_summaries)} to_summarize={len(keys_to_summarize)}"
+    )
+
+    # only the first image of every group of identical images is summarized
+    summaries = run_functions_tuples_in_parallel(
+        [(_summarize_image, (tasks_by_key[key][0], llm)) for key in keys_to_summarize],
+        max_workers=get_image_summarization_concurrency(llm.config.model_provider),
+    )
+    new_summaries = {
+        key: summary for key, summary in zip(keys_to_summarize, summaries) if summary
+    }
+
+    if cache and new_summaries:
+        try:
+            cache.put_many(new_summaries)
+        except Exception:
+            logger.exception("Failed to write to the image summary cache")
+
+    for key, key_tasks in tasks_by_key.items():
+        text = cached_summaries.get(key) or key_tasks[0].text
+        for task in key_tasks:
+            task.text = text
+
+    return {
+        image_file_id: task.text or "[Image could not be summarized]"
+        for image_file_id, task in tasks.items()
+    }
+
+
+def _invoke_contextual_rag_llm(
+    llm: LLM, prompt: str, num_prompt_tokens: int, cache: TextCache | None
+) -> str:
+    """Served from the contextual RAG cache if the same prompt was answered by the
+    same model before, otherwise invoked within the contextual RAG budget."""
+    cache_key: str | None = None
+    if cache:
+        cache_key = build_contextual_rag_cache_key(
+            prompt=prompt,
+            model_provider=llm.config.model_provider,
+            model_name=llm.config.model_name,
+            max_tokens=MAX_CONTEXT_TOKENS,
+            tenant_id=get_current_tenant_id(),
+        )
+        try:
+            cached_output = cache.get_many([cache_key]).get(cache_key)
+            if cached_output is not None:
+                return cached_output
+        except Exception:
+            logger.exception("Failed to read from the contextual RAG cache")
+
+    with _contextual_rag_budget.reserve(num_prompt_tokens + MAX_CONTEXT_TOKENS):
+        output = llm_response_to_string(
+            llm.invoke(prompt, max_tokens=MAX_CONTEXT_TOKENS)
+        )
+
+    if cache and cache_key and output:
+        try:
+            cache.put_many({cache_key: output})
+        except Exception:
+            logger.exception("Failed to write to the contextual RAG cache")
+    return output
+
+
 def add_document_summaries(
     chunks_by_doc: list[DocAwareChunk],
     llm: LLM,
     tokenizer: BaseTokenizer,
     trunc_doc_tokens: int,
+    cache: TextCache | None = None,
 ) -> list[int] | None:
     """
     Adds a document summary to a list of chunks from the same document.
@@ -563,8 +747,11 @@ def add_document_summaries(
     doc_tokens = tokenizer.encode(chunks_by_doc[0].source_document.get_text_content())
     doc_content = tokenizer_trim_middle(doc_tokens, trunc_doc_tokens, tokenizer)
     summary_prompt = DOCUMENT_SUMMARY_PROMPT.format(document=doc_content)
-    doc_summary = llm_response_to_string(
-        llm.invoke(summary_prompt, max_tokens=MAX_CONTEXT_TOKENS)
+    num_prompt_tokens = (
+        min(len(doc_tokens), trunc_doc_tokens) + DOCUMENT_SUMMARY_TOKEN_ESTIMATE
+    )
+    doc_summary = _invoke_contextual_rag_llm(
+        llm, summary_prompt, num_prompt_tokens, cache
     )
 
     for chunk in chunks_by_doc:
@@ -579,6 +766,7 @@ def add_chunk_summaries(
     tokenizer: BaseTokenizer,
     trunc_doc_chunk_tokens: int,
     doc_tokens: list[int] | None,
+    cache: TextCache | None = None,
 ) -> None:
     """
     Adds chunk summaries to the chunks grouped by document id.
@@ -604,23 +792,32 @@ def add_chunk_summaries(
     if not doc_info:
         # This happens if the document is too long AND document summaries are turned off
         # In this case we compute a doc summary using the LLM
-        doc_info = llm_response_to_string(
-            llm.invoke(
-                DOCUMENT_SUMMARY_PROMPT.format(document=doc_content),
-                max_tokens=MAX_CONTEXT_TOKENS,
-            )
+        num_prompt_tokens = (
+            min(len(doc_tokens), trunc_doc_chunk_tokens)
+            + DOCUMENT_SUMMARY_TOKEN_ESTIMATE
+        )
+        doc_info = _invoke_contextual_rag_llm(
+            llm,
+            DOCUMENT_SUMMARY_PROMPT.format(document=doc_content),
+            num_prompt_tokens,
+            cache,
         )
 
+    # The prompts of all chunks start with the same document prefix. It must stay
+    # byte for byte identical so that providers with prompt caching can reuse it.
     context_prompt1 = CONTEXTUAL_RAG_PROMPT1.format(document=doc_info)
+    num_doc_info_tokens = len(tokenizer.encode(doc_info))
 
     def assign_context(chunk: DocAwareChunk) -> None:
         context_prompt2 = CONTEXTUAL_RAG_PROMPT2.format(chunk=chunk.content)
+        num_prompt_tokens = (
+            num_doc_info_tokens
+            + len(tokenizer.encode(chunk.content))
+            + CONTEXTUAL_RAG_TOKEN_ESTIMATE
+        )
         try:
-            chunk.chunk_context = llm_response_to_string(
-                llm.invoke(
-                    context_prompt1 + context_prompt2,
-                    max_tokens=MAX_CONTEXT_TOKENS,
-                )
+            chunk.chunk_context = _invoke_contextual_rag_llm(
+                llm, context_prompt1 + context_prompt2, num_prompt_tokens, cache
             )
         except LLMRateLimitError as e:
             # Erroring during chunker is undesirable, so we log the error and continue
@@ -631,8 +828,12 @@ def add_chunk_summaries(
             logger.exception(f"Error adding chunk summary: {e}", exc_info=e)
             chunk.chunk_context = ""
 
+    # The first call puts the document prefix into the provider's prompt cache, the
+    # remaining chunks of the document run in parallel and hit it
+    assign_context(chunks_by_doc[0])
     run_functions_tuples_in_parallel(
-        [(assign_context, (chunk,)) for chunk in chunks_by_doc]
+        [(assign_context, (chunk,)) for chunk in chunks_by_doc[1:]],
+        max_workers=CONTEXTUAL_RAG_MAX_CONCURRENCY,
     )
 
 
@@ -645,6 +846,9 @@ def add_contextual_summaries(
     """
     Adds Document summary and chunk-within-document context to the chunks
     based on which environment variables are set.
+
+    Documents are processed concurrently. The LLM calls of all documents (and of all
+    indexing batches in this process) share the contextual RAG budget.
     """
     doc2chunks = defaultdict(list)
     for chunk in chunks:
@@ -663,21 +867,444 @@ def add_contextual_summaries(
     trunc_doc_chunk_tokens = (
         llm.config.max_input_tokens - prompt_tokens - chunk_token_limit
     )
-    for chunks_by_doc in doc2chunks.values():
+    cache = get_contextual_rag_cache()
+
+    def add_summaries_for_doc(chunks_by_doc: list[DocAwareChunk]) -> None:
         doc_tokens = None
         if USE_DOCUMENT_SUMMARY:
             doc_tokens = add_document_summaries(
-                chunks_by_doc, llm, tokenizer, trunc_doc_summary_tokens
+                chunks_by_doc, llm, tokenizer, trunc_doc_summary_tokens, cache
             )
 
         if USE_CHUNK_SUMMARY:
             add_chunk_summaries(
-                chunks_by_doc, llm, tokenizer, trunc_doc_chunk_tokens, doc_tokens
+                chunks_by_doc, llm, tokenizer, trunc_doc_chunk_tokens, doc_tokens, cache
             )
 
+    run_functions_tuples_in_parallel(
+        [
+            (add_summaries_for_doc, (chunks_by_doc,))
+            for chunks_by_doc in doc2chunks.values()
+        ],
+        max_workers=CONTEXTUAL_RAG_MAX_CONCURRENCY,
+    )
+
     return chunks
 
 
+class _EmbeddedChunks(BaseModel):
+    chunks_with_embeddings: list[IndexChunk]
+    chunk_content_scores: list[float]
+    embedding_failures: list[ConnectorFailure]
+
+
+def _chunk_documents(
+    indexable_docs: list[IndexingDocument],
+    chunker: Chunker,
+    enable_contextual_rag: bool,
+    llm: LLM | None,
+) -> list[DocAwareChunk]:
+    logger.debug("Starting chunking")
+    # NOTE: no special handling for failures here, since the chunker is not
+    # a common source of failure for the indexing pipeline
+    chunks: list[DocAwareChunk] = chunker.chunk(indexable_docs)
+
+    # contextual RAG
+    if enable_contextual_rag:
+        assert llm is not None, "must provide an LLM for contextual RAG"
+        llm_tokenizer = get_tokenizer(
+            model_name=llm.config.model_name,
+            provider_type=llm.config.model_provider,
+        )
+
+        # Because the chunker's tokens are different from the LLM's tokens,
+        # We add a fudge factor to ensure we truncate prompts to the LLM's token limit
+        chunks = add_contextual_summaries(
+            chunks=chunks,
+            llm=llm,
+            tokenizer=llm_tokenizer,
+            chunk_token_limit=chunker.chunk_token_limit * 2,
+        )
+
+    return chunks
+
+
+def _embed_chunks(
+    chunks: list[DocAwareChunk],
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    tenant_id: str,
+    request_id: str | None,
+) -> _EmbeddedChunks:
+    logger.debug("Starting embedding")
+    chunks_with_embeddings, embedding_failures = (
+        embed_chunks_with_failure_handling(
+            chunks=chunks,
+            embedder=embedder,
+            tenant_id=tenant_id,
+            request_id=request_id,
+        )
+        if chunks
+        else ([], [])
+    )
+
+    chunk_content_scores = (
+        _get_aggregated_chunk_boost_factor(
+            chunks_with_embeddings, information_content_classification_model
+        )
+        if USE_INFORMATION_CONTENT_CLASSIFICATION
+        else [1.0] * len(chunks_with_embeddings)
+    )
+
+    return _EmbeddedChunks(
+        chunks_with_embeddings=chunks_with_embeddings,
+        chunk_content_scores=chunk_content_scores,
+        embedding_failures=embedding_failures,
+    )
+
+
+def _stream_embedded_doc_groups(
+    context: DocumentBatchPrepareContext,
+    chunker: Chunker,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    tenant_id: str,
+    request_id: str | None,
+    enable_contextual_rag: bool,
+    llm: LLM | None,
+    stop_event: threading.Event,
+) -> Iterator[tuple[DocumentBatchPrepareContext, _EmbeddedChunks]]:
+    """Splits the batch into small groups of documents and runs chunking and embedding
+    as separate background stages, connected by bounded queues. While the caller writes
+    group N to the vector db, group N+1 is being embedded and group N+2 chunked.
+
+    Each group is embedded with embed_chunks_with_failure_handling on its own, so a
+    failing document only affects its own group."""
+    updatable_docs_by_id = {doc.id: doc for doc in context.updatable_docs}
+    group_size = INDEXING_PIPELINE_STREAMING_GROUP_SIZE
+    group_contexts = [
+        DocumentBatchPrepareContext(
+            updatable_docs=[
+                updatable_docs_by_id[doc.id]
+                for doc in context.indexable_docs[start : start + group_size]
+            ],
+            id_to_boost_map=context.id_to_boost_map,
+            indexable_docs=context.indexable_docs[start : start + group_size],
+        )
+        for start in range(0, len(context.indexable_docs), group_size)
+    ]
+    logger.debug(
+        f"Streaming {len(context.indexable_docs)} documents "
+        f"through the indexing pipeline in {len(group_contexts)} groups"
+    )
+
+    def _chunk_group(
+        group_context: DocumentBatchPrepareContext,
+    ) -> tuple[DocumentBatchPrepareContext, list[DocAwareChunk]]:
+        return group_context, _chunk_documents(
+            indexable_docs=group_context.indexable_docs,
+            chunker=chunker,
+            enable_contextual_rag=enable_contextual_rag,
+            llm=llm,
+        )
+
+    def _embed_group(
+        chunked_group: tuple[DocumentBatchPrepareContext, list[DocAwareChunk]],
+    ) -> tuple[DocumentBatchPrepareContext, _EmbeddedChunks]:
+        group_context, chunks = chunked_group
+        return group_context, _embed_chunks(
+            chunks=chunks,
+            embedder=embedder,
+            information_content_classification_model=information_content_classification_model,
+            tenant_id=tenant_id,
+            request_id=request_id,
+        )
+
+    chunked_groups = run_pipeline_stage(
+        iter(group_contexts),
+        _chunk_group,
+        queue_size=INDEXING_PIPELINE_STREAMING_QUEUE_SIZE,
+        stop_event=stop_event,
+    )
+    return run_pipeline_stage(
+        chunked_groups,
+        _embed_group,
+        queue_size=INDEXING_PIPELINE_STREAMING_QUEUE_SIZE,
+        stop_event=stop_event,
+    )
+
+
+class _WrittenGroup(BaseModel):
+    result: BuildMetadataAwareChunksResult
+    updatable_chunk_data: list[UpdatableChunkData]
+    num_chunks: int
+    insertion_records: list[DocumentInsertionRecord]
+    write_failures: list[ConnectorFailure]
+    embedding_failures: list[ConnectorFailure]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+def _write_embedded_group(
+    group_context: DocumentBatchPrepareContext,
+    embedded: _EmbeddedChunks,
+    adapter: IndexingBatchAdapter,
+    document_index: DocumentIndex,
+    chunker: Chunker,
+    tenant_id: str,
+) -> _WrittenGroup:
+    """Writes the chunks of a group of documents to the vector db. The documents
+    must be locked by the caller."""
+    updatable_chunk_data = [
+        UpdatableChunkData(
+            chunk_id=chunk.chunk_id,
+            document_id=chunk.source_document.id,
+            boost_score=score,
+        )
+        for chunk, score in zip(
+            embedded.chunks_with_embeddings, embedded.chunk_content_scores
+        )
+    ]
+
+    # we're concerned about race conditions where multiple simultaneous indexings might result
+    # in one set of metadata overwriting another one in vespa.
+    # we still write data here for the immediate and most likely correct sync, but
+    # to resolve this, an update of the last modified field at the end of this loop
+    # always triggers a final metadata sync via the celery queue
+    group_result = adapter.build_metadata_aware_chunks(
+        chunks_with_embeddings=embedded.chunks_with_embeddings,
+        chunk_content_scores=embedded.chunk_content_scores,
+        tenant_id=tenant_id,
+        context=group_context,
+    )
+
+    short_descriptor_list = [
+        chunk.to_short_descriptor() for chunk in group_result.chunks
+    ]
+    short_descriptor_log = str(short_descriptor_list)[:1024]
+    logger.debug(f"Indexing the following chunks: {short_descriptor_log}")
+
+    # A document will not be spread across different batches (or groups), so
+    # all the documents with chunks in this set, are fully represented by the
+    # chunks in this set
+    insertion_records, write_failures = write_chunks_to_vector_db_with_backoff(
+        document_index=document_index,
+        chunks=group_result.chunks,
+        index_batch_params=IndexBatchParams(
+            doc_id_to_previous_chunk_cnt=group_result.doc_id_to_previous_chunk_cnt,
+            doc_id_to_new_chunk_cnt=group_result.doc_id_to_new_chunk_cnt,
+            tenant_id=tenant_id,
+            large_chunks_enabled=chunker.enable_large_chunks,
+        ),
+    )
+
+    return _WrittenGroup(
+        result=group_result,
+        updatable_chunk_data=updatable_chunk_data,
+        num_chunks=len(embedded.chunks_with_embeddings),
+        insertion_records=insertion_records,
+        write_failures=write_failures,
+        embedding_failures=embedded.embedding_failures,
+    )
+
+
+def _verify_all_docs_returned(
+    updatable_ids: list[str],
+    insertion_records: list[DocumentInsertionRecord],
+    failures: list[ConnectorFailure],
+) -> None:
+    all_returned_doc_ids = {record.document_id for record in insertion_records}.union(
+        {
+            failure.failed_document.document_id
+            for failure in failures
+            if failure.failed_document
+        }
+    )
+    if all_returned_doc_ids != set(updatable_ids):
+        raise RuntimeError(
+            f"Some documents were not successfully indexed. "
+            f"Updatable IDs: {updatable_ids}, "
+            f"Returned IDs: {all_returned_doc_ids}. "
+            "This should never happen."
+        )
+
+
+def _write_and_finalize_group(
+    group_context: DocumentBatchPrepareContext,
+    embedded: _EmbeddedChunks,
+    adapter: IndexingBatchAdapter,
+    document_index: DocumentIndex,
+    chunker: Chunker,
+    tenant_id: str,
+    skipped_docs: list[Document],
+) -> _WrittenGroup:
+    """Writes a group of documents and marks them as indexed, together with the
+    skipped_docs that didn't need to be re-indexed. The documents must be locked by
+    the caller."""
+    written_group = _write_embedded_group(
+        group_context=group_context,
+        embedded=embedded,
+        adapter=adapter,
+        document_index=document_index,
+        chunker=chunker,
+        tenant_id=tenant_id,
+    )
+    _verify_all_docs_returned(
+        updatable_ids=[doc.id for doc in group_context.updatable_docs],
+        insertion_records=written_group.insertion_records,
+        failures=written_group.write_failures + written_group.embedding_failures,
+    )
+    adapter.post_index(
+        context=group_context,
+        updatable_chunk_data=written_group.updatable_chunk_data,
+        filtered_documents=group_context.updatable_docs + skipped_docs,
+        result=written_group.result,
+    )
+    return written_group
+
+
+def _split_embedded_group(
+    group_context: DocumentBatchPrepareContext,
+    embedded: _EmbeddedChunks,
+    doc_ids: set[str],
+) -> tuple[DocumentBatchPrepareContext, _EmbeddedChunks]:
+    """Returns the part of the group that belongs to the given documents."""
+    chunks_and_scores = [
+        (chunk, score)
+        for chunk, score in zip(
+            embedded.chunks_with_embeddings, embedded.chunk_content_scores
+        )
+        if chunk.source_document.id in doc_ids
+    ]
+    return (
+        DocumentBatchPrepareContext(
+            updatable_docs=[
+                doc for doc in group_context.updatable_docs if doc.id in doc_ids
+            ],
+            id_to_boost_map=group_context.id_to_boost_map,
+            indexable_docs=[
+                doc for doc in group_context.indexable_docs if doc.id in doc_ids
+            ],
+        ),
+        _EmbeddedChunks(
+            chunks_with_embeddings=[chunk for chunk, _ in chunks_and_scores],
+            chunk_content_scores=[score for _, score in chunks_and_scores],
+            embedding_failures=[
+                failure
+                for failure in embedded.embedding_failures
+                if failure.failed_document
+                and failure.failed_document.document_id in doc_ids
+            ],
+        ),
+    )
+
+
+def _get_lock_retry_delay(num_retries: int) -> float:
+    """Exponential backoff with jitter, so that the workers contending for the same
+    documents don't retry in lockstep."""
+    delay = min(
+        DOCUMENT_LOCK_SKIP_LOCKED_RETRY_DELAY * 2 ** (num_retries - 1),
+        DOCUMENT_LOCK_SKIP_LOCKED_MAX_RETRY_DELAY,
+    )
+    return random.uniform(delay / 2, delay)
+
+
+def _write_available_groups(
+    embedded_groups: Iterator[tuple[DocumentBatchPrepareContext, _EmbeddedChunks]],
+    adapter: IndexingBatchAdapter,
+    document_index: DocumentIndex,
+    chunker: Chunker,
+    tenant_id: str,
+    skipped_docs: list[Document],
+    connector_id: int | None,
+    credential_id: int | None,
+) -> Iterator[_WrittenGroup]:
+    """Locks the documents of each group that are not held by another worker
+    (SKIP LOCKED), writes and finalizes them right away and retries the contended
+    rest with a short jittered backoff. Unlike adapter.lock_context, a single busy
+    document doesn't hold up the whole batch.
+
+    skipped_docs are documents that didn't need to be re-indexed, they are marked as
+    indexed together with the first written group. Documents that were deleted in the
+    meantime are dropped instead of retried."""
+    # user files have no connector / credential
+    metric_labels = (
+        {"connector_id": str(connector_id), "credential_id": str(credential_id)}
+        if connector_id is not None
+        else {
+            "connector_id": _USER_FILE_METRIC_LABEL,
+            "credential_id": _USER_FILE_METRIC_LABEL,
+        }
+    )
+    pending = embedded_groups
+    num_retries = 0
+    while True:
+        contended: list[tuple[DocumentBatchPrepareContext, _EmbeddedChunks]] = []
+        for group_context, embedded in pending:
+            with adapter.lock_available_context(group_context.updatable_docs) as (
+                _,
+                locked_ids,
+                missing_ids,
+            ):
+                if missing_ids:
+                    logger.warning(
+                        f"Skipping {len(missing_ids)} documents that no longer exist: "
+                        f"{sorted(missing_ids)}"
+                    )
+                contended_ids = {
+                    doc.id
+                    for doc in group_context.updatable_docs
+                    if doc.id not in locked_ids and doc.id not in missing_ids
+                }
+                if contended_ids:
+                    document_lock_contention.labels(**metric_labels).inc(
+                        len(contended_ids)
+                    )
+                    contended.append(
+                        _split_embedded_group(group_context, embedded, contended_ids)
+                    )
+
+                if not locked_ids:
+                    continue
+
+                locked_context, locked_embedded = _split_embedded_group(
+                    group_context, embedded, locked_ids
+                )
+                written_group = _write_and_finalize_group(
+                    group_context=locked_context,
+                    embedded=locked_embedded,
+                    adapter=adapter,
+                    document_index=document_index,
+                    chunker=chunker,
+                    tenant_id=tenant_id,
+                    skipped_docs=skipped_docs,
+                )
+                skipped_docs = []
+
+            yield written_group
+
+        if not contended:
+            break
+
+        num_contended = sum(len(group.updatable_docs) for group, _ in contended)
+        if num_retries >= DOCUMENT_LOCK_SKIP_LOCKED_MAX_ATTEMPTS:
+            raise RuntimeError(
+                f"Failed to acquire locks after {num_retries} retries for "
+                f"{num_contended} documents: "
+                f"{[doc.id for group, _ in contended for doc in group.updatable_docs]}"
+            )
+
+        num_retries += 1
+        document_lock_retries.labels(**metric_labels).inc()
+        retry_delay = _get_lock_retry_delay(num_retries)
+        logger.info(
+            f"{num_contended} documents are locked by another worker, retrying in "
+            f"{retry_delay:.2f}s: connector_id={connector_id}, "
+            f"credential_id={credential_id}, retry={num_retries}"
+        )
+        time.sleep(retry_delay)
+        pending = iter(contended)
+
+
 @log_function_time(debug_only=True)
 def index_doc_batch(
     *,
@@ -734,132 +1361,114 @@ def index_doc_batch(
     ]
     logger.debug(f"Starting indexing process for documents: {doc_descriptors}")
 
-    logger.debug("Starting chunking")
-    # NOTE: no special handling for failures here, since the chunker is not
-    # a common source of failure for the indexing pipeline
-    chunks: list[DocAwareChunk] = chunker.chunk(context.indexable_docs)
-    llm_tokenizer: BaseTokenizer | None = None
-
-    # contextual RAG
-    if enable_contextual_rag:
-        assert llm is not None, "must provide an LLM for contextual RAG"
-        llm_tokenizer = get_tokenizer(
-            model_name=llm.config.model_name,
-            provider_type=llm.config.model_provider,
-        )
-
-        # Because the chunker's tokens are different from the LLM's tokens,
-        # We add a fudge factor to ensure we truncate prompts to the LLM's token limit
-        chunks = add_contextual_summaries(
-            chunks=chunks,
-            llm=llm,
-            tokenizer=llm_tokenizer,
-            chunk_token_limit=chunker.chunk_token_limit * 2,
-        )
-
-    logger.debug("Starting embedding")
-    chunks_with_embeddings, embedding_failures = (
-        embed_chunks_with_failure_handling(
-            chunks=chunks,
+    stop_event = threading.Event()
+    embedded_groups: Iterator[tuple[DocumentBatchPrepareContext, _EmbeddedChunks]]
+    if (
+        INDEXING_PIPELINE_STREAMING_ENABLED
+        and len(context.indexable_docs) > INDEXING_PIPELINE_STREAMING_GROUP_SIZE
+    ):
+        embedded_groups = _stream_embedded_doc_groups(
+            context=context,
+            chunker=chunker,
             embedder=embedder,
+            information_content_classification_model=information_content_classification_model,
             tenant_id=tenant_id,
             request_id=request_id,
+            enable_contextual_rag=enable_contextual_rag,
+            llm=llm,
+            stop_event=stop_event,
         )
-        if chunks
-        else ([], [])
-    )
-
-    chunk_content_scores = (
-        _get_aggregated_chunk_boost_factor(
-            chunks_with_embeddings, information_content_classification_model
+    else:
+        chunks = _chunk_documents(
+            indexable_docs=context.indexable_docs,
+            chunker=chunker,
+            enable_contextual_rag=enable_contextual_rag,
+            llm=llm,
         )
-        if USE_INFORMATION_CONTENT_CLASSIFICATION
-        else [1.0] * len(chunks_with_embeddings)
-    )
-
-    updatable_ids = [doc.id for doc in context.updatable_docs]
-    updatable_chunk_data = [
-        UpdatableChunkData(
-            chunk_id=chunk.chunk_id,
-            document_id=chunk.source_document.id,
-            boost_score=score,
+        embedded_groups = iter(
+            [
+                (
+                    context,
+                    _embed_chunks(
+                        chunks=chunks,
+                        embedder=embedder,
+                        information_content_classification_model=information_content_classification_model,
+                        tenant_id=tenant_id,
+                        request_id=request_id,
+                    ),
+                )
+            ]
         )
-        for chunk, score in zip(chunks_with_embeddings, chunk_content_scores)
-    ]
 
-    # Acquires a lock on the documents so that no other process can modify them
-    # NOTE: don't need to acquire till here, since this is when the actual race condition
-    # with Vespa can occur.
-    with adapter.lock_context(context.updatable_docs):
-        # we're concerned about race conditions where multiple simultaneous indexings might result
-        # in one set of metadata overwriting another one in vespa.
-        # we still write data here for the immediate and most likely correct sync, but
-        # to resolve this, an update of the last modified field at the end of this loop
-        # always triggers a final metadata sync via the celery queue
-        result = adapter.build_metadata_aware_chunks(
-            chunks_with_embeddings=chunks_with_embeddings,
-            chunk_content_scores=chunk_content_scores,
-            tenant_id=tenant_id,
-            context=context,
-        )
+    updatable_ids = {doc.id for doc in context.updatable_docs}
+    # documents that didn't need to be re-indexed, marked as indexed with the first group
+    skipped_docs = [doc for doc in filtered_documents if doc.id not in updatable_ids]
+    insertion_records: list[DocumentInsertionRecord] = []
+    vector_db_write_failures: list[ConnectorFailure] = []
+    embedding_failures: list[ConnectorFailure] = []
+    total_chunks = 0
 
-        short_descriptor_list = [chunk.to_short_descriptor() for chunk in result.chunks]
-        short_descriptor_log = str(short_descriptor_list)[:1024]
-        logger.debug(f"Indexing the following chunks: {short_descriptor_log}")
-
-        # A document will not be spread across different batches, so all the
-        # documents with chunks in this set, are fully represented by the chunks
-        # in this set
-        (
-            insertion_records,
-            vector_db_write_failures,
-        ) = write_chunks_to_vector_db_with_backoff(
-            document_index=document_index,
-            chunks=result.chunks,
-            index_batch_params=IndexBatchParams(
-                doc_id_to_previous_chunk_cnt=result.doc_id_to_previous_chunk_cnt,
-                doc_id_to_new_chunk_cnt=result.doc_id_to_new_chunk_cnt,
+    try:
+        # wait for the first group before locking, the remaining groups are embedded
+        # while the earlier ones are being written
+        first_group = next(embedded_groups)
+        all_groups = itertools.chain([first_group], embedded_groups)
+
+        if DOCUMENT_LOCK_SKIP_LOCKED_ENABLED:
+            # every group is locked, written and finalized on its own, documents held
+            # by other workers are retried until they are free
+            for written_group in _write_available_groups(
+                embedded_groups=all_groups,
+                adapter=adapter,
+                document_index=document_index,
+                chunker=chunker,
                 tenant_id=tenant_id,
-                large_chunks_enabled=chunker.enable_large_chunks,
-            ),
-        )
-
-        all_returned_doc_ids = (
-            {record.document_id for record in insertion_records}
-            .union(
-                {
-                    record.failed_document.document_id
-                    for record in vector_db_write_failures
-                    if record.failed_document
-                }
-            )
-            .union(
-                {
-                    record.failed_document.document_id
-                    for record in embedding_failures
-                    if record.failed_document
-                }
-            )
-        )
-        if all_returned_doc_ids != set(updatable_ids):
-            raise RuntimeError(
-                f"Some documents were not successfully indexed. "
-                f"Updatable IDs: {updatable_ids}, "
-                f"Returned IDs: {all_returned_doc_ids}. "
-                "This should never happen."
-            )
-
-        adapter.post_index(
-            context=context,
-            updatable_chunk_data=updatable_chunk_data,
-            filtered_documents=filtered_documents,
-            result=result,
+                skipped_docs=skipped_docs,
+                connector_id=connector_id,
+                credential_id=credential_id,
+            ):
+                total_chunks += written_group.num_chunks
+                insertion_records.extend(written_group.insertion_records)
+                vector_db_write_failures.extend(written_group.write_failures)
+                embedding_failures.extend(written_group.embedding_failures)
+        else:
+            for group_context, embedded in all_groups:
+                # Acquires a lock on the documents so that no other process can modify them
+                # NOTE: only held while the group is written, the later groups keep being
+                # embedded in the meantime
+                with adapter.lock_context(group_context.updatable_docs):
+                    written_group = _write_and_finalize_group(
+                        group_context=group_context,
+                        embedded=embedded,
+                        adapter=adapter,
+                        document_index=document_index,
+                        chunker=chunker,
+                        tenant_id=tenant_id,
+                        skipped_docs=skipped_docs,
+                    )
+                skipped_docs = []
+
+                total_chunks += written_group.num_chunks
+                insertion_records.extend(written_group.insertion_records)
+                vector_db_write_failures.extend(written_group.write_failures)
+                embedding_failures.extend(written_group.embedding_failures)
+    finally:
+        # stops the streaming stages if writing failed before they were done
+        stop_event.set()
+
+    # Updated documents may be stale in cached search results. New documents aren't
+    # in any of them yet but may belong there, so those invalidate the whole tenant.
+    if any(not record.already_existed for record in insertion_records):
+        invalidate_tenant_cache(tenant_id)
+    else:
+        invalidate_documents_cache(
+            [record.document_id for record in insertion_records], tenant_id
         )
 
     return IndexingPipelineResult(
         new_docs=len([r for r in insertion_records if not r.already_existed]),
         total_docs=len(filtered_documents),
-        total_chunks=len(chunks_with_embeddings),
+        total_chunks=total_chunks,
         failures=vector_db_write_failures + embedding_failures,
     )
 
@@ -236,6 +236,13 @@ class IndexingBatchAdapter(Protocol):
     ) -> Generator[TransactionalContext, None, None]:
         """Provide a transaction/row-lock context for critical updates."""
 
+    @contextlib.contextmanager
+    def lock_available_context(
+        self, documents: list[Document]
+    ) -> Generator[tuple[TransactionalContext, set[str], set[str]], None, None]:
+        """Like lock_context, but only locks the docs that are free right now and
+        also provides the IDs of the locked docs and of the docs that don't exist."""
+
     def build_metadata_aware_chunks(
         self,
         chunks_with_embeddings: list[IndexChunk],
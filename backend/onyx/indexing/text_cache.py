@@ -0,0 +1,100 @@
+"""
+Local key value cache for text generated during indexing (e.g. LLM outputs), keyed by a
+hash of everything that determines the text.
+
+The store is a SQLite file so that all indexing worker processes on a host share it.
+It is bounded by entry count; the least recently used entries are evicted first.
+"""
+
+import os
+import sqlite3
+import time
+from collections.abc import Sequence
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Once over capacity, evict down to this fraction so eviction doesn't run on every write
+_EVICTION_TARGET_RATIO = 0.9
+# SQLite limits the number of bound parameters in a single statement
+_MAX_PARAMS_PER_QUERY = 500
+
+
+class TextCache:
+    def __init__(self, db_path: str, max_entries: int, name: str) -> None:
+        """name is used for the table and in log messages"""
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.name = name
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {name}_last_used ON {name} (last_used)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # multiple indexing processes write to the same file, wait for their locks
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        if not keys:
+            return found
+
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), _MAX_PARAMS_PER_QUERY):
+                key_batch = list(keys[start : start + _MAX_PARAMS_PER_QUERY])
+                placeholders = ",".join("?" * len(key_batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM {self.name} WHERE key IN ({placeholders})",
+                    key_batch,
+                ).fetchall()
+                found.update(dict(rows))
+
+                hit_keys = [key for key, _ in rows]
+                if hit_keys:
+                    conn.execute(
+                        f"UPDATE {self.name} SET last_used = ? WHERE key IN "
+                        f"({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+        return found
+
+    def put_many(self, entries: dict[str, str]) -> None:
+        if not entries:
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, last_used) "
+                "VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in entries.items()],
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+        if count <= self.max_entries:
+            return
+
+        to_delete = count - int(self.max_entries * _EVICTION_TARGET_RATIO)
+        conn.execute(
+            f"DELETE FROM {self.name} WHERE key IN "
+            f"(SELECT key FROM {self.name} ORDER BY last_used ASC LIMIT ?)",
+            (to_delete,),
+        )
+        logger.debug(f"Evicted {to_delete} entries from the {self.name} cache")
@@ -0,0 +1,186 @@
+"""
+Process local (L1) cache in front of the Redis layer of PgRedisKVStore.
+
+Every write to the key value store is broadcast over Redis pub/sub, and a listener
+thread in every process drops the entries that were written to. While the listener
+is not subscribed (e.g. after losing the Redis connection), the cache is cleared and
+bypassed, since invalidations may have been missed. Entries also expire after a TTL,
+which bounds how stale a value can get if anything still goes wrong.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from prometheus_client import Counter
+from redis.client import Redis
+
+from onyx.configs.app_configs import KV_STORE_L1_CACHE_MAX_SIZE
+from onyx.configs.app_configs import KV_STORE_L1_CACHE_TTL_SECONDS
+from onyx.redis.redis_pool import get_raw_redis_client
+from onyx.utils.logger import setup_logger
+from onyx.utils.special_types import JSON_ro
+
+logger = setup_logger()
+
+KV_STORE_INVALIDATION_CHANNEL = "onyx_kv_store_invalidation"
+_LISTENER_RETRY_DELAY_SECONDS = 5
+
+l1_cache_hits = Counter(
+    "onyx_kv_store_l1_cache_hits_total",
+    "Key value store loads served from the process local cache",
+)
+l1_cache_misses = Counter(
+    "onyx_kv_store_l1_cache_misses_total",
+    "Key value store loads that missed the process local cache",
+)
+
+
+class KVStoreL1Cache:
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        redis_client: Redis | None = None,
+        start_listener: bool = True,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+
+        # cache key -> (expiry time, value), least recently used first
+        self._entries: OrderedDict[str, tuple[float, JSON_ro]] = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every invalidation, see start_read
+        self._generation = 0
+        self._subscribed = threading.Event()
+        self._redis = redis_client or get_raw_redis_client()
+
+        if start_listener:
+            threading.Thread(
+                target=self._listen, name="kv-store-l1-invalidation", daemon=True
+            ).start()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, cache_key: str) -> tuple[bool, JSON_ro]:
+        """Returns (found, value). The value is a copy, callers may modify it."""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if (
+                entry is not None
+                and entry[0] > time.monotonic()
+                and self._subscribed.is_set()
+            ):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                l1_cache_hits.inc()
+                return True, _copy_value(entry[1])
+
+            if entry is not None:
+                del self._entries[cache_key]
+            self.misses += 1
+            l1_cache_misses.inc()
+            return False, None
+
+    def start_read(self) -> int:
+        """Call before reading a value from the lower layers, and pass the result to
+        put. If the key is invalidated in the meantime the read value may already be
+        stale, and put drops it."""
+        with self._lock:
+            return self._generation
+
+    def put(self, cache_key: str, value: JSON_ro, read_generation: int) -> None:
+        with self._lock:
+            if read_generation != self._generation or not self._subscribed.is_set():
+                return
+
+            self._entries[cache_key] = (
+                time.monotonic() + self.ttl_seconds,
+                _copy_value(value),
+            )
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cache_key: str) -> None:
+        """Drops the key in this process right away and in all other processes once
+        they receive the broadcast."""
+        self._invalidate_local(cache_key)
+        try:
+            self._redis.publish(KV_STORE_INVALIDATION_CHANNEL, cache_key)
+        except Exception:
+            logger.exception(f"Failed to broadcast the invalidation of '{cache_key}'")
+
+    def _invalidate_local(self, cache_key: str | None) -> None:
+        """None drops every entry"""
+        with self._lock:
+            self._generation += 1
+            if cache_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(cache_key, None)
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(KV_STORE_INVALIDATION_CHANNEL)
+                    # the subscribe confirmation, raises if the connection is broken
+                    pubsub.get_message(timeout=1)
+                    self._subscribed.set()
+                    for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        self._invalidate_local(_decode(message["data"]))
+                finally:
+                    pubsub.close()
+            except Exception:
+                logger.exception(
+                    "Lost the key value store invalidation subscription, retrying"
+                )
+            finally:
+                # invalidations may have been missed while not subscribed
+                self._subscribed.clear()
+                self._invalidate_local(None)
+
+            time.sleep(_LISTENER_RETRY_DELAY_SECONDS)
+
+
+def _decode(data: Any) -> str:
+    return data.decode("utf-8") if isinstance(data, bytes) else str(data)
+
+
+def _copy_value(value: JSON_ro) -> JSON_ro:
+    # values used to be decoded fresh on every load, keep callers from modifying the
+    # cached value
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+_l1_cache: KVStoreL1Cache | None = None
+_l1_cache_lock = threading.Lock()
+
+
+def get_kv_store_l1_cache() -> KVStoreL1Cache:
+    """Process wide cache. A new one is created after a fork, as the listener thread
+    of the parent doesn't exist in the child."""
+    global _l1_cache
+
+    with _l1_cache_lock:
+        if _l1_cache is None or _l1_cache.pid != os.getpid():
+            _l1_cache = KVStoreL1Cache(
+                max_size=KV_STORE_L1_CACHE_MAX_SIZE,
+                ttl_seconds=KV_STORE_L1_CACHE_TTL_SECONDS,
+            )
+        return _l1_cache
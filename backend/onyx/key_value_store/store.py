@@ -3,13 +3,17 @@ from typing import cast
 
 from redis.client import Redis
 
+from onyx.configs.app_configs import KV_STORE_L1_CACHE_ENABLED
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
 from onyx.db.models import KVStore
 from onyx.key_value_store.interface import KeyValueStore
 from onyx.key_value_store.interface import KvKeyNotFoundError
+from onyx.key_value_store.l1_cache import get_kv_store_l1_cache
+from onyx.key_value_store.l1_cache import KVStoreL1Cache
 from onyx.redis.redis_pool import get_redis_client
 from onyx.utils.logger import setup_logger
 from onyx.utils.special_types import JSON_ro
+from shared_configs.contextvars import get_current_tenant_id
 
 
 logger = setup_logger()
@@ -20,13 +24,32 @@ KV_REDIS_KEY_EXPIRATION = 60 * 60 * 24  # 1 Day
 
 
 class PgRedisKVStore(KeyValueStore):
-    def __init__(self, redis_client: Redis | None = None) -> None:
+    def __init__(
+        self,
+        redis_client: Redis | None = None,
+        l1_cache: KVStoreL1Cache | None = None,
+    ) -> None:
         # If no redis_client is provided, fall back to the context var
         if redis_client is not None:
             self.redis_client = redis_client
         else:
             self.redis_client = get_redis_client()
 
+        if l1_cache is None and KV_STORE_L1_CACHE_ENABLED:
+            l1_cache = get_kv_store_l1_cache()
+        self.l1_cache = l1_cache
+        # the L1 cache shadows the Redis layer, so it is keyed by the same tenant
+        self._tenant_id = (
+            getattr(self.redis_client, "tenant_id", None) or get_current_tenant_id()
+        )
+
+    def _l1_key(self, key: str) -> str:
+        return f"{self._tenant_id}:{key}"
+
+    def _invalidate_l1(self, key: str) -> None:
+        if self.l1_cache:
+            self.l1_cache.invalidate(self._l1_key(key))
+
     def store(self, key: str, val: JSON_ro, encrypt: bool = False) -> None:
         # Not encrypted in Redis, but encrypted in Postgres
         try:
@@ -50,7 +73,17 @@ class PgRedisKVStore(KeyValueStore):
                 db_session.add(obj)
             db_session.commit()
 
+        self._invalidate_l1(key)
+
     def load(self, key: str, refresh_cache: bool = False) -> JSON_ro:
+        read_generation = 0
+        if self.l1_cache:
+            if not refresh_cache:
+                found, l1_value = self.l1_cache.get(self._l1_key(key))
+                if found:
+                    return l1_value
+            read_generation = self.l1_cache.start_read()
+
         if not refresh_cache:
             try:
                 redis_value = self.redis_client.get(REDIS_KEY_PREFIX + key)
@@ -59,7 +92,10 @@ class PgRedisKVStore(KeyValueStore):
                         raise ValueError(
                             f"Redis value for key '{key}' is not a bytes object"
                         )
-                    return json.loads(redis_value.decode("utf-8"))
+                    value = json.loads(redis_value.decode("utf-8"))
+                    if self.l1_cache:
+                        self.l1_cache.put(self._l1_key(key), value, read_generation)
+                    return value
             except Exception as e:
                 logger.error(
                     f"Failed to get value from Redis for key '{key}': {str(e)}"
@@ -86,6 +122,8 @@ class PgRedisKVStore(KeyValueStore):
             except Exception as e:
                 logger.error(f"Failed to set value in Redis for key '{key}': {str(e)}")
 
+            if self.l1_cache:
+                self.l1_cache.put(self._l1_key(key), value, read_generation)
             return cast(JSON_ro, value)
 
     def delete(self, key: str) -> None:
@@ -94,8 +132,12 @@ class PgRedisKVStore(KeyValueStore):
         except Exception as e:
             logger.error(f"Failed to delete value from Redis for key '{key}': {str(e)}")
 
-        with get_session_with_current_tenant() as db_session:
-            result = db_session.query(KVStore).filter_by(key=key).delete()
-            if result == 0:
-                raise KvKeyNotFoundError
-            db_session.commit()
+        try:
+            with get_session_with_current_tenant() as db_session:
+                result = db_session.query(KVStore).filter_by(key=key).delete()
+                if result == 0:
+                    raise KvKeyNotFoundError
+                db_session.commit()
+        finally:
+            # the Redis entry is gone either way
+            self._invalidate_l1(key)
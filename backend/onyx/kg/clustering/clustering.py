@@ -1,16 +1,17 @@
+import itertools
 import time
 from collections.abc import Generator
 from typing import cast
 
 from rapidfuzz.fuzz import ratio
+from rapidfuzz.process import extractOne
 from redis.lock import Lock as RedisLock
-from sqlalchemy import func
-from sqlalchemy import text
 
 from onyx.background.celery.tasks.kg_processing.utils import extend_lock
 from onyx.configs.constants import CELERY_GENERIC_BEAT_LOCK_TIMEOUT
 from onyx.configs.kg_configs import KG_CLUSTERING_RETRIEVE_THRESHOLD
 from onyx.configs.kg_configs import KG_CLUSTERING_THRESHOLD
+from onyx.configs.kg_configs import KG_CLUSTERING_WRITE_BATCH_SIZE
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
 from onyx.db.entities import KGEntity
 from onyx.db.entities import KGEntityExtractionStaging
@@ -30,37 +31,33 @@ from onyx.document_index.vespa.kg_interactions import (
     get_kg_vespa_info_update_requests_for_document,
 )
 from onyx.document_index.vespa.kg_interactions import update_kg_chunks_vespa_info
+from onyx.kg.clustering.trigram_index import TrigramIndex
 from onyx.kg.models import KGGroundingType
 from onyx.kg.utils.formatting_utils import make_relationship_id
 from onyx.utils.logger import setup_logger
 from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
-from shared_configs.configs import POSTGRES_DEFAULT_SCHEMA
 
 logger = setup_logger()
 
 
-def _get_batch_untransferred_grounded_entities(
-    batch_size: int,
-) -> Generator[list[KGEntityExtractionStaging], None, None]:
-    while True:
-        with get_session_with_current_tenant() as db_session:
-            batch = (
-                db_session.query(KGEntityExtractionStaging)
-                .join(
-                    KGEntityType,
-                    KGEntityExtractionStaging.entity_type_id_name
-                    == KGEntityType.id_name,
-                )
-                .filter(
-                    KGEntityType.grounding == KGGroundingType.GROUNDED,
-                    KGEntityExtractionStaging.transferred_id_name.is_(None),
-                )
-                .limit(batch_size)
-                .all()
+def _get_untransferred_grounded_entity_types() -> list[str]:
+    with get_session_with_current_tenant() as db_session:
+        return [
+            entity_type_id_name
+            for (entity_type_id_name,) in db_session.query(
+                KGEntityExtractionStaging.entity_type_id_name
             )
-            if not batch:
-                break
-            yield batch
+            .join(
+                KGEntityType,
+                KGEntityExtractionStaging.entity_type_id_name == KGEntityType.id_name,
+            )
+            .filter(
+                KGEntityType.grounding == KGGroundingType.GROUNDED,
+                KGEntityExtractionStaging.transferred_id_name.is_(None),
+            )
+            .distinct()
+            .all()
+        ]
 
 
 def _get_batch_untransferred_relationship_types(
@@ -144,78 +141,138 @@ def _get_batch_kg_processed_documents(
             offset += batch_size
 
 
-def _cluster_one_grounded_entity(
+def _has_digit(name: str) -> bool:
+    # skip those with numbers so we don't cluster version1 and version2, etc.
+    return any(char.isdigit() for char in name)
+
+
+def _find_best_match(
     entity: KGEntityExtractionStaging,
-) -> tuple[KGEntity, bool]:
+    entity_name: str,
+    index: TrigramIndex,
+    entities_by_id_name: dict[str, KGEntity],
+) -> KGEntity | None:
+    if _has_digit(entity_name):
+        return None
+
+    # find entities of the same type with a similar name
+    choices = {
+        id_name: entities_by_id_name[id_name].name
+        for id_name in index.query(entity_name)
+        # grounded entities can only be merged into entities without a document
+        if entity.document_id is None
+        or entities_by_id_name[id_name].document_id is None
+    }
+    if not choices:
+        return None
+
+    best_match = extractOne(
+        entity_name,
+        choices,
+        scorer=ratio,
+        score_cutoff=KG_CLUSTERING_THRESHOLD * 100,
+    )
+    if best_match is None:
+        return None
+    _, _, best_id_name = best_match
+    return entities_by_id_name[best_id_name]
+
+
+def _cluster_grounded_entities_of_type(
+    entity_type_id_name: str,
+    lock: RedisLock,
+    last_lock_time: float,
+) -> float:
     """
-    Cluster a single grounded entity.
+    Clusters all untransferred grounded entities of one entity type. All candidates
+    are loaded once and matched in memory, then the staging entities are merged into
+    their best match, or transferred if there is none, in batched transactions.
+    Entities created or updated along the way are candidates for the entities after
+    them, exactly like when clustering one entity at a time.
     """
     with get_session_with_current_tenant() as db_session:
-        # get entity name and filtering conditions
-        if entity.document_id is not None:
-            entity_name = cast(
-                str,
-                db_session.query(Document.semantic_id)
-                .filter(Document.id == entity.document_id)
-                .scalar(),
-            ).lower()
-            filtering = [KGEntity.document_id.is_(None)]
-        else:
-            entity_name = entity.name.lower()
-            filtering = []
-
-        # skip those with numbers so we don't cluster version1 and version2, etc.
-        similar_entities: list[KGEntity] = []
-        if not any(char.isdigit() for char in entity_name):
-            # find similar entities, uses GIN index, very efficient
-            db_session.execute(
-                text(
-                    "SET pg_trgm.similarity_threshold = "
-                    + str(KG_CLUSTERING_RETRIEVE_THRESHOLD)
-                )
+        existing_entities = (
+            db_session.query(KGEntity)
+            .filter(KGEntity.entity_type_id_name == entity_type_id_name)
+            .all()
+        )
+        staging_entities = (
+            db_session.query(KGEntityExtractionStaging, Document.semantic_id)
+            .outerjoin(Document, Document.id == KGEntityExtractionStaging.document_id)
+            .filter(
+                KGEntityExtractionStaging.entity_type_id_name == entity_type_id_name,
+                KGEntityExtractionStaging.transferred_id_name.is_(None),
             )
-            similar_entities = (
-                db_session.query(KGEntity)
-                .filter(
-                    # find entities of the same type with a similar name
-                    *filtering,
-                    KGEntity.entity_type_id_name == entity.entity_type_id_name,
-                    getattr(func, POSTGRES_DEFAULT_SCHEMA).similarity_op(
-                        KGEntity.name, entity_name
-                    ),
+            .order_by(KGEntityExtractionStaging.id_name)
+            .all()
+        )
+
+    # grounded entities with a document are matched by the document's name
+    entities_to_cluster = [
+        (
+            entity,
+            (
+                cast(str, semantic_id).lower()
+                if entity.document_id is not None
+                else entity.name.lower()
+            ),
+        )
+        for entity, semantic_id in staging_entities
+    ]
+
+    entities_by_id_name = {entity.id_name: entity for entity in existing_entities}
+    index = TrigramIndex(
+        threshold=KG_CLUSTERING_RETRIEVE_THRESHOLD,
+        corpus=itertools.chain(
+            (entity.name for entity in existing_entities),
+            (entity_name for _, entity_name in entities_to_cluster),
+            (entity.name.casefold() for entity, _ in entities_to_cluster),
+        ),
+    )
+    for existing_entity in existing_entities:
+        if not _has_digit(existing_entity.name):
+            index.add(existing_entity.id_name, existing_entity.name)
+
+    num_merged = 0
+    for batch_start in range(
+        0, len(entities_to_cluster), KG_CLUSTERING_WRITE_BATCH_SIZE
+    ):
+        with get_session_with_current_tenant() as db_session:
+            for entity, entity_name in entities_to_cluster[
+                batch_start : batch_start + KG_CLUSTERING_WRITE_BATCH_SIZE
+            ]:
+                best_entity = _find_best_match(
+                    entity, entity_name, index, entities_by_id_name
                 )
-                .all()
-            )
 
-    # find best match
-    best_score = -1.0
-    best_entity = None
-    for similar in similar_entities:
-        # skip those with numbers so we don't cluster version1 and version2, etc.
-        if any(char.isdigit() for char in similar.name):
-            continue
-        score = ratio(similar.name, entity_name)
-        if score >= KG_CLUSTERING_THRESHOLD * 100 and score > best_score:
-            best_score = score
-            best_entity = similar
-
-    # if there is a match, update the entity, otherwise create a new one
-    with get_session_with_current_tenant() as db_session:
-        if best_entity:
-            logger.debug(f"Merged {entity.name} with {best_entity.name}")
-            update_vespa = (
-                best_entity.document_id is None and entity.document_id is not None
-            )
-            transferred_entity = merge_entities(
-                db_session=db_session, parent=best_entity, child=entity
-            )
-        else:
-            update_vespa = entity.document_id is not None
-            transferred_entity = transfer_entity(db_session=db_session, entity=entity)
+                # if there is a match, update the entity, otherwise create a new one
+                if best_entity:
+                    logger.debug(f"Merged {entity.name} with {best_entity.name}")
+                    transferred_entity = merge_entities(
+                        db_session=db_session, parent=best_entity, child=entity
+                    )
+                    num_merged += 1
+                else:
+                    transferred_entity = transfer_entity(
+                        db_session=db_session, entity=entity
+                    )
+
+                entities_by_id_name[transferred_entity.id_name] = transferred_entity
+                if not _has_digit(transferred_entity.name):
+                    index.add(transferred_entity.id_name, transferred_entity.name)
 
-        db_session.commit()
+            db_session.commit()
 
-    return transferred_entity, update_vespa
+        last_lock_time = extend_lock(
+            lock, CELERY_GENERIC_BEAT_LOCK_TIMEOUT, last_lock_time
+        )
+
+    logger.info(
+        f"Clustered {len(entities_to_cluster)} entities of type {entity_type_id_name}: "
+        f"merged={num_merged} "
+        f"transferred={len(entities_to_cluster) - num_merged}"
+    )
+    return last_lock_time
 
 
 def _create_one_parent_child_relationship(entity: KGEntityExtractionStaging) -> None:
@@ -319,24 +376,18 @@ def kg_clustering(
 
     last_lock_time = time.monotonic()
 
-    # Cluster and transfer grounded entities sequentially
+    # Cluster and transfer grounded entities, one entity type at a time
     start_time = time.monotonic()
-    i_batch = 0
-    for i_batch, untransferred_grounded_entities in enumerate(
-        _get_batch_untransferred_grounded_entities(
-            batch_size=processing_chunk_batch_size
-        )
-    ):
-        for entity in untransferred_grounded_entities:
-            _cluster_one_grounded_entity(entity)
-        last_lock_time = extend_lock(
-            lock, CELERY_GENERIC_BEAT_LOCK_TIMEOUT, last_lock_time
+    entity_type_id_names = _get_untransferred_grounded_entity_types()
+    for entity_type_id_name in entity_type_id_names:
+        last_lock_time = _cluster_grounded_entities_of_type(
+            entity_type_id_name, lock, last_lock_time
         )
-        # logger.debug(f"Transferred entities batch {i}")
     # NOTE: we assume every entity is transferred, as we currently only have grounded entities
     time_delta = time.monotonic() - start_time
     logger.info(
-        f"Finished transferring {i_batch+1} entity batches in {time_delta:.2f}s"
+        f"Finished transferring entities of {len(entity_type_id_names)} types "
+        f"in {time_delta:.2f}s"
     )
 
     # Create parent-child relationships in parallel
@@ -0,0 +1,92 @@
+"""
+In-memory trigram index used to find clustering candidates for many entities at once.
+
+Similarity is computed the same way as pg_trgm's `similarity`: the Jaccard similarity of
+the trigram sets of the lowercased, alphanumeric words of both strings.
+
+To avoid comparing every pair, prefix filtering is used: with the trigrams of every string
+sorted from the rarest to the most common, two trigram sets with a Jaccard similarity of
+at least t always share one of the first |x| - ceil(t * |x|) + 1 trigrams of each set. So
+only those prefixes are indexed and probed, and very common trigrams are rarely touched.
+"""
+
+import math
+import re
+from collections import Counter
+from collections import defaultdict
+from collections.abc import Iterable
+
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def get_trigrams(text: str) -> frozenset[str]:
+    """Same trigrams as pg_trgm's show_trgm: every word is padded with two spaces in
+    front and one at the end."""
+    trigrams: set[str] = set()
+    for word in _WORD_PATTERN.findall(text.lower()):
+        padded = f"  {word} "
+        trigrams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(trigrams)
+
+
+def trigram_similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TrigramIndex:
+    def __init__(self, threshold: float, corpus: Iterable[str] = ()) -> None:
+        """corpus should contain the strings that will be indexed or queried; it is only
+        used to order trigrams from rare to common, which keeps probing cheap."""
+        self.threshold = threshold
+
+        self._frequencies: Counter[str] = Counter()
+        for text in corpus:
+            self._frequencies.update(get_trigrams(text))
+
+        self._postings: defaultdict[str, list[str]] = defaultdict(list)
+        self._trigrams: dict[str, frozenset[str]] = {}
+        self._positions: dict[str, int] = {}
+
+    def _prefix(self, trigrams: frozenset[str]) -> list[str]:
+        ordered = sorted(trigrams, key=lambda t: (self._frequencies[t], t))
+        prefix_length = len(ordered) - math.ceil(self.threshold * len(ordered)) + 1
+        return ordered[: max(prefix_length, 1)]
+
+    def __len__(self) -> int:
+        return len(self._trigrams)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._trigrams
+
+    def add(self, key: str, text: str) -> None:
+        if key in self._trigrams:
+            return
+
+        trigrams = get_trigrams(text)
+        self._trigrams[key] = trigrams
+        self._positions[key] = len(self._positions)
+        if not trigrams:
+            return
+        for trigram in self._prefix(trigrams):
+            self._postings[trigram].append(key)
+
+    def query(self, text: str) -> list[str]:
+        """Returns the keys of all indexed strings with a similarity of at least the
+        threshold, in the order they were added."""
+        trigrams = get_trigrams(text)
+        if not trigrams:
+            return []
+
+        candidates: set[str] = set()
+        for trigram in self._prefix(trigrams):
+            candidates.update(self._postings.get(trigram, ()))
+
+        matches = [
+            key
+            for key in candidates
+            if trigram_similarity(trigrams, self._trigrams[key]) >= self.threshold
+        ]
+        return sorted(matches, key=self._positions.__getitem__)
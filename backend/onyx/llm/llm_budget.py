@@ -0,0 +1,49 @@
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+
+
+class LLMBudget:
+    """Process wide limit on the number of concurrent LLM calls and the number of
+    tokens they use per minute (a token bucket that refills continuously).
+    tokens_per_minute <= 0 disables the token limit."""
+
+    def __init__(self, max_concurrency: int, tokens_per_minute: int) -> None:
+        self.max_concurrency = max(max_concurrency, 1)
+        self.tokens_per_minute = tokens_per_minute
+
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._available_tokens = float(max(tokens_per_minute, 0))
+        self._last_refill = time.monotonic()
+
+    def _take_tokens(self, num_tokens: int) -> float:
+        """Returns 0 if the tokens were taken, otherwise how long to wait before
+        trying again."""
+        # a call larger than the whole budget has to be let through eventually
+        num_tokens = min(num_tokens, self.tokens_per_minute)
+        tokens_per_second = self.tokens_per_minute / 60
+
+        with self._lock:
+            now = time.monotonic()
+            self._available_tokens = min(
+                self._available_tokens + (now - self._last_refill) * tokens_per_second,
+                self.tokens_per_minute,
+            )
+            self._last_refill = now
+
+            if self._available_tokens >= num_tokens:
+                self._available_tokens -= num_tokens
+                return 0
+            return (num_tokens - self._available_tokens) / tokens_per_second
+
+    @contextmanager
+    def reserve(self, num_tokens: int) -> Generator[None, None, None]:
+        """Blocks until the call may start. num_tokens is an estimate of the tokens
+        the call will use."""
+        with self._semaphore:
+            if self.tokens_per_minute > 0:
+                while wait_time := self._take_tokens(num_tokens):
+                    time.sleep(wait_time)
+            yield
@@ -4,6 +4,7 @@ import os
 import threading
 import time
 from collections.abc import Callable
+from collections.abc import Sequence
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
@@ -23,6 +24,7 @@ from httpx import HTTPError
 from requests import JSONDecodeError
 from requests import RequestException
 from requests import Response
+from requests.adapters import HTTPAdapter
 from retry import retry
 
 from onyx.configs.app_configs import INDEXING_EMBEDDING_MODEL_NUM_THREADS
@@ -51,11 +53,20 @@ from shared_configs.configs import DOC_EMBEDDING_CONTEXT_SIZE
 from shared_configs.configs import INDEXING_MODEL_SERVER_HOST
 from shared_configs.configs import INDEXING_MODEL_SERVER_PORT
 from shared_configs.configs import INDEXING_ONLY
+from shared_configs.configs import MODEL_SERVER_EMBEDDING_TRANSPORT
 from shared_configs.configs import MODEL_SERVER_HOST
 from shared_configs.configs import MODEL_SERVER_PORT
 from shared_configs.configs import OPENAI_EMBEDDING_TIMEOUT
 from shared_configs.configs import SKIP_WARM_UP
 from shared_configs.configs import VERTEXAI_EMBEDDING_LOCAL_BATCH_SIZE
+from shared_configs.embedding_transport import (
+    build_binary_embedding_request_headers,
+)
+from shared_configs.embedding_transport import concat_embeddings
+from shared_configs.embedding_transport import decode_embeddings
+from shared_configs.embedding_transport import EMBEDDING_BINARY_DTYPES
+from shared_configs.embedding_transport import EmbeddingRows
+from shared_configs.embedding_transport import is_binary_embedding_response
 from shared_configs.enums import EmbeddingProvider
 from shared_configs.enums import EmbedTextType
 from shared_configs.enums import RerankerProvider
@@ -202,6 +213,29 @@ def build_model_server_url(
     return f"http://{model_server_url}"
 
 
+# Shared by all EmbeddingModel instances and indexing threads so that batches reuse
+# keep-alive connections to the model server instead of reconnecting for every request
+_model_server_session: requests.Session | None = None
+_model_server_session_lock = threading.Lock()
+
+
+def _get_model_server_session() -> requests.Session:
+    global _model_server_session
+
+    if _model_server_session is None:
+        with _model_server_session_lock:
+            if _model_server_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=max(INDEXING_EMBEDDING_MODEL_NUM_THREADS, 16),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _model_server_session = session
+    return _model_server_session
+
+
 def is_authentication_error(error: Exception) -> bool:
     """Check if an exception is related to authentication issues.
 
@@ -498,7 +532,7 @@ class CloudEmbedding:
         )
         response.raise_for_status()
         result = response.json()
-        
+
         # Ollama returns {"embeddings": [[...], [...], ...]}
         return result["embeddings"]
 
@@ -807,7 +841,7 @@ class EmbeddingModel:
         embed_request: EmbedRequest,
         tenant_id: str | None = None,
         request_id: str | None = None,
-    ) -> EmbedResponse:
+    ) -> Sequence[Embedding]:
         if self.embed_server_endpoint is None:
             raise ValueError("Model server endpoint is not configured for local models")
 
@@ -816,13 +850,20 @@ class EmbeddingModel:
 
         def _make_request() -> Response:
             headers = {}
+            if MODEL_SERVER_EMBEDDING_TRANSPORT in EMBEDDING_BINARY_DTYPES:
+                headers.update(
+                    build_binary_embedding_request_headers(
+                        MODEL_SERVER_EMBEDDING_TRANSPORT
+                    )
+                )
+
             if tenant_id:
                 headers["X-Onyx-Tenant-ID"] = tenant_id
 
             if request_id:
                 headers["X-Onyx-Request-ID"] = request_id
 
-            response = requests.post(
+            response = _get_model_server_session().post(
                 endpoint,
                 headers=headers,
                 json=embed_request.model_dump(),
@@ -853,7 +894,12 @@ class EmbeddingModel:
 
         try:
             response = final_make_request_func()
-            return EmbedResponse(**response.json())
+            if is_binary_embedding_response(response.headers):
+                # rows are only converted to lists once they are used
+                return EmbeddingRows(
+                    decode_embeddings(response.content, response.headers)
+                )
+            return EmbedResponse(**response.json()).embeddings
         except requests.HTTPError as e:
             if not response:
                 raise HTTPError("HTTP error occurred - response is None.") from e
@@ -875,12 +921,12 @@ class EmbeddingModel:
         num_threads: int = INDEXING_EMBEDDING_MODEL_NUM_THREADS,
         tenant_id: str | None = None,
         request_id: str | None = None,
-    ) -> list[Embedding]:
+    ) -> Sequence[Embedding]:
         text_batches = batch_list(texts, batch_size)
 
         logger.debug(f"Encoding {len(texts)} texts in {len(text_batches)} batches")
 
-        embeddings: list[Embedding] = []
+        batches_embeddings: list[Sequence[Embedding]] = []
 
         @_cleanup_thread_local
         def process_batch(
@@ -889,7 +935,7 @@ class EmbeddingModel:
             text_batch: list[str],
             tenant_id: str | None = None,
             request_id: str | None = None,
-        ) -> tuple[int, list[Embedding]]:
+        ) -> tuple[int, Sequence[Embedding]]:
             if self.callback:
                 if self.callback.should_stop():
                     raise ConnectorStopSignal(
@@ -925,9 +971,10 @@ class EmbeddingModel:
                         embed_request, tenant_id=tenant_id, request_id=request_id
                     )
                 )
+                embeddings: Sequence[Embedding] = response.embeddings
             else:
                 # For local models, use model server
-                response = self._make_model_server_request(
+                embeddings = self._make_model_server_request(
                     embed_request, tenant_id=tenant_id, request_id=request_id
                 )
 
@@ -938,7 +985,7 @@ class EmbeddingModel:
                 f"EmbeddingModel.process_batch: Batch {batch_idx}/{batch_len} processing time: {processing_time:.2f} seconds"
             )
 
-            return batch_idx, response.embeddings
+            return batch_idx, embeddings
 
         # only multi thread if:
         #   1. num_threads is greater than 1
@@ -961,7 +1008,7 @@ class EmbeddingModel:
                 }
 
                 # Collect results in order
-                batch_results: list[tuple[int, list[Embedding]]] = []
+                batch_results: list[tuple[int, Sequence[Embedding]]] = []
                 for future in as_completed(future_to_batch):
                     try:
                         result = future.result()
@@ -973,7 +1020,7 @@ class EmbeddingModel:
                 # Sort by batch index and extend embeddings
                 batch_results.sort(key=lambda x: x[0])
                 for _, batch_embeddings in batch_results:
-                    embeddings.extend(batch_embeddings)
+                    batches_embeddings.append(batch_embeddings)
         else:
             # Original sequential processing
             for idx, text_batch in enumerate(text_batches, start=1):
@@ -984,9 +1031,9 @@ class EmbeddingModel:
                     tenant_id=tenant_id,
                     request_id=request_id,
                 )
-                embeddings.extend(batch_embeddings)
+                batches_embeddings.append(batch_embeddings)
 
-        return embeddings
+        return concat_embeddings(batches_embeddings)
 
     @log_function_time(print_only=True, debug_only=True)
     def encode(
@@ -999,7 +1046,7 @@ class EmbeddingModel:
         max_seq_length: int = DOC_EMBEDDING_CONTEXT_SIZE,
         tenant_id: str | None = None,
         request_id: str | None = None,
-    ) -> list[Embedding]:
+    ) -> Sequence[Embedding]:
         if not texts or not all(texts):
             raise ValueError(f"Empty or missing text for embedding: {texts}")
 
@@ -17,6 +17,8 @@ from onyx.configs.constants import OnyxCeleryTask
 from onyx.configs.constants import OnyxRedisConstants
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.document import construct_document_id_select_for_connector_credential_pair
+from onyx.redis.redis_pool import delete_keys_with_prefixes
+from onyx.utils.batching import batch_generator
 
 
 class RedisConnectorDeletePayload(BaseModel):
@@ -65,6 +67,10 @@ class RedisConnectorDelete:
     def payload(self) -> RedisConnectorDeletePayload | None:
         # read related data and evaluate/print task progress
         fence_bytes = cast(bytes, self.redis.get(self.fence_key))
+        return self._parse_payload(fence_bytes)
+
+    @staticmethod
+    def _parse_payload(fence_bytes: bytes | None) -> RedisConnectorDeletePayload | None:
         if fence_bytes is None:
             return None
 
@@ -73,14 +79,25 @@ class RedisConnectorDelete:
 
         return payload
 
+    def get_progress(self) -> tuple[RedisConnectorDeletePayload | None, int]:
+        """Returns the fence payload and the number of remaining tasks, read in a
+        single round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.fence_key)
+        pipe.scard(self.taskset_key)
+        fence_bytes, remaining = pipe.execute()
+        return self._parse_payload(fence_bytes), cast(int, remaining)
+
     def set_fence(self, payload: RedisConnectorDeletePayload | None) -> None:
+        # the fence and the set of active fences are updated atomically
+        pipe = self.redis.pipeline()
         if not payload:
-            self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-            self.redis.delete(self.fence_key)
-            return
-
-        self.redis.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
-        self.redis.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.delete(self.fence_key)
+        else:
+            pipe.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
+            pipe.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.execute()
 
     def set_active(self) -> None:
         """This sets a signal to keep the permissioning flow from getting cleaned up within
@@ -122,45 +139,47 @@ class RedisConnectorDelete:
         stmt = construct_document_id_select_for_connector_credential_pair(
             cc_pair.connector_id, cc_pair.credential_id
         )
-        for doc_id in db_session.scalars(stmt).yield_per(DB_YIELD_PER_DEFAULT):
-            doc_id = cast(str, doc_id)
-            current_time = time.monotonic()
-            if current_time - last_lock_time >= (
-                CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT / 4
-            ):
-                lock.reacquire()
-                last_lock_time = current_time
-
-            custom_task_id = self._generate_task_id()
-
-            # add to the tracking taskset in redis BEFORE creating the celery task.
+        doc_ids = db_session.scalars(stmt).yield_per(DB_YIELD_PER_DEFAULT)
+        for doc_id_batch in batch_generator(doc_ids, DB_YIELD_PER_DEFAULT):
+            custom_task_ids = [self._generate_task_id() for _ in doc_id_batch]
+
+            # add to the tracking taskset in redis BEFORE creating the celery tasks.
             # note that for the moment we are using a single taskset key, not differentiated by cc_pair id
-            self.redis.sadd(self.taskset_key, custom_task_id)
-
-            # Priority on sync's triggered by new indexing should be medium
-            celery_app.send_task(
-                OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
-                kwargs=dict(
-                    document_id=doc_id,
-                    connector_id=cc_pair.connector_id,
-                    credential_id=cc_pair.credential_id,
-                    tenant_id=self.tenant_id,
-                ),
-                queue=OnyxCeleryQueues.CONNECTOR_DELETION,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
-                ignore_result=True,
-            )
-
-            num_tasks_sent += 1
+            self.redis.sadd(self.taskset_key, *custom_task_ids)
+
+            for doc_id, custom_task_id in zip(doc_id_batch, custom_task_ids):
+                doc_id = cast(str, doc_id)
+                current_time = time.monotonic()
+                if current_time - last_lock_time >= (
+                    CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT / 4
+                ):
+                    lock.reacquire()
+                    last_lock_time = current_time
+
+                # Priority on sync's triggered by new indexing should be medium
+                celery_app.send_task(
+                    OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
+                    kwargs=dict(
+                        document_id=doc_id,
+                        connector_id=cc_pair.connector_id,
+                        credential_id=cc_pair.credential_id,
+                        tenant_id=self.tenant_id,
+                    ),
+                    queue=OnyxCeleryQueues.CONNECTOR_DELETION,
+                    task_id=custom_task_id,
+                    priority=OnyxCeleryPriority.MEDIUM,
+                    ignore_result=True,
+                )
+
+                num_tasks_sent += 1
 
         return num_tasks_sent
 
     def reset(self) -> None:
-        self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-        self.redis.delete(self.active_key)
-        self.redis.delete(self.taskset_key)
-        self.redis.delete(self.fence_key)
+        pipe = self.redis.pipeline()
+        pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.delete(self.active_key, self.taskset_key, self.fence_key)
+        pipe.execute()
 
     @staticmethod
     def remove_from_taskset(id: int, task_id: str, r: redis.Redis) -> None:
@@ -171,11 +190,11 @@ class RedisConnectorDelete:
     @staticmethod
     def reset_all(r: redis.Redis) -> None:
         """Deletes all redis values for all connectors"""
-        for key in r.scan_iter(RedisConnectorDelete.ACTIVE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorDelete.TASKSET_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorDelete.FENCE_PREFIX + "*"):
-            r.delete(key)
+        delete_keys_with_prefixes(
+            r,
+            [
+                RedisConnectorDelete.ACTIVE_PREFIX,
+                RedisConnectorDelete.TASKSET_PREFIX,
+                RedisConnectorDelete.FENCE_PREFIX,
+            ],
+        )
@@ -13,6 +13,7 @@ from onyx.access.models import DocExternalAccess
 from onyx.configs.constants import CELERY_GENERIC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import CELERY_PERMISSIONS_SYNC_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxRedisConstants
+from onyx.redis.redis_pool import delete_keys_with_prefixes
 from onyx.redis.redis_pool import SCAN_ITER_COUNT_DEFAULT
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 
@@ -21,12 +22,15 @@ class PermissionSyncResult(NamedTuple):
     """Result of a permission sync operation.
 
     Attributes:
-        num_updated: Number of documents successfully updated
+        num_updated: Number of documents whose permissions were changed
         num_errors: Number of documents that failed to update
+        num_unchanged: Number of documents skipped since their permissions had
+            not changed since the last sync
     """
 
     num_updated: int
     num_errors: int
+    num_unchanged: int = 0
 
 
 class RedisConnectorPermissionSyncPayload(BaseModel):
@@ -82,8 +86,7 @@ class RedisConnectorPermissionSync:
         self.redis.delete(self.taskset_key)
 
     def generator_clear(self) -> None:
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
+        self.redis.delete(self.generator_progress_key, self.generator_complete_key)
 
     def get_remaining(self) -> int:
         remaining = cast(int, self.redis.scard(self.taskset_key))
@@ -122,13 +125,15 @@ class RedisConnectorPermissionSync:
         self,
         payload: RedisConnectorPermissionSyncPayload | None,
     ) -> None:
+        # the fence and the set of active fences are updated atomically
+        pipe = self.redis.pipeline()
         if not payload:
-            self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-            self.redis.delete(self.fence_key)
-            return
-
-        self.redis.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
-        self.redis.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.delete(self.fence_key)
+        else:
+            pipe.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
+            pipe.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.execute()
 
     def set_active(self) -> None:
         """This sets a signal to keep the permissioning flow from getting cleaned up within
@@ -145,15 +150,8 @@ class RedisConnectorPermissionSync:
     def generator_complete(self) -> int | None:
         """the fence payload is an int representing the starting number of
         permission sync tasks to be processed ... just after the generator completes."""
-        fence_bytes = self.redis.get(self.generator_complete_key)
-        if fence_bytes is None:
-            return None
-
-        if fence_bytes == b"None":
-            return None
-
-        fence_int = int(cast(bytes, fence_bytes).decode())
-        return fence_int
+        fence_bytes = cast(bytes | None, self.redis.get(self.generator_complete_key))
+        return self._parse_generator_complete(fence_bytes)
 
     @generator_complete.setter
     def generator_complete(self, payload: int | None) -> None:
@@ -165,6 +163,32 @@ class RedisConnectorPermissionSync:
 
         self.redis.set(self.generator_complete_key, payload, ex=self.FENCE_TTL)
 
+    @staticmethod
+    def _parse_generator_complete(fence_bytes: bytes | None) -> int | None:
+        if fence_bytes is None:
+            return None
+
+        if fence_bytes == b"None":
+            return None
+
+        fence_int = int(cast(bytes, fence_bytes).decode())
+        return fence_int
+
+    def get_progress(self) -> tuple[int, int] | None:
+        """Returns the initial and remaining number of permission sync tasks, read in
+        a single round trip. None if the sync isn't fenced or the generator isn't
+        complete."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(self.fence_key)
+        pipe.get(self.generator_complete_key)
+        pipe.scard(self.taskset_key)
+        fenced, fence_bytes, remaining = pipe.execute()
+        initial = self._parse_generator_complete(fence_bytes)
+        if not fenced or initial is None:
+            return None
+
+        return initial, cast(int, remaining)
+
     def update_db(
         self,
         lock: RedisLock | None,
@@ -174,29 +198,22 @@ class RedisConnectorPermissionSync:
         credential_id: int,
         task_logger: Logger | None = None,
     ) -> PermissionSyncResult:
-        """Update permissions for documents.
+        """Update permissions for documents. The whole batch is written at once,
+        documents whose permissions are unchanged are skipped.
 
         Returns:
-            PermissionSyncResult containing counts of successful updates and errors
+            PermissionSyncResult containing counts of updated, unchanged and failed
+            documents
         """
         last_lock_time = time.monotonic()
 
-        document_update_permissions_fn = fetch_versioned_implementation(
+        document_update_permissions_batch_fn = fetch_versioned_implementation(
             "onyx.background.celery.tasks.doc_permission_syncing.tasks",
-            "document_update_permissions",
+            "document_update_permissions_batch",
         )
 
-        num_permissions = 0
-        num_errors = 0
-        # Create a task for each document permission sync
+        permissions_to_update: list[DocExternalAccess] = []
         for permissions in new_permissions:
-            current_time = time.monotonic()
-            if lock and current_time - last_lock_time >= (
-                CELERY_GENERIC_BEAT_LOCK_TIMEOUT / 4
-            ):
-                lock.reacquire()
-                last_lock_time = current_time
-
             if (
                 permissions.external_access.num_entries
                 > permissions.external_access.MAX_NUM_ENTRIES
@@ -214,23 +231,62 @@ class RedisConnectorPermissionSync:
                     )
                 continue
 
-            # NOTE(rkuo): this used to fire a task instead of directly writing to the DB,
-            # but the permissions can be excessively large if sent over the wire.
-            # On the other hand, the downside of doing db updates here is that we can
-            # block and fail if we can't make the calls to the DB ... but that's probably
-            # a rare enough case to be acceptable.
+            permissions_to_update.append(permissions)
+
+        if not permissions_to_update:
+            return PermissionSyncResult(num_updated=0, num_errors=0)
+
+        # NOTE(rkuo): this used to fire a task instead of directly writing to the DB,
+        # but the permissions can be excessively large if sent over the wire.
+        # On the other hand, the downside of doing db updates here is that we can
+        # block and fail if we can't make the calls to the DB ... but that's probably
+        # a rare enough case to be acceptable.
+        try:
+            batch_result = document_update_permissions_batch_fn(
+                self.tenant_id,
+                permissions_to_update,
+                source_string,
+                connector_id,
+                credential_id,
+            )
+            # keeps the lock alive once per batch, like the per document loop below
+            if lock:
+                lock.reacquire()
+
+            return PermissionSyncResult(
+                num_updated=len(batch_result.changed_doc_ids),
+                num_errors=0,
+                num_unchanged=batch_result.num_unchanged,
+            )
+        except Exception:
+            if task_logger:
+                task_logger.exception(
+                    f"Failed to update permissions for a batch of "
+                    f"{len(permissions_to_update)} documents, retrying one by one"
+                )
+
+        # Catch exceptions per-document to avoid breaking the entire sync
+        num_updated = 0
+        num_unchanged = 0
+        num_errors = 0
+        for permissions in permissions_to_update:
+            current_time = time.monotonic()
+            if lock and current_time - last_lock_time >= (
+                CELERY_GENERIC_BEAT_LOCK_TIMEOUT / 4
+            ):
+                lock.reacquire()
+                last_lock_time = current_time
 
-            # This can internally exception due to db issues but still continue
-            # Catch exceptions per-document to avoid breaking the entire sync
             try:
-                document_update_permissions_fn(
+                batch_result = document_update_permissions_batch_fn(
                     self.tenant_id,
-                    permissions,
+                    [permissions],
                     source_string,
                     connector_id,
                     credential_id,
                 )
-                num_permissions += 1
+                num_updated += len(batch_result.changed_doc_ids)
+                num_unchanged += batch_result.num_unchanged
             except Exception:
                 num_errors += 1
                 if task_logger:
@@ -239,15 +295,23 @@ class RedisConnectorPermissionSync:
                     )
                 # Continue processing other documents
 
-        return PermissionSyncResult(num_updated=num_permissions, num_errors=num_errors)
+        return PermissionSyncResult(
+            num_updated=num_updated,
+            num_errors=num_errors,
+            num_unchanged=num_unchanged,
+        )
 
     def reset(self) -> None:
-        self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-        self.redis.delete(self.active_key)
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
-        self.redis.delete(self.taskset_key)
-        self.redis.delete(self.fence_key)
+        pipe = self.redis.pipeline()
+        pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.delete(
+            self.active_key,
+            self.generator_progress_key,
+            self.generator_complete_key,
+            self.taskset_key,
+            self.fence_key,
+        )
+        pipe.execute()
 
     @staticmethod
     def remove_from_taskset(id: int, task_id: str, r: redis.Redis) -> None:
@@ -258,21 +322,13 @@ class RedisConnectorPermissionSync:
     @staticmethod
     def reset_all(r: redis.Redis) -> None:
         """Deletes all redis values for all connectors"""
-        for key in r.scan_iter(RedisConnectorPermissionSync.ACTIVE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPermissionSync.TASKSET_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(
-            RedisConnectorPermissionSync.GENERATOR_COMPLETE_PREFIX + "*"
-        ):
-            r.delete(key)
-
-        for key in r.scan_iter(
-            RedisConnectorPermissionSync.GENERATOR_PROGRESS_PREFIX + "*"
-        ):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPermissionSync.FENCE_PREFIX + "*"):
-            r.delete(key)
+        delete_keys_with_prefixes(
+            r,
+            [
+                RedisConnectorPermissionSync.ACTIVE_PREFIX,
+                RedisConnectorPermissionSync.TASKSET_PREFIX,
+                RedisConnectorPermissionSync.GENERATOR_COMPLETE_PREFIX,
+                RedisConnectorPermissionSync.GENERATOR_PROGRESS_PREFIX,
+                RedisConnectorPermissionSync.FENCE_PREFIX,
+            ],
+        )
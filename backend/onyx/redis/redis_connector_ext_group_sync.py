@@ -8,6 +8,7 @@ from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
 from onyx.configs.constants import OnyxRedisConstants
+from onyx.redis.redis_pool import delete_keys_with_prefixes
 from onyx.redis.redis_pool import SCAN_ITER_COUNT_DEFAULT
 
 
@@ -64,8 +65,7 @@ class RedisConnectorExternalGroupSync:
         self.redis.delete(self.taskset_key)
 
     def generator_clear(self) -> None:
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
+        self.redis.delete(self.generator_progress_key, self.generator_complete_key)
 
     def get_remaining(self) -> int:
         # todo: move into fence
@@ -106,13 +106,15 @@ class RedisConnectorExternalGroupSync:
         self,
         payload: RedisConnectorExternalGroupSyncPayload | None,
     ) -> None:
+        # the fence and the set of active fences are updated atomically
+        pipe = self.redis.pipeline()
         if not payload:
-            self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-            self.redis.delete(self.fence_key)
-            return
-
-        self.redis.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
-        self.redis.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.delete(self.fence_key)
+        else:
+            pipe.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
+            pipe.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.execute()
 
     def set_active(self) -> None:
         """This sets a signal to keep the permissioning flow from getting cleaned up within
@@ -159,12 +161,16 @@ class RedisConnectorExternalGroupSync:
         pass
 
     def reset(self) -> None:
-        self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-        self.redis.delete(self.active_key)
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
-        self.redis.delete(self.taskset_key)
-        self.redis.delete(self.fence_key)
+        pipe = self.redis.pipeline()
+        pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.delete(
+            self.active_key,
+            self.generator_progress_key,
+            self.generator_complete_key,
+            self.taskset_key,
+            self.fence_key,
+        )
+        pipe.execute()
 
     @staticmethod
     def remove_from_taskset(id: int, task_id: str, r: redis.Redis) -> None:
@@ -175,21 +181,13 @@ class RedisConnectorExternalGroupSync:
     @staticmethod
     def reset_all(r: redis.Redis) -> None:
         """Deletes all redis values for all connectors"""
-        for key in r.scan_iter(RedisConnectorExternalGroupSync.ACTIVE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorExternalGroupSync.TASKSET_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(
-            RedisConnectorExternalGroupSync.GENERATOR_COMPLETE_PREFIX + "*"
-        ):
-            r.delete(key)
-
-        for key in r.scan_iter(
-            RedisConnectorExternalGroupSync.GENERATOR_PROGRESS_PREFIX + "*"
-        ):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorExternalGroupSync.FENCE_PREFIX + "*"):
-            r.delete(key)
+        delete_keys_with_prefixes(
+            r,
+            [
+                RedisConnectorExternalGroupSync.ACTIVE_PREFIX,
+                RedisConnectorExternalGroupSync.TASKSET_PREFIX,
+                RedisConnectorExternalGroupSync.GENERATOR_COMPLETE_PREFIX,
+                RedisConnectorExternalGroupSync.GENERATOR_PROGRESS_PREFIX,
+                RedisConnectorExternalGroupSync.FENCE_PREFIX,
+            ],
+        )
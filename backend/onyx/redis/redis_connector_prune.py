@@ -1,4 +1,5 @@
 import time
+from collections.abc import Iterable
 from datetime import datetime
 from typing import cast
 from uuid import uuid4
@@ -16,7 +17,12 @@ from onyx.configs.constants import OnyxCeleryQueues
 from onyx.configs.constants import OnyxCeleryTask
 from onyx.configs.constants import OnyxRedisConstants
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
+from onyx.redis.redis_pool import delete_keys_with_prefixes
 from onyx.redis.redis_pool import SCAN_ITER_COUNT_DEFAULT
+from onyx.utils.batching import batch_generator
+
+# number of tasks added to the taskset with a single redis command
+_TASKSET_BATCH_SIZE = 1000
 
 
 class RedisConnectorPrunePayload(BaseModel):
@@ -72,8 +78,7 @@ class RedisConnectorPrune:
         self.redis.delete(self.taskset_key)
 
     def generator_clear(self) -> None:
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
+        self.redis.delete(self.generator_progress_key, self.generator_complete_key)
 
     def get_remaining(self) -> int:
         # todo: move into fence
@@ -111,13 +116,15 @@ class RedisConnectorPrune:
         self,
         payload: RedisConnectorPrunePayload | None,
     ) -> None:
+        # the fence and the set of active fences are updated atomically
+        pipe = self.redis.pipeline()
         if not payload:
-            self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-            self.redis.delete(self.fence_key)
-            return
-
-        self.redis.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
-        self.redis.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+            pipe.delete(self.fence_key)
+        else:
+            pipe.set(self.fence_key, payload.model_dump_json(), ex=self.FENCE_TTL)
+            pipe.sadd(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.execute()
 
     def set_active(self) -> None:
         """This sets a signal to keep the permissioning flow from getting cleaned up within
@@ -151,16 +158,29 @@ class RedisConnectorPrune:
 
         self.redis.set(self.generator_complete_key, payload, ex=self.FENCE_TTL)
 
+    def get_progress(self) -> tuple[int, int] | None:
+        """Returns the initial and remaining number of pruning tasks, read in a single
+        round trip. None if pruning isn't fenced or the generator isn't complete."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(self.fence_key)
+        pipe.get(self.generator_complete_key)
+        pipe.scard(self.taskset_key)
+        fenced, fence_bytes, remaining = pipe.execute()
+        if not fenced or fence_bytes is None:
+            return None
+
+        return int(cast(bytes, fence_bytes)), cast(int, remaining)
+
     def generate_tasks(
         self,
-        documents_to_prune: set[str],
+        documents_to_prune: Iterable[str],
         celery_app: Celery,
         db_session: Session,
         lock: RedisLock | None,
     ) -> int | None:
         last_lock_time = time.monotonic()
 
-        async_results = []
+        num_tasks_sent = 0
         cc_pair = get_connector_credential_pair_from_id(
             db_session=db_session,
             cc_pair_id=int(self.id),
@@ -168,49 +188,54 @@ class RedisConnectorPrune:
         if not cc_pair:
             return None
 
-        for doc_id in documents_to_prune:
-            current_time = time.monotonic()
-            if lock and current_time - last_lock_time >= (
-                CELERY_GENERIC_BEAT_LOCK_TIMEOUT / 4
-            ):
-                lock.reacquire()
-                last_lock_time = current_time
-
+        for doc_id_batch in batch_generator(documents_to_prune, _TASKSET_BATCH_SIZE):
             # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
             # the actual redis key is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
             # we prefix the task id so it's easier to keep track of who created the task
             # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            custom_task_id = f"{self.subtask_prefix}_{uuid4()}"
-
-            # add to the tracking taskset in redis BEFORE creating the celery task.
-            self.redis.sadd(self.taskset_key, custom_task_id)
-
-            # Priority on sync's triggered by new indexing should be medium
-            result = celery_app.send_task(
-                OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
-                kwargs=dict(
-                    document_id=doc_id,
-                    connector_id=cc_pair.connector_id,
-                    credential_id=cc_pair.credential_id,
-                    tenant_id=self.tenant_id,
-                ),
-                queue=OnyxCeleryQueues.CONNECTOR_DELETION,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
-                ignore_result=True,
-            )
-
-            async_results.append(result)
-
-        return len(async_results)
+            custom_task_ids = [f"{self.subtask_prefix}_{uuid4()}" for _ in doc_id_batch]
+
+            # add to the tracking taskset in redis BEFORE creating the celery tasks.
+            self.redis.sadd(self.taskset_key, *custom_task_ids)
+
+            for doc_id, custom_task_id in zip(doc_id_batch, custom_task_ids):
+                current_time = time.monotonic()
+                if lock and current_time - last_lock_time >= (
+                    CELERY_GENERIC_BEAT_LOCK_TIMEOUT / 4
+                ):
+                    lock.reacquire()
+                    last_lock_time = current_time
+
+                # Priority on sync's triggered by new indexing should be medium
+                celery_app.send_task(
+                    OnyxCeleryTask.DOCUMENT_BY_CC_PAIR_CLEANUP_TASK,
+                    kwargs=dict(
+                        document_id=doc_id,
+                        connector_id=cc_pair.connector_id,
+                        credential_id=cc_pair.credential_id,
+                        tenant_id=self.tenant_id,
+                    ),
+                    queue=OnyxCeleryQueues.CONNECTOR_DELETION,
+                    task_id=custom_task_id,
+                    priority=OnyxCeleryPriority.MEDIUM,
+                    ignore_result=True,
+                )
+
+                num_tasks_sent += 1
+
+        return num_tasks_sent
 
     def reset(self) -> None:
-        self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
-        self.redis.delete(self.active_key)
-        self.redis.delete(self.generator_progress_key)
-        self.redis.delete(self.generator_complete_key)
-        self.redis.delete(self.taskset_key)
-        self.redis.delete(self.fence_key)
+        pipe = self.redis.pipeline()
+        pipe.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
+        pipe.delete(
+            self.active_key,
+            self.generator_progress_key,
+            self.generator_complete_key,
+            self.taskset_key,
+            self.fence_key,
+        )
+        pipe.execute()
 
     @staticmethod
     def remove_from_taskset(id: int, task_id: str, r: redis.Redis) -> None:
@@ -221,17 +246,13 @@ class RedisConnectorPrune:
     @staticmethod
     def reset_all(r: redis.Redis) -> None:
         """Deletes all redis values for all connectors"""
-        for key in r.scan_iter(RedisConnectorPrune.ACTIVE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPrune.TASKSET_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPrune.GENERATOR_COMPLETE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPrune.GENERATOR_PROGRESS_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorPrune.FENCE_PREFIX + "*"):
-            r.delete(key)
+        delete_keys_with_prefixes(
+            r,
+            [
+                RedisConnectorPrune.ACTIVE_PREFIX,
+                RedisConnectorPrune.TASKSET_PREFIX,
+                RedisConnectorPrune.GENERATOR_COMPLETE_PREFIX,
+                RedisConnectorPrune.GENERATOR_PROGRESS_PREFIX,
+                RedisConnectorPrune.FENCE_PREFIX,
+            ],
+        )
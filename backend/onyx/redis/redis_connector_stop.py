@@ -1,5 +1,7 @@
 import redis
 
+from onyx.redis.redis_pool import delete_keys_with_prefixes
+
 
 class RedisConnectorStop:
     """Manages interactions with redis for stop signaling. Should only be accessed
@@ -44,8 +46,10 @@ class RedisConnectorStop:
 
     @staticmethod
     def reset_all(r: redis.Redis) -> None:
-        for key in r.scan_iter(RedisConnectorStop.FENCE_PREFIX + "*"):
-            r.delete(key)
-
-        for key in r.scan_iter(RedisConnectorStop.TIMEOUT_PREFIX + "*"):
-            r.delete(key)
+        delete_keys_with_prefixes(
+            r,
+            [
+                RedisConnectorStop.FENCE_PREFIX,
+                RedisConnectorStop.TIMEOUT_PREFIX,
+            ],
+        )
@@ -11,6 +11,7 @@ from typing import Optional
 import redis
 from fastapi import Request
 from redis import asyncio as aioredis
+from redis.client import Pipeline as RedisPipeline
 from redis.client import Redis
 from redis.lock import Lock as RedisLock
 
@@ -30,6 +31,7 @@ from onyx.configs.constants import FASTAPI_USERS_AUTH_COOKIE_NAME
 from onyx.configs.constants import REDIS_SOCKET_KEEPALIVE_OPTIONS
 from onyx.redis.iam_auth import configure_redis_iam_auth
 from onyx.redis.iam_auth import create_redis_ssl_context_if_iam
+from onyx.utils.batching import batch_generator
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import DEFAULT_REDIS_PREFIX
 from shared_configs.contextvars import get_current_tenant_id
@@ -39,10 +41,156 @@ logger = setup_logger()
 SCAN_ITER_COUNT_DEFAULT = 4096
 
 
-class TenantRedis(redis.Redis):
-    def __init__(self, tenant_id: str, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self.tenant_id: str = tenant_id
+# Commands whose first argument is their only key
+_SINGLE_KEY_COMMANDS = frozenset(
+    {
+        "APPEND",
+        "DECR",
+        "DECRBY",
+        "EXPIRE",
+        "EXPIREAT",
+        "GET",
+        "GETDEL",
+        "GETEX",
+        "GETSET",
+        "HDEL",
+        "HEXISTS",
+        "HGET",
+        "HGETALL",
+        "HINCRBY",
+        "HINCRBYFLOAT",
+        "HKEYS",
+        "HLEN",
+        "HMGET",
+        "HMSET",
+        "HSCAN",
+        "HSET",
+        "HSETNX",
+        "HVALS",
+        "INCR",
+        "INCRBY",
+        "INCRBYFLOAT",
+        "LINDEX",
+        "LLEN",
+        "LPOP",
+        "LPUSH",
+        "LRANGE",
+        "LREM",
+        "LSET",
+        "LTRIM",
+        "PERSIST",
+        "PEXPIRE",
+        "PEXPIREAT",
+        "PSETEX",
+        "PTTL",
+        "RPOP",
+        "RPUSH",
+        "SADD",
+        "SCARD",
+        "SET",
+        "SETEX",
+        "SETNX",
+        "SISMEMBER",
+        "SMEMBERS",
+        "SMISMEMBER",
+        "SPOP",
+        "SRANDMEMBER",
+        "SREM",
+        "SSCAN",
+        "STRLEN",
+        "TTL",
+        "TYPE",
+        "ZADD",
+        "ZCARD",
+        "ZCOUNT",
+        "ZINCRBY",
+        "ZRANGE",
+        "ZRANGEBYSCORE",
+        "ZREM",
+        "ZREMRANGEBYRANK",
+        "ZREMRANGEBYSCORE",
+        "ZREVRANGE",
+        "ZREVRANGEBYSCORE",
+        "ZSCAN",
+        "ZSCORE",
+    }
+)
+# Commands whose arguments are all keys
+_ALL_KEYS_COMMANDS = frozenset(
+    {
+        "DEL",
+        "EXISTS",
+        "MGET",
+        "RENAME",
+        "RENAMENX",
+        "SDIFF",
+        "SDIFFSTORE",
+        "SINTER",
+        "SINTERSTORE",
+        "SUNION",
+        "SUNIONSTORE",
+        "TOUCH",
+        "UNLINK",
+        "WATCH",
+    }
+)
+# Commands whose two first arguments are keys
+_TWO_KEYS_COMMANDS = frozenset({"BLMOVE", "BRPOPLPUSH", "LMOVE", "RPOPLPUSH", "SMOVE"})
+# Commands whose arguments are all keys except for a trailing timeout
+_KEYS_THEN_TIMEOUT_COMMANDS = frozenset({"BLPOP", "BRPOP"})
+# Commands whose arguments alternate between keys and values
+_KEY_VALUE_COMMANDS = frozenset({"MSET", "MSETNX"})
+# Commands taking a script, the number of keys, the keys and then other arguments
+_SCRIPT_COMMANDS = frozenset({"EVAL", "EVALSHA", "EVAL_RO", "EVALSHA_RO"})
+
+
+def prefix_command_args(
+    args: tuple[Any, ...], prefixed: Callable[[Any], Any]
+) -> tuple[Any, ...]:
+    """Applies prefixed to the keys among the arguments of a redis command (args[0]
+    is the command name). Commands that aren't known to take keys are left as is."""
+    if not args or not isinstance(args[0], str):
+        return args
+
+    command = args[0].upper()
+    command_args = args[1:]
+    if not command_args:
+        return args
+
+    if command in _SINGLE_KEY_COMMANDS:
+        command_args = (prefixed(command_args[0]),) + command_args[1:]
+    elif command in _ALL_KEYS_COMMANDS:
+        command_args = tuple(prefixed(key) for key in command_args)
+    elif command in _TWO_KEYS_COMMANDS:
+        command_args = (
+            tuple(prefixed(key) for key in command_args[:2]) + command_args[2:]
+        )
+    elif command in _KEYS_THEN_TIMEOUT_COMMANDS:
+        command_args = tuple(prefixed(key) for key in command_args[:-1]) + (
+            command_args[-1],
+        )
+    elif command in _KEY_VALUE_COMMANDS:
+        command_args = tuple(
+            prefixed(arg) if i % 2 == 0 else arg for i, arg in enumerate(command_args)
+        )
+    elif command in _SCRIPT_COMMANDS and len(command_args) >= 2:
+        num_keys = int(command_args[1])
+        command_args = (
+            command_args[:2]
+            + tuple(prefixed(key) for key in command_args[2 : 2 + num_keys])
+            + command_args[2 + num_keys :]
+        )
+    else:
+        return args
+
+    return (args[0],) + command_args
+
+
+class TenantPrefixer:
+    """Prefixes keys with the tenant id, shared by the tenant aware client and its
+    pipelines."""
+
+    tenant_id: str
 
     def _prefixed(self, key: str | bytes | memoryview) -> str | bytes | memoryview:
         prefix: str = f"{self.tenant_id}:"
@@ -67,16 +215,31 @@ class TenantRedis(redis.Redis):
         else:
             raise TypeError(f"Unsupported key type: {type(key)}")
 
-    def _prefix_method(self, method: Callable) -> Callable:
-        @functools.wraps(method)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            if "name" in kwargs:
-                kwargs["name"] = self._prefixed(kwargs["name"])
-            elif len(args) > 0:
-                args = (self._prefixed(args[0]),) + args[1:]
-            return method(*args, **kwargs)
 
-        return wrapper
+class TenantPipeline(TenantPrefixer, RedisPipeline):
+    """Pipeline (and MULTI/EXEC transaction) that prefixes the keys of every queued
+    command, including multi key commands and scripts."""
+
+    def __init__(self, tenant_id: str, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.tenant_id = tenant_id
+
+    def execute_command(self, *args: Any, **kwargs: Any) -> Any:
+        return super().execute_command(
+            *prefix_command_args(args, self._prefixed), **kwargs
+        )
+
+
+class TenantRedis(TenantPrefixer, redis.Redis):
+    """Redis client that prefixes every key with the tenant id.
+
+    Keys are prefixed at the command level (see prefix_command_args), so that
+    pipelines, transactions, multi key commands and Lua scripts are isolated the
+    same way as single key commands."""
+
+    def __init__(self, tenant_id: str, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.tenant_id: str = tenant_id
 
     def _prefix_scan_iter(self, method: Callable) -> Callable:
         @functools.wraps(method)
@@ -102,40 +265,30 @@ class TenantRedis(redis.Redis):
 
         return wrapper
 
-    def __getattribute__(self, item: str) -> Any:
-        original_attr = super().__getattribute__(item)
-        methods_to_wrap = [
-            "lock",
-            "unlock",
-            "get",
-            "set",
-            "delete",
-            "exists",
-            "incrby",
-            "hset",
-            "hget",
-            "getset",
-            "owned",
-            "reacquire",
-            "create_lock",
-            "startswith",
-            "smembers",
-            "sismember",
-            "sadd",
-            "srem",
-            "scard",
-            "hexists",
-            "hset",
-            "hdel",
-            "ttl",
-            "pttl",
-        ]  # Regular methods that need simple prefixing
-
-        if item == "scan_iter" or item == "sscan_iter":
-            return self._prefix_scan_iter(original_attr)
-        elif item in methods_to_wrap and callable(original_attr):
-            return self._prefix_method(original_attr)
-        return original_attr
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        return super().execute_command(
+            *prefix_command_args(args, self._prefixed), **options
+        )
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: Any = None
+    ) -> TenantPipeline:
+        return TenantPipeline(
+            self.tenant_id,
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint,
+        )
+
+    def lock(self, name: str, *args: Any, **kwargs: Any) -> RedisLock:
+        return super().lock(cast(str, self._prefixed(name)), *args, **kwargs)
+
+    def scan_iter(self, *args: Any, **kwargs: Any) -> Any:
+        return self._prefix_scan_iter(super().scan_iter)(*args, **kwargs)
+
+    def sscan_iter(self, *args: Any, **kwargs: Any) -> Any:
+        return self._prefix_scan_iter(super().sscan_iter)(*args, **kwargs)
 
 
 class RedisPool:
@@ -358,6 +511,17 @@ def get_raw_redis_replica_client() -> Redis:
     return redis_pool.get_raw_replica_client()
 
 
+def delete_keys_with_prefixes(r: Redis, prefixes: list[str]) -> None:
+    """Deletes every key starting with one of the prefixes, in batches rather than
+    with one round trip per key."""
+    for prefix in prefixes:
+        for keys in batch_generator(
+            r.scan_iter(prefix + "*", count=SCAN_ITER_COUNT_DEFAULT),
+            SCAN_ITER_COUNT_DEFAULT,
+        ):
+            r.delete(*keys)
+
+
 SSL_CERT_REQS_MAP = {
     "none": ssl.CERT_NONE,
     "optional": ssl.CERT_OPTIONAL,
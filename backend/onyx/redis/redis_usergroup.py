@@ -9,6 +9,7 @@ from redis.lock import Lock as RedisLock
 from sqlalchemy.orm import Session
 
 from onyx.configs.app_configs import DB_YIELD_PER_DEFAULT
+from onyx.configs.app_configs import VESPA_METADATA_SYNC_BATCH_SIZE
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryPriority
 from onyx.configs.constants import OnyxCeleryQueues
@@ -64,9 +65,14 @@ class RedisUserGroup(RedisObjectHelper):
     ) -> tuple[int, int] | None:
         """Max tasks is ignored for now until we can build the logic to mark the
         user group up to date over multiple batches.
+
+        Each task syncs up to VESPA_METADATA_SYNC_BATCH_SIZE documents. Returns the
+        number of tasks sent and the number of documents.
         """
         last_lock_time = time.monotonic()
         num_tasks_sent = 0
+        num_docs = 0
+        document_ids: list[str] = []
 
         if not global_version.is_ee_version():
             return 0, 0
@@ -89,26 +95,48 @@ class RedisUserGroup(RedisObjectHelper):
                 lock.reacquire()
                 last_lock_time = current_time
 
-            # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            # we prefix the task id so it's easier to keep track of who created the task
-            # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
-            custom_task_id = f"{self.task_id_prefix}_{uuid4()}"
-
-            # add to the set BEFORE creating the task.
-            redis_client.sadd(self.taskset_key, custom_task_id)
-
-            celery_app.send_task(
-                OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
-                kwargs=dict(document_id=doc_id, tenant_id=tenant_id),
-                queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
-                task_id=custom_task_id,
-                priority=OnyxCeleryPriority.MEDIUM,
+            num_docs += 1
+            document_ids.append(doc_id)
+            if len(document_ids) < VESPA_METADATA_SYNC_BATCH_SIZE:
+                continue
+
+            self._send_sync_batch_task(
+                celery_app, redis_client, document_ids, tenant_id
             )
+            document_ids = []
+            num_tasks_sent += 1
 
+        if document_ids:
+            self._send_sync_batch_task(
+                celery_app, redis_client, document_ids, tenant_id
+            )
             num_tasks_sent += 1
 
-        return num_tasks_sent, num_tasks_sent
+        return num_tasks_sent, num_docs
+
+    def _send_sync_batch_task(
+        self,
+        celery_app: Celery,
+        redis_client: Redis,
+        document_ids: list[str],
+        tenant_id: str,
+    ) -> None:
+        # celery's default task id format is "dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # the key for the result is "celery-task-meta-dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        # we prefix the task id so it's easier to keep track of who created the task
+        # aka "documentset_1_6dd32ded3-00aa-4884-8b21-42f8332e7fac"
+        custom_task_id = f"{self.task_id_prefix}_{uuid4()}"
+
+        # add to the set BEFORE creating the task.
+        redis_client.sadd(self.taskset_key, custom_task_id)
+
+        celery_app.send_task(
+            OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+            kwargs=dict(document_ids=document_ids, tenant_id=tenant_id),
+            queue=OnyxCeleryQueues.VESPA_METADATA_SYNC,
+            task_id=custom_task_id,
+            priority=OnyxCeleryPriority.MEDIUM,
+        )
 
     def reset(self) -> None:
         self.redis.srem(OnyxRedisConstants.ACTIVE_FENCES, self.fence_key)
@@ -214,6 +214,8 @@ class PermissionSyncAttemptSnapshot(BaseModel):
     error_message: str | None
     total_docs_synced: int
     docs_with_permission_errors: int
+    docs_unchanged: int
+    docs_with_permission_changes: int
     time_created: str
     time_started: str | None
     time_finished: str | None
@@ -228,6 +230,8 @@ class PermissionSyncAttemptSnapshot(BaseModel):
             error_message=attempt.error_message,
             total_docs_synced=attempt.total_docs_synced or 0,
             docs_with_permission_errors=attempt.docs_with_permission_errors or 0,
+            docs_unchanged=attempt.docs_unchanged or 0,
+            docs_with_permission_changes=attempt.docs_with_permission_changes or 0,
             time_created=attempt.time_created.isoformat(),
             time_started=(
                 attempt.time_started.isoformat() if attempt.time_started else None
@@ -11,6 +11,7 @@ from onyx.configs.constants import DEFAULT_CC_PAIR_ID
 from onyx.configs.constants import DocumentSource
 from onyx.connectors.models import Document
 from onyx.connectors.models import IndexAttemptMetadata
+from onyx.context.search.semantic_cache import invalidate_documents_cache
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.document import delete_documents_complete__no_commit
 from onyx.db.document import get_document
@@ -207,6 +208,7 @@ def delete_ingestion_doc(
         tenant_id=tenant_id,
         chunk_count=document.chunk_count,
     )
+    invalidate_documents_cache([document_id], tenant_id)
 
     # Delete from database
     delete_documents_complete__no_commit(db_session, [document_id])
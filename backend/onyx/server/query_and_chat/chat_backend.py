@@ -776,24 +776,31 @@ async def search_chats(
     query: str | None = Query(None),
     page: int = Query(1),
     page_size: int = Query(10),
+    cursor: str | None = Query(None),
     user: User | None = Depends(current_user),
     db_session: Session = Depends(get_session),
 ) -> ChatSearchResponse:
     """
     Search for chat sessions based on the provided query.
     If no query is provided, returns recent chat sessions.
+    Pass the returned next_cursor to get the next page, page is only kept for
+    older clients.
     """
 
     # Use the enhanced database function for chat search
-    chat_sessions, has_more = search_chat_sessions(
-        user_id=user.id if user else None,
-        db_session=db_session,
-        query=query,
-        page=page,
-        page_size=page_size,
-        include_deleted=False,
-        include_onyxbot_flows=False,
-    )
+    try:
+        chat_sessions, has_more, next_cursor = search_chat_sessions(
+            user_id=user.id if user else None,
+            db_session=db_session,
+            query=query,
+            page=page,
+            page_size=page_size,
+            include_deleted=False,
+            include_onyxbot_flows=False,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Group chat sessions by time period
     today = datetime.datetime.now().date()
@@ -848,6 +855,7 @@ async def search_chats(
         groups=groups,
         has_more=has_more,
         next_page=page + 1 if has_more else None,
+        next_cursor=next_cursor,
     )
 
 
@@ -305,12 +305,15 @@ class ChatSearchResponse(BaseModel):
     groups: list[ChatSessionGroup]
     has_more: bool
     next_page: int | None = None
+    # opaque, pass as cursor to get the next page
+    next_cursor: str | None = None
 
 
 class ChatSearchRequest(BaseModel):
     query: str | None = None
     page: int = 1
     page_size: int = 10
+    cursor: str | None = None
 
 
 class CreateChatResponse(BaseModel):
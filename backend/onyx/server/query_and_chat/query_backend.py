@@ -46,6 +46,7 @@ from onyx.db.models import User
 from onyx.db.persona import get_persona_by_id
 from onyx.db.search_settings import get_current_search_settings
 from onyx.db.tag import find_tags
+from onyx.document_index.embedded.index import EmbeddedIndex
 from onyx.document_index.factory import get_default_document_index
 from onyx.document_index.vespa.index import VespaIndex
 from onyx.llm.factory import get_default_llm
@@ -340,10 +341,10 @@ def admin_search(
     search_settings = get_current_search_settings(db_session)
     document_index = get_default_document_index(search_settings, None)
 
-    if not isinstance(document_index, VespaIndex):
+    if not isinstance(document_index, (VespaIndex, EmbeddedIndex)):
         raise HTTPException(
             status_code=400,
-            detail="Cannot use admin-search when using a non-Vespa document index",
+            detail="Cannot use admin-search with this document index",
         )
     if not query or query.strip() == "":
         matching_chunks = document_index.random_retrieval(filters=final_filters)
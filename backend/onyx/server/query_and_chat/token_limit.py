@@ -3,6 +3,7 @@ from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 from functools import lru_cache
+from uuid import UUID
 
 from dateutil import tz
 from fastapi import Depends
@@ -12,12 +13,17 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from onyx.auth.users import current_chat_accessible_user
+from onyx.configs.app_configs import TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED
 from onyx.db.engine.sql_engine import get_session_with_current_tenant
 from onyx.db.models import ChatMessage
 from onyx.db.models import ChatSession
 from onyx.db.models import TokenRateLimit
 from onyx.db.models import User
 from onyx.db.token_limit import fetch_all_global_token_rate_limits
+from onyx.server.query_and_chat.token_usage_counters import fetch_token_usage
+from onyx.server.query_and_chat.token_usage_counters import GLOBAL_TOKEN_USAGE_SCOPE
+from onyx.server.query_and_chat.token_usage_counters import record_token_usage
+from onyx.server.query_and_chat.token_usage_counters import TokenUsage
 from onyx.utils.logger import setup_logger
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 
@@ -46,6 +52,26 @@ def _check_token_rate_limits(_: User | None) -> None:
     _user_is_rate_limited_by_global()
 
 
+def record_chat_token_usage(
+    user_id: UUID | None, messages: Sequence[ChatMessage]
+) -> None:
+    """Adds the token counts of newly saved chat messages to the usage counters
+    read by the rate limit checks"""
+    if not TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED or not any_rate_limit_exists():
+        return
+
+    versioned_record_token_usage = fetch_versioned_implementation(
+        "onyx.server.query_and_chat.token_limit", _record_token_usage.__name__
+    )
+    versioned_record_token_usage(
+        user_id, [(message.time_sent, message.token_count) for message in messages]
+    )
+
+
+def _record_token_usage(_: UUID | None, usage: TokenUsage) -> None:
+    record_token_usage([GLOBAL_TOKEN_USAGE_SCOPE], usage)
+
+
 """
 Global rate limits
 """
@@ -59,7 +85,17 @@ def _user_is_rate_limited_by_global() -> None:
 
         if global_rate_limits:
             global_cutoff_time = _get_cutoff_time(global_rate_limits)
-            global_usage = _fetch_global_usage(global_cutoff_time, db_session)
+            if TOKEN_RATE_LIMIT_REDIS_COUNTERS_ENABLED:
+                global_usage = fetch_token_usage(
+                    [GLOBAL_TOKEN_USAGE_SCOPE],
+                    global_cutoff_time,
+                    lambda scopes, cutoff_time: {
+                        scope: _fetch_global_usage(cutoff_time, db_session)
+                        for scope in scopes
+                    },
+                )[GLOBAL_TOKEN_USAGE_SCOPE]
+            else:
+                global_usage = _fetch_global_usage(global_cutoff_time, db_session)
 
             if _is_rate_limited(global_rate_limits, global_usage):
                 raise HTTPException(
@@ -0,0 +1,168 @@
+"""
+Per minute token usage counters in Redis, used for the token rate limit checks.
+
+Each scope (the whole tenant, a user or a user group) has a hash with one field per
+minute (epoch seconds of the minute) holding the tokens used in that minute, plus a
+field recording since when the counters are complete. Usage is only ever added to
+counters that already exist. Missing counters (e.g. after a Redis flush) and counters
+that do not cover the needed window are rebuilt from the chat messages in Postgres.
+
+Counters expire a while after they were built so that any drift (a message saved
+without being counted, or counted twice when racing with a rebuild) is short lived.
+"""
+
+from collections.abc import Callable
+from collections.abc import Sequence
+from datetime import datetime
+from datetime import timezone
+from uuid import UUID
+
+from redis.client import Redis
+
+from onyx.configs.app_configs import TOKEN_RATE_LIMIT_COUNTERS_TTL_SECONDS
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+GLOBAL_TOKEN_USAGE_SCOPE = "global"
+
+_KEY_PREFIX = "token_usage"
+_COVERED_SINCE_FIELD = "covered_since"
+
+# Adds to the minute fields of the counters that exist, missing counters are left
+# to be rebuilt from Postgres on the next check.
+# ARGV is a list of (minute, tokens) pairs.
+_INCREMENT_EXISTING_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for i = 1, #ARGV, 2 do
+            redis.call('HINCRBY', key, ARGV[i], ARGV[i + 1])
+        end
+    end
+end
+return 0
+"""
+
+TokenUsage = Sequence[tuple[datetime, int]]
+
+
+def user_token_usage_scope(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def user_group_token_usage_scope(user_group_id: int) -> str:
+    return f"user_group:{user_group_id}"
+
+
+def _counters_key(scope: str) -> str:
+    return f"{_KEY_PREFIX}:{scope}"
+
+
+def _to_minute(time: datetime) -> int:
+    return int(time.timestamp()) // 60 * 60
+
+
+def record_token_usage(scopes: Sequence[str], usage: TokenUsage) -> None:
+    """Adds the usage to the counters of the scopes. Never raises, the counters are
+    rebuilt from Postgres once they expire."""
+    tokens_by_minute: dict[int, int] = {}
+    for time, tokens in usage:
+        if tokens:
+            minute = _to_minute(time)
+            tokens_by_minute[minute] = tokens_by_minute.get(minute, 0) + tokens
+
+    if not scopes or not tokens_by_minute:
+        return
+
+    args: list[str] = []
+    for minute, tokens in tokens_by_minute.items():
+        args.extend((str(minute), str(tokens)))
+
+    try:
+        get_redis_client().eval(
+            _INCREMENT_EXISTING_SCRIPT,
+            len(scopes),
+            *[_counters_key(scope) for scope in scopes],
+            *args,
+        )
+    except Exception:
+        logger.exception(f"Failed to record token usage for scopes {scopes}")
+
+
+def _parse_counters(
+    fields: dict[bytes, bytes], cutoff_time: datetime
+) -> list[tuple[datetime, int]] | None:
+    """Returns None if the counters are missing or start after the cutoff time"""
+    covered_since = fields.pop(_COVERED_SINCE_FIELD.encode(), None)
+    if covered_since is None or int(covered_since) > int(cutoff_time.timestamp()):
+        return None
+
+    cutoff_minute = _to_minute(cutoff_time)
+    usage: list[tuple[datetime, int]] = []
+    for minute, tokens in fields.items():
+        if int(minute) >= cutoff_minute:
+            usage.append(
+                (datetime.fromtimestamp(int(minute), tz=timezone.utc), int(tokens))
+            )
+    return usage
+
+
+def _rebuild_counters(
+    r: Redis,
+    usage_by_scope: dict[str, TokenUsage],
+    cutoff_time: datetime,
+) -> None:
+    pipe = r.pipeline()
+    for scope, usage in usage_by_scope.items():
+        mapping: dict[str, int] = {_COVERED_SINCE_FIELD: int(cutoff_time.timestamp())}
+        for time, tokens in usage:
+            minute = str(_to_minute(time))
+            mapping[minute] = mapping.get(minute, 0) + int(tokens or 0)
+
+        key = _counters_key(scope)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, TOKEN_RATE_LIMIT_COUNTERS_TTL_SECONDS)
+    pipe.execute()
+
+
+def fetch_token_usage(
+    scopes: Sequence[str],
+    cutoff_time: datetime,
+    fetch_usage_from_db: Callable[[list[str], datetime], dict[str, TokenUsage]],
+) -> dict[str, TokenUsage]:
+    """Per minute usage since the cutoff time for each scope. Read from the counters,
+    `fetch_usage_from_db` is only called for the scopes whose counters have to be
+    (re)built, and for all of them if Redis is unavailable."""
+    try:
+        r = get_redis_client()
+        pipe = r.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.hgetall(_counters_key(scope))
+        all_fields = pipe.execute()
+    except Exception:
+        logger.exception("Failed to read token usage counters, falling back to db")
+        return fetch_usage_from_db(list(scopes), cutoff_time)
+
+    usage_by_scope: dict[str, TokenUsage] = {}
+    scopes_to_rebuild: list[str] = []
+    for scope, fields in zip(scopes, all_fields):
+        usage = _parse_counters(fields, cutoff_time)
+        if usage is None:
+            scopes_to_rebuild.append(scope)
+        else:
+            usage_by_scope[scope] = usage
+
+    if scopes_to_rebuild:
+        db_usage = fetch_usage_from_db(scopes_to_rebuild, cutoff_time)
+        rebuilt_usage = {scope: db_usage.get(scope, []) for scope in scopes_to_rebuild}
+        try:
+            _rebuild_counters(r, rebuilt_usage, cutoff_time)
+        except Exception:
+            logger.exception(
+                f"Failed to rebuild token usage counters for scopes {scopes_to_rebuild}"
+            )
+        usage_by_scope.update(rebuilt_usage)
+
+    return usage_by_scope
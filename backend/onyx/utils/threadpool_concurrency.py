@@ -3,6 +3,7 @@ import collections.abc
 import concurrent
 import contextvars
 import copy
+import queue
 import threading
 import uuid
 from collections.abc import Awaitable
@@ -422,3 +423,67 @@ def parallel_yield_from_funcs(
     yield from parallel_yield(
         [func_wrapper(func) for func in funcs], max_workers=max_workers
     )
+
+
+_PIPELINE_STAGE_DONE = object()
+# How often a blocked stage checks whether the pipeline was stopped
+_PIPELINE_STAGE_POLL_INTERVAL = 0.1
+
+
+def run_pipeline_stage(
+    items: Iterator[_T],
+    func: Callable[[_T], R],
+    queue_size: int,
+    stop_event: threading.Event,
+) -> Iterator[R]:
+    """
+    Applies func to each item in a background thread and yields the results in order.
+    At most queue_size results are buffered; once the consumer falls behind, the stage
+    blocks (backpressure). Stages can be chained by passing the output of one stage as
+    the items of the next, in which case each stage works on a different item at the
+    same time. Exceptions raised by func (or by the items iterator) are re-raised in the
+    consuming thread.
+
+    Setting stop_event makes the background thread exit before taking up the next item,
+    so the consumer MUST set it if it stops iterating early.
+    """
+    results: queue.Queue[Any] = queue.Queue(maxsize=max(queue_size, 1))
+
+    def _put(value: Any) -> bool:
+        while not stop_event.is_set():
+            try:
+                results.put(value, timeout=_PIPELINE_STAGE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if stop_event.is_set() or not _put((func(item), None)):
+                    return
+        except Exception as e:
+            _put((None, e))
+            return
+        _put((_PIPELINE_STAGE_DONE, None))
+
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(_produce,), daemon=True
+    )
+    thread.start()
+
+    while True:
+        try:
+            result, exception = results.get(timeout=_PIPELINE_STAGE_POLL_INTERVAL)
+        except queue.Empty:
+            if stop_event.is_set():
+                return
+            continue
+        if exception is not None:
+            raise exception
+        if result is _PIPELINE_STAGE_DONE:
+            break
+        yield result
+
+    thread.join()
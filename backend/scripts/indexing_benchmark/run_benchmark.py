@@ -0,0 +1,241 @@
+"""End-to-end throughput benchmark for the indexing pipeline.
+
+Drives `index_doc_batch` over synthetic documents with local stand-ins for the
+embedding server, content classification model, LLM, file store, vector db and the
+Postgres backed adapter, so it runs anywhere without a deployment and gives the same
+numbers for the same arguments. The stand-ins simulate latency, configure it to match
+the deployment you care about.
+
+Reports docs/s, chunks/s, a per stage latency breakdown and the peak RSS as JSON, so
+runs on different commits can be diffed.
+
+Basic Usage (from the backend directory):
+
+python -m scripts.indexing_benchmark.run_benchmark --num-docs 2000 --output before.json
+
+With images and contextual RAG going through a slow LLM:
+
+python -m scripts.indexing_benchmark.run_benchmark --image-fraction 0.2 \
+    --contextual-rag --llm-latency-ms 300
+
+For more options, checkout the bottom of the file.
+"""
+
+import argparse
+import contextlib
+import json
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from unittest.mock import patch
+
+from onyx.configs.app_configs import INDEX_BATCH_SIZE
+from onyx.indexing import indexing_pipeline
+from onyx.indexing.chunker import Chunker
+from onyx.indexing.indexing_pipeline import index_doc_batch
+from scripts.indexing_benchmark.stand_ins import StageTimings
+from scripts.indexing_benchmark.stand_ins import StandInDocumentIndex
+from scripts.indexing_benchmark.stand_ins import StandInEmbeddingModel
+from scripts.indexing_benchmark.stand_ins import StandInFileStore
+from scripts.indexing_benchmark.stand_ins import StandInIndexingAdapter
+from scripts.indexing_benchmark.stand_ins import StandInIndexingEmbedder
+from scripts.indexing_benchmark.stand_ins import (
+    StandInInformationContentClassificationModel,
+)
+from scripts.indexing_benchmark.stand_ins import StandInLLM
+from scripts.indexing_benchmark.stand_ins import StandInTokenizer
+from scripts.indexing_benchmark.synthetic_documents import generate_documents
+from scripts.indexing_benchmark.synthetic_documents import SyntheticDocumentsConfig
+from shared_configs.configs import POSTGRES_DEFAULT_SCHEMA
+
+
+def _peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    timings = StageTimings()
+    file_store = StandInFileStore()
+    tokenizer = StandInTokenizer()
+
+    documents_config = SyntheticDocumentsConfig(
+        num_docs=args.num_docs,
+        sections_per_doc=args.sections_per_doc,
+        words_per_section=args.words_per_section,
+        image_fraction=args.image_fraction,
+        image_size_px=args.image_size_px,
+        seed=args.seed,
+    )
+    documents = generate_documents(documents_config, file_store)
+
+    embedder = StandInIndexingEmbedder(
+        StandInEmbeddingModel(
+            tokenizer=tokenizer,
+            dim=args.embedding_dim,
+            batch_size=args.embedding_batch_size,
+            latency_per_request=args.embedding_latency_ms / 1000,
+            latency_per_text=args.embedding_latency_per_text_ms / 1000,
+        )
+    )
+    classification_model = StandInInformationContentClassificationModel(
+        latency_per_request=args.classification_latency_ms / 1000
+    )
+    llm = StandInLLM(latency_per_call=args.llm_latency_ms / 1000)
+    document_index = StandInDocumentIndex(
+        latency_per_request=args.index_latency_ms / 1000,
+        latency_per_chunk=args.index_latency_per_chunk_ms / 1000,
+    )
+    chunker = Chunker(
+        tokenizer=tokenizer,
+        enable_multipass=args.multipass,
+        enable_large_chunks=args.large_chunks,
+        enable_contextual_rag=args.contextual_rag,
+    )
+
+    # every stage is timed where the pipeline hands off to it
+    chunker.chunk = timings.wrap("chunk", chunker.chunk)  # type: ignore[method-assign]
+    embedder.embed_chunks = timings.wrap(  # type: ignore[method-assign]
+        "embed", embedder.embed_chunks
+    )
+    classification_model.predict = timings.wrap(  # type: ignore[method-assign]
+        "classify", classification_model.predict
+    )
+    document_index.index = timings.wrap(  # type: ignore[method-assign]
+        "write", document_index.index
+    )
+    llm.invoke = timings.wrap("llm", llm.invoke)  # type: ignore[method-assign]
+
+    pipeline = indexing_pipeline.__name__
+    with contextlib.ExitStack() as stack:
+        for target, new in (
+            (
+                "process_image_sections",
+                timings.wrap(
+                    "image_sections", indexing_pipeline.process_image_sections
+                ),
+            ),
+            (
+                "get_image_extraction_and_analysis_enabled",
+                lambda: args.image_fraction > 0,
+            ),
+            ("get_default_llm_with_vision", lambda: llm),
+            ("get_default_file_store", lambda: file_store),
+            ("get_tokenizer", lambda *a, **kw: tokenizer),
+            # measure the pipeline, not how warm the local caches are
+            ("get_image_summary_cache", lambda: None),
+            ("get_contextual_rag_cache", lambda: None),
+            ("invalidate_documents_cache", lambda *a, **kw: None),
+            ("USE_INFORMATION_CONTENT_CLASSIFICATION", args.classify),
+        ):
+            stack.enter_context(patch(f"{pipeline}.{target}", new))
+
+        new_docs = 0
+        total_chunks = 0
+        failures = 0
+        start = time.monotonic()
+        for batch_start in range(0, len(documents), args.batch_size):
+            result = index_doc_batch(
+                document_batch=documents[batch_start : batch_start + args.batch_size],
+                chunker=chunker,
+                embedder=embedder,
+                information_content_classification_model=classification_model,  # type: ignore[arg-type]
+                document_index=document_index,  # type: ignore[arg-type]
+                request_id=None,
+                tenant_id=POSTGRES_DEFAULT_SCHEMA,
+                adapter=StandInIndexingAdapter(),
+                enable_contextual_rag=args.contextual_rag,
+                llm=llm if args.contextual_rag else None,
+                ignore_time_skip=True,
+            )
+            new_docs += result.new_docs
+            total_chunks += result.total_chunks
+            failures += len(result.failures)
+        total_seconds = time.monotonic() - start
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "config": vars(args),
+        "results": {
+            "docs": len(documents),
+            "new_docs": new_docs,
+            "chunks": total_chunks,
+            "failures": failures,
+            "total_seconds": total_seconds,
+            "docs_per_second": len(documents) / total_seconds,
+            "chunks_per_second": total_chunks / total_seconds,
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "stages": timings.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexing pipeline benchmark")
+
+    documents_group = parser.add_argument_group("synthetic documents")
+    documents_group.add_argument("--num-docs", type=int, default=1000)
+    documents_group.add_argument("--sections-per-doc", type=int, default=5)
+    documents_group.add_argument("--words-per-section", type=int, default=400)
+    documents_group.add_argument(
+        "--image-fraction",
+        type=float,
+        default=0.0,
+        help="Fraction of the sections that are images",
+    )
+    documents_group.add_argument("--image-size-px", type=int, default=256)
+    documents_group.add_argument("--seed", type=int, default=0)
+
+    pipeline_group = parser.add_argument_group("pipeline")
+    pipeline_group.add_argument(
+        "--batch-size",
+        type=int,
+        default=INDEX_BATCH_SIZE,
+        help="Documents per index_doc_batch call",
+    )
+    pipeline_group.add_argument("--multipass", action="store_true")
+    pipeline_group.add_argument("--large-chunks", action="store_true")
+    pipeline_group.add_argument("--contextual-rag", action="store_true")
+    pipeline_group.add_argument(
+        "--classify",
+        action="store_true",
+        help="Run the information content classification",
+    )
+
+    latency_group = parser.add_argument_group("stand-in latencies")
+    latency_group.add_argument("--embedding-dim", type=int, default=768)
+    latency_group.add_argument("--embedding-batch-size", type=int, default=8)
+    latency_group.add_argument("--embedding-latency-ms", type=float, default=20)
+    latency_group.add_argument("--embedding-latency-per-text-ms", type=float, default=2)
+    latency_group.add_argument("--classification-latency-ms", type=float, default=10)
+    latency_group.add_argument("--llm-latency-ms", type=float, default=200)
+    latency_group.add_argument("--index-latency-ms", type=float, default=20)
+    latency_group.add_argument("--index-latency-per-chunk-ms", type=float, default=0.5)
+
+    parser.add_argument("--output", help="Write the JSON report here, not to stdout")
+
+    benchmark_args = parser.parse_args()
+    report = json.dumps(run_benchmark(benchmark_args), indent=2)
+    if benchmark_args.output:
+        with open(benchmark_args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
@@ -0,0 +1,349 @@
+"""Local stand-ins for everything the indexing pipeline talks to over the network
+(embedding server, content classification model, LLM, file store, vector db) and for
+the Postgres backed indexing adapter.
+
+Every stand-in does the minimum work to return well formed results and sleeps for a
+configurable latency, so the benchmark measures the pipeline itself plus whatever
+latency profile the caller wants to simulate. All of them are deterministic."""
+
+import contextlib
+import hashlib
+import io
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Generator
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import TypeVar
+
+from sqlalchemy.engine.util import TransactionalContext
+
+from onyx.access.models import DocumentAccess
+from onyx.configs.constants import DEFAULT_BOOST
+from onyx.connectors.models import Document
+from onyx.document_index.interfaces import DocumentInsertionRecord
+from onyx.document_index.interfaces import IndexBatchParams
+from onyx.indexing.embedder import DefaultIndexingEmbedder
+from onyx.indexing.embedding_cache import EmbeddingCacheStats
+from onyx.indexing.indexing_pipeline import DocumentBatchPrepareContext
+from onyx.indexing.models import BuildMetadataAwareChunksResult
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.indexing.models import IndexChunk
+from onyx.indexing.models import UpdatableChunkData
+from onyx.llm.interfaces import LLM
+from onyx.llm.interfaces import LLMConfig
+from onyx.llm.model_response import Choice
+from onyx.llm.model_response import Message
+from onyx.llm.model_response import ModelResponse
+from onyx.natural_language_processing.utils import BaseTokenizer
+from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import ContentClassificationPrediction
+from shared_configs.model_server_models import Embedding
+
+R = TypeVar("R")
+
+
+class StageTimings:
+    """Thread safe wall clock durations of every call, per pipeline stage. Stages
+    overlap when the pipeline streams, so the stage totals can add up to more than
+    the total run time."""
+
+    def __init__(self) -> None:
+        self._durations: dict[str, list[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, duration: float) -> None:
+        with self._lock:
+            self._durations[stage].append(duration)
+
+    def wrap(self, stage: str, func: Callable[..., R]) -> Callable[..., R]:
+        def _timed(*args: Any, **kwargs: Any) -> R:
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.monotonic() - start)
+
+        return _timed
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            all_durations = {
+                stage: sorted(durations) for stage, durations in self._durations.items()
+            }
+
+        def _percentile_ms(durations: list[float], percentile: float) -> float:
+            index = min(int(len(durations) * percentile), len(durations) - 1)
+            return 1000 * durations[index]
+
+        return {
+            stage: {
+                "calls": len(durations),
+                "total_seconds": sum(durations),
+                "mean_ms": 1000 * sum(durations) / len(durations),
+                "p50_ms": _percentile_ms(durations, 0.5),
+                "p95_ms": _percentile_ms(durations, 0.95),
+                "max_ms": 1000 * durations[-1],
+            }
+            for stage, durations in all_durations.items()
+        }
+
+
+class StandInTokenizer(BaseTokenizer):
+    """Whitespace tokenizer, so no tokenizer files have to be downloaded"""
+
+    def __init__(self) -> None:
+        self._vocab: dict[str, int] = {}
+        self._words: list[str] = []
+        self._lock = threading.Lock()
+
+    def _token_id(self, word: str) -> int:
+        token_id = self._vocab.get(word)
+        if token_id is None:
+            with self._lock:
+                token_id = self._vocab.setdefault(word, len(self._words))
+                if token_id == len(self._words):
+                    self._words.append(word)
+        return token_id
+
+    def encode(self, string: str) -> list[int]:
+        return [self._token_id(word) for word in string.split()]
+
+    def tokenize(self, string: str) -> list[str]:
+        return string.split()
+
+    def decode(self, tokens: list[int]) -> str:
+        return " ".join(self._words[token] for token in tokens)
+
+
+def _deterministic_embedding(text: str, dim: int) -> Embedding:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(dim)]
+
+
+class StandInEmbeddingModel:
+    """Replaces the model server client of the embedder. A request takes
+    `latency_per_request` plus `latency_per_text` for every text in the batch."""
+
+    def __init__(
+        self,
+        tokenizer: BaseTokenizer,
+        dim: int,
+        batch_size: int,
+        latency_per_request: float,
+        latency_per_text: float,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.dim = dim
+        self.batch_size = max(batch_size, 1)
+        self.latency_per_request = latency_per_request
+        self.latency_per_text = latency_per_text
+
+    def encode(
+        self,
+        texts: list[str],
+        text_type: EmbedTextType,
+        **kwargs: Any,
+    ) -> list[Embedding]:
+        embeddings: list[Embedding] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            time.sleep(self.latency_per_request + self.latency_per_text * len(batch))
+            embeddings.extend(
+                _deterministic_embedding(text, self.dim) for text in batch
+            )
+        return embeddings
+
+
+class StandInIndexingEmbedder(DefaultIndexingEmbedder):
+    """The real embedder (text assembly, title embeddings, mapping embeddings back to
+    chunks) on top of the stand-in embedding model"""
+
+    def __init__(self, embedding_model: StandInEmbeddingModel) -> None:
+        # skips the parent constructor, which connects to the model server and loads
+        # the model's tokenizer
+        self.model_name = "stand-in"
+        self.normalize = True
+        self.query_prefix = None
+        self.passage_prefix = None
+        self.provider_type = None
+        self.api_key = None
+        self.api_url = None
+        self.api_version = None
+        self.deployment_name = None
+        self.reduced_dimension = None
+        self.embedding_model = embedding_model  # type: ignore[assignment]
+        self.embedding_cache = None
+        self.cache_stats = EmbeddingCacheStats()
+
+
+class StandInInformationContentClassificationModel:
+    def __init__(self, latency_per_request: float) -> None:
+        self.latency_per_request = latency_per_request
+
+    def predict(self, queries: list[str]) -> list[ContentClassificationPrediction]:
+        time.sleep(self.latency_per_request)
+        return [
+            ContentClassificationPrediction(predicted_label=1, content_boost_factor=1.0)
+            for _ in queries
+        ]
+
+
+class StandInLLM(LLM):
+    """Answers every prompt with a fixed length summary after `latency_per_call`"""
+
+    def __init__(self, latency_per_call: float, response_words: int = 50) -> None:
+        self.latency_per_call = latency_per_call
+        self.response = " ".join(["summary"] * response_words)
+        self._config = LLMConfig(
+            model_provider="stand-in",
+            model_name="stand-in",
+            temperature=0,
+            max_input_tokens=128_000,
+        )
+
+    @property
+    def config(self) -> LLMConfig:
+        return self._config
+
+    def invoke(self, *args: Any, **kwargs: Any) -> ModelResponse:
+        time.sleep(self.latency_per_call)
+        return ModelResponse(
+            id="stand-in",
+            created=datetime.now(tz=timezone.utc).isoformat(),
+            choice=Choice(finish_reason="stop", message=Message(content=self.response)),
+        )
+
+
+class _StandInFileRecord:
+    def __init__(self, display_name: str) -> None:
+        self.display_name = display_name
+
+
+class StandInFileStore:
+    """In memory file store for the images of the synthetic documents"""
+
+    def __init__(self) -> None:
+        self._files: dict[str, tuple[str, bytes]] = {}
+
+    def save_file(self, file_id: str, display_name: str, content: bytes) -> None:
+        self._files[file_id] = (display_name, content)
+
+    def read_file_record(self, file_id: str) -> _StandInFileRecord | None:
+        if file_id not in self._files:
+            return None
+        return _StandInFileRecord(self._files[file_id][0])
+
+    def read_file(self, file_id: str, **kwargs: Any) -> io.BytesIO:
+        return io.BytesIO(self._files[file_id][1])
+
+
+class StandInDocumentIndex:
+    """Keeps the chunk count of every written document. A write takes
+    `latency_per_request` plus `latency_per_chunk` for every chunk."""
+
+    def __init__(self, latency_per_request: float, latency_per_chunk: float) -> None:
+        self.latency_per_request = latency_per_request
+        self.latency_per_chunk = latency_per_chunk
+        self.chunk_counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def index(
+        self,
+        chunks: list[DocMetadataAwareIndexChunk],
+        index_batch_params: IndexBatchParams,
+    ) -> set[DocumentInsertionRecord]:
+        time.sleep(self.latency_per_request + self.latency_per_chunk * len(chunks))
+
+        new_chunk_counts: dict[str, int] = defaultdict(int)
+        for chunk in chunks:
+            new_chunk_counts[chunk.source_document.id] += 1
+
+        with self._lock:
+            records = {
+                DocumentInsertionRecord(
+                    document_id=document_id,
+                    already_existed=document_id in self.chunk_counts,
+                )
+                for document_id in new_chunk_counts
+            }
+            self.chunk_counts.update(new_chunk_counts)
+        return records
+
+
+class StandInIndexingAdapter:
+    """IndexingBatchAdapter without Postgres: every document is new, public and
+    unlocked, and nothing is persisted after indexing"""
+
+    def __init__(self) -> None:
+        self.connector_id = None
+        self.credential_id = None
+
+    def prepare(
+        self, documents: list[Document], ignore_time_skip: bool
+    ) -> DocumentBatchPrepareContext | None:
+        if not documents:
+            return None
+        return DocumentBatchPrepareContext(updatable_docs=documents, id_to_boost_map={})
+
+    @contextlib.contextmanager
+    def lock_context(
+        self, documents: list[Document]
+    ) -> Generator[TransactionalContext, None, None]:
+        yield None  # type: ignore[misc]
+
+    @contextlib.contextmanager
+    def lock_available_context(
+        self, documents: list[Document]
+    ) -> Generator[tuple[TransactionalContext, set[str]], None, None]:
+        yield None, {doc.id for doc in documents}  # type: ignore[misc]
+
+    def build_metadata_aware_chunks(
+        self,
+        chunks_with_embeddings: list[IndexChunk],
+        chunk_content_scores: list[float],
+        tenant_id: str,
+        context: DocumentBatchPrepareContext,
+    ) -> BuildMetadataAwareChunksResult:
+        access = DocumentAccess.build(
+            user_emails=[],
+            user_groups=[],
+            external_user_emails=[],
+            external_user_group_ids=[],
+            is_public=True,
+        )
+
+        doc_id_to_new_chunk_cnt: dict[str, int] = defaultdict(int)
+        for chunk in chunks_with_embeddings:
+            doc_id_to_new_chunk_cnt[chunk.source_document.id] += 1
+
+        return BuildMetadataAwareChunksResult(
+            chunks=[
+                DocMetadataAwareIndexChunk.from_index_chunk(
+                    index_chunk=chunk,
+                    access=access,
+                    document_sets=set(),
+                    user_project=[],
+                    boost=DEFAULT_BOOST,
+                    tenant_id=tenant_id,
+                    aggregated_chunk_boost_factor=score,
+                )
+                for chunk, score in zip(chunks_with_embeddings, chunk_content_scores)
+            ],
+            doc_id_to_previous_chunk_cnt={doc.id: 0 for doc in context.updatable_docs},
+            doc_id_to_new_chunk_cnt=dict(doc_id_to_new_chunk_cnt),
+            user_file_id_to_raw_text={},
+            user_file_id_to_token_count={},
+        )
+
+    def post_index(
+        self,
+        context: DocumentBatchPrepareContext,
+        updatable_chunk_data: list[UpdatableChunkData],
+        filtered_documents: list[Document],
+        result: BuildMetadataAwareChunksResult,
+    ) -> None:
+        return None
@@ -0,0 +1,102 @@
+"""Reproducible synthetic documents for the indexing benchmark, shaped like what the
+mock connector yields: text sections with links, optionally mixed with image sections
+whose (random, but valid PNG) content lives in the stand-in file store."""
+
+import io
+import random
+from datetime import datetime
+from datetime import timezone
+
+from PIL import Image
+from pydantic import BaseModel
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import ImageSection
+from onyx.connectors.models import TextSection
+from scripts.indexing_benchmark.stand_ins import StandInFileStore
+
+_VOCABULARY_SIZE = 5_000
+_SENTENCE_LENGTH = 15
+
+
+class SyntheticDocumentsConfig(BaseModel):
+    num_docs: int = 1_000
+    sections_per_doc: int = 5
+    words_per_section: int = 400
+    # fraction of the sections that are images instead of text
+    image_fraction: float = 0.0
+    image_size_px: int = 256
+    metadata_fields: int = 3
+    seed: int = 0
+
+
+def _build_vocabulary(rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        "".join(rng.choice(letters) for _ in range(rng.randint(2, 10)))
+        for _ in range(_VOCABULARY_SIZE)
+    ]
+
+
+def _build_text(rng: random.Random, vocabulary: list[str], num_words: int) -> str:
+    sentences: list[str] = []
+    for start in range(0, num_words, _SENTENCE_LENGTH):
+        words = rng.choices(vocabulary, k=min(_SENTENCE_LENGTH, num_words - start))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def _build_png(rng: random.Random, size_px: int) -> bytes:
+    image = Image.frombytes(
+        "RGB", (size_px, size_px), rng.randbytes(size_px * size_px * 3)
+    )
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def generate_documents(
+    config: SyntheticDocumentsConfig, file_store: StandInFileStore
+) -> list[Document]:
+    rng = random.Random(config.seed)
+    vocabulary = _build_vocabulary(rng)
+    doc_updated_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    documents: list[Document] = []
+    for doc_num in range(config.num_docs):
+        doc_id = f"benchmark_doc_{doc_num}"
+        sections: list[TextSection | ImageSection] = []
+        for section_num in range(config.sections_per_doc):
+            link = f"https://example.com/{doc_id}#section-{section_num}"
+            if rng.random() < config.image_fraction:
+                image_file_id = f"{doc_id}_image_{section_num}"
+                file_store.save_file(
+                    file_id=image_file_id,
+                    display_name=f"{image_file_id}.png",
+                    content=_build_png(rng, config.image_size_px),
+                )
+                sections.append(ImageSection(image_file_id=image_file_id, link=link))
+            else:
+                sections.append(
+                    TextSection(
+                        text=_build_text(rng, vocabulary, config.words_per_section),
+                        link=link,
+                    )
+                )
+
+        documents.append(
+            Document(
+                id=doc_id,
+                sections=sections,
+                source=DocumentSource.MOCK_CONNECTOR,
+                semantic_identifier=f"Benchmark document {doc_num}",
+                title=" ".join(rng.choices(vocabulary, k=5)),
+                metadata={
+                    f"field_{field_num}": rng.choice(vocabulary)
+                    for field_num in range(config.metadata_fields)
+                },
+                doc_updated_at=doc_updated_at,
+            )
+        )
+    return documents
@@ -71,6 +71,38 @@ MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
 # or intent classification
 INDEXING_ONLY = os.environ.get("INDEXING_ONLY", "").lower() == "true"
 
+# When enabled, the model server coalesces texts from concurrent /bi-encoder-embed
+# requests for the same model into shared forward passes (micro-batching).
+EMBEDDING_BATCHER_ENABLED = (
+    os.environ.get("EMBEDDING_BATCHER_ENABLED", "").lower() == "true"
+)
+# Maximum number of texts sent through the model in a single forward pass
+EMBEDDING_BATCHER_MAX_BATCH_SIZE = int(
+    os.environ.get("EMBEDDING_BATCHER_MAX_BATCH_SIZE") or 64
+)
+# How long passage texts may wait for other requests to fill up a batch
+EMBEDDING_BATCHER_MAX_WAIT_MS = float(
+    os.environ.get("EMBEDDING_BATCHER_MAX_WAIT_MS") or 10
+)
+# Query texts are latency sensitive, so they get a (much) shorter wait window
+EMBEDDING_BATCHER_QUERY_MAX_WAIT_MS = float(
+    os.environ.get("EMBEDDING_BATCHER_QUERY_MAX_WAIT_MS") or 1
+)
+
+# Wire format for embeddings returned by the model server: "float32" or "float16" for
+# raw binary buffers, "json" for the plain JSON response. float16 halves the payload
+# at the cost of some precision.
+MODEL_SERVER_EMBEDDING_TRANSPORT = (
+    os.environ.get("MODEL_SERVER_EMBEDDING_TRANSPORT") or "float32"
+).lower()
+
+# How long the model server keeps idle client connections open. Indexing workers reuse
+# pooled connections across batches, which uvicorn's default of 5 seconds is usually
+# too short for. Also read by the uvicorn CLI as UVICORN_TIMEOUT_KEEP_ALIVE.
+MODEL_SERVER_KEEP_ALIVE_TIMEOUT = int(
+    os.environ.get("UVICORN_TIMEOUT_KEEP_ALIVE") or 75
+)
+
 # The process needs to have this for the log file to write to
 # otherwise, it will not create additional log files
 # This should just be the filename base without extension or path.
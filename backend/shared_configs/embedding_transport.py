@@ -0,0 +1,122 @@
+"""
+Binary wire format for bi-encoder embeddings.
+
+JSON-encoding embeddings means formatting and parsing every float as text on both
+ends, which dominates CPU for large indexing batches. Clients that understand the
+binary format ask for it via the Accept header and the model server then responds
+with a single contiguous little-endian buffer of shape (count, dim). Servers that
+don't know about it just keep responding with JSON, so the negotiation is backwards
+compatible in both directions.
+"""
+
+from collections.abc import Mapping
+from collections.abc import Sequence
+from typing import cast
+from typing import overload
+
+import numpy as np
+
+EMBEDDING_BINARY_CONTENT_TYPE = "application/x-onyx-embeddings"
+EMBEDDING_DTYPE_HEADER = "X-Onyx-Embedding-Dtype"
+EMBEDDING_COUNT_HEADER = "X-Onyx-Embedding-Count"
+EMBEDDING_DIM_HEADER = "X-Onyx-Embedding-Dim"
+
+# Explicitly little-endian so the format does not depend on the host byte order
+EMBEDDING_BINARY_DTYPES: dict[str, np.dtype] = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+
+class EmbeddingRows(Sequence[list[float]]):
+    """Read only, list like view over a decoded (count, dim) embedding array.
+
+    A row is only converted to Python floats when it is accessed, so responses can be
+    counted, sliced and concatenated (see `concat_embeddings`) without any per element
+    work. Consumers that can take the array directly should use `vectors`."""
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @overload
+    def __getitem__(self, index: int) -> list[float]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "EmbeddingRows": ...
+
+    def __getitem__(self, index: int | slice) -> "list[float] | EmbeddingRows":
+        if isinstance(index, slice):
+            return EmbeddingRows(self.vectors[index])
+        return self.vectors[index].tolist()
+
+
+def concat_embeddings(
+    batches: Sequence[Sequence[list[float]]],
+) -> Sequence[list[float]]:
+    """Concatenates per request embeddings, staying lazy if every batch is."""
+    if batches and all(isinstance(batch, EmbeddingRows) for batch in batches):
+        return EmbeddingRows(
+            np.concatenate([cast(EmbeddingRows, batch).vectors for batch in batches])
+        )
+    return [embedding for batch in batches for embedding in batch]
+
+
+def build_binary_embedding_request_headers(dtype: str) -> dict[str, str]:
+    if dtype not in EMBEDDING_BINARY_DTYPES:
+        raise ValueError(f"Unsupported embedding transport dtype: {dtype}")
+    return {
+        "Accept": f"{EMBEDDING_BINARY_CONTENT_TYPE}, application/json;q=0.5",
+        EMBEDDING_DTYPE_HEADER: dtype,
+    }
+
+
+def get_requested_binary_dtype(headers: Mapping[str, str]) -> str | None:
+    """Returns the dtype the client asked for, or None if it wants JSON."""
+    if EMBEDDING_BINARY_CONTENT_TYPE not in headers.get("accept", ""):
+        return None
+
+    dtype = headers.get(EMBEDDING_DTYPE_HEADER.lower()) or "float32"
+    if dtype not in EMBEDDING_BINARY_DTYPES:
+        return None
+    return dtype
+
+
+def is_binary_embedding_response(headers: Mapping[str, str]) -> bool:
+    return headers.get("content-type", "").startswith(EMBEDDING_BINARY_CONTENT_TYPE)
+
+
+def encode_embeddings(vectors: np.ndarray, dtype: str) -> tuple[bytes, dict[str, str]]:
+    """Serializes a (count, dim) array into the response body and its headers."""
+    if vectors.ndim != 2:
+        raise ValueError(f"Expected a 2D array of embeddings, got {vectors.ndim}D")
+
+    array = np.ascontiguousarray(vectors, dtype=EMBEDDING_BINARY_DTYPES[dtype])
+    headers = {
+        EMBEDDING_DTYPE_HEADER: dtype,
+        EMBEDDING_COUNT_HEADER: str(array.shape[0]),
+        EMBEDDING_DIM_HEADER: str(array.shape[1]),
+    }
+    return array.tobytes(), headers
+
+
+def decode_embeddings(content: bytes, headers: Mapping[str, str]) -> np.ndarray:
+    """Zero-copy view of a binary embedding response as a float32 (count, dim) array
+    (float16 payloads are upcast)."""
+    dtype = headers.get(EMBEDDING_DTYPE_HEADER.lower()) or "float32"
+    if dtype not in EMBEDDING_BINARY_DTYPES:
+        raise ValueError(f"Unsupported embedding transport dtype: {dtype}")
+
+    count = int(headers.get(EMBEDDING_COUNT_HEADER.lower()) or 0)
+    dim = int(headers.get(EMBEDDING_DIM_HEADER.lower()) or 0)
+    np_dtype = EMBEDDING_BINARY_DTYPES[dtype]
+    if len(content) != count * dim * np_dtype.itemsize:
+        raise ValueError(
+            f"Embedding payload has {len(content)} bytes, "
+            f"expected {count}x{dim} {dtype} values"
+        )
+
+    array = np.frombuffer(content, dtype=np_dtype).reshape(count, dim)
+    return array.astype(np.float32, copy=False)
@@ -0,0 +1,88 @@
+"""Keyset pagination of chat session search against the real database."""
+
+from datetime import datetime
+from datetime import timezone
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from onyx.db.chat_search import decode_chat_search_cursor
+from onyx.db.chat_search import search_chat_sessions
+from onyx.db.models import ChatSession
+from tests.external_dependency_unit.conftest import create_test_user
+
+
+def _create_sessions(
+    db_session: Session, user_id: UUID, descriptions: list[str]
+) -> None:
+    """All sessions are created at the same time, only the id tells them apart."""
+    time_created = datetime.now(tz=timezone.utc)
+    for description in descriptions:
+        db_session.add(
+            ChatSession(
+                user_id=user_id,
+                persona_id=None,
+                description=description,
+                time_created=time_created,
+            )
+        )
+    db_session.commit()
+
+
+def _search_all_pages(
+    db_session: Session, user_id: UUID, query: str | None, page_size: int
+) -> list[UUID]:
+    session_ids: list[UUID] = []
+    cursor = None
+    while True:
+        sessions, has_more, cursor = search_chat_sessions(
+            user_id=user_id,
+            db_session=db_session,
+            query=query,
+            page_size=page_size,
+            cursor=cursor,
+        )
+        session_ids.extend(session.id for session in sessions)
+        if not has_more:
+            return session_ids
+
+
+def test_search_pages_sharing_a_rank(db_session: Session, tenant_context: None) -> None:
+    user = create_test_user(db_session, "chat_search")
+    # the first five sessions share a rank, so every page boundary falls between
+    # sessions of the same rank
+    _create_sessions(
+        db_session,
+        user.id,
+        ["quarterly revenue forecast"] * 5 + ["revenue revenue revenue"],
+    )
+
+    expected, _, _ = search_chat_sessions(
+        user_id=user.id, db_session=db_session, query="revenue", page_size=10
+    )
+    assert len(expected) == 6
+
+    _, has_more, cursor = search_chat_sessions(
+        user_id=user.id, db_session=db_session, query="revenue", page_size=2
+    )
+    assert has_more and cursor
+    # the cursor rank compares equal to the rank in the database
+    rank = decode_chat_search_cursor(cursor).rank
+    assert rank is not None and rank > 0
+
+    assert _search_all_pages(db_session, user.id, "revenue", page_size=2) == [
+        session.id for session in expected
+    ]
+
+
+def test_recent_sessions_pages(db_session: Session, tenant_context: None) -> None:
+    user = create_test_user(db_session, "chat_recent")
+    _create_sessions(db_session, user.id, [f"session {i}" for i in range(5)])
+
+    expected, _, _ = search_chat_sessions(
+        user_id=user.id, db_session=db_session, page_size=10
+    )
+    assert len(expected) == 5
+    assert _search_all_pages(db_session, user.id, None, page_size=2) == [
+        session.id for session in expected
+    ]
@@ -0,0 +1,111 @@
+"""The recursive CTE behind get_mainline_chat_messages against the real database."""
+
+from sqlalchemy.orm import Session
+
+from onyx.configs.constants import MessageType
+from onyx.db.chat import create_chat_session
+from onyx.db.chat import create_new_chat_message
+from onyx.db.chat import get_mainline_chat_messages
+from onyx.db.chat import get_or_create_root_message
+from onyx.db.models import ChatMessage
+from onyx.db.models import ChatSession
+from tests.external_dependency_unit.conftest import create_test_user
+
+
+def _add_message(
+    db_session: Session,
+    chat_session: ChatSession,
+    parent_message: ChatMessage,
+    message_type: MessageType,
+) -> ChatMessage:
+    return create_new_chat_message(
+        chat_session_id=chat_session.id,
+        parent_message=parent_message,
+        message=f"{message_type.value} after {parent_message.id}",
+        token_count=1,
+        message_type=message_type,
+        db_session=db_session,
+    )
+
+
+def _ids(messages: list[ChatMessage]) -> list[int]:
+    return [message.id for message in messages]
+
+
+def test_mainline_follows_latest_children(
+    db_session: Session, tenant_context: None
+) -> None:
+    user = create_test_user(db_session, "mainline")
+    chat_session = create_chat_session(
+        db_session, description=None, user_id=user.id, persona_id=None
+    )
+    root = get_or_create_root_message(chat_session.id, db_session)
+
+    question = _add_message(db_session, chat_session, root, MessageType.USER)
+    # the first answer is regenerated, the second one is the latest child
+    _add_message(db_session, chat_session, question, MessageType.ASSISTANT)
+    answer = _add_message(db_session, chat_session, question, MessageType.ASSISTANT)
+    follow_up = _add_message(db_session, chat_session, answer, MessageType.USER)
+    follow_up_answer = _add_message(
+        db_session, chat_session, follow_up, MessageType.ASSISTANT
+    )
+
+    mainline = [root, question, answer, follow_up, follow_up_answer]
+    assert _ids(get_mainline_chat_messages(chat_session.id, db_session)) == _ids(
+        mainline
+    )
+
+    # stop_at_message_id is the last message returned
+    assert _ids(
+        get_mainline_chat_messages(
+            chat_session.id, db_session, stop_at_message_id=answer.id
+        )
+    ) == _ids(mainline[:3])
+
+    # start_message_id is the first message returned
+    assert _ids(
+        get_mainline_chat_messages(
+            chat_session.id, db_session, start_message_id=answer.id
+        )
+    ) == _ids(mainline[2:])
+    assert _ids(
+        get_mainline_chat_messages(
+            chat_session.id,
+            db_session,
+            start_message_id=question.id,
+            stop_at_message_id=follow_up.id,
+        )
+    ) == _ids(mainline[1:4])
+
+    # editing the first question starts a new mainline without the old answers
+    edited_question = _add_message(db_session, chat_session, root, MessageType.USER)
+    assert _ids(get_mainline_chat_messages(chat_session.id, db_session)) == _ids(
+        [root, edited_question]
+    )
+    # the old branch can still be followed from one of its own messages
+    assert _ids(
+        get_mainline_chat_messages(
+            chat_session.id, db_session, start_message_id=answer.id
+        )
+    ) == _ids(mainline[2:])
+
+
+def test_start_message_of_another_session_returns_nothing(
+    db_session: Session, tenant_context: None
+) -> None:
+    user = create_test_user(db_session, "mainline_other")
+    chat_session = create_chat_session(
+        db_session, description=None, user_id=user.id, persona_id=None
+    )
+    other_chat_session = create_chat_session(
+        db_session, description=None, user_id=user.id, persona_id=None
+    )
+    root = get_or_create_root_message(chat_session.id, db_session)
+    question = _add_message(db_session, chat_session, root, MessageType.USER)
+
+    assert (
+        get_mainline_chat_messages(
+            other_chat_session.id, db_session, start_message_id=question.id
+        )
+        == []
+    )
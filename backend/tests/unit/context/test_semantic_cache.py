@@ -2,25 +2,132 @@
 Unit tests for semantic cache with tenant isolation.
 """
 
+import json
 import threading
 import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from typing import Any
+from typing import cast
 
 import pytest
+from redis import Redis
 
-from onyx.context.search.semantic_cache import (
-    CacheEntry,
-    CacheStats,
-    SemanticCache,
-)
+from onyx.context.search.semantic_cache import CacheEntry
+from onyx.context.search.semantic_cache import CacheStats
+from onyx.context.search.semantic_cache import RedisCacheTier
+from onyx.context.search.semantic_cache import SemanticCache
+
+
+class FakeRedisTier(RedisCacheTier):
+    """In-memory stand-in for the Redis tier, shared by several SemanticCaches
+    the same way Redis is shared by several API server processes."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, bytes] = {}
+        self.doc_to_keys: dict[str, set[str]] = {}
+
+    def get(self, cache_key: str, tenant_id: str) -> bytes | None:
+        return self.entries.get(cache_key)
+
+    def contains(self, cache_key: str, tenant_id: str) -> bool:
+        return cache_key in self.entries
+
+    def set(
+        self,
+        cache_key: str,
+        value: bytes,
+        ttl_seconds: float,
+        tenant_id: str,
+        document_ids: Iterable[str],
+    ) -> None:
+        self.entries[cache_key] = value
+        for doc_id in document_ids:
+            self.doc_to_keys.setdefault(f"{tenant_id}:{doc_id}", set()).add(cache_key)
+
+    def invalidate_documents(self, document_ids: Iterable[str], tenant_id: str) -> int:
+        count = 0
+        for doc_id in document_ids:
+            for key in self.doc_to_keys.pop(f"{tenant_id}:{doc_id}", set()):
+                if self.entries.pop(key, None) is not None:
+                    count += 1
+        return count
+
+
+class _FakeRedis:
+    """The subset of the Redis client used by RedisCacheTier, without expiry."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+        self.sets: dict[str, set[str]] = {}
+
+    def pipeline(self, transaction: bool = True) -> "_FakePipeline":
+        return _FakePipeline(self)
+
+    def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    def exists(self, key: str) -> int:
+        return int(key in self.values)
+
+    def incr(self, key: str) -> int:
+        value = int(self.values.get(key, b"0")) + 1
+        self.values[key] = str(value).encode()
+        return value
+
+    def sadd(self, key: str, member: str) -> None:
+        self.sets.setdefault(key, set()).add(member)
+
+    def smembers(self, key: str) -> set[bytes]:
+        return {member.encode() for member in self.sets.get(key, set())}
+
+    def expire(self, key: str, ttl: int) -> None:
+        pass
+
+    def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self.values.pop(key, None) is not None:
+                deleted += 1
+            self.sets.pop(key, None)
+        return deleted
+
+    def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        self.values[key] = value
+
+
+class _FakePipeline:
+    def __init__(self, redis: _FakeRedis) -> None:
+        self._redis = redis
+        self._results: list[Any] = []
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        def command(*args: Any, **kwargs: Any) -> None:
+            self._results.append(getattr(self._redis, name)(*args, **kwargs))
+
+        return command
+
+    def execute(self) -> list[Any]:
+        results, self._results = self._results, []
+        return results
+
+
+def _make_shared_cache(l2: RedisCacheTier) -> SemanticCache[list[str]]:
+    return SemanticCache(
+        max_size=100,
+        l2=l2,
+        serializer=lambda value: json.dumps(value).encode(),
+        deserializer=lambda data: json.loads(data),
+    )
 
 
 class TestSemanticCache:
     """Tests for semantic cache functionality."""
-    
+
     @pytest.fixture
     def cache(self) -> SemanticCache[list[str]]:
         return SemanticCache(max_size=100, default_ttl_seconds=60.0)
-    
+
     def test_cache_miss_returns_none(self, cache: SemanticCache[list[str]]) -> None:
         """Cache miss should return None."""
         result = cache.get(
@@ -29,7 +136,7 @@ class TestSemanticCache:
             acl=["user:alice@a.com"],
         )
         assert result is None
-    
+
     def test_cache_hit_returns_value(self, cache: SemanticCache[list[str]]) -> None:
         """Cache hit should return stored value."""
         cache.set(
@@ -38,15 +145,15 @@ class TestSemanticCache:
             acl=["user:alice@a.com"],
             value=["result1", "result2"],
         )
-        
+
         result = cache.get(
             query="test query",
             tenant_id="tenant_a",
             acl=["user:alice@a.com"],
         )
-        
+
         assert result == ["result1", "result2"]
-    
+
     def test_tenant_isolation(self, cache: SemanticCache[list[str]]) -> None:
         """Different tenants should have isolated caches."""
         # Set value for tenant A
@@ -56,7 +163,7 @@ class TestSemanticCache:
             acl=["PUBLIC"],
             value=["tenant_a_results"],
         )
-        
+
         # Set different value for tenant B
         cache.set(
             query="shared query",
@@ -64,7 +171,7 @@ class TestSemanticCache:
             acl=["PUBLIC"],
             value=["tenant_b_results"],
         )
-        
+
         # Each tenant should get their own results
         result_a = cache.get(
             query="shared query",
@@ -76,10 +183,10 @@ class TestSemanticCache:
             tenant_id="tenant_b",
             acl=["PUBLIC"],
         )
-        
+
         assert result_a == ["tenant_a_results"]
         assert result_b == ["tenant_b_results"]
-    
+
     def test_acl_isolation(self, cache: SemanticCache[list[str]]) -> None:
         """Different ACLs should have isolated cache entries."""
         # Set value for user with full access
@@ -89,7 +196,7 @@ class TestSemanticCache:
             acl=["user:admin@a.com", "group:admins"],
             value=["full_results"],
         )
-        
+
         # Set value for user with limited access
         cache.set(
             query="sensitive query",
@@ -97,24 +204,24 @@ class TestSemanticCache:
             acl=["user:user@a.com"],
             value=["limited_results"],
         )
-        
+
         # Admin gets full results
         admin_result = cache.get(
             query="sensitive query",
             tenant_id="tenant_a",
             acl=["user:admin@a.com", "group:admins"],
         )
-        
+
         # Regular user gets limited results
         user_result = cache.get(
             query="sensitive query",
             tenant_id="tenant_a",
             acl=["user:user@a.com"],
         )
-        
+
         assert admin_result == ["full_results"]
         assert user_result == ["limited_results"]
-    
+
     def test_query_normalization(self, cache: SemanticCache[list[str]]) -> None:
         """Queries should be normalized (case-insensitive, trimmed)."""
         cache.set(
@@ -123,39 +230,39 @@ class TestSemanticCache:
             acl=["PUBLIC"],
             value=["results"],
         )
-        
+
         # Same query with different case/whitespace should hit
         result = cache.get(
             query="  test query  ",
             tenant_id="tenant_a",
             acl=["PUBLIC"],
         )
-        
+
         assert result == ["results"]
-    
+
     def test_ttl_expiration(self) -> None:
         """Expired entries should return None."""
         cache: SemanticCache[list[str]] = SemanticCache(
             max_size=100,
             default_ttl_seconds=0.1,  # 100ms TTL
         )
-        
+
         cache.set(
             query="test",
             tenant_id="tenant_a",
             acl=["PUBLIC"],
             value=["results"],
         )
-        
+
         # Should hit immediately
         assert cache.get("test", "tenant_a", ["PUBLIC"]) == ["results"]
-        
+
         # Wait for expiration
         time.sleep(0.15)
-        
+
         # Should miss after expiration
         assert cache.get("test", "tenant_a", ["PUBLIC"]) is None
-    
+
     def test_custom_ttl(self, cache: SemanticCache[list[str]]) -> None:
         """Custom TTL should override default."""
         cache.set(
@@ -165,12 +272,12 @@ class TestSemanticCache:
             value=["results"],
             ttl_seconds=0.1,
         )
-        
+
         time.sleep(0.15)
-        
+
         result = cache.get("short_lived", "tenant_a", ["PUBLIC"])
         assert result is None
-    
+
     def test_document_invalidation(self, cache: SemanticCache[list[str]]) -> None:
         """Invalidating a document should remove related cache entries."""
         cache.set(
@@ -180,7 +287,7 @@ class TestSemanticCache:
             value=["results1"],
             document_ids=["doc1", "doc2"],
         )
-        
+
         cache.set(
             query="query2",
             tenant_id="tenant_a",
@@ -188,71 +295,71 @@ class TestSemanticCache:
             value=["results2"],
             document_ids=["doc2", "doc3"],
         )
-        
+
         # Invalidate doc1 - should only affect query1
         count = cache.invalidate_document("doc1", "tenant_a")
         assert count == 1
-        
+
         assert cache.get("query1", "tenant_a", ["PUBLIC"]) is None
         assert cache.get("query2", "tenant_a", ["PUBLIC"]) == ["results2"]
-    
+
     def test_tenant_invalidation(self, cache: SemanticCache[list[str]]) -> None:
         """Invalidating a tenant should remove all their entries."""
         cache.set("q1", "tenant_a", ["PUBLIC"], ["r1"])
         cache.set("q2", "tenant_a", ["PUBLIC"], ["r2"])
         cache.set("q1", "tenant_b", ["PUBLIC"], ["r3"])
-        
+
         count = cache.invalidate_tenant("tenant_a")
         assert count == 2
-        
+
         assert cache.get("q1", "tenant_a", ["PUBLIC"]) is None
         assert cache.get("q2", "tenant_a", ["PUBLIC"]) is None
         assert cache.get("q1", "tenant_b", ["PUBLIC"]) == ["r3"]
-    
+
     def test_stats_tracking(self, cache: SemanticCache[list[str]]) -> None:
         """Cache should track hit/miss statistics."""
         cache.set("q1", "t1", ["PUBLIC"], ["r1"])
-        
+
         # 2 hits
         cache.get("q1", "t1", ["PUBLIC"])
         cache.get("q1", "t1", ["PUBLIC"])
-        
+
         # 1 miss
         cache.get("q2", "t1", ["PUBLIC"])
-        
+
         stats = cache.get_stats()
         assert stats.hits == 2
         assert stats.misses == 1
-        assert stats.hit_rate == pytest.approx(2/3)
-    
+        assert stats.hit_rate == pytest.approx(2 / 3)
+
     def test_max_size_eviction(self) -> None:
         """Cache should evict entries when max size is reached."""
         cache: SemanticCache[str] = SemanticCache(max_size=10)
-        
+
         # Fill cache beyond max
         for i in range(15):
             cache.set(f"query{i}", "tenant", ["PUBLIC"], f"result{i}")
-        
+
         stats = cache.get_stats()
         assert stats.size <= 10
         assert stats.evictions > 0
-    
+
     def test_clear(self, cache: SemanticCache[list[str]]) -> None:
         """Clear should remove all entries."""
         cache.set("q1", "t1", ["PUBLIC"], ["r1"])
         cache.set("q2", "t1", ["PUBLIC"], ["r2"])
-        
+
         cache.clear()
-        
+
         assert cache.get("q1", "t1", ["PUBLIC"]) is None
         assert cache.get("q2", "t1", ["PUBLIC"]) is None
         assert cache.get_stats().size == 0
-    
+
     def test_thread_safety(self) -> None:
         """Cache should be thread-safe."""
         cache: SemanticCache[int] = SemanticCache(max_size=1000)
         errors: list[Exception] = []
-        
+
         def writer(thread_id: int) -> None:
             try:
                 for i in range(100):
@@ -264,7 +371,7 @@ class TestSemanticCache:
                     )
             except Exception as e:
                 errors.append(e)
-        
+
         def reader(thread_id: int) -> None:
             try:
                 for i in range(100):
@@ -275,23 +382,23 @@ class TestSemanticCache:
                     )
             except Exception as e:
                 errors.append(e)
-        
+
         threads = []
         for i in range(10):
             threads.append(threading.Thread(target=writer, args=(i,)))
             threads.append(threading.Thread(target=reader, args=(i,)))
-        
+
         for t in threads:
             t.start()
         for t in threads:
             t.join()
-        
+
         assert len(errors) == 0
 
 
 class TestCacheEntry:
     """Tests for CacheEntry class."""
-    
+
     def test_is_expired_false_when_fresh(self) -> None:
         """Fresh entry should not be expired."""
         entry = CacheEntry(
@@ -303,7 +410,7 @@ class TestCacheEntry:
             query_hash="xyz",
         )
         assert entry.is_expired() is False
-    
+
     def test_is_expired_true_when_old(self) -> None:
         """Old entry should be expired."""
         entry = CacheEntry(
@@ -319,24 +426,130 @@ class TestCacheEntry:
 
 class TestCacheStats:
     """Tests for CacheStats class."""
-    
+
     def test_hit_rate_zero_when_empty(self) -> None:
         """Hit rate should be 0 when no accesses."""
         stats = CacheStats()
         assert stats.hit_rate == 0.0
-    
+
     def test_hit_rate_calculation(self) -> None:
         """Hit rate should be correctly calculated."""
         stats = CacheStats(hits=75, misses=25)
         assert stats.hit_rate == 0.75
-    
+
     def test_to_dict(self) -> None:
         """Should convert to dictionary."""
         stats = CacheStats(hits=10, misses=5, evictions=2, size=100)
         d = stats.to_dict()
-        
+
         assert d["hits"] == 10
         assert d["misses"] == 5
         assert d["evictions"] == 2
         assert d["size"] == 100
-        assert d["hit_rate"] == pytest.approx(10/15)
+        assert d["hit_rate"] == pytest.approx(10 / 15)
+
+
+class TestSimilarityLookup:
+    """Tests for near-duplicate lookups on the query embedding."""
+
+    @pytest.fixture
+    def cache(self) -> SemanticCache[list[str]]:
+        return SemanticCache(max_size=100, similarity_threshold=0.95)
+
+    def test_similar_query_hits(self, cache: SemanticCache[list[str]]) -> None:
+        """A different query with a near-identical embedding is served from cache."""
+        cache.set(
+            "how do I reset my password",
+            "t1",
+            ["PUBLIC"],
+            ["r1"],
+            query_embedding=[1.0, 0.0, 0.0],
+        )
+
+        result = cache.get(
+            "how can I reset my password",
+            "t1",
+            ["PUBLIC"],
+            query_embedding=[0.99, 0.05, 0.0],
+        )
+
+        assert result == ["r1"]
+        assert cache.get_stats().similarity_hits == 1
+
+    def test_dissimilar_query_misses(self, cache: SemanticCache[list[str]]) -> None:
+        cache.set("q1", "t1", ["PUBLIC"], ["r1"], query_embedding=[1.0, 0.0])
+
+        assert cache.get("q2", "t1", ["PUBLIC"], query_embedding=[0.0, 1.0]) is None
+
+    def test_similarity_respects_acl(self, cache: SemanticCache[list[str]]) -> None:
+        """Near-duplicate lookups never cross tenant/ACL scopes."""
+        cache.set("q1", "t1", ["user:alice"], ["r1"], query_embedding=[1.0, 0.0])
+
+        assert cache.get("q2", "t1", ["user:bob"], query_embedding=[1.0, 0.0]) is None
+        assert cache.get("q2", "t2", ["user:alice"], query_embedding=[1.0, 0.0]) is None
+
+
+class TestRedisTier:
+    """Tests for the shared second-level cache."""
+
+    def test_hit_from_other_process(self) -> None:
+        """Entries written by one process are served to another one."""
+        l2 = FakeRedisTier()
+        writer = _make_shared_cache(l2)
+        reader = _make_shared_cache(l2)
+
+        writer.set("q1", "t1", ["PUBLIC"], ["r1"], document_ids=["doc1"])
+
+        assert reader.get("q1", "t1", ["PUBLIC"]) == ["r1"]
+        assert reader.get_stats().l2_hits == 1
+
+    def test_invalidation_from_other_process(self) -> None:
+        """A document update in a background worker invalidates local entries elsewhere."""
+        l2 = FakeRedisTier()
+        api_server = _make_shared_cache(l2)
+        worker = _make_shared_cache(l2)
+
+        api_server.set("q1", "t1", ["PUBLIC"], ["r1"], document_ids=["doc1"])
+        assert api_server.get("q1", "t1", ["PUBLIC"]) == ["r1"]
+
+        worker.invalidate_documents(["doc1"], "t1")
+
+        assert api_server.get("q1", "t1", ["PUBLIC"]) is None
+
+    def test_redis_tier_invalidation(self) -> None:
+        """Documents and whole tenants are invalidated in the shared tier."""
+        redis = _FakeRedis()
+        l2 = RedisCacheTier(cast(Redis, redis))
+        l2.set("t1:q1", b"r1", 60, "t1", ["doc1"])
+        l2.set("t1:q2", b"r2", 60, "t1", ["doc2"])
+        l2.set("t2:q1", b"r3", 60, "t2", ["doc1"])
+
+        assert l2.get("t1:q1", "t1") == b"r1"
+        assert l2.invalidate_documents(["doc1"], "t1") == 1
+        assert not l2.contains("t1:q1", "t1")
+        assert l2.get("t2:q1", "t2") == b"r3"
+
+        # a tenant is invalidated without looking at its keys
+        l2.invalidate_tenant("t1")
+        assert l2.get("t1:q2", "t1") is None
+        assert l2.get("t2:q1", "t2") == b"r3"
+
+        # new entries of the tenant are served again
+        l2.set("t1:q2", b"r4", 60, "t1", ["doc2"])
+        assert l2.get("t1:q2", "t1") == b"r4"
+        l2.invalidate_documents(["doc2"], "t1")
+        assert l2.get("t1:q2", "t1") is None
+
+    def test_tenant_invalidation_from_other_process(self) -> None:
+        """Indexing new documents in a worker invalidates the tenant elsewhere."""
+        l2 = RedisCacheTier(cast(Redis, _FakeRedis()))
+        api_server = _make_shared_cache(l2)
+        worker = _make_shared_cache(l2)
+
+        api_server.set("q1", "t1", ["PUBLIC"], ["r1"], document_ids=["doc1"])
+        api_server.set("q1", "t2", ["PUBLIC"], ["r2"], document_ids=["doc1"])
+
+        worker.invalidate_tenant("t1")
+
+        assert api_server.get("q1", "t1", ["PUBLIC"]) is None
+        assert api_server.get("q1", "t2", ["PUBLIC"]) == ["r2"]
@@ -0,0 +1,83 @@
+"""Tests for the batched, digest based document permission upsert."""
+
+from unittest.mock import MagicMock
+
+from ee.onyx.db.document import build_external_access_digest
+from ee.onyx.db.document import upsert_document_external_perms_batch
+from onyx.access.models import DocExternalAccess
+from onyx.access.models import ExternalAccess
+from onyx.configs.constants import DocumentSource
+from onyx.db.models import Document as DbDocument
+
+
+def _doc_access(doc_id: str, emails: set[str], groups: set[str]) -> DocExternalAccess:
+    return DocExternalAccess(
+        external_access=ExternalAccess(
+            external_user_emails=emails,
+            external_user_group_ids=groups,
+            is_public=False,
+        ),
+        doc_id=doc_id,
+    )
+
+
+def test_digest_is_order_independent() -> None:
+    digest = build_external_access_digest(["b@x.com", "a@x.com"], ["g1"], False)
+    assert digest == build_external_access_digest(["a@x.com", "b@x.com"], ["g1"], False)
+
+    # moving a value between emails and groups must change the digest
+    email_digest = build_external_access_digest(["a"], [], False)
+    assert email_digest != build_external_access_digest([], ["a"], False)
+
+    private_digest = build_external_access_digest([], [], False)
+    assert private_digest != build_external_access_digest([], [], True)
+
+
+def test_batch_upsert_skips_unchanged_documents() -> None:
+    unchanged = _doc_access("unchanged", {"a@x.com"}, {"g1"})
+    changed = _doc_access("changed", {"b@x.com"}, set())
+    same_without_digest = _doc_access("no_digest", {"c@x.com"}, set())
+    new = _doc_access("new", {"d@x.com"}, set())
+
+    source = DocumentSource.SLACK
+    unchanged_digest = build_external_access_digest(["a@x.com"], ["slack_g1"], False)
+    changed_doc = DbDocument(
+        id="changed",
+        external_user_emails=["old@x.com"],
+        external_user_group_ids=[],
+        is_public=False,
+    )
+    no_digest_doc = DbDocument(
+        id="no_digest",
+        external_user_emails=["c@x.com"],
+        external_user_group_ids=[],
+        is_public=False,
+    )
+
+    mock_session = MagicMock()
+    mock_session.execute.return_value.tuples.return_value.all.return_value = [
+        ("unchanged", unchanged_digest),
+        ("changed", "stale"),
+        ("no_digest", None),
+    ]
+    mock_session.scalars.return_value.all.return_value = [changed_doc, no_digest_doc]
+
+    result = upsert_document_external_perms_batch(
+        mock_session, [unchanged, changed, same_without_digest, new], source
+    )
+
+    assert result.created_doc_ids == ["new"]
+    assert sorted(result.changed_doc_ids) == ["changed", "new"]
+    assert result.num_unchanged == 2
+
+    assert changed_doc.external_user_emails == ["b@x.com"]
+    assert changed_doc.last_modified is not None
+    # the permissions were already correct, only the digest is filled in
+    assert no_digest_doc.last_modified is None
+    assert no_digest_doc.external_access_digest == build_external_access_digest(
+        ["c@x.com"], [], False
+    )
+
+    (added_doc,) = [call.args[0] for call in mock_session.add.call_args_list]
+    assert added_doc.id == "new"
+    mock_session.commit.assert_called_once()
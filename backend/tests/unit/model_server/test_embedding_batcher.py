@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+
+from model_server.embedding_batcher import EmbeddingBatcher
+from model_server.embedding_batcher import PASSAGE_LANE
+from model_server.embedding_batcher import QUERY_LANE
+
+
+class _RecordingEncoder:
+    """Embeds a text as [len(text)] and records every batch it was called with."""
+
+    def __init__(self, block: threading.Event | None = None) -> None:
+        self.batches: list[list[str]] = []
+        self._block = block
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        if self._block is not None:
+            self._block.wait(timeout=5)
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced() -> None:
+    encoder = _RecordingEncoder()
+    batcher = EmbeddingBatcher(
+        model_name="fake-model",
+        encode_fn=encoder,
+        max_batch_size=16,
+        max_wait_seconds=0.05,
+    )
+
+    results = await asyncio.gather(
+        batcher.embed(["a", "bbb"]),
+        batcher.embed(["cc"]),
+        batcher.embed(["dddd", "e"]),
+    )
+    batcher.shutdown()
+
+    assert list(results) == [[[1.0], [3.0]], [[2.0]], [[4.0], [1.0]]]
+    # all five texts share a single forward pass, sorted by length
+    assert encoder.batches == [["a", "e", "cc", "bbb", "dddd"]]
+
+
+@pytest.mark.asyncio
+async def test_large_request_is_split_into_max_batch_size() -> None:
+    encoder = _RecordingEncoder()
+    batcher = EmbeddingBatcher(
+        model_name="fake-model",
+        encode_fn=encoder,
+        max_batch_size=3,
+        max_wait_seconds=0,
+    )
+
+    texts = [str(i) * (i + 1) for i in range(7)]
+    result = await batcher.embed(texts)
+    batcher.shutdown()
+
+    assert result == [[float(len(text))] for text in texts]
+    assert [len(batch) for batch in encoder.batches] == [3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_queries_jump_ahead_of_queued_passages() -> None:
+    release = threading.Event()
+    encoder = _RecordingEncoder(block=release)
+    batcher = EmbeddingBatcher(
+        model_name="fake-model",
+        encode_fn=encoder,
+        max_batch_size=2,
+        max_wait_seconds=0,
+        query_max_wait_seconds=0,
+    )
+
+    passages = asyncio.create_task(
+        batcher.embed(["p1", "p2", "p3", "p4", "p5", "p6"], lane=PASSAGE_LANE)
+    )
+    # let the first passage batch start (and block inside the encoder)
+    await asyncio.sleep(0.05)
+    query = asyncio.create_task(batcher.embed(["query"], lane=QUERY_LANE))
+    await asyncio.sleep(0.01)
+    assert batcher.queue_depth(QUERY_LANE) == 1
+
+    release.set()
+    await asyncio.gather(passages, query)
+    batcher.shutdown()
+
+    # the query goes into the very next forward pass, ahead of the remaining passages
+    assert encoder.batches[0] == ["p1", "p2"]
+    assert sorted(encoder.batches[1]) == ["p3", "query"]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_all_requests_in_it() -> None:
+    def _failing_encoder(texts: list[str]) -> list[list[float]]:
+        raise RuntimeError("boom")
+
+    batcher = EmbeddingBatcher(
+        model_name="fake-model",
+        encode_fn=_failing_encoder,
+        max_batch_size=8,
+        max_wait_seconds=0.05,
+    )
+
+    results = await asyncio.gather(
+        batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True
+    )
+    batcher.shutdown()
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.queue_depth() == 0
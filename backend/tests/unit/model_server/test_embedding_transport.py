@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from shared_configs.embedding_transport import build_binary_embedding_request_headers
+from shared_configs.embedding_transport import concat_embeddings
+from shared_configs.embedding_transport import decode_embeddings
+from shared_configs.embedding_transport import EmbeddingRows
+from shared_configs.embedding_transport import encode_embeddings
+from shared_configs.embedding_transport import get_requested_binary_dtype
+
+
+def _lowercase(headers: dict[str, str]) -> dict[str, str]:
+    # both starlette and requests expose case-insensitive headers
+    return {key.lower(): value for key, value in headers.items()}
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_binary_round_trip(dtype: str) -> None:
+    vectors = np.array([[0.25, -0.5, 1.0], [0.125, 0.0, -1.0]], dtype=np.float32)
+
+    request_headers = _lowercase(build_binary_embedding_request_headers(dtype))
+    assert get_requested_binary_dtype(request_headers) == dtype
+
+    content, response_headers = encode_embeddings(vectors, dtype)
+    decoded = decode_embeddings(content, _lowercase(response_headers))
+
+    assert decoded.dtype == np.float32
+    assert decoded.shape == (2, 3)
+    assert decoded.tolist() == vectors.tolist()
+
+
+def test_json_clients_are_not_sent_binary() -> None:
+    assert get_requested_binary_dtype({"accept": "application/json"}) is None
+    assert get_requested_binary_dtype({}) is None
+
+
+def test_truncated_payload_is_rejected() -> None:
+    content, headers = encode_embeddings(np.ones((2, 4)), "float32")
+
+    with pytest.raises(ValueError):
+        decode_embeddings(content[:-4], _lowercase(headers))
+
+
+def test_embedding_rows_stay_lazy_when_concatenated() -> None:
+    first = EmbeddingRows(np.array([[1.0, 2.0]], dtype=np.float32))
+    second = EmbeddingRows(np.array([[3.0, 4.0], [5.0, 6.0]], dtype=np.float32))
+
+    combined = concat_embeddings([first, second])
+    assert isinstance(combined, EmbeddingRows)
+    assert combined.vectors.shape == (3, 2)
+    assert combined[1] == [3.0, 4.0]
+    assert isinstance(combined[1:], EmbeddingRows)
+    assert list(combined[1:]) == [[3.0, 4.0], [5.0, 6.0]]
+
+    # JSON responses are plain lists and get concatenated as such
+    assert concat_embeddings([first, [[7.0, 8.0]]]) == [[1.0, 2.0], [7.0, 8.0]]
@@ -0,0 +1,36 @@
+import random
+
+from onyx.background.celery.tasks.pruning.streaming_diff import iter_ids_missing_from
+from onyx.background.celery.tasks.pruning.streaming_diff import SortedIdSpool
+
+
+def test_sorted_id_spool_merges_runs() -> None:
+    rng = random.Random(0)
+    ids = [f"doc_{rng.randint(0, 500)}" for _ in range(1000)]
+    ids.append("doc with\nnewline")
+
+    with SortedIdSpool(run_size=64) as spool:
+        for i in range(0, len(ids), 10):
+            spool.add(ids[i : i + 10])
+
+        assert spool.num_runs > 1
+        assert list(spool.iter_sorted_unique()) == sorted(set(ids))
+
+
+def test_sorted_id_spool_without_spilling() -> None:
+    with SortedIdSpool(run_size=100) as spool:
+        spool.add(["b", "a", "b"])
+        assert spool.num_runs == 0
+        assert list(spool.iter_sorted_unique()) == ["a", "b"]
+
+
+def test_iter_ids_missing_from() -> None:
+    rng = random.Random(1)
+    indexed = {f"doc_{rng.randint(0, 300)}" for _ in range(200)}
+    source = {f"doc_{rng.randint(0, 300)}" for _ in range(200)}
+
+    missing = list(iter_ids_missing_from(sorted(indexed), sorted(source)))
+    assert missing == sorted(indexed - source)
+
+    assert list(iter_ids_missing_from(["a", "b"], [])) == ["a", "b"]
+    assert list(iter_ids_missing_from([], ["a"])) == []
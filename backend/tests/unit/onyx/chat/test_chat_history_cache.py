@@ -0,0 +1,260 @@
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+from uuid import UUID
+from uuid import uuid4
+
+import pytest
+
+import onyx.chat.chat_history_cache as chat_history_cache
+import onyx.chat.process_message as process_message
+from onyx.chat.chat_history_cache import CachedChatHistory
+from onyx.chat.chat_history_cache import ChatHistoryCache
+from onyx.chat.models import ChatLoadedFile
+from onyx.chat.models import ChatMessageSimple
+from onyx.chat.process_message import _cache_chat_history
+from onyx.chat.process_message import _load_chat_history
+from onyx.configs.constants import MessageType
+from onyx.file_store.models import ChatFileType
+
+
+def _simple_message(message: str, message_type: MessageType) -> ChatMessageSimple:
+    return ChatMessageSimple(message=message, token_count=1, message_type=message_type)
+
+
+def test_extended_prefix_replaces_the_cached_one() -> None:
+    cache = ChatHistoryCache(max_size=10, max_chars=1000)
+    chat_session_id = uuid4()
+    assert cache.get(chat_session_id) is None
+
+    first_turn = CachedChatHistory(
+        message_ids=[1],
+        converted_messages=[[_simple_message("hi", MessageType.USER)]],
+    )
+    cache.put(chat_session_id, first_turn)
+    cache.put(
+        chat_session_id,
+        first_turn.extend(
+            [2, 3],
+            [
+                [_simple_message("hello", MessageType.ASSISTANT)],
+                [
+                    _simple_message("File: a.txt", MessageType.USER),
+                    _simple_message("summarize", MessageType.USER),
+                ],
+            ],
+        ),
+    )
+
+    cached_history = cache.get(chat_session_id)
+    assert cached_history is not None
+    assert cached_history.last_message_id == 3
+    assert [m.message for m in cached_history.simple_messages] == [
+        "hi",
+        "hello",
+        "File: a.txt",
+        "summarize",
+    ]
+
+    cache.invalidate(chat_session_id)
+    assert cache.get(chat_session_id) is None
+
+
+def test_lru_eviction() -> None:
+    cache = ChatHistoryCache(max_size=2, max_chars=1000)
+    session_a, session_b, session_c = uuid4(), uuid4(), uuid4()
+    history = CachedChatHistory(
+        message_ids=[1],
+        converted_messages=[[_simple_message("hi", MessageType.USER)]],
+    )
+
+    cache.put(session_a, history)
+    cache.put(session_b, history)
+    # touch "a" so that "b" is the least recently used entry
+    assert cache.get(session_a) is not None
+    cache.put(session_c, history)
+
+    assert cache.get(session_a) is not None
+    assert cache.get(session_b) is None
+    assert cache.get(session_c) is not None
+
+
+def test_cache_is_bounded_by_message_chars() -> None:
+    cache = ChatHistoryCache(max_size=10, max_chars=10)
+    session_a, session_b, session_c = uuid4(), uuid4(), uuid4()
+
+    def history(message: str) -> CachedChatHistory:
+        return CachedChatHistory(
+            message_ids=[1],
+            converted_messages=[[_simple_message(message, MessageType.USER)]],
+        )
+
+    cache.put(session_a, history("a" * 4))
+    cache.put(session_b, history("b" * 4))
+    cache.put(session_c, history("c" * 4))
+    assert cache.get(session_a) is None
+    assert cache.get(session_b) is not None
+    assert cache.get(session_c) is not None
+
+    # replacing an entry doesn't count it twice
+    cache.put(session_c, history("c" * 5))
+    assert cache.get(session_b) is not None
+
+    # a single session above the limit isn't cached
+    cache.put(session_a, history("a" * 11))
+    assert cache.get(session_a) is None
+    assert cache.get(session_b) is not None
+
+
+def test_image_contents_are_read_back_from_the_file_store() -> None:
+    image = ChatLoadedFile(
+        file_id="image",
+        content=b"image bytes",
+        file_type=ChatFileType.IMAGE,
+        content_text=None,
+        token_count=10,
+    )
+    user_message = ChatMessageSimple(
+        message="what is this?",
+        token_count=3,
+        message_type=MessageType.USER,
+        image_files=[image],
+    )
+    cached_history = CachedChatHistory(message_ids=[], converted_messages=[]).extend(
+        [1, 2],
+        [[user_message], [_simple_message("a cat", MessageType.ASSISTANT)]],
+    )
+
+    # the cache doesn't hold the bytes of the image
+    cached_image_files = cached_history.simple_messages[0].image_files
+    assert cached_image_files is not None
+    assert cached_image_files[0].content == b""
+    assert user_message.image_files == [image]
+
+    file_store = Mock()
+    file_store.read_file.side_effect = lambda file_id, mode: BytesIO(b"image bytes")
+    with patch.object(
+        chat_history_cache, "get_default_file_store", return_value=file_store
+    ):
+        simple_messages = cached_history.load_simple_messages()
+
+    assert simple_messages == [
+        user_message,
+        _simple_message("a cat", MessageType.ASSISTANT),
+    ]
+    file_store.read_file.assert_called_once_with("image", mode="b")
+
+
+class _FakeChatSession:
+    """The mainline of a chat session, following latest_child_message_id the way
+    get_mainline_chat_messages does."""
+
+    def __init__(self) -> None:
+        # message id -> parent message id
+        self.parents: dict[int, int | None] = {0: None}
+        self.latest_child: dict[int, int] = {}
+        self.loads: list[int | None] = []
+
+    def add(self, message_id: int, parent_id: int) -> None:
+        self.parents[message_id] = parent_id
+        self.latest_child[parent_id] = message_id
+
+    def create_chat_history_chain(
+        self,
+        chat_session_id: UUID,
+        db_session: Any,
+        start_after_message_id: int | None = None,
+    ) -> list[Any]:
+        self.loads.append(start_after_message_id)
+        if start_after_message_id is not None and (
+            start_after_message_id not in self.latest_child
+        ):
+            raise RuntimeError("No messages in Chat Session")
+        message_id = 0 if start_after_message_id is None else start_after_message_id
+        chain = []
+        while message_id in self.latest_child:
+            message_id = self.latest_child[message_id]
+            chain.append(SimpleNamespace(id=message_id))
+        return chain
+
+
+def _run_turn(
+    cache: ChatHistoryCache, fake_session: _FakeChatSession, chat_session_id: UUID
+) -> tuple[CachedChatHistory | None, list[int]]:
+    """Loads the history up to the latest user message, then caches it like
+    stream_chat_message_objects does."""
+    user_message_id = max(fake_session.parents)
+    with (
+        patch.object(process_message, "get_chat_history_cache", return_value=cache),
+        patch.object(
+            process_message,
+            "create_chat_history_chain",
+            fake_session.create_chat_history_chain,
+        ),
+    ):
+        cached_history, chat_history = _load_chat_history(
+            chat_session_id=chat_session_id,
+            user_message_id=user_message_id,
+            db_session=None,  # type: ignore
+        )
+        _cache_chat_history(
+            chat_session_id=chat_session_id,
+            cached_history=cached_history,
+            chat_history=chat_history,
+            converted_messages=[
+                [_simple_message(str(m.id), MessageType.USER)] for m in chat_history
+            ],
+        )
+    return cached_history, [m.id for m in chat_history]
+
+
+@pytest.mark.parametrize(
+    "branch_parent_id,expected_chain",
+    [
+        # edit of the first user message
+        (0, [6]),
+        # regeneration of the first answer, followed by a new user message
+        (1, [1, 6, 7]),
+    ],
+)
+def test_branch_above_cached_tail_invalidates(
+    branch_parent_id: int, expected_chain: list[int]
+) -> None:
+    cache = ChatHistoryCache(max_size=10, max_chars=1000)
+    chat_session_id = uuid4()
+    fake_session = _FakeChatSession()
+
+    fake_session.add(1, 0)
+    fake_session.add(2, 1)
+    fake_session.add(3, 2)
+    cached_history, chain = _run_turn(cache, fake_session, chat_session_id)
+    assert cached_history is None
+    assert chain == [1, 2, 3]
+
+    # the next turn only loads the messages after the cached tail
+    fake_session.add(4, 3)
+    fake_session.add(5, 4)
+    cached_history, chain = _run_turn(cache, fake_session, chat_session_id)
+    assert cached_history is not None
+    assert cached_history.message_ids == [1, 2]
+    assert chain == [3, 4, 5]
+
+    # a new branch above the cached tail (4)
+    fake_session.add(6, branch_parent_id)
+    if branch_parent_id == 1:
+        fake_session.add(7, 6)
+    cached_history, chain = _run_turn(cache, fake_session, chat_session_id)
+
+    assert cached_history is None
+    assert chain == expected_chain
+    # the stale prefix was tried first, then the whole mainline loaded
+    assert fake_session.loads[-2:] == [4, None]
+
+    new_history = cache.get(chat_session_id)
+    if expected_chain[:-1]:
+        assert new_history is not None
+        assert new_history.message_ids == expected_chain[:-1]
+    else:
+        assert new_history is None
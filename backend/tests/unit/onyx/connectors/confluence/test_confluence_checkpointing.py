@@ -4,6 +4,7 @@ from collections.abc import Generator
 from datetime import datetime
 from datetime import timezone
 from typing import Any
+from typing import cast
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
@@ -270,7 +271,11 @@ def test_load_from_checkpoint_with_page_processing_error(
             confluence_connector, 0, end_time
         )
 
-        assert len(outputs) == 1
+        # the checkpoint moves past the full first page of results even though its
+        # last page failed
+        assert len(outputs) == 2
+        assert not outputs[1].items
+        assert not outputs[1].next_checkpoint.has_more
         checkpoint_output = outputs[0]
         assert len(checkpoint_output.items) == 2
 
@@ -289,6 +294,70 @@ def test_load_from_checkpoint_with_page_processing_error(
         )
 
 
+def test_load_from_checkpoint_with_expanded_attachments(
+    confluence_connector: ConfluenceConnector,
+    create_mock_page: Callable[..., dict[str, Any]],
+) -> None:
+    """Attachments expanded in the page listing are used without querying them
+    again, and the documents keep the page order while pages are hydrated
+    concurrently"""
+
+    def _attachment(id: str, labels: list[str] | None = None) -> dict[str, Any]:
+        return {
+            "id": id,
+            "title": f"{id}.txt",
+            "version": {"when": "2023-01-01T12:00:00.000+0000"},
+            "metadata": {
+                "mediaType": "text/plain",
+                "labels": {"results": [{"name": label} for label in labels or []]},
+            },
+            "_links": {
+                "webui": f"/spaces/TEST/pages/{id}",
+                "download": f"/download/attachments/{id}.txt",
+            },
+        }
+
+    mock_page1 = create_mock_page(id="1", title="Page 1")
+    mock_page1["children"] = {
+        "attachment": {
+            "results": [_attachment("a1"), _attachment("a2", labels=["secret"])],
+            "_links": {},
+        }
+    }
+    mock_page2 = create_mock_page(id="2", title="Page 2")
+    mock_page2["children"] = {"attachment": {"results": [], "_links": {}}}
+
+    confluence_client = confluence_connector._confluence_client
+    assert confluence_client is not None, "bad test setup"
+    get_mock = MagicMock()
+    confluence_client.get = get_mock  # type: ignore
+    get_mock.side_effect = [
+        MagicMock(json=lambda: {"results": [mock_page1, mock_page2]}),
+        # only the comments of both pages are queried
+        MagicMock(json=lambda: {"results": []}),
+        MagicMock(json=lambda: {"results": []}),
+    ]
+
+    with patch(
+        "onyx.connectors.confluence.connector.convert_attachment_to_content",
+        return_value=("attachment text", None),
+    ):
+        outputs = load_everything_from_checkpoint_connector(
+            confluence_connector, 0, time.time()
+        )
+
+    assert get_mock.call_count == 3
+    assert len(outputs) == 1
+    items = outputs[0].items
+    assert all(isinstance(item, Document) for item in items)
+    assert [cast(Document, item).semantic_identifier for item in items] == [
+        "Page 1",
+        "a1.txt",
+        "Page 2",
+    ]
+    assert not outputs[0].next_checkpoint.has_more
+
+
 def test_retrieve_all_slim_docs_perm_sync(
     confluence_connector: ConfluenceConnector,
     create_mock_page: Callable[..., dict[str, Any]],
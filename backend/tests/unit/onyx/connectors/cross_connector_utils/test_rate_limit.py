@@ -1,8 +1,19 @@
 import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+from typing import Any
 
+import pytest
+
+import onyx.connectors.cross_connector_utils.rate_limit_wrapper as rlw
+from onyx.configs.constants import DocumentSource
 from onyx.connectors.cross_connector_utils.rate_limit_wrapper import (
     rate_limit_builder,
 )
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 
 def test_rate_limit_basic() -> None:
@@ -27,3 +38,108 @@ def test_rate_limit_basic() -> None:
     assert call_cnt == 3
     assert time_to_finish_non_ratelimited < 1
     assert time_to_finish_ratelimited > 5
+
+
+def test_rate_limit_is_thread_safe() -> None:
+    call_times: list[float] = []
+
+    @rate_limit_builder(max_calls=3, period=0.5)
+    def func() -> None:
+        call_times.append(time.monotonic())
+
+    run_functions_tuples_in_parallel([(func, ()) for _ in range(9)], max_workers=9)
+
+    call_times.sort()
+    assert len(call_times) == 9
+    # never more than max_calls calls within one period (with some slack for the
+    # time between taking a token and recording the call)
+    for earlier, later in zip(call_times, call_times[3:]):
+        assert later - earlier >= 0.45
+
+
+class _FakeTime:
+    def __init__(self) -> None:
+        self._t = 0.0
+
+    def monotonic(self) -> float:
+        return self._t
+
+    def sleep(self, seconds: float) -> None:
+        self._t += float(seconds)
+
+
+def test_functions_wrapped_by_one_limit_do_not_share_tokens(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake_time = _FakeTime()
+    monkeypatch.setattr(rlw, "time", fake_time)
+
+    limit = rate_limit_builder(max_calls=1, period=10)
+
+    @limit
+    def first() -> None:
+        pass
+
+    @limit
+    def second() -> None:
+        pass
+
+    first()
+    second()
+    assert fake_time.monotonic() == 0
+
+    first()
+    assert fake_time.monotonic() >= 10
+
+
+def test_rate_limited_request_honors_retry_after(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake_time = _FakeTime()
+    monkeypatch.setattr(rlw, "time", fake_time)
+
+    responses = [
+        SimpleNamespace(status_code=429, headers={"Retry-After": "7"}),
+        SimpleNamespace(status_code=200, headers={}),
+    ]
+
+    def fake_get(url: str) -> Any:
+        return responses.pop(0)
+
+    rate_limited_get = rlw.wrap_request_to_handle_ratelimiting(fake_get)
+
+    assert rate_limited_get("https://retry-after.example.com/api").status_code == 200
+    assert fake_time.monotonic() >= 7
+
+
+def test_rate_limit_falls_back_to_local_without_redis(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def _no_redis() -> Any:
+        raise ConnectionError("Redis unavailable")
+
+    monkeypatch.setattr(rlw, "get_raw_redis_client", _no_redis)
+    fake_time = _FakeTime()
+    monkeypatch.setattr(rlw, "time", fake_time)
+
+    @rate_limit_builder(max_calls=1, period=10)
+    def func() -> None:
+        pass
+
+    with rlw.rate_limit_scope(DocumentSource.NOTION, credential_id=1):
+        func()
+        func()
+
+    assert fake_time.monotonic() >= 10
+
+
+def test_get_retry_after_seconds() -> None:
+    assert rlw.get_retry_after_seconds({"Retry-After": "12"}, 30) == 12
+    assert rlw.get_retry_after_seconds({}, 30) == 30
+    assert rlw.get_retry_after_seconds({"Retry-After": "soon"}, 30) == 30
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    wait_time = rlw.get_retry_after_seconds(
+        {"Retry-After": format_datetime(retry_at, usegmt=True)}, 30
+    )
+    assert 100 < wait_time <= 120
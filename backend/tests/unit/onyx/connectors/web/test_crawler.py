@@ -0,0 +1,80 @@
+import threading
+import time
+
+from onyx.connectors.web.crawler import CrawlWorkerPool
+from onyx.connectors.web.crawler import get_content_hash
+from onyx.connectors.web.crawler import HostPoliteness
+
+
+def test_content_hash_is_stable() -> None:
+    assert get_content_hash("title", "text") == get_content_hash("title", "text")
+    assert get_content_hash("title", "text") != get_content_hash("titl", "etext")
+    assert get_content_hash(None, "text") != get_content_hash("", "text")
+
+
+def test_worker_pool_runs_cleanup_on_every_thread() -> None:
+    cleaned_up_threads: set[str] = set()
+    lock = threading.Lock()
+
+    def cleanup() -> None:
+        with lock:
+            cleaned_up_threads.add(threading.current_thread().name)
+
+    pool: CrawlWorkerPool[str] = CrawlWorkerPool(
+        num_workers=3, work_fn=str.upper, thread_cleanup_fn=cleanup
+    )
+    try:
+        results: dict[str, str] = {}
+        urls = [f"https://example.com/{i}" for i in range(10)]
+        for url in urls:
+            if not pool.has_capacity:
+                url_done, result = pool.next_result()
+                results[url_done] = result
+            pool.submit(url)
+        while pool.num_pending:
+            url_done, result = pool.next_result()
+            results[url_done] = result
+    finally:
+        pool.shutdown()
+
+    assert results == {url: url.upper() for url in urls}
+    assert len(cleaned_up_threads) == 3
+
+
+def test_host_politeness_limits_concurrency_per_host() -> None:
+    politeness = HostPoliteness(max_concurrent_requests=2, min_interval=0)
+    max_concurrent: dict[str, int] = {}
+    current: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def request(url: str, host: str) -> None:
+        with politeness.slot(url):
+            with lock:
+                current[host] = current.get(host, 0) + 1
+                max_concurrent[host] = max(max_concurrent.get(host, 0), current[host])
+            time.sleep(0.02)
+            with lock:
+                current[host] -= 1
+
+    threads = [
+        threading.Thread(target=request, args=(f"https://{host}/{i}", host))
+        for host in ("a.com", "b.com")
+        for i in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_concurrent == {"a.com": 2, "b.com": 2}
+
+
+def test_host_politeness_spaces_out_requests() -> None:
+    politeness = HostPoliteness(max_concurrent_requests=5, min_interval=0.05)
+
+    start = time.monotonic()
+    for i in range(3):
+        with politeness.slot(f"https://example.com/{i}"):
+            pass
+    # the first request starts right away
+    assert time.monotonic() - start >= 0.1
@@ -0,0 +1,364 @@
+from collections.abc import Generator
+from types import SimpleNamespace
+from typing import Any
+from typing import cast
+from unittest.mock import MagicMock
+
+import pytest
+
+import onyx.connectors.web.connector as web_connector
+import onyx.connectors.web.crawler as web_crawler
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import TextSection
+from onyx.connectors.web.connector import CrawlSettings
+from onyx.connectors.web.connector import ScrapeResult
+from onyx.connectors.web.connector import ScrapeSessionContext
+from onyx.connectors.web.connector import WebConnector
+from onyx.connectors.web.crawler import CrawlStateStore
+from onyx.connectors.web.crawler import get_content_hash
+from onyx.connectors.web.crawler import HostPoliteness
+from onyx.connectors.web.crawler import PageValidators
+from shared_configs.contextvars import INDEX_ATTEMPT_INFO_CONTEXTVAR
+
+BASE_URL = "https://example.com/"
+# two poll windows, the second one starts where the first one ended
+FIRST_WINDOW_END = 1_000_000.0
+SECOND_WINDOW_END = 2_000_000.0
+
+
+class _FakeRedis:
+    """Just enough of redis for CrawlStateStore."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, Any] = {}
+
+    def pipeline(self, transaction: bool = True) -> "_FakeRedis":
+        return self
+
+    def execute(self) -> None:
+        pass
+
+    def expire(self, key: str, seconds: int) -> None:
+        pass
+
+    def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+    def rpush(self, key: str, *values: str) -> None:
+        self.data.setdefault(key, []).extend(v.encode("utf-8") for v in values)
+
+    def lrange(self, key: str, start: int, end: int) -> list[bytes]:
+        return list(self.data.get(key, []))
+
+    def sadd(self, key: str, *values: str) -> None:
+        self.data.setdefault(key, set()).update(v.encode("utf-8") for v in values)
+
+    def smembers(self, key: str) -> set[bytes]:
+        return set(self.data.get(key, set()))
+
+    def hset(self, key: str, mapping: dict[str, str]) -> None:
+        self.data.setdefault(key, {}).update(
+            {k: v.encode("utf-8") for k, v in mapping.items()}
+        )
+
+    def hget(self, key: str, field: str) -> bytes | None:
+        return self.data.get(key, {}).get(field)
+
+    # shadows the builtin in the class body, so it comes last
+    def set(self, key: str, value: str) -> None:
+        self.data[key] = value.encode("utf-8")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> _FakeRedis:
+    redis = _FakeRedis()
+    monkeypatch.setattr(web_crawler, "get_raw_redis_client", lambda: redis)
+    return redis
+
+
+@pytest.fixture
+def index_attempt() -> Generator[None, None, None]:
+    token = INDEX_ATTEMPT_INFO_CONTEXTVAR.set((1, 1))
+    yield
+    INDEX_ATTEMPT_INFO_CONTEXTVAR.reset(token)
+
+
+def _page_result(url: str, links: set[str]) -> ScrapeResult:
+    result = ScrapeResult(url)
+    result.links = links
+    result.content_hash = get_content_hash(url, url)
+    result.etag = f'"{url}"'
+    result.doc = Document(
+        id=url,
+        sections=[TextSection(link=url, text=url)],
+        source=DocumentSource.WEB,
+        semantic_identifier=url,
+        metadata={},
+    )
+    return result
+
+
+def _make_connector(
+    monkeypatch: pytest.MonkeyPatch, site: dict[str, set[str]]
+) -> tuple[WebConnector, list[str]]:
+    """A recursive connector crawling site (url -> links on the page), one page
+    per batch. Returns the connector and the list of scraped urls."""
+    monkeypatch.setattr(web_connector, "check_internet_connection", lambda url: None)
+    monkeypatch.setattr(web_connector, "get_oauth_headers", lambda: {})
+
+    connector = WebConnector(base_url=BASE_URL, batch_size=1)
+    connector.num_workers = 1
+    scraped: list[str] = []
+
+    def scrape(url: str, crawl: CrawlSettings) -> ScrapeResult:
+        scraped.append(url)
+        return _page_result(url, site[url])
+
+    monkeypatch.setattr(connector, "_scrape_with_retries", scrape)
+    return connector, scraped
+
+
+def _start_crawl(connector: WebConnector) -> Generator[list[Document], None, None]:
+    return cast(
+        Generator[list[Document], None, None],
+        connector.poll_source(0, FIRST_WINDOW_END),
+    )
+
+
+def _doc_ids(batches: list[list[Document]]) -> set[str]:
+    return {doc.id for batch in batches for doc in batch}
+
+
+SITE = {
+    BASE_URL: {f"{BASE_URL}a", f"{BASE_URL}b"},
+    f"{BASE_URL}a": set(),
+    f"{BASE_URL}b": set(),
+}
+
+
+def test_state_store_round_trip(fake_redis: _FakeRedis) -> None:
+    store = CrawlStateStore(crawl_id="1:recursive:x", window_end=FIRST_WINDOW_END)
+    assert store.load() is None
+
+    store.save(to_visit=["u2", "u3"], newly_visited=["u1"], new_content_hashes=["h"])
+    store.save(to_visit=["u3"], newly_visited=["u2"], new_content_hashes=[])
+
+    state = store.load()
+    assert state is not None
+    # the frontier is replaced, visited pages and hashes accumulate
+    assert state.to_visit == ["u3"]
+    assert state.visited == {"u1", "u2"}
+    assert state.content_hashes == {"h"}
+
+    # a crawl of another poll window or another cc pair starts over
+    assert (
+        CrawlStateStore(crawl_id="1:recursive:x", window_end=SECOND_WINDOW_END).load()
+        is None
+    )
+    assert (
+        CrawlStateStore(crawl_id="2:recursive:x", window_end=FIRST_WINDOW_END).load()
+        is None
+    )
+
+    store.clear()
+    assert store.load() is None
+
+
+def test_state_store_validators_survive_clear(fake_redis: _FakeRedis) -> None:
+    store = CrawlStateStore(crawl_id="1:recursive:x", window_end=FIRST_WINDOW_END)
+    validators = PageValidators(etag='"v1"', window_end=FIRST_WINDOW_END, links=["l"])
+    store.set_validators({"u1": validators})
+    store.clear()
+
+    assert store.get_validators("u1") == validators
+    assert store.get_validators("u2") is None
+
+
+def test_handle_scrape_result_skips_duplicates_and_redirects() -> None:
+    connector = WebConnector(base_url=BASE_URL)
+    session_ctx = ScrapeSessionContext(BASE_URL, [])
+    session_ctx.visited_links = {"https://example.com/a", "https://example.com/b"}
+
+    page = _page_result("https://example.com/a", {"https://example.com/c"})
+    connector._handle_scrape_result(
+        session_ctx, "https://example.com/a", page, FIRST_WINDOW_END
+    )
+    assert session_ctx.to_visit == ["https://example.com/c"]
+    assert [doc.id for doc in session_ctx.doc_batch] == ["https://example.com/a"]
+    assert session_ctx.pending_validators["https://example.com/a"] == PageValidators(
+        etag='"https://example.com/a"',
+        window_end=FIRST_WINDOW_END,
+        links=["https://example.com/c"],
+    )
+
+    # same title and content under another url
+    duplicate = _page_result("https://example.com/a", set())
+    duplicate.url = "https://example.com/a2"
+    connector._handle_scrape_result(
+        session_ctx, "https://example.com/a2", duplicate, FIRST_WINDOW_END
+    )
+    assert len(session_ctx.doc_batch) == 1
+
+    # redirect to a page that was already indexed
+    redirected = _page_result("https://example.com/a", set())
+    connector._handle_scrape_result(
+        session_ctx, "https://example.com/old", redirected, FIRST_WINDOW_END
+    )
+    assert len(session_ctx.doc_batch) == 1
+    assert set(session_ctx.newly_visited) == {
+        "https://example.com/a",
+        "https://example.com/a2",
+        "https://example.com/old",
+    }
+
+
+def test_handle_unchanged_result_keeps_links_and_validators() -> None:
+    connector = WebConnector(base_url=BASE_URL)
+    session_ctx = ScrapeSessionContext(BASE_URL, [])
+
+    result = ScrapeResult("https://example.com/a")
+    result.unchanged = True
+    result.links = {"https://example.com/c"}
+    result.validators = PageValidators(etag='"v1"', window_end=FIRST_WINDOW_END)
+    connector._handle_scrape_result(
+        session_ctx, "https://example.com/a", result, SECOND_WINDOW_END
+    )
+
+    assert session_ctx.doc_batch == []
+    assert session_ctx.num_unchanged == 1
+    assert session_ctx.to_visit == ["https://example.com/c"]
+    # refreshed, so the next poll can skip the page again
+    assert session_ctx.pending_validators["https://example.com/a"] == PageValidators(
+        etag='"v1"', window_end=SECOND_WINDOW_END
+    )
+
+
+def _http_connector(monkeypatch: pytest.MonkeyPatch, response: Any) -> MagicMock:
+    http_session = MagicMock()
+    http_session.get.return_value = response
+    monkeypatch.setattr(
+        WebConnector,
+        "_get_worker_session",
+        lambda self: SimpleNamespace(http_session=http_session),
+    )
+    monkeypatch.setattr(
+        WebConnector,
+        "_scrape_with_playwright",
+        lambda self, url, crawl: ScrapeResult(url),
+    )
+    return http_session
+
+
+def _crawl_settings(store: CrawlStateStore, start: float) -> CrawlSettings:
+    return CrawlSettings(
+        base_url=BASE_URL,
+        state_store=store,
+        politeness=HostPoliteness(max_concurrent_requests=1, min_interval=0),
+        extra_headers={},
+        start=start,
+    )
+
+
+def test_unchanged_page_is_fetched_conditionally(
+    monkeypatch: pytest.MonkeyPatch, fake_redis: _FakeRedis
+) -> None:
+    url = "https://example.com/a"
+    response = MagicMock(url=url, status_code=304)
+    http_session = _http_connector(monkeypatch, response)
+
+    store = CrawlStateStore(crawl_id="1:recursive:x", window_end=SECOND_WINDOW_END)
+    validators = PageValidators(
+        etag='"v1"',
+        last_modified="Wed, 01 Jan 2025 00:00:00 GMT",
+        window_end=FIRST_WINDOW_END,
+        links=["https://example.com/c"],
+    )
+    store.set_validators({url: validators})
+
+    connector = WebConnector(base_url=BASE_URL)
+    result = connector._scrape_with_retries(
+        url, _crawl_settings(store, start=FIRST_WINDOW_END)
+    )
+
+    headers = http_session.get.call_args.kwargs["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert result.unchanged
+    assert result.doc is None
+    assert result.links == {"https://example.com/c"}
+    assert result.validators == validators
+
+
+def test_page_indexed_after_window_start_is_fetched_in_full(
+    monkeypatch: pytest.MonkeyPatch, fake_redis: _FakeRedis
+) -> None:
+    url = "https://example.com/a"
+    http_session = _http_connector(monkeypatch, MagicMock(url=url, ok=False))
+
+    store = CrawlStateStore(crawl_id="1:recursive:x", window_end=SECOND_WINDOW_END)
+    # indexed by a crawl that may not have completed before this window started
+    store.set_validators(
+        {url: PageValidators(etag='"v1"', window_end=SECOND_WINDOW_END)}
+    )
+
+    connector = WebConnector(base_url=BASE_URL)
+    result = connector._scrape_with_retries(
+        url, _crawl_settings(store, start=FIRST_WINDOW_END)
+    )
+
+    assert "If-None-Match" not in http_session.get.call_args.kwargs["headers"]
+    assert not result.unchanged
+
+
+def test_interrupted_crawl_resumes_from_frontier(
+    monkeypatch: pytest.MonkeyPatch, fake_redis: _FakeRedis, index_attempt: None
+) -> None:
+    connector, _ = _make_connector(monkeypatch, SITE)
+    crawl = _start_crawl(connector)
+    first_batches = [next(crawl), next(crawl)]
+    # the worker restarts while the second batch is being indexed
+    crawl.close()
+
+    assert _doc_ids(first_batches[:1]) == {BASE_URL}
+
+    connector, scraped = _make_connector(monkeypatch, SITE)
+    resumed_batches = list(connector.poll_source(0, FIRST_WINDOW_END))
+
+    # the base page was handed off and isn't scraped again, the second batch was
+    # not acknowledged so its page is
+    assert BASE_URL not in scraped
+    assert _doc_ids(resumed_batches) == {f"{BASE_URL}a", f"{BASE_URL}b"}
+
+    # finished crawls don't leave a frontier behind
+    connector, scraped = _make_connector(monkeypatch, SITE)
+    list(connector.poll_source(0, FIRST_WINDOW_END))
+    assert set(scraped) == set(SITE)
+
+
+def test_crawl_state_is_not_shared_between_cc_pairs(
+    monkeypatch: pytest.MonkeyPatch, fake_redis: _FakeRedis
+) -> None:
+    token = INDEX_ATTEMPT_INFO_CONTEXTVAR.set((1, 1))
+    try:
+        connector, _ = _make_connector(monkeypatch, SITE)
+        crawl = _start_crawl(connector)
+        next(crawl), next(crawl)
+        crawl.close()
+    finally:
+        INDEX_ATTEMPT_INFO_CONTEXTVAR.reset(token)
+
+    # another connector crawling the same site in the same window
+    token = INDEX_ATTEMPT_INFO_CONTEXTVAR.set((2, 7))
+    try:
+        connector, scraped = _make_connector(monkeypatch, SITE)
+        batches = list(connector.poll_source(0, FIRST_WINDOW_END))
+    finally:
+        INDEX_ATTEMPT_INFO_CONTEXTVAR.reset(token)
+
+    assert set(scraped) == set(SITE)
+    assert _doc_ids(batches) == set(SITE)
@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+from onyx.context.search.query_embedding_cache import QueryEmbeddingCache
+
+
+def _search_settings(settings_id: int, model_name: str = "model") -> MagicMock:
+    search_settings = MagicMock()
+    search_settings.id = settings_id
+    search_settings.model_name = model_name
+    search_settings.provider_type = None
+    search_settings.query_prefix = "query: "
+    search_settings.normalize = True
+    search_settings.reduced_dimension = None
+    return search_settings
+
+
+def test_lru_eviction() -> None:
+    cache = QueryEmbeddingCache(max_size=2)
+    settings = _search_settings(1)
+    key_a, key_b, key_c = (cache.build_key(settings, q) for q in ("a", "b", "c"))
+
+    cache.put_many({key_a: [1.0], key_b: [2.0]})
+    # touch "a" so that "b" is the least recently used entry
+    assert cache.get_many([key_a]) == {key_a: [1.0]}
+    cache.put_many({key_c: [3.0]})
+
+    assert cache.get_many([key_a, key_b, key_c]) == {key_a: [1.0], key_c: [3.0]}
+
+
+def test_search_settings_change_drops_entries() -> None:
+    cache = QueryEmbeddingCache(max_size=10)
+    old_settings = _search_settings(1)
+    new_settings = _search_settings(2, model_name="new-model")
+
+    cache.observe_search_settings(old_settings)
+    old_key = cache.build_key(old_settings, "query")
+    cache.put_many({old_key: [1.0]})
+
+    new_key = cache.build_key(new_settings, "query")
+    assert new_key != old_key
+
+    cache.observe_search_settings(new_settings)
+    assert cache.get_many([old_key]) == {}
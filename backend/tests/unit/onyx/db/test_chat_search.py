@@ -0,0 +1,41 @@
+from datetime import datetime
+from datetime import timezone
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from onyx.db.chat_search import ChatSearchCursor
+from onyx.db.chat_search import decode_chat_search_cursor
+from onyx.db.chat_search import encode_chat_search_cursor
+from onyx.db.chat_search import search_chat_sessions
+
+
+def test_cursor_round_trip() -> None:
+    cursor = ChatSearchCursor(
+        time_created=datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        id=uuid4(),
+        rank=0.0607927,
+    )
+    assert decode_chat_search_cursor(encode_chat_search_cursor(cursor)) == cursor
+
+
+@pytest.mark.parametrize("raw_cursor", ["not a cursor", "e30=", "////"])
+def test_invalid_cursor_raises_value_error(raw_cursor: str) -> None:
+    with pytest.raises(ValueError):
+        decode_chat_search_cursor(raw_cursor)
+
+
+def test_recent_sessions_use_keyset_instead_of_offset() -> None:
+    db_session = MagicMock()
+    cursor = encode_chat_search_cursor(
+        ChatSearchCursor(time_created=datetime.now(tz=timezone.utc), id=uuid4())
+    )
+
+    search_chat_sessions(user_id=uuid4(), db_session=db_session, cursor=cursor)
+
+    (stmt,), _ = db_session.execute.call_args
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(chat_session.time_created, chat_session.id) <" in sql
+    assert "OFFSET" not in sql
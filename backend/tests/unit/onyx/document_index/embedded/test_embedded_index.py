@@ -0,0 +1,281 @@
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+import onyx.document_index.embedded.index as embedded_index
+from onyx.access.models import DocumentAccess
+from onyx.configs.constants import DocumentSource
+from onyx.configs.constants import INDEX_SEPARATOR
+from onyx.connectors.models import BasicExpertInfo
+from onyx.connectors.models import Document
+from onyx.connectors.models import TextSection
+from onyx.context.search.models import IndexFilters
+from onyx.document_index.embedded.bitmap import BitmapIndex
+from onyx.document_index.embedded.index import EmbeddedIndex
+from onyx.document_index.embedded.store import EmbeddedChunk
+from onyx.document_index.interfaces import DocumentInsertionRecord
+from onyx.document_index.interfaces import IndexBatchParams
+from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
+from onyx.document_index.interfaces import UpdateRequest
+from onyx.document_index.interfaces import VespaChunkRequest
+from onyx.document_index.interfaces import VespaDocumentFields
+from onyx.document_index.interfaces import VespaDocumentUserFields
+from onyx.indexing.models import ChunkEmbedding
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+
+_TENANT_ID = "public"
+_UPDATED_AT = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def index(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> EmbeddedIndex:
+    monkeypatch.setattr(embedded_index, "EMBEDDED_DOCUMENT_INDEX_DIR", str(tmp_path))
+    return EmbeddedIndex(
+        index_name="test_index",
+        secondary_index_name=None,
+        large_chunks_enabled=False,
+        secondary_large_chunks_enabled=None,
+    )
+
+
+def _access(user_emails: list[str | None], is_public: bool) -> DocumentAccess:
+    return DocumentAccess.build(
+        user_emails=user_emails,
+        user_groups=[],
+        external_user_emails=[],
+        external_user_group_ids=[],
+        is_public=is_public,
+    )
+
+
+def _index_chunk(document_id: str, chunk_id: int) -> DocMetadataAwareIndexChunk:
+    document = Document(
+        id=document_id,
+        sections=[TextSection(text="cats purr", link="https://cats.com")],
+        source=DocumentSource.WEB,
+        semantic_identifier=f"{document_id} semantic id",
+        title=f"{document_id}\ntitle",
+        metadata={"animal": ["cat", "feline"], "color": "black"},
+        doc_updated_at=_UPDATED_AT,
+        primary_owners=[BasicExpertInfo(email="owner@cats.com")],
+    )
+    return DocMetadataAwareIndexChunk(
+        chunk_id=chunk_id,
+        blurb="cats purr",
+        content="cats purr",
+        source_links={0: "https://cats.com"},
+        image_file_id=None,
+        section_continuation=False,
+        source_document=document,
+        title_prefix="title\n",
+        metadata_suffix_semantic="",
+        metadata_suffix_keyword=" black cat",
+        contextual_rag_reserved_tokens=0,
+        doc_summary="summary ",
+        chunk_context=" context",
+        mini_chunk_texts=None,
+        large_chunk_id=None,
+        embeddings=ChunkEmbedding(
+            full_embedding=[1.0, 0.0, 0.0, 0.0], mini_chunk_embeddings=[]
+        ),
+        title_embedding=[0.0, 1.0, 0.0, 0.0],
+        tenant_id=_TENANT_ID,
+        access=_access(["a@cats.com"], is_public=False),
+        document_sets={"b_set", "a_set"},
+        user_project=[7],
+        boost=2,
+        aggregated_chunk_boost_factor=0.5,
+    )
+
+
+def _index_chunks(
+    index: EmbeddedIndex, chunks: list[DocMetadataAwareIndexChunk]
+) -> set[DocumentInsertionRecord]:
+    return index.index(
+        chunks,
+        IndexBatchParams(
+            doc_id_to_previous_chunk_cnt={},
+            doc_id_to_new_chunk_cnt={},
+            tenant_id=_TENANT_ID,
+            large_chunks_enabled=False,
+        ),
+    )
+
+
+def _stored_chunks(index: EmbeddedIndex, document_id: str) -> list[EmbeddedChunk]:
+    hits = index._store.get_chunks(
+        [VespaChunkRequest(document_id=document_id)],
+        IndexFilters(access_control_list=None),
+    )
+    return [hit.chunk for hit in hits]
+
+
+def test_index_converts_chunks(index: EmbeddedIndex) -> None:
+    records = _index_chunks(index, [_index_chunk("cats", 0), _index_chunk("cats", 1)])
+    assert records == {
+        DocumentInsertionRecord(document_id="cats", already_existed=False)
+    }
+
+    chunk = _stored_chunks(index, "cats")[0]
+    assert chunk.tenant_id == _TENANT_ID
+    assert chunk.chunk_id == 0
+    # title prefix, contextual RAG texts and metadata suffix are keyword searchable
+    assert chunk.keyword_content == "title\nsummary cats purr context black cat"
+    assert chunk.title == "cats title"
+    assert chunk.has_title_embedding
+    assert chunk.semantic_identifier == "cats semantic id"
+    assert chunk.source_type == DocumentSource.WEB.value
+    assert sorted(chunk.metadata_list) == sorted(
+        [
+            f"animal{INDEX_SEPARATOR}cat",
+            f"animal{INDEX_SEPARATOR}feline",
+            f"color{INDEX_SEPARATOR}black",
+        ]
+    )
+    assert chunk.doc_updated_at == _UPDATED_AT
+    assert chunk.primary_owners == ["owner@cats.com"]
+    assert chunk.access_control_list == ["user_email:a@cats.com"]
+    assert chunk.document_sets == ["a_set", "b_set"]
+    assert chunk.user_projects == [7]
+    assert chunk.boost == 2
+    assert chunk.aggregated_chunk_boost_factor == 0.5
+    assert not chunk.hidden
+
+    inference_chunks = index.id_based_retrieval(
+        [VespaChunkRequest(document_id="cats")],
+        IndexFilters(access_control_list=["user_email:a@cats.com"]),
+    )
+    assert [c.chunk_id for c in inference_chunks] == [0, 1]
+    assert inference_chunks[0].metadata == {
+        "animal": ["cat", "feline"],
+        "color": "black",
+    }
+    assert inference_chunks[0].updated_at == _UPDATED_AT
+
+    # reindexing a document reports that it existed
+    records = _index_chunks(index, [_index_chunk("cats", 0)])
+    assert records == {
+        DocumentInsertionRecord(document_id="cats", already_existed=True)
+    }
+    assert len(_stored_chunks(index, "cats")) == 1
+
+
+def test_update_single_maps_fields(index: EmbeddedIndex) -> None:
+    _index_chunks(index, [_index_chunk("cats", 0), _index_chunk("dogs", 0)])
+
+    index.update_single(
+        "cats",
+        tenant_id=_TENANT_ID,
+        chunk_count=None,
+        fields=VespaDocumentFields(
+            access=_access(["b@cats.com"], is_public=True),
+            document_sets={"z_set", "c_set"},
+            boost=-1.0,
+            hidden=True,
+            aggregated_chunk_boost_factor=0.25,
+        ),
+        user_fields=VespaDocumentUserFields(user_projects=[1, 2]),
+    )
+
+    chunk = _stored_chunks(index, "cats")[0]
+    assert chunk.access_control_list == ["PUBLIC", "user_email:b@cats.com"]
+    assert chunk.document_sets == ["c_set", "z_set"]
+    assert chunk.boost == -1
+    assert chunk.hidden
+    assert chunk.aggregated_chunk_boost_factor == 0.25
+    assert chunk.user_projects == [1, 2]
+    # other documents are left alone
+    assert _stored_chunks(index, "dogs")[0].document_sets == ["a_set", "b_set"]
+
+    # fields that are None are unchanged
+    index.update_single(
+        "cats",
+        tenant_id=_TENANT_ID,
+        chunk_count=None,
+        fields=None,
+        user_fields=VespaDocumentUserFields(user_projects=[3]),
+    )
+    chunk = _stored_chunks(index, "cats")[0]
+    assert chunk.user_projects == [3]
+    assert chunk.document_sets == ["c_set", "z_set"]
+    assert chunk.hidden
+
+    # the filters see the new values
+    assert index.random_retrieval(IndexFilters(access_control_list=None)) != []
+    assert not index.random_retrieval(
+        IndexFilters(access_control_list=None, document_set=["c_set"])
+    )
+    assert index.admin_retrieval(
+        "cats", IndexFilters(access_control_list=["PUBLIC"], project_id=3)
+    )
+
+    with pytest.raises(ValueError):
+        index.update_single(
+            "cats",
+            tenant_id=_TENANT_ID,
+            chunk_count=None,
+            fields=None,
+            user_fields=None,
+        )
+
+
+def test_update_maps_request_fields(index: EmbeddedIndex) -> None:
+    _index_chunks(index, [_index_chunk("cats", 0), _index_chunk("dogs", 0)])
+
+    index.update(
+        [
+            UpdateRequest(
+                minimal_document_indexing_info=[
+                    MinimalDocumentIndexingInfo(doc_id="cats", chunk_start_index=0),
+                    MinimalDocumentIndexingInfo(doc_id="dogs", chunk_start_index=0),
+                ],
+                document_sets={"new_set"},
+                boost=3.0,
+            )
+        ],
+        tenant_id=_TENANT_ID,
+    )
+
+    for document_id in ("cats", "dogs"):
+        chunk = _stored_chunks(index, document_id)[0]
+        assert chunk.document_sets == ["new_set"]
+        assert chunk.boost == 3
+        # not part of the request
+        assert chunk.access_control_list == ["user_email:a@cats.com"]
+        assert not chunk.hidden
+        assert chunk.aggregated_chunk_boost_factor == 0.5
+
+
+def test_user_file_filter(index: EmbeddedIndex) -> None:
+    user_file_id = uuid4()
+    _index_chunks(index, [_index_chunk(str(user_file_id), 0), _index_chunk("cats", 0)])
+
+    hits = index.admin_retrieval(
+        "cats", IndexFilters(access_control_list=None, user_file_ids=[user_file_id])
+    )
+    assert [hit.document_id for hit in hits] == [str(user_file_id)]
+    assert not index.admin_retrieval(
+        "cats", IndexFilters(access_control_list=None, user_file_ids=[uuid4()])
+    )
+
+
+def test_bitmap_index_add_and_remove() -> None:
+    bitmap_index = BitmapIndex()
+    bitmap_index.add(3, {"a", "b"})
+    bitmap_index.add(200, {"a"})
+    # adding a slot twice doesn't count it twice
+    bitmap_index.add(200, {"a"})
+
+    assert np.flatnonzero(bitmap_index.get("a", 256)).tolist() == [3, 200]
+    assert np.flatnonzero(bitmap_index.any_of(["b", "c"], 256)).tolist() == [3]
+    # the mask always has the requested size
+    assert len(bitmap_index.get("a", 10)) == 10
+
+    bitmap_index.remove(200, {"a"})
+    bitmap_index.remove(3, {"a", "b"})
+    assert not bitmap_index.get("a", 256).any()
+    assert bitmap_index._bitmaps == {}
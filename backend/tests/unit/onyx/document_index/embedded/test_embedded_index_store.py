@@ -0,0 +1,195 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.context.search.models import IndexFilters
+from onyx.document_index.embedded.store import EmbeddedChunk
+from onyx.document_index.embedded.store import EmbeddedChunkUpdate
+from onyx.document_index.embedded.store import EmbeddedIndexStore
+from onyx.document_index.interfaces import VespaChunkRequest
+
+_DIM = 4
+
+
+def _chunk(
+    document_id: str,
+    chunk_id: int,
+    content: str,
+    acl: list[str] | None = None,
+    document_sets: list[str] | None = None,
+) -> EmbeddedChunk:
+    return EmbeddedChunk(
+        tenant_id="public",
+        document_id=document_id,
+        chunk_id=chunk_id,
+        large_chunk_reference_ids=[],
+        blurb=content[:20],
+        content=content,
+        keyword_content=content,
+        title=document_id,
+        has_title_embedding=False,
+        semantic_identifier=document_id,
+        source_type=DocumentSource.FILE.value,
+        source_links=None,
+        section_continuation=False,
+        image_file_id=None,
+        metadata={},
+        metadata_list=[],
+        doc_summary="",
+        chunk_context="",
+        doc_updated_at=None,
+        primary_owners=None,
+        secondary_owners=None,
+        access_control_list=acl if acl is not None else ["PUBLIC"],
+        document_sets=document_sets or [],
+        user_projects=[],
+        boost=0,
+        hidden=False,
+        aggregated_chunk_boost_factor=None,
+    )
+
+
+def _vector(axis: int) -> list[float]:
+    return [1.0 if i == axis else 0.0 for i in range(_DIM)]
+
+
+def _filters(
+    access_control_list: list[str] | None = None,
+    document_set: list[str] | None = None,
+) -> IndexFilters:
+    return IndexFilters(
+        access_control_list=access_control_list, document_set=document_set
+    )
+
+
+def _search(store: EmbeddedIndexStore, query: str, axis: int) -> list[str]:
+    hits = store.hybrid_search(
+        query=query,
+        query_vector=_vector(axis),
+        filters=_filters(),
+        hybrid_alpha=0.5,
+        title_content_ratio=0.1,
+        decay_factor=0.5,
+        num_to_retrieve=10,
+        offset=0,
+        target_hits=100,
+    )
+    return [f"{hit.chunk.document_id}:{hit.chunk.chunk_id}" for hit in hits]
+
+
+def _new_store(directory: Path) -> EmbeddedIndexStore:
+    store = EmbeddedIndexStore(str(directory), ivf_nprobe=4)
+    store.ensure_dim(_DIM)
+    return store
+
+
+def test_index_search_update_and_delete(tmp_path: Path) -> None:
+    store = _new_store(tmp_path)
+    already_existed = store.replace_documents(
+        [
+            (_chunk("cats", 0, "cats purr and sleep"), _vector(0), None),
+            (_chunk("cats", 1, "cats chase mice"), _vector(0), None),
+            (
+                _chunk("dogs", 0, "dogs bark", acl=["user_email:a@b.c"]),
+                _vector(1),
+                None,
+            ),
+        ]
+    )
+    assert already_existed == {"cats": False, "dogs": False}
+
+    assert _search(store, "mice", axis=0)[0] == "cats:1"
+    assert _search(store, "bark", axis=1)[0] == "dogs:0"
+
+    acl_hits = store.admin_search(
+        "cats dogs", _filters(access_control_list=["PUBLIC"]), 10, 0
+    )
+    assert {hit.chunk.document_id for hit in acl_hits} == {"cats"}
+
+    store.update_document(
+        "cats", "public", EmbeddedChunkUpdate(hidden=True, document_sets=["pets"])
+    )
+    assert "cats:0" not in _search(store, "cats", axis=0)
+    # the admin search still finds hidden documents
+    set_hits = store.admin_search("cats", _filters(document_set=["pets"]), 10, 0)
+    assert {hit.chunk.document_id for hit in set_hits} == {"cats"}
+
+    # reindexing replaces every chunk of the document
+    already_existed = store.replace_documents(
+        [(_chunk("cats", 0, "cats only"), _vector(0), None)]
+    )
+    assert already_existed == {"cats": True}
+    chunks = store.get_chunks([VespaChunkRequest(document_id="cats")], _filters())
+    assert [hit.chunk.content for hit in chunks] == ["cats only"]
+
+    assert store.delete_document("dogs", "public") == 1
+    assert store.delete_document("dogs", "public") == 0
+    assert _search(store, "bark", axis=1) == ["cats:0"]
+
+
+def test_writes_are_visible_to_other_stores_on_the_same_directory(
+    tmp_path: Path,
+) -> None:
+    writer = _new_store(tmp_path)
+    reader = _new_store(tmp_path)
+
+    # enough chunks to grow the vector files past their initial size
+    writer.replace_documents(
+        [
+            (_chunk(f"doc_{i}", 0, f"document number {i}"), _vector(i % _DIM), None)
+            for i in range(1500)
+        ]
+    )
+    chunks = reader.get_chunks([VespaChunkRequest(document_id="doc_1234")], _filters())
+    assert [hit.chunk.content for hit in chunks] == ["document number 1234"]
+
+    writer.delete_document("doc_1234", "public")
+    assert not reader.get_chunks(
+        [VespaChunkRequest(document_id="doc_1234")], _filters()
+    )
+    # and everything survives a restart
+    assert len(_new_store(tmp_path).random_chunks(_filters(), 2000)) == 1499
+
+
+def test_failed_replace_keeps_the_old_vectors(tmp_path: Path) -> None:
+    store = _new_store(tmp_path)
+    store.replace_documents([(_chunk("cats", 0, "cats purr"), _vector(0), None)])
+    reader = _new_store(tmp_path)
+    assert _search(reader, "purr", axis=0) == ["cats:0"]
+
+    # the new vectors are written, then the transaction fails before committing,
+    # with enough chunks to grow the vector files
+    with (
+        patch.object(store, "_prune_changelog", side_effect=RuntimeError("boom")),
+        pytest.raises(RuntimeError),
+    ):
+        store.replace_documents(
+            [
+                (_chunk("cats", i, "cats purr loudly"), _vector(1), None)
+                for i in range(1500)
+            ]
+        )
+
+    # the old chunk still has its own vector, in this process and the others
+    for searched_store in (store, reader, _new_store(tmp_path)):
+        (hit,) = searched_store.get_chunks(
+            [VespaChunkRequest(document_id="cats")], _filters()
+        )
+        assert hit.chunk.content == "cats purr"
+        assert searched_store._content_vectors is not None
+        (slot,) = searched_store._document_slots["cats"]
+        assert searched_store._content_vectors.cosine_similarities(
+            np.array([slot]), np.array(_vector(0), dtype=np.float32)
+        ) == pytest.approx([1.0])
+
+    # the capacity grown by the failed transaction is stored by the next one
+    store.replace_documents(
+        [
+            (_chunk(f"doc_{i}", 0, f"document {i}"), _vector(1), None)
+            for i in range(1500)
+        ]
+    )
+    assert len(_new_store(tmp_path).random_chunks(_filters(), 2000)) == 1501
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from collections.abc import Callable
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from onyx.document_index.vespa.feed_client import feed_vespa_documents
+from onyx.document_index.vespa.feed_client import get_retry_delay
+from onyx.document_index.vespa.feed_client import INDEXING_MAX_RETRIES
+from onyx.document_index.vespa.feed_client import VespaFeedOperation
+from onyx.document_index.vespa.indexing_utils import (
+    get_document_chunk_counts_via_visit,
+)
+
+
+def _operations(count: int) -> list[VespaFeedOperation]:
+    return [
+        VespaFeedOperation(
+            document_id=f"doc_{i}",
+            url=f"http://vespa/document/v1/default/test_index/docid/{i}",
+            fields={"chunk_id": i},
+        )
+        for i in range(count)
+    ]
+
+
+def _patch_async_client(handler: Callable[..., Any]) -> Any:
+    return patch(
+        "onyx.document_index.vespa.feed_client.get_vespa_async_http_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff() -> Iterator[None]:
+    with patch("onyx.document_index.vespa.feed_client.INDEXING_BASE_DELAY", 0.0):
+        yield
+
+
+def test_feed_posts_all_operations() -> None:
+    received: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(json.loads(request.content))
+        return httpx.Response(200, json={})
+
+    with _patch_async_client(handler):
+        stats = feed_vespa_documents(_operations(20), max_in_flight=4)
+
+    assert sorted(body["fields"]["chunk_id"] for body in received) == list(range(20))
+    assert stats.num_operations == 20
+    assert stats.num_retries == 0
+    assert stats.latency_p50_ms <= stats.latency_p95_ms <= stats.latency_p99_ms
+
+
+def test_feed_bounds_requests_in_flight() -> None:
+    in_flight = 0
+    max_seen = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_seen
+        in_flight += 1
+        max_seen = max(max_seen, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={})
+
+    with _patch_async_client(handler):
+        feed_vespa_documents(_operations(30), max_in_flight=5)
+
+    assert max_seen == 5
+
+
+def test_feed_retries_failed_requests() -> None:
+    attempts: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts[request.url.path] = attempts.get(request.url.path, 0) + 1
+        if attempts[request.url.path] == 1:
+            return httpx.Response(503, json={})
+        return httpx.Response(200, json={})
+
+    with _patch_async_client(handler):
+        stats = feed_vespa_documents(_operations(3), max_in_flight=2)
+
+    assert stats.num_operations == 3
+    assert stats.num_retries == 3
+
+
+def test_feed_raises_on_non_retryable_error() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/2"):
+            return httpx.Response(400, json={"message": "bad field"})
+        return httpx.Response(200, json={})
+
+    with _patch_async_client(handler), pytest.raises(httpx.HTTPStatusError):
+        feed_vespa_documents(_operations(5), max_in_flight=1)
+
+
+def test_get_retry_delay() -> None:
+    assert get_retry_delay(0, 400) is None
+    assert get_retry_delay(0, 507) is None
+    assert get_retry_delay(0, 429) is not None
+    assert get_retry_delay(0, None) is not None
+    assert get_retry_delay(INDEXING_MAX_RETRIES - 1, 429) is None
+
+
+def test_get_document_chunk_counts_via_visit_follows_continuation() -> None:
+    pages = [
+        {
+            "documents": [
+                {"fields": {"document_id": "a", "chunk_id": 0}},
+                {"fields": {"document_id": "a", "chunk_id": 3}},
+            ],
+            "continuation": "next",
+        },
+        {"documents": [{"fields": {"document_id": "b", "chunk_id": 1}}]},
+    ]
+    selections: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        selections.append(request.url.params["selection"])
+        page = 1 if request.url.params.get("continuation") == "next" else 0
+        return httpx.Response(200, json=pages[page])
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        counts = get_document_chunk_counts_via_visit(
+            document_ids=["a", "b", "c"],
+            index_name="test_index",
+            http_client=client,
+        )
+
+    assert counts == {"a": 4, "b": 2}
+    # one visit (two pages) for all documents
+    assert len(selections) == 2
+    assert "test_index.document_id=='c'" in selections[0]
@@ -0,0 +1,138 @@
+from datetime import datetime
+from datetime import timezone
+from io import BytesIO
+from typing import Any
+from typing import IO
+from unittest.mock import patch
+
+import pytest
+
+from onyx.configs.constants import DocumentSource
+from onyx.configs.constants import FileOrigin
+from onyx.connectors.models import Document
+from onyx.connectors.models import TextSection
+from onyx.file_store.document_batch_format import DocumentBatchFormatError
+from onyx.file_store.document_batch_format import iter_document_batch
+from onyx.file_store.document_batch_format import serialize_document_batch
+from onyx.file_store.document_batch_storage import FileStoreDocumentBatchStorage
+
+
+class _InMemoryFileStore:
+    def __init__(self) -> None:
+        self.files: dict[str, tuple[bytes, str, dict[str, Any]]] = {}
+
+    def save_file(
+        self,
+        content: IO,
+        display_name: str | None,
+        file_origin: FileOrigin,
+        file_type: str,
+        file_metadata: dict[str, Any] | None = None,
+        file_id: str | None = None,
+    ) -> str:
+        assert file_id is not None
+        data = content.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.files[file_id] = (data, file_type, file_metadata or {})
+        return file_id
+
+    def has_file(self, file_id: str, file_origin: FileOrigin, file_type: str) -> bool:
+        return file_id in self.files and self.files[file_id][1] == file_type
+
+    def read_file(
+        self, file_id: str, mode: str | None = None, use_tempfile: bool = False
+    ) -> IO[bytes]:
+        return BytesIO(self.files[file_id][0])
+
+    def delete_file(self, file_id: str) -> None:
+        del self.files[file_id]
+
+    def change_file_id(self, old_file_id: str, new_file_id: str) -> None:
+        self.files[new_file_id] = self.files.pop(old_file_id)
+
+
+def _documents(count: int) -> list[Document]:
+    return [
+        Document(
+            id=f"doc_{i}",
+            semantic_identifier=f"Document {i}",
+            sections=[TextSection(text=f"content {i} " * 50, link=f"link_{i}")],
+            source=DocumentSource.FILE,
+            metadata={"tag": str(i)},
+            doc_updated_at=datetime(2024, 1, i + 1, tzinfo=timezone.utc),
+        )
+        for i in range(count)
+    ]
+
+
+def _storage(
+    file_store: _InMemoryFileStore, index_attempt_id: int = 2
+) -> FileStoreDocumentBatchStorage:
+    return FileStoreDocumentBatchStorage(
+        cc_pair_id=1,
+        index_attempt_id=index_attempt_id,
+        file_store=file_store,  # type: ignore[arg-type]
+    )
+
+
+def test_binary_batch_round_trip() -> None:
+    file_store = _InMemoryFileStore()
+    storage = _storage(file_store)
+    documents = _documents(5)
+
+    with patch(
+        "onyx.file_store.document_batch_storage.DOCUMENT_BATCH_BINARY_FORMAT_ENABLED",
+        True,
+    ):
+        storage.store_batch(0, documents)
+
+    ((file_id, (data, _, metadata)),) = file_store.files.items()
+    assert file_id == "iab/1/2/0.batch"
+    assert int(metadata["compressed_size"]) == len(data)
+    assert int(metadata["uncompressed_size"]) > len(data)
+    assert metadata["document_count"] == "5"
+
+    assert storage.get_batch(0) == documents
+    assert storage.extract_path_info(file_id) is not None
+
+    # documents are decoded one at a time while the file is open
+    document_iter = storage.iter_batch(0)
+    assert document_iter is not None
+    assert next(document_iter) == documents[0]
+    assert list(document_iter) == documents[1:]
+    assert storage.iter_batch(1) is None
+
+    storage.delete_batch_by_num(0)
+    assert not file_store.files
+
+
+def test_reads_legacy_json_batches() -> None:
+    file_store = _InMemoryFileStore()
+    documents = _documents(3)
+
+    # JSON is written until the binary format is enabled
+    _storage(file_store).store_batch(4, documents)
+    assert list(file_store.files) == ["iab/1/2/4.json"]
+
+    storage = _storage(file_store)
+    assert storage.get_batch(4) == documents
+    assert list(storage.iter_batch(4) or []) == documents
+    assert storage.get_batch(5) is None
+
+    # moving to a new attempt keeps the format of the batch
+    new_storage = _storage(file_store, index_attempt_id=3)
+    new_storage.update_old_batches_to_new_index_attempt(["iab/1/2/4.json"])
+    assert new_storage.get_batch(4) == documents
+
+
+def test_iter_document_batch_decodes_documents_lazily() -> None:
+    documents = _documents(3)
+    data = serialize_document_batch(documents).data
+
+    document_iter = iter_document_batch(BytesIO(data))
+    assert next(document_iter) == documents[0]
+    assert list(document_iter) == documents[1:]
+
+    with pytest.raises(DocumentBatchFormatError):
+        list(iter_document_batch(BytesIO(b"[]")))
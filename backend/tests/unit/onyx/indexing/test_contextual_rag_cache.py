@@ -0,0 +1,42 @@
+from pathlib import Path
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from onyx.indexing.contextual_rag_cache import build_contextual_rag_cache_key
+from onyx.indexing.indexing_pipeline import _invoke_contextual_rag_llm
+from onyx.indexing.text_cache import TextCache
+
+
+def test_cache_key_depends_on_prompt_and_model() -> None:
+    base = build_contextual_rag_cache_key("prompt", "openai", "gpt-4o-mini", 512)
+    assert base == build_contextual_rag_cache_key(
+        "prompt", "openai", "gpt-4o-mini", 512
+    )
+    assert base != build_contextual_rag_cache_key(
+        "prompt 2", "openai", "gpt-4o-mini", 512
+    )
+    assert base != build_contextual_rag_cache_key("prompt", "openai", "gpt-4o", 512)
+    assert base != build_contextual_rag_cache_key(
+        "prompt", "openai", "gpt-4o-mini", 512, tenant_id="tenant"
+    )
+
+
+def test_repeated_prompts_are_served_from_the_cache(tmp_path: Path) -> None:
+    cache = TextCache(
+        db_path=str(tmp_path / "cache.sqlite3"), max_entries=10, name="contextual_rag"
+    )
+    llm = Mock()
+    llm.config.model_provider = "openai"
+    llm.config.model_name = "gpt-4o-mini"
+
+    with patch(
+        "onyx.indexing.indexing_pipeline.llm_response_to_string",
+        side_effect=lambda response: f"context {llm.invoke.call_count}",
+    ):
+        first = _invoke_contextual_rag_llm(llm, "prompt", 10, cache)
+        second = _invoke_contextual_rag_llm(llm, "prompt", 10, cache)
+        other = _invoke_contextual_rag_llm(llm, "other prompt", 10, cache)
+
+    assert first == second == "context 1"
+    assert other == "context 2"
+    assert llm.invoke.call_count == 2
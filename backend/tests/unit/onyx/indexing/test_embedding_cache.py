@@ -0,0 +1,66 @@
+import time
+from pathlib import Path
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from onyx.indexing.embedder import DefaultIndexingEmbedder
+from onyx.indexing.embedding_cache import build_embedding_cache_key
+from onyx.indexing.embedding_cache import EmbeddingCache
+
+
+def test_cache_round_trip_and_eviction(tmp_path: Path) -> None:
+    cache = EmbeddingCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=10)
+
+    cache.put_many({f"key{i}": [float(i), 0.5] for i in range(10)})
+    assert cache.get_many(["key3", "missing"]) == {"key3": [3.0, 0.5]}
+    # make sure the read and the next write get distinct last_used timestamps
+    time.sleep(0.01)
+
+    # going over capacity evicts the least recently used entries, "key3" was just read
+    cache.put_many({"key10": [10.0, 0.5]})
+    remaining = cache.get_many([f"key{i}" for i in range(11)])
+    assert len(remaining) == 9
+    assert "key3" in remaining
+    assert "key10" in remaining
+
+
+def test_cache_key_depends_on_model_settings() -> None:
+    base = build_embedding_cache_key(
+        text="hello", model_name="model", normalize=True, prefix=None
+    )
+    assert base == build_embedding_cache_key(
+        text="hello", model_name="model", normalize=True, prefix=None
+    )
+    assert base != build_embedding_cache_key(
+        text="hello", model_name="model", normalize=False, prefix=None
+    )
+    assert base != build_embedding_cache_key(
+        text="hello", model_name="model", normalize=True, prefix="passage: "
+    )
+    assert base != build_embedding_cache_key(
+        text="hello", model_name="other-model", normalize=True, prefix=None
+    )
+
+
+def test_embedder_only_encodes_cache_misses(tmp_path: Path) -> None:
+    cache = EmbeddingCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=100)
+
+    with patch("onyx.indexing.embedder.EmbeddingModel"):
+        embedder = DefaultIndexingEmbedder(
+            model_name="test-model",
+            normalize=True,
+            query_prefix=None,
+            passage_prefix=None,
+            embedding_cache=cache,
+        )
+
+    encode = Mock(side_effect=lambda texts: [[float(len(text))] for text in texts])
+
+    first = embedder._encode_with_cache(["a", "bb"], encode=encode)
+    second = embedder._encode_with_cache(["bb", "ccc", "ccc"], encode=encode)
+
+    assert first == [[1.0], [2.0]]
+    assert second == [[2.0], [3.0], [3.0]]
+    assert encode.call_args_list[1].args == (["ccc"],)
+    assert embedder.cache_stats.hits == 2
+    assert embedder.cache_stats.misses == 3
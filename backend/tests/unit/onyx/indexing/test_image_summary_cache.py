@@ -0,0 +1,116 @@
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from onyx.configs.constants import DocumentSource
+from onyx.connectors.models import Document
+from onyx.connectors.models import ImageSection
+from onyx.connectors.models import TextSection
+from onyx.indexing.image_summary_cache import build_image_summary_cache_key
+from onyx.indexing.indexing_pipeline import process_image_sections
+from onyx.indexing.text_cache import TextCache
+
+_PIPELINE = "onyx.indexing.indexing_pipeline"
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    cache = TextCache(
+        db_path=str(tmp_path / "cache.sqlite3"), max_entries=10, name="summaries"
+    )
+
+    cache.put_many({f"key{i}": f"summary {i}" for i in range(10)})
+    # make sure the next write gets a later last_used timestamp
+    time.sleep(0.01)
+
+    # going over capacity evicts the least recently used entries
+    cache.put_many({"key10": "summary 10"})
+    remaining = cache.get_many([f"key{i}" for i in range(11)])
+    assert len(remaining) == 9
+    assert cache.get_many(["key10", "missing"]) == {"key10": "summary 10"}
+
+
+def test_cache_key_depends_on_image_model_and_prompts() -> None:
+    base = build_image_summary_cache_key(b"image", "openai", "gpt-4o", "sys", "user")
+    assert base == build_image_summary_cache_key(
+        b"image", "openai", "gpt-4o", "sys", "user"
+    )
+    assert base != build_image_summary_cache_key(
+        b"other", "openai", "gpt-4o", "sys", "user"
+    )
+    assert base != build_image_summary_cache_key(
+        b"image", "openai", "gpt-4o-mini", "sys", "user"
+    )
+    assert base != build_image_summary_cache_key(
+        b"image", "openai", "gpt-4o", "sys", "new user prompt"
+    )
+    assert base != build_image_summary_cache_key(
+        b"image", "openai", "gpt-4o", "sys", "user", tenant_id="tenant"
+    )
+
+
+def test_duplicate_and_cached_images_are_summarized_once(tmp_path: Path) -> None:
+    images = {"logo_1": b"logo", "logo_2": b"logo", "chart": b"chart"}
+    file_store = Mock()
+    file_store.read_file_record.side_effect = lambda file_id: Mock(display_name=file_id)
+    file_store.read_file.side_effect = lambda file_id: BytesIO(images[file_id])
+
+    summarized: list[bytes] = []
+
+    def summarize(llm: Any, image_data: bytes, context_name: str) -> str:
+        summarized.append(image_data)
+        return f"summary of {image_data.decode()}"
+
+    llm = Mock()
+    llm.config.model_provider = "openai"
+    llm.config.model_name = "gpt-4o"
+
+    document = Document(
+        id="deck",
+        source=DocumentSource.GOOGLE_DRIVE,
+        semantic_identifier="Deck",
+        metadata={},
+        sections=[
+            ImageSection(image_file_id="logo_1", link="slide1"),
+            TextSection(text="Agenda", link="slide2"),
+            ImageSection(image_file_id="chart", link="slide3"),
+            ImageSection(image_file_id="logo_2", link="slide4"),
+        ],
+    )
+    cache = TextCache(
+        db_path=str(tmp_path / "cache.sqlite3"), max_entries=10, name="summaries"
+    )
+
+    with (
+        patch(
+            f"{_PIPELINE}.get_image_extraction_and_analysis_enabled",
+            return_value=True,
+        ),
+        patch(f"{_PIPELINE}.get_default_llm_with_vision", return_value=llm),
+        patch(f"{_PIPELINE}.get_default_file_store", return_value=file_store),
+        patch(f"{_PIPELINE}.summarize_image_with_error_handling", new=summarize),
+        patch(f"{_PIPELINE}.get_image_summary_cache", return_value=cache),
+    ):
+        (indexing_document,) = process_image_sections([document])
+        assert sorted(summarized) == [b"chart", b"logo"]
+        # every image is read to be hashed, only the summarized ones are read again
+        assert file_store.read_file.call_count == 3 + 2
+        assert [section.text for section in indexing_document.processed_sections] == [
+            "summary of logo",
+            "Agenda",
+            "summary of chart",
+            "summary of logo",
+        ]
+
+        # re-indexing the same document is served from the cache
+        summarized.clear()
+        file_store.read_file.reset_mock()
+        (reindexed_document,) = process_image_sections([document])
+        assert summarized == []
+        assert file_store.read_file.call_count == 3
+        assert (
+            reindexed_document.processed_sections
+            == indexing_document.processed_sections
+        )
@@ -1,22 +1,33 @@
+import contextlib
+from collections.abc import Callable
+from collections.abc import Iterator
 from typing import Any
 from typing import cast
 from typing import List
+from unittest.mock import MagicMock
 from unittest.mock import Mock
 from unittest.mock import patch
 
 import pytest
+from prometheus_client import REGISTRY
 
 from onyx.configs.app_configs import MAX_DOCUMENT_CHARS
+from onyx.connectors.models import ConnectorFailure
 from onyx.connectors.models import Document
+from onyx.connectors.models import DocumentFailure
 from onyx.connectors.models import DocumentSource
 from onyx.connectors.models import ImageSection
 from onyx.connectors.models import TextSection
+from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.indexing.chunker import Chunker
 from onyx.indexing.embedder import DefaultIndexingEmbedder
 from onyx.indexing.indexing_pipeline import _get_aggregated_chunk_boost_factor
 from onyx.indexing.indexing_pipeline import add_contextual_summaries
+from onyx.indexing.indexing_pipeline import DocumentBatchPrepareContext
 from onyx.indexing.indexing_pipeline import filter_documents
+from onyx.indexing.indexing_pipeline import index_doc_batch
 from onyx.indexing.indexing_pipeline import process_image_sections
+from onyx.indexing.models import BuildMetadataAwareChunksResult
 from onyx.indexing.models import ChunkEmbedding
 from onyx.indexing.models import IndexChunk
 from onyx.llm.model_response import Choice
@@ -343,3 +354,268 @@ def test_contextual_rag(
             count += 1
         assert chunk.doc_summary == doc_summary
         assert chunk.chunk_context == chunk_context
+
+
+def _mock_adapter(docs: list[Document]) -> MagicMock:
+    """An adapter that prepares all of docs and reports the number of chunks of each
+    document it builds chunks for"""
+    adapter = MagicMock()
+    adapter.prepare.return_value = DocumentBatchPrepareContext(
+        updatable_docs=docs, id_to_boost_map={}
+    )
+    adapter.build_metadata_aware_chunks.side_effect = (
+        lambda chunks_with_embeddings, chunk_content_scores, tenant_id, context: (
+            BuildMetadataAwareChunksResult(
+                chunks=[],
+                doc_id_to_previous_chunk_cnt={},
+                doc_id_to_new_chunk_cnt={
+                    doc.id: len(
+                        [
+                            chunk
+                            for chunk in chunks_with_embeddings
+                            if chunk.source_document.id == doc.id
+                        ]
+                    )
+                    for doc in context.updatable_docs
+                },
+                user_file_id_to_raw_text={},
+                user_file_id_to_token_count={},
+            )
+        )
+    )
+
+    return adapter
+
+
+def _mock_chunker() -> Mock:
+    """Splits every document into two chunks"""
+    chunker = Mock()
+    chunker.enable_large_chunks = False
+    chunker.chunk.side_effect = lambda indexable_docs: [
+        create_test_chunk("content", chunk_id=chunk_id, doc_id=doc.id)
+        for doc in indexable_docs
+        for chunk_id in range(2)
+    ]
+    return chunker
+
+
+def _mock_write_chunks(
+    written_doc_ids: list[set[str]],
+) -> Callable[
+    [Any, Any, Any], tuple[list[DocumentInsertionRecord], list[ConnectorFailure]]
+]:
+    """Records the documents of every write, the ones with chunks are new"""
+
+    def mock_write(
+        document_index: Any, chunks: Any, index_batch_params: Any
+    ) -> tuple[list[DocumentInsertionRecord], list[ConnectorFailure]]:
+        written_doc_ids.append(set(index_batch_params.doc_id_to_new_chunk_cnt))
+        return [
+            DocumentInsertionRecord(document_id=doc_id, already_existed=False)
+            for doc_id, count in index_batch_params.doc_id_to_new_chunk_cnt.items()
+            if count
+        ], []
+
+    return mock_write
+
+
+@pytest.mark.parametrize("streaming_enabled", [True, False])
+def test_index_doc_batch_streaming(streaming_enabled: bool) -> None:
+    docs = [create_test_document(doc_id=f"doc_{i}") for i in range(5)]
+    failing_doc_id = "doc_3"
+
+    adapter = _mock_adapter(docs)
+    chunker = _mock_chunker()
+
+    def mock_embed(
+        chunks: list[IndexChunk], **kwargs: Any
+    ) -> tuple[list[IndexChunk], list[ConnectorFailure]]:
+        failures = [
+            ConnectorFailure(
+                failed_document=DocumentFailure(document_id=failing_doc_id),
+                failure_message="Failed to embed",
+            )
+            for chunk in chunks
+            if chunk.source_document.id == failing_doc_id and chunk.chunk_id == 0
+        ]
+        return [
+            chunk for chunk in chunks if chunk.source_document.id != failing_doc_id
+        ], failures
+
+    written_doc_ids: list[set[str]] = []
+    mock_write = _mock_write_chunks(written_doc_ids)
+
+    with (
+        patch(
+            "onyx.indexing.indexing_pipeline.INDEXING_PIPELINE_STREAMING_ENABLED",
+            streaming_enabled,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.INDEXING_PIPELINE_STREAMING_GROUP_SIZE", 2
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.USE_INFORMATION_CONTENT_CLASSIFICATION",
+            False,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.get_image_extraction_and_analysis_enabled",
+            return_value=False,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.embed_chunks_with_failure_handling",
+            side_effect=mock_embed,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.write_chunks_to_vector_db_with_backoff",
+            side_effect=mock_write,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.invalidate_documents_cache"
+        ) as mock_invalidate_documents,
+        patch(
+            "onyx.indexing.indexing_pipeline.invalidate_tenant_cache"
+        ) as mock_invalidate_tenant,
+    ):
+        result = index_doc_batch(
+            document_batch=docs,
+            chunker=chunker,
+            embedder=Mock(),
+            information_content_classification_model=Mock(),
+            document_index=Mock(),
+            request_id=None,
+            tenant_id="test_tenant",
+            adapter=adapter,
+            filter_fnc=lambda batch: batch,
+        )
+
+    assert result.new_docs == 4
+    # new documents may belong in any cached search result
+    mock_invalidate_tenant.assert_called_once_with("test_tenant")
+    mock_invalidate_documents.assert_not_called()
+    assert result.total_docs == 5
+    assert result.total_chunks == 8
+    assert [
+        failure.failed_document.document_id
+        for failure in result.failures
+        if failure.failed_document
+    ] == [failing_doc_id]
+
+    if streaming_enabled:
+        # every group is written separately, in order
+        assert written_doc_ids == [
+            {"doc_0", "doc_1"},
+            {"doc_2", "doc_3"},
+            {"doc_4"},
+        ]
+    else:
+        assert written_doc_ids == [{doc.id for doc in docs}]
+
+    # each group is only locked while it is written and finalized
+    assert [
+        {doc.id for doc in call.args[0]} for call in adapter.lock_context.call_args_list
+    ] == written_doc_ids
+    assert len(adapter.post_index.call_args_list) == len(written_doc_ids)
+
+    doc_id_to_new_chunk_cnt: dict[str, int] = {}
+    num_updatable_chunks = 0
+    for call in adapter.post_index.call_args_list:
+        doc_id_to_new_chunk_cnt.update(call.kwargs["result"].doc_id_to_new_chunk_cnt)
+        num_updatable_chunks += len(call.kwargs["updatable_chunk_data"])
+    assert doc_id_to_new_chunk_cnt == {
+        "doc_0": 2,
+        "doc_1": 2,
+        "doc_2": 2,
+        "doc_3": 0,
+        "doc_4": 2,
+    }
+    assert num_updatable_chunks == 8
+
+
+@pytest.mark.parametrize("missing_doc_ids", [set(), {"doc_2"}])
+def test_index_doc_batch_skip_locked_retries_contended_docs(
+    missing_doc_ids: set[str],
+) -> None:
+    docs = [create_test_document(doc_id=f"doc_{i}") for i in range(3)]
+    # doc_1 is held by another worker for the first attempt
+    held_doc_ids = {"doc_1"}
+
+    @contextlib.contextmanager
+    def mock_lock_available_context(
+        documents: list[Document],
+    ) -> Iterator[tuple[Mock, set[str], set[str]]]:
+        doc_ids = {doc.id for doc in documents}
+        locked_ids = doc_ids - held_doc_ids - missing_doc_ids
+        held_doc_ids.clear()
+        yield Mock(), locked_ids, doc_ids & missing_doc_ids
+
+    adapter = _mock_adapter(docs)
+    adapter.lock_available_context.side_effect = mock_lock_available_context
+    # like the user file adapter, which has no connector / credential
+    adapter.connector_id = None
+    adapter.credential_id = None
+    user_file_labels = {"connector_id": "user_file", "credential_id": "user_file"}
+    num_retries = (
+        REGISTRY.get_sample_value(
+            "onyx_indexing_document_lock_retries_total", user_file_labels
+        )
+        or 0
+    )
+    chunker = _mock_chunker()
+
+    written_doc_ids: list[set[str]] = []
+    mock_write = _mock_write_chunks(written_doc_ids)
+
+    with (
+        patch(
+            "onyx.indexing.indexing_pipeline.DOCUMENT_LOCK_SKIP_LOCKED_ENABLED", True
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.USE_INFORMATION_CONTENT_CLASSIFICATION",
+            False,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.get_image_extraction_and_analysis_enabled",
+            return_value=False,
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.embed_chunks_with_failure_handling",
+            side_effect=lambda chunks, **kwargs: (chunks, []),
+        ),
+        patch(
+            "onyx.indexing.indexing_pipeline.write_chunks_to_vector_db_with_backoff",
+            side_effect=mock_write,
+        ),
+        patch("onyx.indexing.indexing_pipeline.invalidate_documents_cache"),
+        patch("onyx.indexing.indexing_pipeline.invalidate_tenant_cache"),
+        patch("onyx.indexing.indexing_pipeline.time.sleep") as mock_sleep,
+    ):
+        result = index_doc_batch(
+            document_batch=docs,
+            chunker=chunker,
+            embedder=Mock(),
+            information_content_classification_model=Mock(),
+            document_index=Mock(),
+            request_id=None,
+            tenant_id="test_tenant",
+            adapter=adapter,
+            filter_fnc=lambda batch: batch,
+        )
+
+    assert result.new_docs == 3 - len(missing_doc_ids)
+    assert result.total_chunks == 6 - 2 * len(missing_doc_ids)
+    # the free documents are written right away, the contended one after a backoff
+    # and the ones that were deleted in the meantime not at all
+    expected_doc_ids = [{"doc_0", "doc_2"} - missing_doc_ids, {"doc_1"}]
+    assert written_doc_ids == expected_doc_ids
+    mock_sleep.assert_called_once()
+    assert (
+        REGISTRY.get_sample_value(
+            "onyx_indexing_document_lock_retries_total", user_file_labels
+        )
+        == num_retries + 1
+    )
+    assert [
+        {doc.id for doc in call.kwargs["context"].updatable_docs}
+        for call in adapter.post_index.call_args_list
+    ] == expected_doc_ids
+    adapter.lock_context.assert_not_called()
@@ -0,0 +1,78 @@
+from unittest.mock import MagicMock
+
+from onyx.key_value_store.l1_cache import KV_STORE_INVALIDATION_CHANNEL
+from onyx.key_value_store.l1_cache import KVStoreL1Cache
+
+
+def _make_cache(max_size: int = 10, ttl_seconds: float = 60) -> KVStoreL1Cache:
+    cache = KVStoreL1Cache(
+        max_size=max_size,
+        ttl_seconds=ttl_seconds,
+        redis_client=MagicMock(),
+        start_listener=False,
+    )
+    # pretend the listener is subscribed
+    cache._subscribed.set()
+    return cache
+
+
+def test_get_put_and_hit_rate() -> None:
+    cache = _make_cache()
+
+    assert cache.get("t:settings") == (False, None)
+    cache.put("t:settings", {"a": [1]}, cache.start_read())
+
+    found, value = cache.get("t:settings")
+    assert found and value == {"a": [1]}
+    # callers get a copy they are free to modify
+    value["a"].append(2)  # type: ignore
+    assert cache.get("t:settings") == (True, {"a": [1]})
+
+    assert cache.hits == 2
+    assert cache.misses == 1
+    assert cache.hit_rate == 2 / 3
+
+
+def test_invalidation_drops_entry_and_broadcasts() -> None:
+    cache = _make_cache()
+    cache.put("t:key", "value", cache.start_read())
+
+    cache.invalidate("t:key")
+
+    assert cache.get("t:key") == (False, None)
+    cache._redis.publish.assert_called_once_with(  # type: ignore
+        KV_STORE_INVALIDATION_CHANNEL, "t:key"
+    )
+
+
+def test_value_read_during_invalidation_is_not_cached() -> None:
+    cache = _make_cache()
+
+    read_generation = cache.start_read()
+    # another process writes the key while this one is reading the old value
+    cache._invalidate_local("t:key")
+    cache.put("t:key", "stale", read_generation)
+
+    assert cache.get("t:key") == (False, None)
+
+
+def test_bounded_size_and_ttl() -> None:
+    cache = _make_cache(max_size=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key, cache.start_read())
+    assert cache.get("a") == (False, None)
+    assert cache.get("c") == (True, "c")
+
+    expired_cache = _make_cache(ttl_seconds=0)
+    expired_cache.put("a", "a", expired_cache.start_read())
+    assert expired_cache.get("a") == (False, None)
+
+
+def test_cache_is_bypassed_while_not_subscribed() -> None:
+    cache = _make_cache()
+    cache.put("a", "a", cache.start_read())
+
+    cache._subscribed.clear()
+    assert cache.get("a") == (False, None)
+    cache.put("a", "a", cache.start_read())
+    assert cache.get("a") == (False, None)
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from onyx.kg.clustering.trigram_index import get_trigrams
+from onyx.kg.clustering.trigram_index import trigram_similarity
+from onyx.kg.clustering.trigram_index import TrigramIndex
+
+
+def test_get_trigrams_matches_pg_trgm() -> None:
+    # SELECT show_trgm('Cat-Dog') -> {"  c","  d"," ca"," do","at ","cat","dog","og "}
+    assert get_trigrams("Cat-Dog") == frozenset(
+        {"  c", "  d", " ca", " do", "at ", "cat", "dog", "og "}
+    )
+    assert get_trigrams("--") == frozenset()
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.6, 0.9])
+def test_query_matches_brute_force(threshold: float) -> None:
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choice("abcde") for _ in range(rng.randint(3, 8)))
+        for _ in range(200)
+    ]
+    names = [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(300)]
+
+    index = TrigramIndex(threshold=threshold, corpus=names)
+    for i, name in enumerate(names):
+        index.add(str(i), name)
+
+    for query in names[:50]:
+        expected = [
+            str(i)
+            for i, name in enumerate(names)
+            if trigram_similarity(get_trigrams(query), get_trigrams(name)) >= threshold
+        ]
+        assert index.query(query) == expected
+
+
+def test_entities_added_later_are_found() -> None:
+    index = TrigramIndex(threshold=0.6)
+    index.add("a", "onyx knowledge graph")
+    assert index.query("onyx knowledge graphs") == ["a"]
+
+    index.add("b", "onyx knowledge graphs")
+    index.add("b", "something else")  # already indexed, ignored
+    assert index.query("onyx knowledge graphs") == ["a", "b"]
+    assert index.query("unrelated") == []
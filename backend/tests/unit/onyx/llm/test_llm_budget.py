@@ -0,0 +1,49 @@
+import threading
+import time
+
+from onyx.llm.llm_budget import LLMBudget
+
+
+def test_budget_limits_concurrency() -> None:
+    budget = LLMBudget(max_concurrency=2, tokens_per_minute=0)
+    lock = threading.Lock()
+    current = 0
+    max_concurrent = 0
+
+    def call() -> None:
+        nonlocal current, max_concurrent
+        with budget.reserve(100):
+            with lock:
+                current += 1
+                max_concurrent = max(max_concurrent, current)
+            time.sleep(0.02)
+            with lock:
+                current -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_concurrent == 2
+
+
+def test_budget_limits_tokens_per_minute() -> None:
+    # 6000 tokens per minute refill at 100 tokens per second
+    budget = LLMBudget(max_concurrency=4, tokens_per_minute=6000)
+
+    start = time.monotonic()
+    with budget.reserve(6000):
+        pass
+    # the bucket starts full
+    assert time.monotonic() - start < 0.05
+
+    with budget.reserve(10):
+        pass
+    assert time.monotonic() - start >= 0.09
+
+    # calls larger than the whole budget still go through once the bucket is full
+    budget = LLMBudget(max_concurrency=4, tokens_per_minute=6000)
+    with budget.reserve(1_000_000):
+        pass
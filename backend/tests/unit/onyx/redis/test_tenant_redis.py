@@ -0,0 +1,78 @@
+from unittest.mock import call
+from unittest.mock import patch
+
+import redis
+
+from onyx.redis.redis_pool import prefix_command_args
+from onyx.redis.redis_pool import TenantRedis
+
+
+def _prefixed(key: str) -> str:
+    return key if key.startswith("tenant:") else f"tenant:{key}"
+
+
+def test_prefix_command_args() -> None:
+    assert prefix_command_args(("GET", "a"), _prefixed) == ("GET", "tenant:a")
+    assert prefix_command_args(("SET", "a", "v", "EX", 10), _prefixed) == (
+        "SET",
+        "tenant:a",
+        "v",
+        "EX",
+        10,
+    )
+    assert prefix_command_args(("DEL", "a", "tenant:b"), _prefixed) == (
+        "DEL",
+        "tenant:a",
+        "tenant:b",
+    )
+    assert prefix_command_args(("MSET", "a", "1", "b", "2"), _prefixed) == (
+        "MSET",
+        "tenant:a",
+        "1",
+        "tenant:b",
+        "2",
+    )
+    assert prefix_command_args(("BLPOP", "a", "b", 5), _prefixed) == (
+        "BLPOP",
+        "tenant:a",
+        "tenant:b",
+        5,
+    )
+    assert prefix_command_args(("EVALSHA", "sha", 1, "a", "arg"), _prefixed) == (
+        "EVALSHA",
+        "sha",
+        1,
+        "tenant:a",
+        "arg",
+    )
+    # commands without keys are left alone
+    assert prefix_command_args(("SCAN", 0), _prefixed) == ("SCAN", 0)
+
+
+def test_client_commands_are_prefixed() -> None:
+    client = TenantRedis("tenant", connection_pool=redis.ConnectionPool())
+
+    with patch.object(redis.Redis, "execute_command") as mock_execute_command:
+        client.delete("a", "b")
+        client.sunion(["c", "d"])
+
+    assert mock_execute_command.call_args_list == [
+        call("DEL", "tenant:a", "tenant:b"),
+        call("SUNION", "tenant:c", "tenant:d"),
+    ]
+    assert client.lock("e").name == "tenant:e"
+
+
+def test_pipeline_commands_are_prefixed() -> None:
+    client = TenantRedis("tenant", connection_pool=redis.ConnectionPool())
+
+    pipe = client.pipeline()
+    pipe.mget(["a", "b"])
+    pipe.set("c", "value", ex=10)
+    pipe.eval("return 1", 1, "d", "arg")
+
+    assert [args for args, _ in pipe.command_stack] == [
+        ("MGET", "tenant:a", "tenant:b"),
+        ("SET", "tenant:c", "value", "EX", 10),
+        ("EVAL", "return 1", 1, "tenant:d", "arg"),
+    ]
@@ -0,0 +1,62 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from onyx.server.query_and_chat.token_usage_counters import fetch_token_usage
+from onyx.server.query_and_chat.token_usage_counters import TokenUsage
+
+
+def test_counters_are_read_and_missing_ones_rebuilt_from_db() -> None:
+    now = datetime(2025, 1, 1, 12, 30, 15, tzinfo=timezone.utc)
+    cutoff_time = now - timedelta(hours=1)
+    cutoff_ts = int(cutoff_time.timestamp())
+    minute = int(now.timestamp()) // 60 * 60
+
+    r = MagicMock()
+    r.pipeline.return_value.execute.return_value = [
+        # complete counters, the field before the cutoff is ignored
+        {
+            b"covered_since": str(cutoff_ts - 60).encode(),
+            str(minute).encode(): b"100",
+            str(cutoff_ts - 120).encode(): b"5",
+        },
+        # flushed
+        {},
+        # built for a shorter window than needed
+        {b"covered_since": str(cutoff_ts + 600).encode()},
+    ]
+    db_calls: list[list[str]] = []
+
+    def _fetch_usage_from_db(
+        scopes: list[str], cutoff_time: datetime
+    ) -> dict[str, TokenUsage]:
+        db_calls.append(scopes)
+        return {"user_group:1": [(now, 7)]}
+
+    with patch(
+        "onyx.server.query_and_chat.token_usage_counters.get_redis_client",
+        return_value=r,
+    ):
+        usage = fetch_token_usage(
+            ["global", "user_group:1", "user_group:2"],
+            cutoff_time,
+            _fetch_usage_from_db,
+        )
+
+    assert db_calls == [["user_group:1", "user_group:2"]]
+    assert usage == {
+        "global": [(datetime.fromtimestamp(minute, tz=timezone.utc), 100)],
+        "user_group:1": [(now, 7)],
+        "user_group:2": [],
+    }
+
+    # the rebuilt counters cover the window and replace the old ones
+    r.pipeline.return_value.hset.assert_any_call(
+        "token_usage:user_group:1",
+        mapping={"covered_since": cutoff_ts, str(minute): 7},
+    )
+    r.pipeline.return_value.hset.assert_any_call(
+        "token_usage:user_group:2", mapping={"covered_since": cutoff_ts}
+    )
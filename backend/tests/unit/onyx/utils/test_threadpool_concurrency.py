@@ -9,6 +9,7 @@ import pytest
 
 from onyx.utils.threadpool_concurrency import parallel_yield
 from onyx.utils.threadpool_concurrency import run_in_background
+from onyx.utils.threadpool_concurrency import run_pipeline_stage
 from onyx.utils.threadpool_concurrency import run_with_timeout
 from onyx.utils.threadpool_concurrency import ThreadSafeDict
 from onyx.utils.threadpool_concurrency import wait_on_background
@@ -389,3 +390,72 @@ def test_parallel_yield_non_blocking() -> None:
     # Verify no values are missing
     assert len(results) == 300  # Should have all values from 0 to 299
     assert sorted(results) == list(range(300))
+
+
+def test_run_pipeline_stage_chained_stages_preserve_order() -> None:
+    stop_event = threading.Event()
+    doubled = run_pipeline_stage(iter(range(10)), lambda x: x * 2, 2, stop_event)
+    incremented = run_pipeline_stage(doubled, lambda x: x + 1, 2, stop_event)
+
+    assert list(incremented) == [x * 2 + 1 for x in range(10)]
+
+
+def test_run_pipeline_stage_overlaps_with_consumer() -> None:
+    """The stage should work on the next item while the consumer handles the current one"""
+    stop_event = threading.Event()
+
+    def slow_identity(x: int) -> int:
+        time.sleep(0.1)
+        return x
+
+    start = time.time()
+    for _ in run_pipeline_stage(iter(range(5)), slow_identity, 2, stop_event):
+        time.sleep(0.1)
+    elapsed = time.time() - start
+
+    # sequential processing would take 1 second
+    assert elapsed < 0.9
+
+
+def test_run_pipeline_stage_applies_backpressure() -> None:
+    stop_event = threading.Event()
+    produced: list[int] = []
+
+    def record(x: int) -> int:
+        produced.append(x)
+        return x
+
+    results = run_pipeline_stage(iter(range(100)), record, 2, stop_event)
+    assert next(results) == 0
+    time.sleep(0.2)
+
+    # one item was consumed, two are queued and one is waiting to be put
+    assert len(produced) <= 4
+
+    stop_event.set()
+
+
+def test_run_pipeline_stage_propagates_exceptions() -> None:
+    stop_event = threading.Event()
+
+    def fail_on_three(x: int) -> int:
+        if x == 3:
+            raise ValueError("Test error")
+        return x
+
+    results = run_pipeline_stage(iter(range(10)), fail_on_three, 2, stop_event)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(ValueError, match="Test error"):
+        next(results)
+
+
+def test_run_pipeline_stage_preserves_contextvars() -> None:
+    stop_event = threading.Event()
+    token = test_context_var.set("pipeline_value")
+    try:
+        results = run_pipeline_stage(
+            iter(range(3)), lambda _: test_context_var.get(), 1, stop_event
+        )
+        assert list(results) == ["pipeline_value"] * 3
+    finally:
+        test_context_var.reset(token)
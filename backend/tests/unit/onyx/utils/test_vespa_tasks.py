@@ -1,7 +1,16 @@
+import contextlib
+from collections.abc import Iterator
 from types import SimpleNamespace
 from typing import Any
 
+import pytest
+from celery.exceptions import Retry
+
+from onyx.background.celery.tasks.vespa import document_sync
 from onyx.background.celery.tasks.vespa import tasks as vespa_tasks
+from onyx.configs.constants import OnyxCeleryTask
+from onyx.redis import redis_document_set
+from onyx.redis import redis_object_helper
 
 
 class _StubRedisDocumentSet:
@@ -96,3 +105,183 @@ def test_monitor_deletes_document_set_with_no_connectors(monkeypatch: Any) -> No
 
     assert calls["deleted"] is True
     assert calls["synced"] is False
+
+
+def test_generate_document_sync_tasks_batches_documents(monkeypatch: Any) -> None:
+    doc_ids = [f"doc_{i}" for i in range(7)]
+    sent: list[dict[str, Any]] = []
+
+    monkeypatch.setattr(
+        document_sync, "construct_document_id_select_by_needs_sync", lambda: None
+    )
+    db_session = SimpleNamespace(
+        scalars=lambda stmt: SimpleNamespace(yield_per=lambda n: iter(doc_ids))
+    )
+    celery_app = SimpleNamespace(
+        send_task=lambda name, kwargs, **options: sent.append(kwargs)
+    )
+    taskset: set[str] = set()
+    r = SimpleNamespace(sadd=lambda key, task_id: taskset.add(task_id))
+
+    tasks_generated, total_docs = document_sync.generate_document_sync_tasks(
+        r=r,  # type: ignore[arg-type]
+        max_tasks=10,
+        celery_app=celery_app,  # type: ignore[arg-type]
+        db_session=db_session,  # type: ignore[arg-type]
+        lock=SimpleNamespace(reacquire=lambda: None),  # type: ignore[arg-type]
+        tenant_id="tenant",
+        batch_size=3,
+    )
+
+    assert (tasks_generated, total_docs) == (3, 7)
+    assert [kwargs["document_ids"] for kwargs in sent] == [
+        doc_ids[0:3],
+        doc_ids[3:6],
+        doc_ids[6:7],
+    ]
+    assert len(taskset) == 3
+
+
+def test_document_set_generate_tasks_batches_documents(monkeypatch: Any) -> None:
+    doc_ids = [f"doc_{i}" for i in range(5)]
+    sent: list[tuple[str, dict[str, Any], str]] = []
+
+    monkeypatch.setattr(
+        redis_object_helper, "get_redis_client", lambda tenant_id: SimpleNamespace()
+    )
+    monkeypatch.setattr(redis_document_set, "VESPA_METADATA_SYNC_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        redis_document_set,
+        "construct_document_id_select_by_docset",
+        lambda document_set_id, current_only: None,
+    )
+    db_session = SimpleNamespace(
+        scalars=lambda stmt: SimpleNamespace(yield_per=lambda n: iter(doc_ids))
+    )
+    celery_app = SimpleNamespace(
+        send_task=lambda name, kwargs, task_id, **options: sent.append(
+            (name, kwargs, task_id)
+        )
+    )
+    taskset: set[str] = set()
+    r = SimpleNamespace(sadd=lambda key, task_id: taskset.add(task_id))
+
+    rds = redis_document_set.RedisDocumentSet("tenant", 1)
+    result = rds.generate_tasks(
+        max_tasks=10,
+        celery_app=celery_app,  # type: ignore[arg-type]
+        db_session=db_session,  # type: ignore[arg-type]
+        redis_client=r,  # type: ignore[arg-type]
+        lock=SimpleNamespace(reacquire=lambda: None),  # type: ignore[arg-type]
+        tenant_id="tenant",
+    )
+
+    assert result == (3, 5)
+    assert {name for name, _, _ in sent} == {
+        OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK
+    }
+    assert [kwargs["document_ids"] for _, kwargs, _ in sent] == [
+        doc_ids[0:2],
+        doc_ids[2:4],
+        doc_ids[4:5],
+    ]
+    # the monitor tracks completion through the prefixed task ids
+    assert taskset == {task_id for _, _, task_id in sent}
+    assert all(task_id.startswith(rds.task_id_prefix) for task_id in taskset)
+
+
+def _setup_batch_sync_patches(
+    monkeypatch: Any, failing_doc_ids: set[str]
+) -> dict[str, Any]:
+    calls: dict[str, Any] = {"updated": [], "synced": None}
+
+    @contextlib.contextmanager
+    def _session() -> Iterator[SimpleNamespace]:
+        yield SimpleNamespace()
+
+    class _StubRetryDocumentIndex:
+        def __init__(self, index: Any) -> None:
+            pass
+
+        def update_single(self, doc_id: str, **kwargs: Any) -> None:
+            if doc_id in failing_doc_ids:
+                raise ConnectionError("Vespa unavailable")
+            calls["updated"].append((doc_id, kwargs["fields"]))
+
+    def _mark(document_ids: list[str], db_session: Any) -> None:
+        calls["synced"] = document_ids
+
+    monkeypatch.setattr(vespa_tasks, "get_session_with_current_tenant", _session)
+    monkeypatch.setattr(
+        vespa_tasks,
+        "get_active_search_settings",
+        lambda db_session: SimpleNamespace(primary=None, secondary=None),
+    )
+    monkeypatch.setattr(
+        vespa_tasks, "get_default_document_index", lambda **kwargs: object()
+    )
+    monkeypatch.setattr(vespa_tasks.HttpxPool, "get", lambda name: None)
+    monkeypatch.setattr(vespa_tasks, "RetryDocumentIndex", _StubRetryDocumentIndex)
+    monkeypatch.setattr(
+        vespa_tasks,
+        "get_documents_by_ids",
+        lambda db_session, document_ids: [
+            SimpleNamespace(id=doc_id, chunk_count=1, boost=0, hidden=False)
+            for doc_id in document_ids
+            if doc_id != "missing"
+        ],
+    )
+    monkeypatch.setattr(
+        vespa_tasks,
+        "fetch_document_sets_for_documents",
+        lambda document_ids, db_session: [
+            (doc_id, [f"set_{doc_id}"]) for doc_id in document_ids
+        ],
+    )
+    monkeypatch.setattr(
+        vespa_tasks,
+        "get_access_for_documents",
+        lambda document_ids, db_session: {
+            doc_id: f"access_{doc_id}" for doc_id in document_ids
+        },
+    )
+    monkeypatch.setattr(vespa_tasks, "mark_documents_as_synced", _mark)
+    monkeypatch.setattr(
+        vespa_tasks,
+        "VespaDocumentFields",
+        lambda **kwargs: SimpleNamespace(**kwargs),
+    )
+    return calls
+
+
+def test_vespa_metadata_sync_batch_task_syncs_all(monkeypatch: Any) -> None:
+    calls = _setup_batch_sync_patches(monkeypatch, failing_doc_ids=set())
+
+    result = vespa_tasks.vespa_metadata_sync_batch_task.run(
+        document_ids=["a", "b", "missing"], tenant_id="tenant"
+    )
+
+    assert result is True
+    assert sorted(calls["synced"]) == ["a", "b"]
+    doc_id_to_fields = dict(calls["updated"])
+    assert doc_id_to_fields["a"].document_sets == {"set_a"}
+    assert doc_id_to_fields["b"].access == "access_b"
+
+
+def test_vespa_metadata_sync_batch_task_retries_only_failed(monkeypatch: Any) -> None:
+    calls = _setup_batch_sync_patches(monkeypatch, failing_doc_ids={"b"})
+    retry_kwargs: dict[str, Any] = {}
+
+    def _retry(**kwargs: Any) -> None:
+        retry_kwargs.update(kwargs)
+        raise Retry()
+
+    monkeypatch.setattr(vespa_tasks.vespa_metadata_sync_batch_task, "retry", _retry)
+
+    with pytest.raises(Retry):
+        vespa_tasks.vespa_metadata_sync_batch_task.run(
+            document_ids=["a", "b", "c"], tenant_id="tenant"
+        )
+
+    assert sorted(calls["synced"]) == ["a", "c"]
+    assert retry_kwargs["kwargs"] == {"document_ids": ["b"], "tenant_id": "tenant"}
@@ -29,6 +29,7 @@ export function useChatSearch(
   const [debouncedIsSearching, setDebouncedIsSearching] = useState(false);
 
   const [page, setPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const searchTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const currentAbortController = useRef<AbortController | null>(null);
   const activeSearchIdRef = useRef<number>(0); // Add a unique ID for each search
@@ -97,6 +98,7 @@ export function useChatSearch(
       try {
         setIsLoading(true);
         setPage(1);
+        setNextCursor(null);
 
         const response = await fetchChatSessions({
           query,
@@ -109,6 +111,7 @@ export function useChatSearch(
         if (activeSearchIdRef.current === searchId && !signal?.aborted) {
           setChatGroups(response.groups);
           setHasMore(response.has_more);
+          setNextCursor(response.next_cursor);
         }
       } catch (error: any) {
         if (
@@ -149,6 +152,7 @@ export function useChatSearch(
       const response = await fetchChatSessions({
         query: searchQuery,
         page: nextPage,
+        cursor: nextCursor ?? undefined,
         page_size: PAGE_SIZE,
         signal: localSignal,
       });
@@ -157,6 +161,7 @@ export function useChatSearch(
         // Use mergeGroups instead of just concatenating
         setChatGroups((prevGroups) => mergeGroups(prevGroups, response.groups));
         setHasMore(response.has_more);
+        setNextCursor(response.next_cursor);
         setPage(nextPage);
       }
     } catch (error: any) {
@@ -171,7 +176,15 @@ export function useChatSearch(
         setIsLoading(false);
       }
     }
-  }, [isLoading, hasMore, page, searchQuery, PAGE_SIZE, mergeGroups]);
+  }, [
+    isLoading,
+    hasMore,
+    page,
+    nextCursor,
+    searchQuery,
+    PAGE_SIZE,
+    mergeGroups,
+  ]);
 
   const setSearchQuery = useCallback(
     (query: string) => {
@@ -24,10 +24,12 @@ export interface ChatSearchResponse {
   groups: ChatSessionGroup[];
   has_more: boolean;
   next_page: number | null;
+  next_cursor: string | null;
 }
 
 export interface ChatSearchRequest {
   query?: string;
   page?: number;
   page_size?: number;
+  cursor?: string;
 }
@@ -20,6 +20,10 @@ export async function fetchChatSessions(
     queryParams.append("page", params.page.toString());
   }
 
+  if (params.cursor) {
+    queryParams.append("cursor", params.cursor);
+  }
+
   if (params.page_size) {
     queryParams.append("page_size", params.page_size.toString());
   }